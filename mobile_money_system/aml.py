@@ -0,0 +1,301 @@
+import time
+from abc import ABC, abstractmethod
+from collections import deque, namedtuple
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional
+
+try:
+    from models import Transaction, User
+    from storage import JsonStorage
+except ImportError:
+    from mobile_money_system.models import Transaction, User
+    from mobile_money_system.storage import JsonStorage
+
+# Transaction types that move money out of the sender's wallet. Fees and
+# pending requests are bookkeeping and don't count as customer activity.
+OUTGOING_TYPES = {"TRANSFER", "WITHDRAWAL", "BILL_PAYMENT"}
+
+# Rule configuration. Each entry is compiled once into a rule object; the
+# first two reproduce the original hardcoded checks.
+DEFAULT_RULES = [
+    {"id": "large_amount", "type": "amount_threshold", "reason": "Large amount (>10k)",
+     "default": 10000, "tiers": {}, "currencies": {}},
+    {"id": "velocity", "type": "velocity", "reason": "Rapid movement (Velocity)",
+     "window_seconds": 300, "max_count": 5},
+    # Below each tier's daily cap in limits.py, or the cap would refuse the volume before it could be flagged
+    {"id": "daily_volume", "type": "daily_volume", "reason": "High daily volume",
+     "default": 10000, "tiers": {"low": 1500, "standard": 10000, "high": 150000}},
+    # Superseded by the multi-window structuring.StructuringDetector plug-in; kept for custom rule sets
+    {"id": "structuring", "type": "structuring", "enabled": False, "reason": "Possible structuring (repeated amounts just under a threshold)",
+     "window_seconds": 86400, "margin": 0.1, "min_count": 3, "thresholds": [10000],
+     "tier_limits": {"low": 1000, "standard": 5000, "high": 50000}},
+    {"id": "new_counterparty_burst", "type": "new_counterparty_burst", "reason": "Burst of new counterparties",
+     "window_seconds": 3600, "min_count": 5},
+]
+
+# One unit of account activity, either replayed from history or being assessed.
+AMLEvent = namedtuple("AMLEvent", "ts day amount tier currency counterparty outgoing")
+
+
+class AMLResult:
+    __slots__ = ("flagged", "reasons", "rules", "elapsed_ms")
+
+    def __init__(self, reasons: List[str], rules: List[str], elapsed_ms: float):
+        self.flagged = bool(rules)
+        self.reasons = reasons
+        self.rules = rules
+        self.elapsed_ms = elapsed_ms
+
+    @property
+    def reason(self) -> str:
+        return "; ".join(self.reasons)
+
+
+def _evict(window: deque, cutoff: float):
+    while window and window[0] < cutoff:
+        window.popleft()
+
+
+class Rule(ABC):
+    """
+    A compiled rule. `new_state` creates the per-account aggregate the rule
+    needs, `update` folds a committed event into it and `check` decides on a
+    new event from the aggregate alone — all O(1) amortized.
+    """
+    def __init__(self, config: dict):
+        self.id = config["id"]
+        self.reason = config.get("reason", self.id)
+
+    def new_state(self):
+        return None
+
+    def update(self, state, ev: AMLEvent):
+        pass
+
+    @abstractmethod
+    def check(self, state, ev: AMLEvent) -> bool:
+        pass
+
+
+class AmountThresholdRule(Rule):
+    def __init__(self, config: dict):
+        super().__init__(config)
+        self.default = Decimal(str(config.get("default", 10000)))
+        self.tiers = {k: Decimal(str(v)) for k, v in config.get("tiers", {}).items()}
+        self.currencies = {k: Decimal(str(v)) for k, v in config.get("currencies", {}).items()}
+        # "tier:currency" keys override both
+        self.pairs = {tuple(k.split(":", 1)): Decimal(str(v)) for k, v in config.get("tier_currency", {}).items()}
+        self._resolved: Dict[tuple, Decimal] = {}
+
+    def threshold(self, tier: str, currency: str) -> Decimal:
+        key = (tier, currency)
+        value = self._resolved.get(key)
+        if value is None:
+            value = self.pairs.get(key) or self.tiers.get(tier) or self.currencies.get(currency) or self.default
+            self._resolved[key] = value
+        return value
+
+    def check(self, state, ev: AMLEvent) -> bool:
+        return ev.amount >= self.threshold(ev.tier, ev.currency)
+
+
+class VelocityRule(Rule):
+    def __init__(self, config: dict):
+        super().__init__(config)
+        self.window = float(config.get("window_seconds", 300))
+        self.max_count = int(config.get("max_count", 5))
+
+    def new_state(self):
+        return deque()
+
+    def update(self, state, ev: AMLEvent):
+        if ev.outgoing:
+            state.append(ev.ts)
+            _evict(state, ev.ts - self.window)
+
+    def check(self, state, ev: AMLEvent) -> bool:
+        _evict(state, ev.ts - self.window)
+        return len(state) >= self.max_count
+
+
+class DailyVolumeRule(Rule):
+    def __init__(self, config: dict):
+        super().__init__(config)
+        self.default = Decimal(str(config.get("default", 10000)))
+        self.tiers = {k: Decimal(str(v)) for k, v in config.get("tiers", {}).items()}
+
+    def new_state(self):
+        return [None, Decimal("0")]
+
+    def update(self, state, ev: AMLEvent):
+        if not ev.outgoing:
+            return
+        if state[0] != ev.day:
+            state[0], state[1] = ev.day, Decimal("0")
+        state[1] += ev.amount
+
+    def check(self, state, ev: AMLEvent) -> bool:
+        if not ev.outgoing:
+            return False
+        today = state[1] if state[0] == ev.day else Decimal("0")
+        return today + ev.amount > self.tiers.get(ev.tier, self.default)
+
+
+class StructuringRule(Rule):
+    """Repeated sends landing within `margin` below a reporting threshold or the sender's tier limit."""
+    def __init__(self, config: dict):
+        super().__init__(config)
+        self.window = float(config.get("window_seconds", 86400))
+        self.min_count = int(config.get("min_count", 3))
+        margin = Decimal(str(config.get("margin", 0.1)))
+        thresholds = [Decimal(str(t)) for t in config.get("thresholds", [10000])]
+        tier_limits = {k: Decimal(str(v)) for k, v in config.get("tier_limits", {}).items()}
+        self.bands: Dict[Optional[str], List[tuple]] = {None: [(t * (1 - margin), t) for t in thresholds]}
+        for tier, limit in tier_limits.items():
+            self.bands[tier] = self.bands[None] + [(limit * (1 - margin), limit)]
+
+    def near(self, ev: AMLEvent) -> bool:
+        for low, high in self.bands.get(ev.tier, self.bands[None]):
+            if low <= ev.amount < high:
+                return True
+        return False
+
+    def new_state(self):
+        return deque()
+
+    def update(self, state, ev: AMLEvent):
+        if ev.outgoing and self.near(ev):
+            state.append(ev.ts)
+            _evict(state, ev.ts - self.window)
+
+    def check(self, state, ev: AMLEvent) -> bool:
+        if not (ev.outgoing and self.near(ev)):
+            return False
+        _evict(state, ev.ts - self.window)
+        return len(state) + 1 >= self.min_count
+
+
+class NewCounterpartyBurstRule(Rule):
+    def __init__(self, config: dict):
+        super().__init__(config)
+        self.window = float(config.get("window_seconds", 3600))
+        self.min_count = int(config.get("min_count", 5))
+
+    def new_state(self):
+        return (set(), deque())
+
+    def update(self, state, ev: AMLEvent):
+        known, recent = state
+        if ev.counterparty and ev.counterparty not in known:
+            known.add(ev.counterparty)
+            recent.append(ev.ts)
+            _evict(recent, ev.ts - self.window)
+
+    def check(self, state, ev: AMLEvent) -> bool:
+        known, recent = state
+        if not ev.counterparty or ev.counterparty in known:
+            return False
+        _evict(recent, ev.ts - self.window)
+        return len(recent) + 1 >= self.min_count
+
+
+RULE_TYPES = {
+    "amount_threshold": AmountThresholdRule,
+    "velocity": VelocityRule,
+    "daily_volume": DailyVolumeRule,
+    "structuring": StructuringRule,
+    "new_counterparty_burst": NewCounterpartyBurstRule,
+}
+
+
+def load_rules(rules_file: str = "aml_rules.json") -> List[dict]:
+    """Rule configuration from `rules_file` if present, else DEFAULT_RULES."""
+    data = JsonStorage(rules_file).load(default=DEFAULT_RULES)
+    return data if isinstance(data, list) else DEFAULT_RULES
+
+
+def compile_rules(configs: List[dict]) -> List[Rule]:
+    rules = []
+    for config in configs:
+        if config.get("enabled", True) is False:
+            continue
+        cls = RULE_TYPES.get(config.get("type"))
+        if cls is None:
+            raise ValueError(f"Unknown AML rule type: {config.get('type')}")
+        rules.append(cls(config))
+    return rules
+
+
+class AMLEngine:
+    """
+    Evaluates compiled rules against per-account aggregates. Aggregates are
+    fed from the append-only transaction list the same way TransactionIndex
+    is: sync() only folds in transactions it hasn't seen, so an assessment
+    costs the same whether an account has ten transactions or ten thousand.
+
+    Plug-ins (e.g. StructuringDetector) keep their own state and expose
+    `aml_observe(transaction, event)` and `aml_check(phone, event)`, the
+    latter returning (rule_id, reason) pairs.
+    """
+    def __init__(self, rules: Optional[List[dict]] = None, user_lookup: Optional[Callable[[str], Optional[User]]] = None,
+                 plugins: Optional[list] = None):
+        self.rules = compile_rules(rules if rules is not None else DEFAULT_RULES)
+        self.user_lookup = user_lookup
+        self.plugins = plugins or []
+        self.accounts: Dict[str, list] = {}
+        self._source: Optional[List[Transaction]] = None
+        self._seen = 0
+
+    def _state(self, phone: str) -> list:
+        state = self.accounts.get(phone)
+        if state is None:
+            state = self.accounts[phone] = [rule.new_state() for rule in self.rules]
+        return state
+
+    def _tier(self, phone: str) -> str:
+        user = self.user_lookup(phone) if self.user_lookup else None
+        return user.risk_tier if user else "standard"
+
+    def observe(self, t: Transaction):
+        if t.type not in OUTGOING_TYPES or t.status != "COMPLETED":
+            return
+        ts = datetime.fromisoformat(t.timestamp).timestamp()
+        ev = AMLEvent(ts, t.timestamp[:10], t.amount, self._tier(t.sender_phone), t.currency,
+                      t.receiver_phone if t.type == "TRANSFER" else None, True)
+        state = self._state(t.sender_phone)
+        for rule, rule_state in zip(self.rules, state):
+            rule.update(rule_state, ev)
+        for plugin in self.plugins:
+            plugin.aml_observe(t, ev)
+
+    def sync(self, transactions: List[Transaction]):
+        if transactions is not self._source or len(transactions) < self._seen:
+            self._source = transactions
+            self._seen = 0
+            self.accounts = {}
+            for plugin in self.plugins:
+                plugin.reset()
+        for pos in range(self._seen, len(transactions)):
+            self.observe(transactions[pos])
+        self._seen = len(transactions)
+
+    def assess(self, phone: str, amount: Decimal, user: Optional[User] = None, counterparty: Optional[str] = None,
+               outgoing: bool = True, currency: Optional[str] = None, now: Optional[float] = None) -> AMLResult:
+        start = time.perf_counter()
+        now = time.time() if now is None else now
+        tier = user.risk_tier if user else self._tier(phone)
+        currency = currency or (user.currency if user else "USD")
+        ev = AMLEvent(now, datetime.fromtimestamp(now).date().isoformat(), amount, tier, currency,
+                      counterparty if outgoing else None, outgoing)
+        state = self._state(phone)
+        reasons, fired = [], []
+        for rule, rule_state in zip(self.rules, state):
+            if rule.check(rule_state, ev):
+                reasons.append(rule.reason)
+                fired.append(rule.id)
+        for plugin in self.plugins:
+            for rule_id, reason in plugin.aml_check(phone, ev):
+                reasons.append(reason)
+                fired.append(rule_id)
+        return AMLResult(reasons, fired, (time.perf_counter() - start) * 1000)
@@ -1,18 +1,53 @@
-from fastapi import FastAPI, HTTPException, Body
+import asyncio
+import io
+import tempfile
+import uuid
+from datetime import datetime
+from fastapi import FastAPI, HTTPException, Body, Request, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 from typing import Optional, List
 try:
-    from .users import UserManager
-    from .transactions import TransactionManager
+    from .engine import MoneyEngine
+    from . import metrics
+    from . import tracing
+    from . import bulk_import
 except ImportError:
-    from users import UserManager
-    from transactions import TransactionManager
+    from engine import MoneyEngine
+    import metrics
+    import tracing
+    import bulk_import
 
 app = FastAPI(title="Mobile Money API")
 
-# Singletons for the app lifecycle
-user_mgr = UserManager()
-txn_mgr = TransactionManager(user_mgr)
+# Singletons for the app lifecycle. The engine serializes writes across the
+# threadpool and reloads files changed by other processes (e.g. the web app).
+# Under `--workers N`, set MMS_SHARED_STORE=1 so writes are serialized across workers too.
+engine = MoneyEngine()
+user_mgr = engine.user_manager
+txn_mgr = engine.transaction_manager
+
+@app.middleware("http")
+async def refresh_engine(request: Request, call_next):
+    engine.refresh()
+    return await call_next(request)
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    # Opt-in via MMS_PROFILING=1: samples MMS_TRACE_SAMPLE of requests (or any
+    # request sent with "X-Trace: 1") into a span tree; slow ones go to the trace file.
+    if not tracing.PROFILING_ENABLED or not tracing.TRACER.should_sample(request.headers.get("x-trace") == "1"):
+        return await call_next(request)
+    trace_id = uuid.uuid4().hex[:16]
+    with tracing.TRACER.trace(f"{request.method} {request.url.path}", trace_id=trace_id) as root:
+        response = await call_next(request)
+        route = request.scope.get("route")
+        if route is not None:
+            root.name = f"{request.method} {route.path}"
+        root.attrs["status"] = response.status_code
+    response.headers["X-Trace-Id"] = trace_id
+    return response
 
 class RegisterRequest(BaseModel):
     phone: str
@@ -38,6 +73,41 @@ class TransferRequest(BaseModel):
     amount: float
     description: str = ""
 
+class QuotedTransferRequest(TransferRequest):
+    fx_quote_id: Optional[str] = None  # From POST /fx/quotes, for a transfer between currencies
+
+class FxQuoteRequest(BaseModel):
+    sender_phone: str
+    receiver_phone: str
+    amount: float
+
+class BillAuthorizationRequest(BaseModel):
+    phone: str
+    amount: float
+    biller_name: str
+    biller_id: str
+    description: str = "Bill Payment"
+    ttl_seconds: Optional[float] = None
+
+class TransferAuthorizationRequest(TransferRequest):
+    ttl_seconds: Optional[float] = None
+
+class BillScheduleRequest(BaseModel):
+    phone: str
+    amount: float
+    biller_name: str
+    biller_id: str
+    interval: str  # DAILY, WEEKLY or MONTHLY
+    description: str = "Bill Payment"
+    start_at: Optional[datetime] = None
+    occurrences: Optional[int] = None
+
+class TransferScheduleRequest(TransferRequest):
+    interval: str
+    description: str = "Standing Order"
+    start_at: Optional[datetime] = None
+    occurrences: Optional[int] = None
+
 @app.post("/users/register")
 def register(req: RegisterRequest):
     success, msg = user_mgr.register(req.phone, req.name, req.pin, req.sec_q, req.sec_a, req.currency)
@@ -45,6 +115,18 @@ def register(req: RegisterRequest):
         raise HTTPException(status_code=400, detail=msg)
     return {"message": msg}
 
+@app.post("/users/import")
+async def import_users(request: Request, workers: int = Query(1, ge=1, le=16)):
+    # Body is the agent CSV itself (Content-Type: text/csv), spooled to disk past 8 MB
+    with tempfile.SpooledTemporaryFile(max_size=8 << 20) as body:
+        async for chunk in request.stream():
+            body.write(chunk)
+        body.seek(0)
+        rejects = io.StringIO()
+        report = await run_in_threadpool(bulk_import.import_users, user_mgr,
+                                         io.TextIOWrapper(body, encoding="utf-8-sig", newline=""), rejects, workers)
+    return {**report.to_dict(), "rejects_csv": rejects.getvalue()}
+
 @app.post("/users/{phone}/kyc")
 def submit_kyc(phone: str, req: KYCRequest):
     if phone != req.phone:
@@ -59,7 +141,21 @@ def get_user(phone: str):
     user = user_mgr.get_user(phone)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user.to_dict()
+    data = user.to_dict()
+    data["available_balance"] = str(txn_mgr.available_balance(phone))
+    return data
+
+@app.get("/users/{phone}/holds")
+def get_holds(phone: str):
+    if not user_mgr.get_user(phone):
+        raise HTTPException(status_code=404, detail="User not found")
+    return [h.to_dict() for h in txn_mgr.get_holds(phone)]
+
+@app.get("/users/{phone}/schedules")
+def get_schedules(phone: str):
+    if not user_mgr.get_user(phone):
+        raise HTTPException(status_code=404, detail="User not found")
+    return [s.to_dict() for s in txn_mgr.get_schedules(phone)]
 
 @app.post("/transactions/deposit")
 def deposit(req: TransactionRequest):
@@ -76,13 +172,121 @@ def withdraw(req: TransactionRequest):
     return {"message": msg}
 
 @app.post("/transactions/transfer")
-def transfer(req: TransferRequest):
-    success, msg = txn_mgr.transfer(req.sender_phone, req.receiver_phone, req.amount, req.description)
+def transfer(req: QuotedTransferRequest):
+    success, msg = txn_mgr.transfer(req.sender_phone, req.receiver_phone, req.amount, req.description, req.fx_quote_id)
+    if not success:
+        raise HTTPException(status_code=400, detail=msg)
+    return {"message": msg}
+
+@app.get("/fx/rates")
+def fx_rates():
+    return txn_mgr.fx.describe()
+
+@app.post("/fx/quotes")
+def lock_fx_quote(req: FxQuoteRequest):
+    success, msg = txn_mgr.lock_fx_quote(req.sender_phone, req.receiver_phone, req.amount)
+    if not success:
+        raise HTTPException(status_code=400, detail=msg)
+    return txn_mgr.get_fx_quote(msg).to_dict()
+
+@app.post("/holds/bill")
+def authorize_bill(req: BillAuthorizationRequest):
+    success, msg = txn_mgr.authorize_bill(req.phone, req.amount, req.biller_name, req.biller_id, req.description, req.ttl_seconds)
+    if not success:
+        raise HTTPException(status_code=400, detail=msg)
+    return {"hold_id": msg}
+
+@app.post("/holds/transfer")
+def authorize_transfer(req: TransferAuthorizationRequest):
+    success, msg = txn_mgr.authorize_transfer(req.sender_phone, req.receiver_phone, req.amount, req.description, req.ttl_seconds)
+    if not success:
+        raise HTTPException(status_code=400, detail=msg)
+    return {"hold_id": msg}
+
+@app.post("/holds/{hold_id}/capture")
+def capture_hold(hold_id: str):
+    success, msg = txn_mgr.capture_hold(hold_id)
+    if not success:
+        raise HTTPException(status_code=404 if msg == "Hold not found" else 400, detail=msg)
+    return {"message": msg}
+
+@app.post("/holds/{hold_id}/void")
+def void_hold(hold_id: str):
+    success, msg = txn_mgr.void_hold(hold_id)
+    if not success:
+        raise HTTPException(status_code=404, detail=msg)
+    return {"message": msg}
+
+@app.post("/schedules/bill")
+def schedule_bill(req: BillScheduleRequest):
+    success, msg = txn_mgr.schedule_bill(req.phone, req.amount, req.biller_name, req.biller_id, req.interval, req.description,
+                                         req.start_at.timestamp() if req.start_at else None, req.occurrences)
+    if not success:
+        raise HTTPException(status_code=400, detail=msg)
+    return {"schedule_id": msg}
+
+@app.post("/schedules/transfer")
+def schedule_transfer(req: TransferScheduleRequest):
+    success, msg = txn_mgr.schedule_transfer(req.sender_phone, req.receiver_phone, req.amount, req.interval, req.description,
+                                             req.start_at.timestamp() if req.start_at else None, req.occurrences)
     if not success:
         raise HTTPException(status_code=400, detail=msg)
+    return {"schedule_id": msg}
+
+@app.delete("/schedules/{schedule_id}")
+def cancel_schedule(schedule_id: str):
+    success, msg = txn_mgr.cancel_schedule(schedule_id)
+    if not success:
+        raise HTTPException(status_code=404, detail=msg)
     return {"message": msg}
 
+@app.get("/fees/quote")
+def quote_fee(phone: str, operation: str = Query(..., pattern="^(transfer|withdraw|bill_payment|deposit)$"),
+              amount: float = Query(..., gt=0), biller: Optional[str] = None):
+    if not user_mgr.get_user(phone):
+        raise HTTPException(status_code=404, detail="User not found")
+    return txn_mgr.quote_fee(phone, operation, amount, biller).to_dict()
+
+@app.get("/ledger/proofs/{transaction_id}")
+def ledger_proofs(transaction_id: str):
+    # Merkle inclusion proofs against the ledger's hash-chain checkpoints
+    try:
+        return txn_mgr.ledger_proofs(transaction_id)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
 @app.get("/transactions/{phone}/history")
 def get_history(phone: str):
     txns = txn_mgr.get_history(phone)
     return [t.to_dict() for t in txns]
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    # Prometheus scrape endpoint; enable collection with MMS_METRICS=1
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+def _require_profiling():
+    if not tracing.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+@app.get("/debug/traces")
+def debug_traces(limit: int = Query(20, ge=1, le=200)):
+    _require_profiling()
+    return tracing.recent_traces(limit)
+
+@app.get("/debug/profile", response_class=PlainTextResponse)
+async def debug_profile(seconds: float = Query(10, gt=0, le=300), mode: str = Query("sample", pattern="^(sample|cprofile)$"),
+                        format: str = Query("top", pattern="^(top|collapsed)$")):
+    # "sample" profiles every thread by wall clock; "cprofile" gives exact call
+    # counts for engine operations. Both cover traffic arriving during the window.
+    _require_profiling()
+    try:
+        with tracing.profiling(mode) as profiler:
+            await asyncio.sleep(seconds)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if mode == "cprofile":
+        return profiler.report()
+    return profiler.collapsed() if format == "collapsed" else profiler.top()
@@ -1,14 +1,18 @@
 import streamlit as st
 from streamlit_option_menu import option_menu
-from users import UserManager
-from transactions import TransactionManager
+from engine import MoneyEngine
+import replica
+from storage import StorageCorruptError
 from i18n import get_text
 from styles import get_custom_css
+from datetime import timedelta
+import exports
+import fx
+import metrics
+import graph
+import functools
 import time
-import re
-
-def validate_phone(phone):
-    return re.match(r'^\d{10,15}$', phone)
+from users import validate_phone
 
 # --- Configuration & Styles ---
 st.set_page_config(
@@ -145,25 +149,79 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- State Management ---
-if 'user_manager' not in st.session_state:
-    st.session_state.user_manager = UserManager()
+@st.cache_resource
+def get_engine():
+    # One engine per server process, shared by every browser session
+    return MoneyEngine()
 
-if 'transaction_manager' not in st.session_state:
-    st.session_state.transaction_manager = TransactionManager(st.session_state.user_manager)
+try:
+    engine = get_engine()
+    engine.refresh() # Pick up writes made by other processes (e.g. the API)
+except StorageCorruptError as e:
+    # Refuse to start rather than run on (and later save over) an empty store
+    st.error(str(e))
+    st.code("python replay.py --data-dir . --output-dir ./rebuilt --users-snapshot <backup of users.json>")
+    st.stop()
 
 if 'current_user_phone' not in st.session_state:
     st.session_state.current_user_phone = None
 
-user_manager = st.session_state.user_manager
-transaction_manager = st.session_state.transaction_manager
+user_manager = engine.user_manager
+transaction_manager = engine.transaction_manager
+
+@st.cache_resource
+def get_replica():
+    # Admin read views can be served by a journal-tailing replica (MMS_REPLICA=1)
+    if not replica.REPLICA_ENABLED:
+        return None
+    reader = replica.Replica()
+    engine.subscribe(lambda version: reader.invalidate())  # read-your-writes for this process
+    return reader
+
+read_replica = get_replica()
+admin_users = read_replica.user_manager if read_replica else user_manager
+admin_txns = read_replica.transaction_manager if read_replica else transaction_manager
 
 # Refresh user object from manager to get latest balance
 current_user = None
 if st.session_state.current_user_phone:
     current_user = user_manager.get_user(st.session_state.current_user_phone)
 
+st.session_state.engine_version = engine.version
+st.session_state.seen_balance = current_user.balance if current_user else None
+
+@st.fragment(run_every="5s")
+def watch_engine():
+    # Rerun this session when another session or process changes data it shows
+    engine.refresh()
+    if engine.version == st.session_state.engine_version:
+        return
+    st.session_state.engine_version = engine.version
+    me = user_manager.get_user(st.session_state.current_user_phone) if st.session_state.current_user_phone else None
+    if not me:
+        return
+    if me.role == 'admin':
+        st.rerun(scope="app")
+    elif me.balance != st.session_state.seen_balance:
+        st.toast(f"{TR('balance')}: {me.currency} {me.balance:,.2f}", icon="🔔")
+        st.rerun(scope="app")
+
+watch_engine()
+
 # --- Helper Functions ---
+HISTORY_PAGE_SIZE = 20
 
+def build_receipt(t, detail_text, sender_name, receiver_name):
+    return f"""--- TRANSACTION RECEIPT ---
+Date: {t.timestamp}
+ID: {t.id}
+Type: {t.type}
+Amount: {t.currency} {t.amount:,.2f}
+Detail: {detail_text}
+Sender: {sender_name} ({t.sender_phone})
+Receiver: {receiver_name} ({t.receiver_phone})
+Status: Successful
+---------------------------"""
 
 def logout_user():
     st.session_state.current_user_phone = None
@@ -355,10 +413,11 @@ else:
         
         # Admin Metrics
         col1, col2, col3, col4 = st.columns(4)
-        total_users = len(user_manager.users)
-        total_balance = sum(u.balance for u in user_manager.users.values())
-        tx_count = len(transaction_manager.transactions)
-        flagged_count = len([t for t in transaction_manager.transactions if t.flagged])
+        total_users = len(admin_users.users)
+        # Through the managers' methods, which run under the shared engine's lock
+        total_balance = admin_users.total_balance()
+        tx_count = len(admin_txns.transactions)
+        flagged_count = len(admin_txns.flagged_transactions())
         
         col1.metric("Users", total_users)
         col2.metric("Total Float", f"${total_balance:,.2f}")
@@ -386,25 +445,19 @@ else:
             with col_s2:
                 filter_status = st.selectbox("Status", ["All", "Active", "Suspended", "Deleted"])
             
-            # Filter Logic
-            users_list = []
-            for u in user_manager.users.values():
-                # Filter by Status
-                if filter_status != "All" and u.status.lower() != filter_status.lower():
-                    continue
-                    
-                # Search
-                q = search_q.lower()
-                if not q or q in u.phone or (u.name and q in u.name.lower()) or (u.id_number and q in u.id_number):
-                    users_list.append(u)
+            # Indexed search (ranked and capped)
+            users_list = admin_users.search_users(
+                search_q, limit=100, status=None if filter_status == "All" else filter_status.lower()
+            )
+            st.caption(f"Showing top {len(users_list)} matches" if search_q else f"Showing first {len(users_list)} users")
             
             st.dataframe([u.to_dict() for u in users_list], width="stretch")
             
             # Action Panel
             st.markdown("### 🛠️ Account Actions")
             if users_list:
-                selected_user_phone = st.selectbox("Select Target User", [u.phone for u in users_list], format_func=lambda x: f"{x} - {user_manager.users[x].name}")
-                target_u = user_manager.users[selected_user_phone]
+                selected_user_phone = st.selectbox("Select Target User", [u.phone for u in users_list], format_func=lambda x: f"{x} - {admin_users.users[x].name}")
+                target_u = admin_users.users[selected_user_phone]
                 
                 with st.expander(f"Manage: {target_u.name} ({target_u.phone})", expanded=True):
                     col_act1, col_act2, col_act3 = st.columns(3)
@@ -458,11 +511,50 @@ else:
         elif selected_adm == "Transactions":
             st.subheader("💳 Transaction Oversight")
             
-            # Live Feed
-            all_tx = transaction_manager.transactions
-            tx_data = [t.to_dict() for t in all_tx]
-            tx_data.sort(key=lambda x: x['timestamp'], reverse=True)
-            st.dataframe(tx_data, width="stretch")
+            # Live Feed (filtered and paged by the transaction index)
+            col_fl1, col_fl2, col_fl3, col_fl4, col_fl5 = st.columns(5)
+            with col_fl1:
+                feed_range = st.date_input("Date Range", value=(), key="feed_range")
+            with col_fl2:
+                feed_type = st.selectbox("Type", ["All", "DEPOSIT", "WITHDRAWAL", "TRANSFER", "BILL_PAYMENT", "FEE", "REQUEST", "REVERSAL", "ADMIN_CREDIT", "ADMIN_DEBIT"], key="feed_type")
+            with col_fl3:
+                feed_status = st.selectbox("Status", ["All", "COMPLETED", "PENDING", "DECLINED"], key="feed_status")
+            with col_fl4:
+                feed_flag = st.selectbox("Flagged", ["All", "Flagged", "Clean"], key="feed_flag")
+            with col_fl5:
+                feed_phone = st.text_input("Phone", key="feed_phone").strip()
+
+            feed_filters = {
+                "start": feed_range[0].isoformat() if len(feed_range) > 0 else None,
+                "end": (feed_range[1] + timedelta(days=1)).isoformat() if len(feed_range) > 1 else None,
+                "t_type": None if feed_type == "All" else feed_type,
+                "status": None if feed_status == "All" else feed_status,
+                "flagged": None if feed_flag == "All" else feed_flag == "Flagged",
+                "phone": feed_phone or None,
+            }
+
+            # Reset to the first page whenever the filters change
+            if st.session_state.get('feed_filters') != feed_filters:
+                st.session_state.feed_filters = feed_filters
+                st.session_state.feed_page = 0
+
+            page_size = st.session_state.get('feed_page_size', 50)
+            page_no = st.session_state.get('feed_page', 0)
+            page, has_more = admin_txns.query_transactions(offset=page_no * page_size, limit=page_size, **feed_filters)
+            st.dataframe([t.to_dict() for t in page], width="stretch")
+
+            col_pg1, col_pg2, col_pg3 = st.columns([1, 2, 1])
+            with col_pg1:
+                if st.button("◀ Newer", disabled=page_no == 0, width="stretch", key="feed_prev"):
+                    st.session_state.feed_page = page_no - 1
+                    st.rerun()
+            with col_pg2:
+                st.caption(f"Page {page_no + 1} · {len(page)} transactions")
+                st.selectbox("Rows per page", [25, 50, 100, 250], index=1, key="feed_page_size")
+            with col_pg3:
+                if st.button("Older ▶", disabled=not has_more, width="stretch", key="feed_next"):
+                    st.session_state.feed_page = page_no + 1
+                    st.rerun()
             
             col_t1, col_t2 = st.columns(2)
             
@@ -500,7 +592,7 @@ else:
             col_b1, col_b2 = st.columns(2)
             with col_b1:
                  st.markdown("### Revenue Stream")
-                 revenue_tx = [t for t in transaction_manager.transactions if t.receiver_phone == "SYSTEM_REVENUE"]
+                 revenue_tx = admin_txns.revenue_transactions()
                  total_rev = sum(t.amount for t in revenue_tx)
                  st.metric("Total Fee Revenue", f"${total_rev:,.2f}")
                  st.bar_chart([t.amount for t in revenue_tx])
@@ -520,11 +612,32 @@ else:
                      st.text_input("Fee %")
                      st.button("Save Provider (Mock)")
 
+            st.markdown("### 🏦 Biller Settlement")
+            st.caption("Bill payments collect in one ledger sub-account per biller and are settled in batches.")
+            settle_queue = admin_txns.settlement_queue()
+            if settle_queue:
+                st.dataframe(settle_queue, width="stretch")
+            else:
+                st.caption("No bill payments waiting for settlement.")
+            col_s1, col_s2 = st.columns(2)
+            if col_s1.button("Run Settlement Batch", disabled=not settle_queue, width="stretch"):
+                records = transaction_manager.settle_billers()
+                settled = sum(r["status"] == "SETTLED" for r in records)
+                st.success(f"{settled} of {len(records)} settlements acknowledged by billers.")
+            pending_settlements = [r for r in admin_txns.settler.settlements if r["status"] == "PENDING"]
+            if col_s2.button(f"Retry Pending ({len(pending_settlements)})", disabled=not pending_settlements, width="stretch"):
+                records = transaction_manager.retry_settlements()
+                st.info(f"{sum(r['status'] == 'SETTLED' for r in records)} of {len(records)} now settled.")
+            recent = admin_txns.settler.settlements[-20:]
+            if recent:
+                st.dataframe([{k: r.get(k, "") for k in ("id", "biller", "currency", "payments", "total", "status", "reference", "last_error")}
+                              for r in reversed(recent)], width="stretch")
+
         # ---------------- SECURITY TAB ----------------
         elif selected_adm == "Security":
             st.subheader("🛡️ Security Center")
             
-            flagged = [t for t in transaction_manager.transactions if t.flagged]
+            flagged = admin_txns.flagged_transactions()
             if flagged:
                 st.error(f"{len(flagged)} Suspicious Transactions Detected")
                 for t in flagged:
@@ -532,6 +645,36 @@ else:
             else:
                 st.success("No active security alerts.")
                 
+            st.markdown("### 🕸️ Fraud Ring Analytics")
+            transfer_graph = admin_txns.transfer_graph()
+            st.caption(f"Transfer graph: {len(transfer_graph.out_edges):,} senders, {transfer_graph.edge_count:,} counterparty links")
+            col_g1, col_g2 = st.columns(2)
+            with col_g1:
+                st.markdown("**Round-tripping cycles**")
+                ring_cycles = transfer_graph.cycles(max_len=4, limit=20)
+                if ring_cycles:
+                    for cycle in ring_cycles:
+                        st.write(" → ".join(cycle + [cycle[0]]))
+                else:
+                    st.caption("No short cycles found.")
+            with col_g2:
+                st.markdown("**Possible mule accounts**")
+                min_senders = st.number_input("Minimum distinct senders", min_value=2, value=10, step=1)
+                mules = transfer_graph.mule_candidates(min_senders=int(min_senders), limit=20)
+                if mules:
+                    st.dataframe(mules, width="stretch")
+                else:
+                    st.caption("No accounts match.")
+
+            st.markdown("**Networks around flagged accounts**")
+            rings = transfer_graph.components_from(graph.flagged_accounts(flagged), max_size=500)
+            if rings:
+                for ring in rings[:10]:
+                    with st.expander(f"{ring['size']} accounts — flagged: {', '.join(ring['flagged'])}"):
+                        st.write(", ".join(ring["members"]))
+            else:
+                st.caption("No flagged accounts have transfer links.")
+
             st.markdown("### Fraud Rules Configuration")
             st.checkbox("Block transfers > $500 to new recipients", value=True)
             st.checkbox("Auto-freeze account after 3 failed PIN attempts", value=True)
@@ -541,15 +684,44 @@ else:
         # ---------------- ANALYTICS TAB ----------------
         elif selected_adm == "Analytics":
             st.subheader("📊 Reports & Analytics")
-            st.info("Export data for external analysis.")
-            
-            col_exp1, col_exp2 = st.columns(2)
+            st.info("Export data for external analysis. Files are generated when you click download; for very large exports use `python exports.py --help`.")
+
+            # Export Filters
+            col_f1, col_f2, col_f3 = st.columns(3)
+            with col_f1:
+                exp_range = st.date_input("Date Range", value=(), key="exp_range")
+            with col_f2:
+                exp_types = st.multiselect("Transaction Types", ["DEPOSIT", "WITHDRAWAL", "TRANSFER", "BILL_PAYMENT", "FEE", "REQUEST", "REVERSAL", "ADMIN_CREDIT", "ADMIN_DEBIT"], key="exp_types")
+            with col_f3:
+                exp_formats = ["CSV", "Parquet"] if exports.parquet_available() else ["CSV"]
+                exp_format = st.selectbox("Format", exp_formats, key="exp_format").lower()
+
+            exp_start = exp_range[0].isoformat() if len(exp_range) > 0 else None
+            exp_end = (exp_range[1] + timedelta(days=1)).isoformat() if len(exp_range) > 1 else None
+            exp_mime = "text/csv" if exp_format == "csv" else "application/octet-stream"
+
+            col_exp1, col_exp2, col_exp3 = st.columns(3)
             with col_exp1:
                 st.markdown("**User Data**")
-                st.download_button("Download Users CSV", data="mock_csv_data", file_name="users.csv")
+                st.download_button(
+                    f"Download Users {exp_format.upper()}",
+                    data=exports.deferred_export("users", exp_format, admin_users, admin_txns),
+                    file_name=f"users.{exp_format}", mime=exp_mime
+                )
             with col_exp2:
                 st.markdown("**Transaction Logs**")
-                st.download_button("Download Transactions CSV", data="mock_csv_data", file_name="transactions.csv")
+                st.download_button(
+                    f"Download Transactions {exp_format.upper()}",
+                    data=exports.deferred_export("transactions", exp_format, admin_users, admin_txns, exp_start, exp_end, exp_types),
+                    file_name=f"transactions.{exp_format}", mime=exp_mime
+                )
+            with col_exp3:
+                st.markdown("**Ledger Entries**")
+                st.download_button(
+                    f"Download Ledger {exp_format.upper()}",
+                    data=exports.deferred_export("ledger", exp_format, admin_users, admin_txns, exp_start, exp_end),
+                    file_name=f"ledger.{exp_format}", mime=exp_mime
+                )
                 
             st.markdown("### Growth Metrics")
             st.line_chart([10, 15, 20, 25, 40, 55, 60, 80]) # Mock growth
@@ -559,16 +731,111 @@ else:
             st.subheader("⚙️ System Configuration")
             st.selectbox("System Status", ["Operational", "Maintenance Mode", "ReadOnly"])
             
-            st.markdown("**Fee Configuration**")
+            st.markdown("**Fee Schedule**")
+            st.dataframe(transaction_manager.fees.describe(), width="stretch")
+            st.caption("Fees are quoted from this schedule everywhere (app, CLI, API). Place a rule list in `fee_schedule.json` to change it.")
+            st.markdown("**FX Rates**")
+            fx_engine = transaction_manager.fx
+            st.dataframe(fx_engine.describe(), width="stretch")
+            if fx_engine.error:
+                st.warning(fx_engine.error)
+            st.caption("Cross-currency transfers convert at the customer rate. Rates come from `fx_rates.json` (or `MMS_FX_URL`) and are cached for a minute.")
             col_sys1, col_sys2 = st.columns(2)
             with col_sys1:
-                st.number_input("P2P Transfer Fee (%)", value=1.0)
-                st.number_input("Withdrawal Fee (%)", value=2.0)
-            with col_sys2:
-                 st.number_input("Bill Payment Fee (Fixed)", value=0.5)
-                 st.number_input("Forex Margin (%)", value=2.5)
+                 fx_margin = st.number_input("Forex Margin (%)", value=float(fx_engine.table.get("margin_percent", 0)),
+                                             help="Spread for currencies without their own in the rate table.")
             
-            st.button("Save System Config")
+            if st.button("Save System Config"):
+                fx.set_margin(fx_margin)
+                fx_engine.invalidate()
+                st.success("Saved.")
+                st.rerun()
+
+            st.markdown("### 📈 Performance Metrics")
+            metrics_on = st.toggle("Collect metrics", value=metrics.REGISTRY.enabled, help="Timing and counters on storage, ledger, checks and operations. Also served at /metrics by the API.")
+            if metrics_on != metrics.REGISTRY.enabled:
+                metrics.REGISTRY.enabled = metrics_on
+                st.rerun()
+
+            if metrics.REGISTRY.enabled:
+                counts = {dict(k)["kind"]: v for k, v in metrics.OBJECTS.values().items()}
+                flag_rate = metrics.aml_flag_rate()
+                col_m1, col_m2, col_m3, col_m4 = st.columns(4)
+                col_m1.metric("Users in memory", f"{counts.get('users', 0):,}")
+                col_m2.metric("Transactions in memory", f"{counts.get('transactions', 0):,}")
+                col_m3.metric("Ledger entries", f"{counts.get('ledger_entries', 0):,}")
+                col_m4.metric("AML flag rate", "—" if flag_rate is None else f"{flag_rate:.1%}")
+
+                op_rows = metrics.operation_summary()
+                if op_rows:
+                    st.dataframe(op_rows, width="stretch")
+                else:
+                    st.caption("No operations recorded yet.")
+
+                rule_hits = {dict(k)["rule"]: int(v) for k, v in metrics.AML_RULE_HITS.values.items()}
+                if rule_hits:
+                    st.caption("AML rule hits: " + ", ".join(f"{rule} {count}" for rule, count in sorted(rule_hits.items())))
+
+                storage_rows = []
+                for key, (_, total, n) in sorted(metrics.STORAGE_SECONDS.series.items()):
+                    labels = dict(key)
+                    bytes_series = metrics.STORAGE_BYTES.series.get((("file", labels["file"]),))
+                    storage_rows.append({
+                        "file": labels["file"],
+                        "op": labels["op"],
+                        "calls": n,
+                        "mean_ms": round(total / n * 1000, 3),
+                        "avg_bytes_written": int(bytes_series[1] / bytes_series[2]) if labels["op"] == "save" and bytes_series else None,
+                    })
+                if storage_rows:
+                    st.dataframe(storage_rows, width="stretch")
+
+                if st.button("Reset Metrics"):
+                    metrics.REGISTRY.reset()
+                    st.rerun()
+
+            st.markdown("### 🧮 Ledger Reconciliation")
+            col_rc1, col_rc2 = st.columns([1, 3])
+            with col_rc1:
+                rec_full = st.checkbox("Full rebuild", value=False, help="Ignore the checkpoint and re-aggregate the whole ledger")
+                run_rec = st.button("Run Reconciliation")
+            if run_rec:
+                report = transaction_manager.reconcile(full=rec_full)
+                with col_rc2:
+                    col_r1, col_r2, col_r3 = st.columns(3)
+                    col_r1.metric("Entries aggregated", f"{report.new_entries:,} / {report.entries:,}")
+                    col_r2.metric("Ledger total", f"{report.ledger_total}")
+                    col_r3.metric("Drifting wallets", len(report.drift))
+                if report.ok:
+                    st.success(f"Ledger and wallets agree ({report.elapsed_ms:.0f} ms).")
+                else:
+                    if not report.zero_sum:
+                        totals = report.to_dict()["currency_totals"]
+                        off = ", ".join(f"{c or '-'} {totals[c or '-']}" for c, units in report.currency_totals.items() if units)
+                        st.error(f"Ledger does not sum to zero: {off}")
+                    if report.unbalanced_transactions:
+                        st.error("Unbalanced transactions: " + ", ".join(report.unbalanced_transactions[:20]))
+                    if report.drift:
+                        st.warning("Wallet balances differ from the ledger:")
+                        st.dataframe(report.drift, width="stretch")
+
+            st.markdown("### 🔗 Ledger Integrity")
+            ledger = transaction_manager.ledger
+            col_hc1, col_hc2 = st.columns([1, 3])
+            with col_hc1:
+                chain_full = st.checkbox("From genesis", value=False, help="Re-verify the whole chain instead of the segment since the last checkpoint")
+                run_chain = st.button("Verify Hash Chain")
+            with col_hc2:
+                col_h1, col_h2 = st.columns(2)
+                col_h1.metric("Checkpoints", len(ledger.checkpoints))
+                col_h2.metric("Chain head", ledger.head[:12])
+            if run_chain:
+                chain_report = ledger.verify(full=chain_full)
+                if chain_report.ok:
+                    st.success(f"Entries {chain_report.start:,}–{chain_report.end:,} verified ({chain_report.checkpoints} checkpoint roots checked).")
+                else:
+                    st.error("Ledger hash chain verification failed:")
+                    st.code("\n".join(chain_report.errors[:50]))
 
         # ---------------- SUPPORT TAB ----------------
         elif selected_adm == "Support":
@@ -731,14 +998,22 @@ else:
                     if not rx_user:
                         st.error("Receiver not found in the system.")
                     else:
-                        st.session_state.review_mode = True
-                        st.session_state.review_data = {
+                        review = {
                             "type": "TRANSFER",
                             "receiver_phone": receiver_phone,
                             "receiver_name": rx_user.name,
                             "amount": send_amount,
                             "desc": send_desc
                         }
+                        if rx_user.currency != current_user.currency:
+                            # Lock the rate now so the confirmation charges what the review shows
+                            ok, quote_id = transaction_manager.lock_fx_quote(current_user.phone, receiver_phone, send_amount)
+                            if not ok:
+                                st.error(quote_id)
+                                st.stop()
+                            review["fx_quote_id"] = quote_id
+                        st.session_state.review_mode = True
+                        st.session_state.review_data = review
                         st.rerun()
         else:
             # Verification View
@@ -747,8 +1022,19 @@ else:
              st.info("Please review the details below carefully before confirming.")
              
              # Fee Calculation
-             fee = data['amount'] * 0.01
-             total_deduction = data['amount'] + fee
+             quote = transaction_manager.quote_fee(current_user.phone, "transfer", data['amount'])
+             fee, total_deduction = quote.fee, quote.total
+             fx_quote = transaction_manager.get_fx_quote(data["fx_quote_id"]) if data.get("fx_quote_id") else None
+             fx_row = ""
+             if fx_quote:
+                 fx_row = f"""
+                    <div style="margin-bottom: 15px;">
+                        <span class="conf-label">Recipient Gets</span><br/>
+                        <span style="font-size: 1.1em; font-weight: bold;">{fx_quote.target} {fx_quote.converted:,.2f}</span>
+                        <span style="color: #777;"> at {fx_quote.rate} (rate held for {max(int(fx_quote.expires_at - time.time()), 0)}s)</span>
+                    </div>"""
+             elif data.get("fx_quote_id"):
+                 st.warning("The exchange rate quote has expired. Cancel and review the transfer again for a new rate.")
 
              with st.container():
                  st.markdown(f"""
@@ -763,9 +1049,10 @@ else:
                         <span class="conf-amount" style="color: #4CAF50;">${data['amount']:,.2f}</span>
                     </div>
                     <div style="margin-bottom: 15px;">
-                        <span class="conf-label">Fee (1%)</span><br/>
+                        <span class="conf-label">Fee ({quote.label})</span><br/>
                         <span style="font-size: 1.1em; color: #777;">${fee:,.2f}</span>
                     </div>
+                    {fx_row}
                      <div style="margin-bottom: 15px; border-top: 1px dashed #ccc; pt-2;">
                         <span class="conf-label">Total Deduction</span><br/>
                         <span style="font-size: 1.3em; font-weight: bold; color: #d9534f;">${total_deduction:,.2f}</span>
@@ -787,7 +1074,8 @@ else:
                          st.rerun()
                  with col_btn2:
                      if st.button("Confirm Transfer", type="primary", width="stretch"):
-                         success, msg = transaction_manager.transfer(current_user.phone, data['receiver_phone'], data['amount'], data['desc'])
+                         success, msg = transaction_manager.transfer(current_user.phone, data['receiver_phone'], data['amount'], data['desc'],
+                                                                     fx_quote_id=data.get("fx_quote_id"))
                          if success:
                              st.success(f"Success! {msg}")
                              st.session_state.review_mode = False
@@ -859,8 +1147,8 @@ else:
              data = st.session_state.review_data
              st.subheader("Confirm Bill Payment")
              
-             fee = 0.50
-             total = data['amount'] + fee
+             quote = transaction_manager.quote_fee(current_user.phone, "bill_payment", data['amount'], biller=data['biller_name'])
+             fee, total = quote.fee, quote.total
              
              with st.container():
                  st.markdown(f"""
@@ -912,7 +1200,7 @@ else:
         with tab_req:
             # Filter for pending requests where current user is the Payer (Sender)
             pending_requests = [
-                t for t in transaction_manager.transactions 
+                t for t in transaction_manager.get_history(current_user.phone)
                 if t.sender_phone == current_user.phone 
                 and t.type == "REQUEST" 
                 and t.status == "PENDING"
@@ -1098,8 +1386,8 @@ else:
              st.info("Please confirm the withdrawal details below.")
              
              # Calculate Fee
-             fee = data['amount'] * 0.01
-             total_deduction = data['amount'] + fee
+             quote = transaction_manager.quote_fee(current_user.phone, "withdraw", data['amount'])
+             fee, total_deduction = quote.fee, quote.total
              
              with st.container():
                  st.markdown(f"""
@@ -1113,7 +1401,7 @@ else:
                         <span class="conf-amount">${data['amount']:,.2f}</span>
                     </div>
                     <div style="margin-bottom: 15px;">
-                        <span class="conf-label">Fee (1%)</span><br/>
+                        <span class="conf-label">Fee ({quote.label})</span><br/>
                         <span style="font-size: 1.1em; color: #777;">${fee:,.2f}</span>
                     </div>
                      <div style="margin-bottom: 15px; border-top: 1px dashed #ccc; pt-2;">
@@ -1219,14 +1507,27 @@ else:
 
     elif is_selected("history"):
         st.subheader("Recent Transactions")
-        history = transaction_manager.get_history(current_user.phone)
+
+        # Rows are fetched newest-first from the phone index, one page at a time
+        if st.session_state.get('history_phone') != current_user.phone:
+            st.session_state.history_phone = current_user.phone
+            st.session_state.history_visible = HISTORY_PAGE_SIZE
+        history, has_more = transaction_manager.query_transactions(phone=current_user.phone, limit=st.session_state.history_visible)
         
         if not history:
             st.info("No transactions yet.")
         else:
-            # Sort by timestamp descending
-            history.sort(key=lambda x: x.timestamp, reverse=True)
-            
+            # Memoized per run: heavy accounts repeat the same counterparties
+            names = {}
+            def display_name(phone):
+                if phone not in names:
+                    if phone == "SYSTEM":
+                        names[phone] = "System"
+                    else:
+                        u = user_manager.get_user(phone)
+                        names[phone] = u.name if u else "Unknown"
+                return names[phone]
+
             for t in history:
                 # Determine icon/color
                 if t.type == "TRANSFER":
@@ -1268,28 +1569,8 @@ else:
                     detail_text = desc_text
                 
                 # Get Sender/Receiver Names
-                sender_name = "System"
-                receiver_name = "System"
-                
-                if t.sender_phone != "SYSTEM":
-                     s_user = user_manager.get_user(t.sender_phone)
-                     sender_name = s_user.name if s_user else "Unknown"
-
-                if t.receiver_phone != "SYSTEM":
-                     r_user = user_manager.get_user(t.receiver_phone)
-                     receiver_name = r_user.name if r_user else "Unknown"
-                
-                # Receipt Content
-                receipt_text = f"""--- TRANSACTION RECEIPT ---
-Date: {t.timestamp}
-ID: {t.id}
-Type: {t.type}
-Amount: {t.currency} {t.amount:,.2f}
-Detail: {detail_text}
-Sender: {sender_name} ({t.sender_phone})
-Receiver: {receiver_name} ({t.receiver_phone})
-Status: Successful
----------------------------"""
+                sender_name = display_name(t.sender_phone)
+                receiver_name = display_name(t.receiver_phone)
 
                 # Custom HTML Transaction Card via CSS Class
                 # Check style details
@@ -1325,14 +1606,24 @@ Status: Successful
                         st.markdown(f"**Recipient:** {receiver_name}")
                         st.caption(f"Phone: {t.receiver_phone}")
                     
+                    # Receipt text is only built when the button is clicked
                     st.download_button(
                         label="Download Receipt", 
-                        data=receipt_text, 
+                        data=functools.partial(build_receipt, t, detail_text, sender_name, receiver_name),
                         file_name=f"receipt_{t.id}.txt", 
                         mime="text/plain",
-                        key=f"dl_{t.id}"
+                        key=f"dl_{t.id}",
+                        on_click="ignore"
                     )
 
+            # Infinite-scroll style paging
+            if has_more:
+                if st.button("Load more", width="stretch", key="history_more"):
+                    st.session_state.history_visible += HISTORY_PAGE_SIZE
+                    st.rerun()
+            else:
+                st.caption("You've reached the beginning of your history.")
+
 
     elif is_selected("verify_id"):
         st.subheader(TR("verify_id"))
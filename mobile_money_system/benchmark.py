@@ -0,0 +1,172 @@
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+try:
+    import loadgen
+except ImportError:
+    from mobile_money_system import loadgen
+
+OPERATIONS = ["deposit", "withdraw", "transfer", "pay_bill", "request_money", "process_request",
+              "get_history", "reverse_transaction"]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+def summarize(latencies: List[float], errors: int) -> dict:
+    ordered = sorted(latencies)
+    total = sum(ordered)
+    return {
+        "count": len(ordered),
+        "errors": errors,
+        "ops_per_sec": round(len(ordered) / total, 2) if total else 0.0,
+        "mean_ms": round(total / len(ordered) * 1000, 4) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 4),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 4),
+        "max_ms": round(ordered[-1] * 1000, 4) if ordered else 0.0,
+    }
+
+
+def measure(fn: Callable[[int], tuple], n: int) -> dict:
+    latencies, errors = [], 0
+    for i in range(n):
+        start = time.perf_counter()
+        result = fn(i)
+        latencies.append(time.perf_counter() - start)
+        if isinstance(result, tuple) and result and result[0] is False:
+            errors += 1
+    return summarize(latencies, errors)
+
+
+def run(n_users: int = 1000, history_depth: int = 5, ops: int = 200, operations: Optional[List[str]] = None,
+        data_dir: Optional[str] = None, seed_value: int = 42) -> dict:
+    operations = operations or OPERATIONS
+    tmp = None
+    if data_dir is None:
+        tmp = tempfile.TemporaryDirectory(prefix="mms-bench-")
+        data_dir = tmp.name
+
+    try:
+        # Single-currency, high-tier population so limits and currency checks
+        # don't turn the measurement into an error count.
+        spec = loadgen.PopulationSpec(users=n_users, currencies={"USD": 1.0}, risk_tiers={"high": 1.0},
+                                      opening_balance=50000)
+        t0 = time.perf_counter()
+        user_manager, tm, population = loadgen.seed(data_dir, spec, n_users * history_depth, seed_value)
+        seed_seconds = time.perf_counter() - t0
+        seeded = len(tm.transactions)
+        rng = population.rng
+
+        def pick() -> str:
+            return population.sender().phone
+
+        def pair():
+            sender = population.sender()
+            return sender.phone, population.receiver(sender).phone
+
+        results: Dict[str, dict] = {}
+        transfer_ids: List[str] = []
+        request_ids: List[str] = []
+
+        def created(since: int, t_type: str) -> str:
+            # The record the call just added, whatever fee or other records came with it
+            return next(t.id for t in tm.transactions[since:] if t.type == t_type)
+
+        def do_transfer(i):
+            sender, receiver = pair()
+            since = len(tm.transactions)
+            result = tm.transfer(sender, receiver, rng.randint(1, 100), "bench")
+            if result[0]:
+                transfer_ids.append(created(since, "TRANSFER"))
+            return result
+
+        def do_request(i):
+            requester, payer = pair()
+            since = len(tm.transactions)
+            result = tm.request_money(requester, payer, rng.randint(1, 100), "bench")
+            if result[0]:
+                request_ids.append(created(since, "REQUEST"))
+            return result
+
+        runners = {
+            "deposit": lambda i: tm.deposit(pick(), rng.randint(1, 1000), "bench"),
+            "withdraw": lambda i: tm.withdraw(pick(), rng.randint(1, 100), "bench"),
+            "transfer": do_transfer,
+            "pay_bill": lambda i: tm.pay_bill(pick(), rng.randint(1, 100), "Bench Power", str(i), "bench"),
+            "request_money": do_request,
+            "get_history": lambda i: tm.get_history(pick()),
+        }
+
+        for name in operations:
+            if name == "process_request":
+                if not request_ids:
+                    for i in range(ops):
+                        do_request(i)
+                pending = list(request_ids)
+                results[name] = measure(lambda i: tm.process_request(pending[i], "PAY"), len(pending))
+            elif name == "reverse_transaction":
+                if not transfer_ids:
+                    for i in range(ops):
+                        do_transfer(i)
+                done = list(transfer_ids)
+                results[name] = measure(lambda i: tm.reverse_transaction(done[i]), len(done))
+            else:
+                results[name] = measure(runners[name], ops)
+
+        return {
+            "meta": {
+                "timestamp": datetime.now().isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "storage": "json",
+                "users": n_users,
+                "history_depth": history_depth,
+                "seeded_transactions": seeded,
+                "ops_per_operation": ops,
+                "seed": seed_value,
+                "seed_seconds": round(seed_seconds, 3),
+            },
+            "results": results,
+        }
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Throughput/latency benchmark for core money operations.")
+    parser.add_argument("--users", type=int, default=1000, help="Users to seed (e.g. 1000, 100000, 1000000)")
+    parser.add_argument("--history", type=int, default=5, help="Seeded transactions per user")
+    parser.add_argument("--ops", type=int, default=200, help="Calls per operation")
+    parser.add_argument("--only", action="append", choices=OPERATIONS, help="Operation to run (repeatable)")
+    parser.add_argument("--data-dir", help="Seed into this directory instead of a temp dir")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="-", help="JSON results path, '-' for stdout")
+    args = parser.parse_args(argv)
+    if args.users < 2:
+        parser.error("--users must be at least 2")
+
+    report = run(args.users, args.history, args.ops, args.only, args.data_dir, args.seed)
+    text = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        for name, stats in report["results"].items():
+            print(f"{name:<20} {stats['ops_per_sec']:>10} ops/s  p50 {stats['p50_ms']:>9} ms  p99 {stats['p99_ms']:>9} ms",
+                  file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, IO, Iterator, List, Optional, Tuple
+
+try:
+    from models import User
+    from users import check_kyc, hash_answer, hash_pin, validate_phone
+except ImportError:
+    from mobile_money_system.models import User
+    from mobile_money_system.users import check_kyc, hash_answer, hash_pin, validate_phone
+
+# Agent batch layout; id_type/id_number may be blank (KYC later), the rest are required
+COLUMNS = ("phone", "name", "pin", "sec_q", "sec_a", "currency", "id_type", "id_number")
+REQUIRED = ("phone", "name", "pin", "sec_q", "sec_a")
+CURRENCIES = ("USD", "EUR", "KES", "GBP", "LRD")
+CHUNK_ROWS = 5000  # Rows validated, hashed and committed (one users.json save) at a time
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.verified = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.reasons: Dict[str, int] = {}
+        self.chunks = 0
+        self.elapsed_ms = 0.0
+
+    def reject(self, reason: str):
+        self.rejected += 1
+        self.reasons[reason] = self.reasons.get(reason, 0) + 1
+
+    def to_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "imported": self.imported,
+            "verified": self.verified,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "reasons": self.reasons,
+            "chunks": self.chunks,
+            "elapsed_ms": round(self.elapsed_ms, 3),
+        }
+
+
+def check_row(row: Dict[str, str]) -> Tuple[Optional[str], bool]:
+    """Validates one CSV row the way register and submit_kyc would: (reject reason, KYC verified)."""
+    missing = [c for c in REQUIRED if not row.get(c)]
+    if missing:
+        return f"Missing {', '.join(missing)}", False
+    if not validate_phone(row["phone"]):
+        return "Invalid phone number", False
+    if len(row["pin"]) != 4 or not row["pin"].isdigit():
+        return "PIN must be 4 digits", False
+    if row["currency"] not in CURRENCIES:
+        return "Unsupported currency", False
+    if not row.get("id_type") and not row.get("id_number"):
+        return None, False
+    accepted, verified, msg = check_kyc(row.get("id_type", ""), row.get("id_number", ""))
+    return (None if accepted else msg), verified
+
+
+def hash_secrets(pairs: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """(PIN, answer) hashes for one slice of a chunk; runs in the worker processes."""
+    return [(hash_pin(pin), hash_answer(answer)) for pin, answer in pairs]
+
+
+def read_rows(stream: IO[str]) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """(line number, row) per CSV record, with cells stripped and currency defaulted."""
+    reader = csv.DictReader(stream)
+    for row in reader:
+        row = {k.strip().lower(): (v or "").strip() for k, v in row.items() if k}
+        row["currency"] = (row.get("currency") or "USD").upper()
+        yield reader.line_num, row
+
+
+def import_users(user_manager, stream: IO[str], rejects: Optional[IO[str]] = None, workers: int = 1,
+                 chunk_rows: int = CHUNK_ROWS, progress: Optional[Callable[[ImportReport], None]] = None) -> ImportReport:
+    """
+    Registers every valid, new customer in a CSV batch (see COLUMNS).
+
+    The file is streamed in chunks of `chunk_rows`. Each chunk is validated
+    (phone, PIN, currency and the submit_kyc rules), deduplicated against
+    the file so far and the existing users, hashed across `workers`
+    processes, and committed with one save through
+    UserManager.import_users. Rejected rows go to `rejects` as CSV with
+    their line number and reason. `progress` is called after each chunk.
+    """
+    start = time.perf_counter()
+    report = ImportReport()
+    writer = None
+    if rejects is not None:
+        writer = csv.DictWriter(rejects, fieldnames=["line", "reason", *COLUMNS], extrasaction="ignore")
+        writer.writeheader()
+    seen = set()
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    def reject(line: int, row: Dict[str, str], reason: str):
+        report.reject(reason)
+        if writer:
+            writer.writerow({**row, "pin": "", "sec_a": "", "line": line, "reason": reason})
+
+    def commit(chunk: List[Tuple[int, Dict[str, str], bool]]):
+        pairs = [(row["pin"], row["sec_a"]) for _, row, _ in chunk]
+        if pool:
+            size = -(-len(pairs) // workers)
+            hashed = [h for part in pool.map(hash_secrets, [pairs[i:i + size] for i in range(0, len(pairs), size)])
+                      for h in part]
+        else:
+            hashed = hash_secrets(pairs)
+        users = [User(phone=row["phone"], name=row["name"], pin=pin, sec_q=row["sec_q"], sec_a=answer,
+                      currency=row["currency"], id_type=row.get("id_type", ""), id_number=row.get("id_number", ""),
+                      is_verified=verified)
+                 for (_, row, verified), (pin, answer) in zip(chunk, hashed)]
+        duplicates = set(user_manager.import_users(users))
+        for line, row, verified in chunk:
+            if row["phone"] in duplicates:
+                # Registered by someone else since the chunk was checked
+                report.duplicates += 1
+                reject(line, row, "Already registered")
+            else:
+                report.imported += 1
+                report.verified += verified
+        report.chunks += 1
+        report.elapsed_ms = (time.perf_counter() - start) * 1000
+        if progress:
+            progress(report)
+
+    try:
+        chunk: List[Tuple[int, Dict[str, str], bool]] = []
+        for line, row in read_rows(stream):
+            report.rows += 1
+            reason, verified = check_row(row)
+            if reason is None and (row["phone"] in seen or user_manager.get_user(row["phone"])):
+                report.duplicates += 1
+                reason = "Already registered" if row["phone"] not in seen else "Duplicate in file"
+            if reason:
+                reject(line, row, reason)
+                continue
+            seen.add(row["phone"])
+            chunk.append((line, row, verified))
+            if len(chunk) >= chunk_rows:
+                commit(chunk)
+                chunk = []
+        if chunk:
+            commit(chunk)
+    finally:
+        if pool:
+            pool.shutdown()
+    report.elapsed_ms = (time.perf_counter() - start) * 1000
+    return report
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Bulk-register customers from an agent CSV batch.")
+    parser.add_argument("csv", help=f"CSV with columns {', '.join(COLUMNS)}")
+    parser.add_argument("--data-dir", default=".")
+    parser.add_argument("--rejects", help="Where to write rejected rows (default: <csv>.rejects.csv)")
+    parser.add_argument("--workers", type=int, default=1, help="Processes for PIN hashing")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    try:
+        from engine import MoneyEngine
+    except ImportError:
+        from mobile_money_system.engine import MoneyEngine
+    engine = MoneyEngine(*(os.path.join(args.data_dir, name) for name in ("users.json", "transactions.json", "ledger.json")))
+    rejects_path = args.rejects or f"{os.path.splitext(args.csv)[0]}.rejects.csv"
+
+    def progress(report: ImportReport):
+        print(f"chunk {report.chunks}: {report.rows} rows read, {report.imported} imported, "
+              f"{report.rejected} rejected ({report.elapsed_ms / 1000:.1f}s)", file=sys.stderr)
+
+    with open(args.csv, newline="", encoding="utf-8-sig") as f, open(rejects_path, "w", newline="") as rejects:
+        report = import_users(engine.user_manager, f, rejects, args.workers, args.chunk_rows, progress)
+    result = report.to_dict()
+    result["rejects_file"] = rejects_path
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import contextlib
+import functools
+import os
+import threading
+from typing import Callable, List, Optional
+
+try:
+    from storage import StoreLock
+    from holds import ExpiryTimer
+    from users import UserManager
+    from transactions import TransactionManager
+    import metrics
+    import tracing
+    import replica
+    import scheduler
+except ImportError:
+    from mobile_money_system.storage import StoreLock
+    from mobile_money_system.holds import ExpiryTimer
+    from mobile_money_system.users import UserManager
+    from mobile_money_system.transactions import TransactionManager
+    from mobile_money_system import metrics
+    from mobile_money_system import tracing
+    from mobile_money_system import replica
+    from mobile_money_system import scheduler
+
+# Several processes (e.g. `uvicorn api:app --workers 4`) on one set of files
+SHARED_STORE = os.environ.get("MMS_SHARED_STORE", "0") == "1"
+# Methods that never save; in a shared store everything else takes the cross-process write lock
+SHARED_READS = replica.READ_METHODS | {"ledger_proofs", "login", "verify_security_answer", "generate_otp", "verify_otp",
+                                       "get_fx_quote"}
+
+
+class LockedProxy:
+    """
+    Wraps a manager so every method call runs under the engine lock.
+    Attribute reads (e.g. `user_manager.users`) pass straight through.
+    In a sampled trace, time spent waiting for the lock gets its own span.
+    With `write_section`, calls that may save also run inside it.
+    """
+    def __init__(self, target, lock, write_section: Optional[Callable] = None):
+        self._target = target
+        self._lock = lock
+        self._write_section = write_section
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def locked(*args, **kwargs):
+            if tracing.active():
+                with tracing.span("engine.lock_wait"):
+                    self._lock.acquire()
+            else:
+                self._lock.acquire()
+            try:
+                if self._write_section is None or name in SHARED_READS:
+                    return attr(*args, **kwargs)
+                with self._write_section():
+                    return attr(*args, **kwargs)
+            finally:
+                self._lock.release()
+        return locked
+
+
+class MoneyEngine:
+    """
+    One UserManager/TransactionManager pair shared by every session in the
+    process. Writes are serialized with a single lock, each save bumps
+    `version` and notifies subscribers, and files written by another process
+    (e.g. the API) are picked up by refresh(). With a journal file, every
+    save is also appended to a change journal for read replicas.
+
+    With a lock file (a shared store), writes are serialized across processes
+    too: each one runs under an exclusive flock, first reloading if another
+    process wrote since, and then bumps the store version. refresh() compares
+    that version instead of file stamps, so it never reloads half an operation.
+    """
+    def __init__(self, users_file: str = "users.json", transactions_file: str = "transactions.json", ledger_file: str = "ledger.json",
+                 journal_file: Optional[str] = None, lock_file: Optional[str] = None):
+        self.lock = threading.RLock()
+        self.version = 0
+        self._listeners: List[Callable[[int], None]] = []
+
+        if lock_file is None and SHARED_STORE:
+            lock_file = os.path.join(os.path.dirname(os.path.abspath(users_file)), "store.lock")
+        self.store = StoreLock(lock_file) if lock_file else None
+        with self.store.exclusive() if self.store else contextlib.nullcontext():
+            self._user_manager = UserManager(users_file)
+            self._transaction_manager = TransactionManager(self._user_manager, transactions_file, ledger_file)
+            self.store_version = self.store.version() if self.store else 0
+        write_section = self._shared_write if self.store else None
+        self.user_manager = LockedProxy(self._user_manager, self.lock, write_section)
+        self.transaction_manager = LockedProxy(self._transaction_manager, self.lock, write_section)
+
+        for storage in self._storages():
+            storage.listeners.append(self._on_save)
+        metrics.register_object_counts(self._user_manager, self._transaction_manager)
+        # Releases expired authorizations when the earliest one is due
+        self.hold_timer = ExpiryTimer(self._transaction_manager.holds, self.transaction_manager.expire_holds, self.lock)
+        self.hold_timer.start()
+        # Runs due standing orders in batches when the earliest one is due
+        self.schedule_timer = None
+        if scheduler.SCHEDULER_ENABLED:
+            self.schedule_timer = ExpiryTimer(self._transaction_manager.schedules, self._run_schedules, self.lock,
+                                              name="standing-orders")
+            self.schedule_timer.start()
+
+        if journal_file is None and replica.JOURNAL_ENABLED:
+            journal_file = replica.JOURNAL_FILE
+        self.journal = replica.ChangeJournal(journal_file) if journal_file else None
+        if self.journal:
+            self.journal.attach(self._user_manager, self._transaction_manager)
+
+    def _storages(self):
+        return [
+            self._user_manager.storage,
+            self._transaction_manager.storage,
+            self._transaction_manager.ledger.storage,
+            self._transaction_manager.holds.storage,
+            self._transaction_manager.settler.storage,
+            self._transaction_manager.schedules.storage,
+            self._transaction_manager.schedules.log,
+            self._transaction_manager.fx.storage,
+        ]
+
+    def _run_schedules(self) -> int:
+        # Pick up schedules another process ran or cancelled before paying anything
+        self.refresh()
+        return self.transaction_manager.run_schedules()
+
+    def _on_save(self, storage):
+        self.version += 1
+        for listener in list(self._listeners):
+            listener(self.version)
+
+    def subscribe(self, listener: Callable[[int], None]) -> Callable[[], None]:
+        """Registers a change listener; returns a function that unsubscribes it."""
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener) if listener in self._listeners else None
+
+    def _reload(self):
+        # Only what another process rewrote; the schedule store tails its change log
+        tm = self._transaction_manager
+        for storage, load in ((self._user_manager.storage, self._user_manager.load_users),
+                              (tm.storage, tm.load_transactions),
+                              (tm.ledger.storage, tm.ledger.load_entries),
+                              (tm.holds.storage, tm.holds.load_holds),
+                              (tm.settler.storage, tm.settler.load),
+                              (tm.fx.storage, tm.fx.load_quotes)):
+            if storage.changed_on_disk():
+                load()
+        if tm.schedules.storage.changed_on_disk() or tm.schedules.log.changed_on_disk():
+            tm.schedules.catch_up()
+        if self.journal:
+            # The other process journaled its own writes
+            self.journal.rebaseline()
+        self._on_save(None)
+
+    @contextlib.contextmanager
+    def _shared_write(self):
+        # Called under self.lock: flock is per open file, not per thread
+        with self.store.exclusive():
+            version = self.store.version()
+            if version != self.store_version:
+                self._reload()
+                self.store_version = version
+            before = self.version
+            try:
+                yield
+            finally:
+                if self.version != before:
+                    self.store_version = self.store.bump()
+
+    def refresh(self) -> bool:
+        """
+        Reloads from disk if another process changed any data file.
+        Costs a stat call per data file (one read of the store version with a lock
+        file) when nothing changed.
+        """
+        if self.store:
+            if self.store.version() == self.store_version:
+                return False
+            with self.lock, self.store.shared():
+                version = self.store.version()
+                if version == self.store_version:
+                    return False
+                self._reload()
+                self.store_version = version
+            return True
+        if not any(s.changed_on_disk() for s in self._storages()):
+            return False
+        with self.lock:
+            if not any(s.changed_on_disk() for s in self._storages()):
+                return False
+            self._reload()
+        return True
@@ -0,0 +1,237 @@
+import argparse
+import csv
+import io
+import os
+import sys
+import tempfile
+from typing import Callable, Iterable, Iterator, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional
+    pa = None
+    pq = None
+
+try:
+    from users import UserManager
+    from transactions import TransactionManager
+except ImportError:
+    from mobile_money_system.users import UserManager
+    from mobile_money_system.transactions import TransactionManager
+
+# PIN and security answer hashes never leave the system.
+USER_FIELDS = ["phone", "name", "balance", "currency", "role", "id_type", "id_number",
+               "is_verified", "status", "risk_tier"]
+TRANSACTION_FIELDS = ["id", "sender_phone", "receiver_phone", "amount", "currency", "type",
+                      "timestamp", "description", "status", "flagged", "flag_reason"]
+LEDGER_FIELDS = ["id", "transaction_id", "account_id", "amount", "timestamp", "description"]
+
+DATASETS = {
+    "users": USER_FIELDS,
+    "transactions": TRANSACTION_FIELDS,
+    "ledger": LEDGER_FIELDS,
+}
+
+CHUNK_ROWS = 10000
+SPOOL_BYTES = 8 * 1024 * 1024  # Exports larger than this spill to a temp file
+
+
+def parquet_available() -> bool:
+    return pa is not None
+
+
+def _in_range(timestamp: str, start: Optional[str], end: Optional[str]) -> bool:
+    # ISO-8601 strings compare chronologically, so no parsing is needed.
+    if start and timestamp < start:
+        return False
+    if end and timestamp >= end:
+        return False
+    return True
+
+
+def iter_user_rows(user_manager: UserManager, statuses: Optional[Iterable[str]] = None,
+                   risk_tiers: Optional[Iterable[str]] = None) -> Iterator[dict]:
+    statuses = set(statuses) if statuses else None
+    risk_tiers = set(risk_tiers) if risk_tiers else None
+    # Snapshot the keys so a concurrent register doesn't break iteration.
+    for phone in list(user_manager.users.keys()):
+        user = user_manager.users.get(phone)
+        if user is None:
+            continue
+        if statuses and user.status not in statuses:
+            continue
+        if risk_tiers and user.risk_tier not in risk_tiers:
+            continue
+        row = user.to_dict()
+        yield {k: row[k] for k in USER_FIELDS}
+
+
+def iter_transaction_rows(transaction_manager: TransactionManager, start: Optional[str] = None,
+                          end: Optional[str] = None, types: Optional[Iterable[str]] = None) -> Iterator[dict]:
+    types = set(types) if types else None
+    for t in list(transaction_manager.transactions):
+        if types and t.type not in types:
+            continue
+        if not _in_range(t.timestamp, start, end):
+            continue
+        yield t.to_dict()
+
+
+def iter_ledger_rows(transaction_manager: TransactionManager, start: Optional[str] = None,
+                     end: Optional[str] = None, accounts: Optional[Iterable[str]] = None) -> Iterator[dict]:
+    accounts = set(accounts) if accounts else None
+    for e in list(transaction_manager.ledger.entries):
+        if accounts and e.account_id not in accounts:
+            continue
+        if not _in_range(e.timestamp, start, end):
+            continue
+        yield e.to_dict()
+
+
+def iter_rows(dataset: str, user_manager: UserManager, transaction_manager: TransactionManager,
+              start: Optional[str] = None, end: Optional[str] = None,
+              types: Optional[Iterable[str]] = None) -> Iterator[dict]:
+    """
+    Row generator for a dataset. `types` means user status for users,
+    transaction type for transactions and account id for the ledger.
+    """
+    if dataset == "users":
+        return iter_user_rows(user_manager, statuses=types)
+    if dataset == "transactions":
+        return iter_transaction_rows(transaction_manager, start, end, types)
+    if dataset == "ledger":
+        return iter_ledger_rows(transaction_manager, start, end, accounts=types)
+    raise ValueError(f"Unknown dataset: {dataset}")
+
+
+def iter_csv_chunks(rows: Iterable[dict], fields: List[str], chunk_rows: int = CHUNK_ROWS) -> Iterator[str]:
+    """Yields CSV text in chunks of at most `chunk_rows` rows, header first."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+    writer.writeheader()
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= chunk_rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _chunked(rows: Iterable[dict], chunk_rows: int) -> Iterator[List[dict]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def write_csv(rows: Iterable[dict], fields: List[str], fileobj, chunk_rows: int = CHUNK_ROWS) -> int:
+    """Streams rows into a binary file object. Returns the number of rows written."""
+    count = 0
+
+    def counted():
+        nonlocal count
+        for row in rows:
+            count += 1
+            yield row
+
+    for chunk in iter_csv_chunks(counted(), fields, chunk_rows):
+        fileobj.write(chunk.encode("utf-8"))
+    return count
+
+
+def write_parquet(rows: Iterable[dict], fields: List[str], fileobj, chunk_rows: int = CHUNK_ROWS) -> int:
+    """
+    Streams rows into a Parquet file one row group per chunk.
+    All columns are written as strings so Decimal amounts keep their precision.
+    Returns the number of rows written.
+    """
+    if pa is None:
+        raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+
+    schema = pa.schema([(f, pa.string()) for f in fields])
+    count = 0
+    writer = pq.ParquetWriter(fileobj, schema)
+    try:
+        for chunk in _chunked(rows, chunk_rows):
+            columns = {f: [None if r.get(f) is None else str(r.get(f)) for r in chunk] for f in fields}
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            count += len(chunk)
+        if count == 0:
+            writer.write_table(schema.empty_table())
+    finally:
+        writer.close()
+    return count
+
+
+def export(dataset: str, fmt: str, fileobj, user_manager: UserManager, transaction_manager: TransactionManager,
+           start: Optional[str] = None, end: Optional[str] = None, types: Optional[Iterable[str]] = None,
+           chunk_rows: int = CHUNK_ROWS):
+    fields = DATASETS[dataset]
+    rows = iter_rows(dataset, user_manager, transaction_manager, start, end, types)
+    if fmt == "csv":
+        return write_csv(rows, fields, fileobj, chunk_rows)
+    if fmt == "parquet":
+        return write_parquet(rows, fields, fileobj, chunk_rows)
+    raise ValueError(f"Unknown format: {fmt}")
+
+
+def deferred_export(dataset: str, fmt: str, user_manager: UserManager, transaction_manager: TransactionManager,
+                    start: Optional[str] = None, end: Optional[str] = None,
+                    types: Optional[Iterable[str]] = None) -> Callable[[], object]:
+    """
+    Returns a zero-argument callable for st.download_button. The export only
+    runs when the button is clicked and is spooled to disk past SPOOL_BYTES,
+    so memory stays bounded regardless of row count.
+    """
+    def build():
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+        export(dataset, fmt, spool, user_manager, transaction_manager, start, end, types)
+        spool.seek(0)
+        return spool
+    return build
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Export users, transactions or ledger entries.")
+    parser.add_argument("dataset", choices=sorted(DATASETS))
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--out", default="-", help="Output path, '-' for stdout (CSV only)")
+    parser.add_argument("--start", help="Inclusive ISO date/time lower bound")
+    parser.add_argument("--end", help="Exclusive ISO date/time upper bound")
+    parser.add_argument("--type", action="append", dest="types",
+                        help="Transaction type, user status or ledger account (repeatable)")
+    parser.add_argument("--data-dir", default=".", help="Directory holding the JSON data files")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    user_manager = UserManager(os.path.join(args.data_dir, "users.json"))
+    transaction_manager = TransactionManager(
+        user_manager,
+        os.path.join(args.data_dir, "transactions.json"),
+        os.path.join(args.data_dir, "ledger.json"),
+    )
+
+    if args.out == "-":
+        if args.format != "csv":
+            parser.error("Parquet output needs --out")
+        count = export(args.dataset, "csv", sys.stdout.buffer, user_manager, transaction_manager,
+                       args.start, args.end, args.types, args.chunk_rows)
+    else:
+        with open(args.out, "wb") as f:
+            count = export(args.dataset, args.format, f, user_manager, transaction_manager,
+                           args.start, args.end, args.types, args.chunk_rows)
+    print(f"Exported {count} {args.dataset} rows", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+from bisect import bisect_left
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from storage import JsonStorage
+except ImportError:
+    from mobile_money_system.storage import JsonStorage
+
+CENT = Decimal("0.01")
+OPERATIONS = ("transfer", "withdraw", "bill_payment", "deposit")
+
+# Fee schedule. Each rule applies to one operation and optionally narrows to a
+# currency, risk tier and/or biller; the most specific match wins (biller,
+# then tier, then currency). Bands are ordered by "up_to" (inclusive upper
+# amount, omitted on the last band); a band's fee is flat + percent% of the
+# amount, then clamped to the rule's min/max. For example a tiered transfer
+# schedule with a cap:
+#   {"operation": "transfer", "max": 25,
+#    "bands": [{"up_to": 10, "flat": 0}, {"up_to": 1000, "percent": 1}, {"percent": 0.5}]}
+DEFAULT_SCHEDULE = [
+    {"operation": "transfer", "bands": [{"percent": 1}]},
+    {"operation": "withdraw", "bands": [{"percent": 1}]},
+    {"operation": "bill_payment", "bands": [{"flat": 0.5}]},
+]
+
+
+class FeeQuote:
+    __slots__ = ("operation", "amount", "fee", "label")
+
+    def __init__(self, operation: str, amount: Decimal, fee: Decimal, label: str):
+        self.operation = operation
+        self.amount = amount
+        self.fee = fee
+        self.label = label
+
+    @property
+    def total(self) -> Decimal:
+        return self.amount + self.fee
+
+    def to_dict(self) -> dict:
+        return {"operation": self.operation, "amount": str(self.amount), "fee": str(self.fee),
+                "total": str(self.total), "label": self.label}
+
+
+def _dec(value) -> Optional[Decimal]:
+    return None if value is None else Decimal(str(value))
+
+
+def _band_label(percent: Decimal, flat: Decimal) -> str:
+    parts = []
+    if percent:
+        parts.append(f"{percent.normalize():f}%")
+    if flat or not parts:
+        parts.append(f"{flat.quantize(CENT)} flat" if not parts else f"{flat.quantize(CENT)}")
+    return " + ".join(parts)
+
+
+class CompiledRule:
+    """One rule's bands as parallel sorted lists, so picking a band is a bisect."""
+    __slots__ = ("bounds", "bands", "minimum", "maximum")
+
+    def __init__(self, config: dict):
+        bands = config.get("bands") or [{"flat": 0}]
+        self.bounds: List[Decimal] = []
+        self.bands: List[Tuple[Decimal, Decimal, str]] = []
+        for i, band in enumerate(bands):
+            up_to = _dec(band.get("up_to"))
+            if up_to is None and i != len(bands) - 1:
+                raise ValueError("Only the last fee band may omit 'up_to'")
+            if self.bounds and up_to is not None and up_to <= self.bounds[-1]:
+                raise ValueError("Fee bands must be in increasing 'up_to' order")
+            percent = _dec(band.get("percent", 0))
+            flat = _dec(band.get("flat", 0))
+            if up_to is not None:
+                self.bounds.append(up_to)
+            self.bands.append((percent / 100, flat, _band_label(percent, flat)))
+        if len(self.bands) == len(self.bounds):
+            # Amounts above the last bound pay the last band
+            self.bounds.pop()
+        self.minimum = _dec(config.get("min"))
+        self.maximum = _dec(config.get("max"))
+
+    def fee(self, amount: Decimal) -> Tuple[Decimal, str]:
+        rate, flat, label = self.bands[bisect_left(self.bounds, amount)]
+        fee = flat + amount * rate
+        if self.minimum is not None and fee < self.minimum:
+            fee, label = self.minimum, f"{label}, min {self.minimum.quantize(CENT)}"
+        if self.maximum is not None and fee > self.maximum:
+            fee, label = self.maximum, f"{label}, max {self.maximum.quantize(CENT)}"
+        return fee.quantize(CENT, rounding=ROUND_HALF_UP), label
+
+
+class FeeEngine:
+    """
+    Quotes fees from a compiled schedule. Rule resolution for a
+    (operation, currency, tier, biller) combination is cached, so a quote is
+    a dict lookup plus a bisect over the matching rule's bands.
+    """
+    def __init__(self, schedule: Optional[List[dict]] = None):
+        self.rules: Dict[tuple, CompiledRule] = {}
+        for config in schedule if schedule is not None else DEFAULT_SCHEDULE:
+            operation = config.get("operation")
+            if operation not in OPERATIONS:
+                raise ValueError(f"Unknown fee operation: {operation}")
+            key = (operation, config.get("currency"), config.get("tier"), config.get("biller"))
+            self.rules[key] = CompiledRule(config)
+        self._resolved: Dict[tuple, Optional[CompiledRule]] = {}
+
+    def _rule(self, operation: str, currency: Optional[str], tier: Optional[str], biller: Optional[str]) -> Optional[CompiledRule]:
+        key = (operation, currency, tier, biller)
+        if key in self._resolved:
+            return self._resolved[key]
+        rule = None
+        for b in ((biller, None) if biller else (None,)):
+            for t in ((tier, None) if tier else (None,)):
+                for c in ((currency, None) if currency else (None,)):
+                    rule = self.rules.get((operation, c, t, b))
+                    if rule is not None:
+                        break
+                if rule is not None:
+                    break
+            if rule is not None:
+                break
+        self._resolved[key] = rule
+        return rule
+
+    def quote(self, operation: str, amount: Decimal, currency: Optional[str] = None, tier: Optional[str] = None,
+              biller: Optional[str] = None) -> FeeQuote:
+        amount = Decimal(str(amount))
+        rule = self._rule(operation, currency, tier, biller)
+        if rule is None:
+            return FeeQuote(operation, amount, Decimal("0.00"), "free")
+        fee, label = rule.fee(amount)
+        return FeeQuote(operation, amount, fee, label)
+
+    def describe(self) -> List[dict]:
+        """One row per rule, for display."""
+        rows = []
+        for (operation, currency, tier, biller), rule in self.rules.items():
+            bands = []
+            for i, (_, _, label) in enumerate(rule.bands):
+                bound = rule.bounds[i] if i < len(rule.bounds) else None
+                bands.append(f"≤{bound}: {label}" if bound is not None else (f">{rule.bounds[-1]}: {label}" if rule.bounds else label))
+            rows.append({"operation": operation, "currency": currency or "any", "tier": tier or "any",
+                         "biller": biller or "any", "bands": "; ".join(bands),
+                         "min": str(rule.minimum) if rule.minimum is not None else "",
+                         "max": str(rule.maximum) if rule.maximum is not None else ""})
+        return rows
+
+
+def load_schedule(schedule_file: str = "fee_schedule.json") -> List[dict]:
+    """Fee schedule from `schedule_file` if present, else DEFAULT_SCHEDULE."""
+    data = JsonStorage(schedule_file).load(default=DEFAULT_SCHEDULE)
+    return data if isinstance(data, list) else DEFAULT_SCHEDULE
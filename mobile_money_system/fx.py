@@ -0,0 +1,272 @@
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.request
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from decimal import Decimal, ROUND_DOWN, ROUND_UP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    from storage import JsonStorage
+except ImportError:
+    from mobile_money_system.storage import JsonStorage
+
+CENT = Decimal("0.01")
+RATE_PLACES = Decimal("0.000001")
+RATES_TTL_SECONDS = float(os.environ.get("MMS_FX_TTL", "60"))          # How long a loaded rate table is used
+QUOTE_TTL_SECONDS = float(os.environ.get("MMS_FX_QUOTE_TTL", "30"))    # How long a quoted rate is honoured
+POSITION_PREFIX = "FX_POSITION:"
+
+# Mid rates in units per `base`, each with an optional bid/ask spread (percent
+# of mid, split evenly either side); currencies without one use margin_percent.
+# A bare number is a mid rate. Place a table like this in `fx_rates.json`, or
+# point MMS_FX_URL at a service returning one.
+DEFAULT_RATES = {
+    "base": "USD",
+    "margin_percent": 2.5,
+    "rates": {
+        "EUR": {"mid": 0.92},
+        "GBP": {"mid": 0.79},
+        "KES": {"mid": 129.0, "spread_percent": 3},
+        "LRD": {"mid": 193.0, "spread_percent": 3},
+    },
+}
+
+
+def position_account(currency: str) -> str:
+    return POSITION_PREFIX + currency
+
+
+@dataclass
+class FxQuote:
+    """A customer rate for one conversion, honoured until `expires_at`."""
+    id: str
+    phone: str
+    source: str       # Currency debited
+    target: str       # Currency credited
+    amount: Decimal   # In `source`
+    rate: Decimal     # `target` per `source`, spread included
+    mid: Decimal
+    expires_at: float
+
+    @property
+    def converted(self) -> Decimal:
+        return (self.amount * self.rate).quantize(CENT, rounding=ROUND_DOWN)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "phone": self.phone,
+            "source": self.source,
+            "target": self.target,
+            "amount": str(self.amount),
+            "converted": str(self.converted),
+            "rate": str(self.rate),
+            "mid": str(self.mid),
+            "expires_at": self.expires_at,
+        }
+
+    @staticmethod
+    def from_dict(data: dict) -> 'FxQuote':
+        return FxQuote(
+            id=data["id"],
+            phone=data["phone"],
+            source=data["source"],
+            target=data["target"],
+            amount=Decimal(str(data["amount"])),
+            rate=Decimal(str(data["rate"])),
+            mid=Decimal(str(data["mid"])),
+            expires_at=data["expires_at"],
+        )
+
+
+def file_source(rates_file: str = "fx_rates.json") -> Callable[[], dict]:
+    return lambda: JsonStorage(rates_file).load(default=DEFAULT_RATES)
+
+
+def http_source(url: str, timeout: float = 5.0) -> Callable[[], dict]:
+    def fetch():
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return json.loads(response.read())
+    return fetch
+
+
+def rate_source(rates_file: str = "fx_rates.json") -> Callable[[], dict]:
+    """MMS_FX_URL if set, else `rates_file` (falling back to DEFAULT_RATES)."""
+    url = os.environ.get("MMS_FX_URL")
+    return http_source(url) if url else file_source(rates_file)
+
+
+def set_margin(percent: float, rates_file: str = "fx_rates.json"):
+    """Sets the default spread in `rates_file`, creating it from DEFAULT_RATES if needed."""
+    storage = JsonStorage(rates_file)
+    table = storage.load(default=DEFAULT_RATES)
+    storage.save(dict(table, margin_percent=percent))
+
+
+def cross_rates(table: dict) -> Dict[Tuple[str, str], Tuple[Decimal, Decimal]]:
+    """
+    (customer rate, mid) for every ordered currency pair. Converting A to B
+    sells A at its ask and buys B at its bid, both quoted per base unit, so a
+    cross pays both currencies' half-spreads.
+    """
+    base = table.get("base", "USD")
+    margin = Decimal(str(table.get("margin_percent", 0)))
+    legs = {base: (Decimal("1"), Decimal("1"), Decimal("1"))}  # (bid, mid, ask) per base unit
+    for currency, spec in table.get("rates", {}).items():
+        spec = spec if isinstance(spec, dict) else {"mid": spec}
+        mid = Decimal(str(spec["mid"]))
+        half = mid * Decimal(str(spec.get("spread_percent", margin))) / 200
+        legs[currency] = (mid - half, mid, mid + half)
+    return {(a, b): ((legs[b][0] / legs[a][2]).quantize(RATE_PLACES, rounding=ROUND_DOWN),
+                     (legs[b][1] / legs[a][1]).quantize(RATE_PLACES))
+            for a in legs for b in legs if a != b}
+
+
+class FxEngine:
+    """
+    Conversion rates from a rate source, cached for `ttl_seconds`. Each load
+    precomputes the full cross-rate matrix, so a quote is a dict lookup. If a
+    reload fails, the last good table is kept. Locked quotes live in an
+    ordered dict. Every quote gets the same lock window, so the oldest ones
+    are always at the front and expired ones are dropped from there. With
+    `quotes_file` they are also saved there, so any process sharing the
+    store can honour a quote another one locked.
+    """
+    def __init__(self, source: Optional[Callable[[], dict]] = None, ttl_seconds: float = RATES_TTL_SECONDS,
+                 quote_ttl_seconds: float = QUOTE_TTL_SECONDS, quotes_file: Optional[str] = None):
+        self.source = source or (lambda: DEFAULT_RATES)
+        self.ttl_seconds = ttl_seconds
+        self.quote_ttl_seconds = quote_ttl_seconds
+        self.table: dict = {}
+        self.cross: Dict[Tuple[str, str], Tuple[Decimal, Decimal]] = {}
+        self.loaded_at: Optional[float] = None
+        self.error = ""
+        self.quotes: "OrderedDict[str, FxQuote]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.storage = JsonStorage(quotes_file) if quotes_file else None
+        self.load_quotes()
+
+    def load_quotes(self):
+        if self.storage is None:
+            return
+        data = self.storage.load(default={})
+        now = time.time()
+        quotes = sorted((FxQuote.from_dict(q) for q in data.values()), key=lambda q: q.expires_at) if isinstance(data, dict) else []
+        with self._lock:
+            self.quotes = OrderedDict((q.id, q) for q in quotes if q.expires_at > now)
+
+    def _save_quotes(self):
+        if self.storage is not None:
+            self.storage.save({q_id: quote.to_dict() for q_id, quote in self.quotes.items()})
+
+    def rates(self) -> Dict[Tuple[str, str], Tuple[Decimal, Decimal]]:
+        with self._lock:
+            if self.loaded_at is None or time.monotonic() - self.loaded_at >= self.ttl_seconds:
+                self._reload()
+            return self.cross
+
+    def _reload(self):
+        try:
+            table = self.source()
+            self.cross = cross_rates(table)
+            self.table = table
+            self.error = ""
+        except (OSError, ValueError, KeyError, TypeError, AttributeError, ArithmeticError) as e:
+            self.error = f"FX rates unavailable ({e}); keeping the previous table"
+            if not self.cross:
+                self.table, self.cross = DEFAULT_RATES, cross_rates(DEFAULT_RATES)
+        self.loaded_at = time.monotonic()
+
+    def invalidate(self):
+        """Drops the cached table so the next quote reloads it."""
+        with self._lock:
+            self.loaded_at = None
+
+    def quote(self, phone: str, source: str, target: str, amount: Decimal) -> Optional[FxQuote]:
+        """A fresh quote (not locked), or None if either currency has no rate."""
+        pair = self.rates().get((source, target))
+        if pair is None:
+            return None
+        return self._quote(phone, source, target, amount, *pair)
+
+    def quote_for(self, phone: str, source: str, target: str, converted: Decimal) -> Optional[FxQuote]:
+        """
+        A quote for the `source` amount that delivers `converted` in `target`,
+        e.g. to pay a request made in the receiver's currency. The amount is
+        rounded up to the cent, so at most a fraction of a cent more arrives.
+        """
+        pair = self.rates().get((source, target))
+        if pair is None:
+            return None
+        rate, mid = pair
+        return self._quote(phone, source, target, (converted / rate).quantize(CENT, rounding=ROUND_UP), rate, mid)
+
+    def _quote(self, phone: str, source: str, target: str, amount: Decimal, rate: Decimal, mid: Decimal) -> FxQuote:
+        return FxQuote(id=f"FXQ-{int(time.time())}-{str(uuid.uuid4())[:8].upper()}", phone=phone, source=source,
+                       target=target, amount=amount, rate=rate, mid=mid,
+                       expires_at=time.time() + self.quote_ttl_seconds)
+
+    def lock(self, quote: FxQuote) -> FxQuote:
+        now = time.time()
+        with self._lock:
+            while self.quotes and next(iter(self.quotes.values())).expires_at <= now:
+                self.quotes.popitem(last=False)
+            self.quotes[quote.id] = quote
+            self._save_quotes()
+        return quote
+
+    def get(self, quote_id: str) -> Optional[FxQuote]:
+        quote = self.quotes.get(quote_id)
+        return quote if quote and quote.expires_at > time.time() else None
+
+    def take(self, quote_id: str) -> Optional[FxQuote]:
+        """Removes and returns a live quote: each locked rate is used once."""
+        with self._lock:
+            quote = self.quotes.pop(quote_id, None)
+            if quote is not None:
+                self._save_quotes()
+        return quote if quote and quote.expires_at > time.time() else None
+
+    def describe(self) -> List[dict]:
+        return [{"pair": f"{a}/{b}", "mid": str(mid), "customer_rate": str(rate),
+                 "spread": f"{(1 - rate / mid) * 100:.2f}%"}
+                for (a, b), (rate, mid) in sorted(self.rates().items())]
+
+
+def serve(port: int, rates_file: str = "fx_rates.json"):
+    """Stand-in rate service: GET returns the rate table from `rates_file`."""
+    source = file_source(rates_file)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = json.dumps(source()).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="FX rate table: print the cross rates or serve the table over HTTP.")
+    parser.add_argument("--rates", default="fx_rates.json")
+    parser.add_argument("--serve", type=int, metavar="PORT", help="Serve the table for MMS_FX_URL and exit on Ctrl-C")
+    args = parser.parse_args(argv)
+    if args.serve:
+        print(f"FX rates at http://127.0.0.1:{args.serve}/")
+        serve(args.serve, args.rates)
+        return
+    for row in FxEngine(file_source(args.rates)).describe():
+        print(f"{row['pair']:<8} mid {row['mid']:>14}  customer {row['customer_rate']:>14}  ({row['spread']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+import argparse
+import json
+import sys
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    import numpy as np
+    from scipy import sparse
+    from scipy.sparse import csgraph
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+    sparse = None
+    csgraph = None
+
+try:
+    from models import Transaction
+    from storage import JsonStorage
+except ImportError:
+    from mobile_money_system.models import Transaction
+    from mobile_money_system.storage import JsonStorage
+
+
+def _is_edge(t: Transaction) -> bool:
+    return t.type == "TRANSFER" and t.status == "COMPLETED" and t.sender_phone != t.receiver_phone
+
+
+class TransferGraph:
+    """
+    Directed, weighted graph of completed TRANSFERs: phone -> counterparty ->
+    [total amount, transfer count]. Like TransactionIndex it catches up from
+    the last transaction it has seen, so each new transfer is one dict update.
+    """
+    def __init__(self):
+        self.out_edges: Dict[str, Dict[str, list]] = {}
+        self.in_edges: Dict[str, Dict[str, list]] = {}
+        self._source: Optional[List[Transaction]] = None
+        self._seen = 0
+
+    def add_transfer(self, sender: str, receiver: str, amount: float):
+        edge = self.out_edges.setdefault(sender, {}).get(receiver)
+        if edge is None:
+            edge = [0.0, 0]
+            self.out_edges[sender][receiver] = edge
+            self.in_edges.setdefault(receiver, {})[sender] = edge
+        edge[0] += amount
+        edge[1] += 1
+
+    def sync(self, transactions: List[Transaction]):
+        if transactions is not self._source or len(transactions) < self._seen:
+            self._source = transactions
+            self._seen = 0
+            self.out_edges = {}
+            self.in_edges = {}
+        for pos in range(self._seen, len(transactions)):
+            t = transactions[pos]
+            if _is_edge(t):
+                self.add_transfer(t.sender_phone, t.receiver_phone, float(t.amount))
+        self._seen = len(transactions)
+
+    @property
+    def edge_count(self) -> int:
+        return sum(len(v) for v in self.out_edges.values())
+
+    def cycles_closed_by(self, sender: str, receiver: str, max_len: int = 4, limit: int = 10) -> List[List[str]]:
+        """
+        Cycles that the edge sender -> receiver completes: paths receiver ~> sender
+        of at most max_len - 1 hops. Cheap enough to run as each transfer lands.
+        """
+        found = []
+        stack = [(receiver, [sender, receiver])]
+        while stack and len(found) < limit:
+            node, path = stack.pop()
+            for nxt in self.out_edges.get(node, ()):
+                if nxt == sender:
+                    found.append(path[:])
+                elif len(path) < max_len and nxt not in path:
+                    stack.append((nxt, path + [nxt]))
+        return found
+
+    def cycles(self, max_len: int = 4, limit: int = 100, budget: int = 500000) -> List[List[str]]:
+        """
+        Short simple cycles (money round-tripping), each reported once starting
+        from its smallest phone number. `budget` caps the edges explored so a
+        dense graph can't stall the caller; use SparseTransferGraph offline.
+        """
+        found = []
+        for start in sorted(self.out_edges):
+            stack = [(start, [start])]
+            while stack:
+                node, path = stack.pop()
+                edges = self.out_edges.get(node, ())
+                budget -= len(edges)
+                if budget < 0:
+                    return found
+                for nxt in edges:
+                    if nxt == start and len(path) > 1:
+                        found.append(path)
+                        if len(found) >= limit:
+                            return found
+                    elif nxt > start and len(path) < max_len and nxt not in path:
+                        stack.append((nxt, path + [nxt]))
+        return found
+
+    def mule_candidates(self, min_senders: int = 10, min_pass_through: float = 0.8, limit: int = 50) -> List[dict]:
+        """
+        Accounts collecting from many distinct senders and forwarding most of
+        it on: high fan-in with outgoing volume close to incoming volume.
+        """
+        rows = []
+        for phone, senders in self.in_edges.items():
+            if len(senders) < min_senders:
+                continue
+            received = sum(edge[0] for edge in senders.values())
+            sent = sum(edge[0] for edge in self.out_edges.get(phone, {}).values())
+            pass_through = sent / received if received else 0.0
+            if pass_through >= min_pass_through:
+                rows.append({"phone": phone, "senders": len(senders), "received": round(received, 2),
+                             "forwarded": round(sent, 2), "pass_through": round(pass_through, 3)})
+        rows.sort(key=lambda r: (r["senders"], r["received"]), reverse=True)
+        return rows[:limit]
+
+    def component(self, seed: str, max_size: int = 10000) -> Set[str]:
+        """Accounts connected to `seed` by transfers in either direction."""
+        seen = {seed}
+        queue = deque([seed])
+        while queue and len(seen) < max_size:
+            node = queue.popleft()
+            for nxt in list(self.out_edges.get(node, ())) + list(self.in_edges.get(node, ())):
+                if nxt not in seen:
+                    seen.add(nxt)
+                    queue.append(nxt)
+        return seen
+
+    def components_from(self, seeds: Iterable[str], max_size: int = 10000) -> List[dict]:
+        """Connected components containing any of `seeds` (e.g. flagged accounts), largest first."""
+        done: Set[str] = set()
+        result = []
+        for seed in seeds:
+            if seed in done or (seed not in self.out_edges and seed not in self.in_edges):
+                continue
+            members = self.component(seed, max_size)
+            done |= members
+            flagged = sorted(s for s in seeds if s in members)
+            result.append({"size": len(members), "flagged": flagged, "members": sorted(members)})
+        result.sort(key=lambda c: c["size"], reverse=True)
+        return result
+
+
+class SparseTransferGraph:
+    """
+    Full recomputation over the whole transfer history with scipy.sparse:
+    one CSR matrix of summed amounts, everything else is matrix arithmetic.
+    Intended for offline runs over tens of millions of edges.
+    """
+    def __init__(self, senders, receivers, amounts):
+        if sparse is None:
+            raise ImportError("numpy and scipy are required for SparseTransferGraph")
+        phones, idx = np.unique(np.concatenate([np.asarray(senders), np.asarray(receivers)]), return_inverse=True)
+        n = len(senders)
+        self.phones = phones
+        size = len(phones)
+        weights = np.asarray(amounts, dtype=np.float64)
+        self.volume = sparse.csr_matrix((weights, (idx[:n], idx[n:])), shape=(size, size))
+        self.volume.sum_duplicates()
+        self.adjacency = (self.volume > 0).astype(np.int32)
+
+    @classmethod
+    def from_transactions(cls, transactions: Iterable[Transaction]) -> 'SparseTransferGraph':
+        senders, receivers, amounts = [], [], []
+        for t in transactions:
+            if _is_edge(t):
+                senders.append(t.sender_phone)
+                receivers.append(t.receiver_phone)
+                amounts.append(float(t.amount))
+        return cls(senders, receivers, amounts)
+
+    def in_degree(self):
+        return np.asarray(self.adjacency.sum(axis=0)).ravel()
+
+    def out_degree(self):
+        return np.asarray(self.adjacency.sum(axis=1)).ravel()
+
+    def round_trip_pairs(self) -> List[Tuple[str, str]]:
+        """2-cycles: pairs that have sent money to each other."""
+        mutual = sparse.triu(self.adjacency.multiply(self.adjacency.T), k=1).tocoo()
+        return [(self.phones[i], self.phones[j]) for i, j in zip(mutual.row, mutual.col)]
+
+    def triangle_counts(self):
+        """Per account, the number of directed 3-cycles it sits on (diag of A^3)."""
+        a = self.adjacency
+        return np.asarray((a @ a).multiply(a.T).sum(axis=1)).ravel()
+
+    def mule_candidates(self, min_senders: int = 10, min_pass_through: float = 0.8, limit: int = 50) -> List[dict]:
+        received = np.asarray(self.volume.sum(axis=0)).ravel()
+        sent = np.asarray(self.volume.sum(axis=1)).ravel()
+        senders = self.in_degree()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = np.where(received > 0, sent / received, 0.0)
+        hits = np.nonzero((senders >= min_senders) & (ratio >= min_pass_through))[0]
+        hits = hits[np.lexsort((received[hits], senders[hits]))[::-1]][:limit]
+        return [{"phone": str(self.phones[i]), "senders": int(senders[i]), "received": round(float(received[i]), 2),
+                 "forwarded": round(float(sent[i]), 2), "pass_through": round(float(ratio[i]), 3)} for i in hits]
+
+    def components_from(self, seeds: Iterable[str]) -> List[dict]:
+        count, labels = csgraph.connected_components(self.adjacency, directed=True, connection="weak")
+        position = {p: i for i, p in enumerate(self.phones)}
+        seeds = [s for s in seeds if s in position]
+        sizes = np.bincount(labels, minlength=count)
+        by_label: Dict[int, List[str]] = {}
+        for s in seeds:
+            by_label.setdefault(int(labels[position[s]]), []).append(s)
+        result = [{"size": int(sizes[label]), "flagged": sorted(flagged),
+                   "members": sorted(str(p) for p in self.phones[labels == label])}
+                  for label, flagged in by_label.items()]
+        result.sort(key=lambda c: c["size"], reverse=True)
+        return result
+
+
+def flagged_accounts(transactions: Iterable[Transaction]) -> List[str]:
+    """Customer accounts on flagged transactions (the depositor for deposits, else the sender)."""
+    accounts = set()
+    for t in transactions:
+        if t.flagged:
+            accounts.add(t.receiver_phone if t.type == "DEPOSIT" else t.sender_phone)
+    return sorted(accounts)
+
+
+def report(transactions: List[Transaction], max_cycle_len: int = 4, min_senders: int = 10,
+           use_sparse: Optional[bool] = None) -> dict:
+    """Cycles, mule candidates and flagged-account components for the whole history."""
+    flagged = flagged_accounts(transactions)
+    if use_sparse is None:
+        use_sparse = sparse is not None
+    if use_sparse:
+        g = SparseTransferGraph.from_transactions(transactions)
+        triangles = g.triangle_counts()
+        on_triangles = [str(g.phones[i]) for i in np.nonzero(triangles)[0]]
+        return {
+            "engine": "sparse",
+            "accounts": len(g.phones),
+            "edges": int(g.adjacency.nnz),
+            "round_trip_pairs": [list(p) for p in g.round_trip_pairs()[:100]],
+            "accounts_on_3_cycles": on_triangles[:100],
+            "mule_candidates": g.mule_candidates(min_senders),
+            "flagged_components": g.components_from(flagged),
+        }
+    g = TransferGraph()
+    g.sync(transactions)
+    return {
+        "engine": "python",
+        "accounts": len(set(g.out_edges) | set(g.in_edges)),
+        "edges": g.edge_count,
+        "cycles": g.cycles(max_cycle_len),
+        "mule_candidates": g.mule_candidates(min_senders),
+        "flagged_components": g.components_from(flagged),
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Transfer-graph analytics: cycles, mule accounts, fraud-ring components.")
+    parser.add_argument("--transactions", default="transactions.json")
+    parser.add_argument("--max-cycle-len", type=int, default=4)
+    parser.add_argument("--min-senders", type=int, default=10, help="Fan-in needed to consider an account a mule")
+    parser.add_argument("--engine", choices=["auto", "sparse", "python"], default="auto")
+    parser.add_argument("--output", default="-")
+    args = parser.parse_args(argv)
+
+    transactions = [Transaction.from_dict(t) for t in JsonStorage(args.transactions).load(default=[])]
+    use_sparse = None if args.engine == "auto" else args.engine == "sparse"
+    result = report(transactions, args.max_cycle_len, args.min_senders, use_sparse)
+    text = json.dumps(result, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        print(f"{result['accounts']} accounts, {result['edges']} edges", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
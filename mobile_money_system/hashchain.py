@@ -0,0 +1,200 @@
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import sys
+from datetime import datetime
+from typing import List, Optional, Sequence
+
+try:
+    from models import LedgerEntry
+except ImportError:
+    from mobile_money_system.models import LedgerEntry
+
+GENESIS = "0" * 64
+# Set to sign checkpoints; a verifier holding the key won't trust a checkpoint it didn't sign
+KEY_ENV = "MMS_LEDGER_KEY"
+
+
+def leaf_hash(entry: LedgerEntry) -> bytes:
+    """Digest of one entry's content (everything but its chain hash)."""
+    fields = (entry.id, entry.transaction_id, entry.account_id, str(entry.amount), entry.timestamp, entry.description)
+    # Entries from before currencies were recorded keep their original digest
+    data = "\x1f".join(fields + (entry.currency,) if entry.currency else fields)
+    return hashlib.sha256(b"\x00" + data.encode()).digest()
+
+
+def chain_hash(previous: str, leaves: Sequence[bytes]) -> str:
+    """Head after a batch: one hash over the previous head and the batch's leaf digests."""
+    return hashlib.sha256(bytes.fromhex(previous) + b"".join(leaves)).hexdigest()
+
+
+def _parent(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def merkle_root(leaves: Sequence[bytes]) -> str:
+    level = list(leaves)
+    if not level:
+        return GENESIS
+    while len(level) > 1:
+        # An odd node out is carried up unchanged
+        level = [_parent(level[i], level[i + 1]) if i + 1 < len(level) else level[i] for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def merkle_path(leaves: Sequence[bytes], index: int) -> List[list]:
+    """Sibling hashes from leaf `index` up to the root, each tagged with the side it sits on."""
+    path = []
+    level = list(leaves)
+    while len(level) > 1:
+        sibling = index ^ 1
+        if sibling < len(level):
+            path.append([level[sibling].hex(), "L" if sibling < index else "R"])
+        level = [_parent(level[i], level[i + 1]) if i + 1 < len(level) else level[i] for i in range(0, len(level), 2)]
+        index //= 2
+    return path
+
+
+def verify_proof(entry: LedgerEntry, proof: dict) -> bool:
+    """True if `entry` is the leaf the proof's path leads from to its checkpoint root."""
+    node = leaf_hash(entry)
+    for sibling, side in proof["path"]:
+        node = _parent(bytes.fromhex(sibling), node) if side == "L" else _parent(node, bytes.fromhex(sibling))
+    return node.hex() == proof["root"]
+
+
+def sign(checkpoint: dict, key: Optional[str]) -> str:
+    if not key:
+        return ""
+    message = f"{checkpoint['start']}:{checkpoint['end']}:{checkpoint['head']}:{checkpoint['root']}"
+    return hmac.new(key.encode(), message.encode(), hashlib.sha256).hexdigest()
+
+
+def make_checkpoint(start: int, end: int, head: str, leaves: Sequence[bytes], key: Optional[str] = None) -> dict:
+    checkpoint = {"start": start, "end": end, "head": head, "root": merkle_root(leaves),
+                  "timestamp": datetime.now().isoformat()}
+    checkpoint["signature"] = sign(checkpoint, key)
+    return checkpoint
+
+
+class VerificationReport:
+    def __init__(self, start: int, end: int, checkpoints: int, errors: List[str]):
+        self.start = start
+        self.end = end
+        self.checkpoints = checkpoints
+        self.errors = errors
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def to_dict(self) -> dict:
+        return {"ok": self.ok, "verified_from": self.start, "verified_to": self.end,
+                "checkpoints_checked": self.checkpoints, "errors": self.errors[:100]}
+
+
+def trusted_checkpoint(entries: Sequence[LedgerEntry], checkpoints: List[dict], key: Optional[str]) -> Optional[dict]:
+    """The latest checkpoint that is signed (if a key is set) and anchored in the current ledger."""
+    for checkpoint in reversed(checkpoints):
+        if key and not hmac.compare_digest(checkpoint.get("signature", ""), sign(checkpoint, key)):
+            continue
+        end = checkpoint["end"]
+        if 0 < end <= len(entries) and entries[end - 1].chain_hash == checkpoint["head"]:
+            return checkpoint
+    return None
+
+
+def verify(entries: Sequence[LedgerEntry], checkpoints: List[dict], full: bool = False,
+           key: Optional[str] = None) -> VerificationReport:
+    """
+    Recomputes the chain from the last trusted checkpoint (or from genesis
+    if `full`), checking every batch hash and the Merkle root of every
+    checkpoint inside that segment.
+    """
+    errors = []
+    anchor = None if full else trusted_checkpoint(entries, checkpoints, key)
+    start = anchor["end"] if anchor else 0
+    head = anchor["head"] if anchor else GENESIS
+
+    leaves: List[bytes] = []
+    batch_start = 0
+    for pos in range(start, len(entries)):
+        entry = entries[pos]
+        leaves.append(leaf_hash(entry))
+        if entry.chain_hash:
+            expected = chain_hash(head, leaves[batch_start:])
+            if expected != entry.chain_hash:
+                errors.append(f"Entry {pos} ({entry.id}): batch hash mismatch")
+            head = entry.chain_hash
+            batch_start = len(leaves)
+    if batch_start < len(leaves):
+        errors.append(f"Entries {start + batch_start}-{len(entries) - 1} are not sealed by a batch hash "
+                      "(a pre-chain ledger is sealed by the next post or `hashchain.py --seal`)")
+
+    checked = 0
+    for i, checkpoint in enumerate(checkpoints):
+        if checkpoint["start"] < start:
+            continue
+        checked += 1
+        if checkpoint["end"] > len(entries):
+            errors.append(f"Checkpoint {i} covers entries beyond the end of the ledger")
+            continue
+        if key and not hmac.compare_digest(checkpoint.get("signature", ""), sign(checkpoint, key)):
+            errors.append(f"Checkpoint {i}: bad signature")
+        if entries[checkpoint["end"] - 1].chain_hash != checkpoint["head"]:
+            errors.append(f"Checkpoint {i}: head does not match entry {checkpoint['end'] - 1}")
+        if merkle_root(leaves[checkpoint["start"] - start:checkpoint["end"] - start]) != checkpoint["root"]:
+            errors.append(f"Checkpoint {i}: Merkle root mismatch")
+    return VerificationReport(start, len(entries), checked, errors)
+
+
+def inclusion_proofs(entries: Sequence[LedgerEntry], checkpoints: List[dict], transaction_id: str) -> List[dict]:
+    """
+    Merkle proofs that each entry of `transaction_id` is under a checkpoint
+    root. Raises LookupError for unknown transactions and ValueError for ones
+    posted after the last checkpoint.
+    """
+    positions = [pos for pos, e in enumerate(entries) if e.transaction_id == transaction_id]
+    if not positions:
+        raise LookupError(f"No ledger entries for {transaction_id}")
+    proofs = []
+    for pos in positions:
+        checkpoint = next((c for c in checkpoints if c["start"] <= pos < c["end"]), None)
+        if checkpoint is None:
+            raise ValueError(f"{transaction_id} is not covered by a checkpoint yet")
+        leaves = [leaf_hash(e) for e in entries[checkpoint["start"]:checkpoint["end"]]]
+        proofs.append({"entry": entries[pos].to_dict(), "position": pos, "root": checkpoint["root"],
+                       "checkpoint": {k: checkpoint[k] for k in ("start", "end", "head", "timestamp")},
+                       "path": merkle_path(leaves, pos - checkpoint["start"])})
+    return proofs
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Verify the ledger hash chain or print inclusion proofs.")
+    parser.add_argument("--ledger", default="ledger.json")
+    parser.add_argument("--full", action="store_true", help="Verify from genesis instead of the last trusted checkpoint")
+    parser.add_argument("--proof", metavar="TRANSACTION_ID", help="Print inclusion proofs for a transaction")
+    parser.add_argument("--seal", action="store_true", help="Seal unhashed entries (e.g. a pre-chain ledger) and checkpoint them")
+    args = parser.parse_args(argv)
+
+    try:
+        from ledger import LedgerManager
+    except ImportError:
+        from mobile_money_system.ledger import LedgerManager
+    ledger = LedgerManager(args.ledger)
+    if args.seal:
+        ledger.seal()
+        ledger.save_entries()
+        ledger.checkpoint()
+    if args.proof:
+        print(json.dumps(inclusion_proofs(ledger.entries, ledger.checkpoints, args.proof), indent=2))
+        return
+    report = verify(ledger.entries, ledger.checkpoints, full=args.full, key=os.environ.get(KEY_ENV))
+    print(json.dumps(report.to_dict(), indent=2))
+    sys.exit(0 if report.ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+import heapq
+import logging
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    from storage import JsonStorage
+except ImportError:
+    from mobile_money_system.storage import JsonStorage
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+RETRY_SECONDS = 1.0        # First wait after a failed expire() run, doubled per consecutive failure
+MAX_RETRY_SECONDS = 60.0
+
+logger = logging.getLogger("mms.timers")
+
+
+@dataclass
+class Hold:
+    """Funds reserved by an authorization; the wallet balance only moves on capture."""
+    id: str
+    phone: str
+    kind: str          # BILL_PAYMENT or TRANSFER
+    counterparty: str  # Biller name or receiver phone
+    amount: Decimal
+    fee: Decimal
+    currency: str
+    expires_at: float  # Unix time
+    reference: str = ""  # Biller account id
+    description: str = ""
+    flagged: bool = False
+    flag_reason: str = ""
+    created: str = field(default_factory=lambda: datetime.now().isoformat())
+
+    @property
+    def total(self) -> Decimal:
+        return self.amount + self.fee
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "phone": self.phone,
+            "kind": self.kind,
+            "counterparty": self.counterparty,
+            "amount": str(self.amount),
+            "fee": str(self.fee),
+            "currency": self.currency,
+            "expires_at": self.expires_at,
+            "reference": self.reference,
+            "description": self.description,
+            "flagged": self.flagged,
+            "flag_reason": self.flag_reason,
+            "created": self.created,
+        }
+
+    @staticmethod
+    def from_dict(data: dict) -> 'Hold':
+        return Hold(
+            id=data["id"],
+            phone=data["phone"],
+            kind=data["kind"],
+            counterparty=data["counterparty"],
+            amount=Decimal(str(data["amount"])),
+            fee=Decimal(str(data.get("fee", "0"))),
+            currency=data.get("currency", "USD"),
+            expires_at=data["expires_at"],
+            reference=data.get("reference", ""),
+            description=data.get("description", ""),
+            flagged=data.get("flagged", False),
+            flag_reason=data.get("flag_reason", ""),
+            created=data.get("created", datetime.now().isoformat()),
+        )
+
+
+class HoldManager:
+    """
+    Open authorizations, per-account counters of held funds (available
+    balance = wallet balance - held) and of open hold count and amount (which
+    count against the daily/monthly limits until released), and a timer heap
+    of expiry times. Captured, voided and expired holds are dropped; heap
+    entries for them are skipped lazily when they reach the top.
+    """
+    def __init__(self, db_file: str = "holds.json", ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.storage = JsonStorage(db_file)
+        self.ttl_seconds = ttl_seconds
+        self.on_schedule: Optional[Callable[[float], None]] = None
+        self.load_holds()
+
+    def load_holds(self):
+        data = self.storage.load(default={})
+        self.holds: Dict[str, Hold] = {h_id: Hold.from_dict(h) for h_id, h in data.items()} if isinstance(data, dict) else {}
+        self.held: Dict[str, Decimal] = {}
+        self.open: Dict[str, Tuple[int, Decimal]] = {}
+        for hold in self.holds.values():
+            self._add(hold)
+        self._heap = [(hold.expires_at, hold.id) for hold in self.holds.values()]
+        heapq.heapify(self._heap)
+        if self.on_schedule and self._heap:
+            self.on_schedule(self._heap[0][0])
+
+    def save_holds(self):
+        self.storage.save({h_id: hold.to_dict() for h_id, hold in self.holds.items()})
+
+    def held_for(self, phone: str) -> Decimal:
+        return self.held.get(phone, Decimal("0"))
+
+    def open_usage(self, phone: str) -> Tuple[int, Decimal]:
+        """Count and amount (fees excluded) of `phone`'s open holds, for the limit checks."""
+        return self.open.get(phone, (0, Decimal("0")))
+
+    def _add(self, hold: Hold, sign: int = 1):
+        held = self.held_for(hold.phone) + sign * hold.total
+        count, volume = self.open_usage(hold.phone)
+        count, volume = count + sign, volume + sign * hold.amount
+        if count > 0:
+            self.held[hold.phone], self.open[hold.phone] = held, (count, volume)
+        else:
+            self.held.pop(hold.phone, None)
+            self.open.pop(hold.phone, None)
+
+    def for_phone(self, phone: str) -> List[Hold]:
+        return sorted((h for h in self.holds.values() if h.phone == phone), key=lambda h: h.created)
+
+    def create(self, phone: str, kind: str, counterparty: str, amount: Decimal, fee: Decimal, currency: str,
+               ttl_seconds: Optional[float] = None, **details) -> Hold:
+        hold = Hold(id=f"HLD-{int(time.time())}-{str(uuid.uuid4())[:8].upper()}", phone=phone, kind=kind,
+                    counterparty=counterparty, amount=amount, fee=fee, currency=currency,
+                    expires_at=time.time() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds), **details)
+        earliest = self.next_expiry()
+        self.holds[hold.id] = hold
+        self._add(hold)
+        heapq.heappush(self._heap, (hold.expires_at, hold.id))
+        self.save_holds()
+        if self.on_schedule and (earliest is None or hold.expires_at < earliest):
+            self.on_schedule(hold.expires_at)
+        return hold
+
+    def release(self, hold_id: str, save: bool = True) -> Optional[Hold]:
+        """Removes a hold and returns its funds to the available balance."""
+        hold = self.holds.pop(hold_id, None)
+        if hold is None:
+            return None
+        self._add(hold, -1)
+        if save:
+            self.save_holds()
+        return hold
+
+    def next_expiry(self) -> Optional[float]:
+        while self._heap and self._heap[0][1] not in self.holds:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def due(self, now: Optional[float] = None) -> List[Hold]:
+        """Open holds whose expiry has passed, popped off the heap in expiry order."""
+        now = time.time() if now is None else now
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            _, hold_id = heapq.heappop(self._heap)
+            hold = self.holds.get(hold_id)
+            if hold is not None:
+                expired.append(hold)
+        return expired
+
+
+class ExpiryTimer:
+    """
+    Background thread that sleeps until the earliest hold expiry and then
+    calls `expire` (e.g. TransactionManager.expire_holds through the engine
+    lock). A hold expiring sooner than the current wait wakes it early.
+    Also drives ScheduleManager, which has the same next_expiry/on_schedule
+    interface. A failing run is logged and retried with backoff; the thread
+    never dies with it.
+    """
+    def __init__(self, holds: HoldManager, expire: Callable[[], int], lock=None, name: str = "hold-expiry",
+                 retry_seconds: float = RETRY_SECONDS):
+        self.holds = holds
+        self.expire = expire
+        self.retry_seconds = retry_seconds
+        self.failures = 0  # Consecutive failed runs
+        self._lock = lock or threading.RLock()  # guards the heap against the writers' threads
+        self._wake = threading.Event()
+        self._halt = threading.Event()  # Only stop() cuts a backoff short: a failed run requeues and sets _wake
+        self._stopped = False
+        holds.on_schedule = lambda expires_at: self._wake.set()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        self._halt.set()
+        self._wake.set()
+        self._thread.join()
+
+    def _next_expiry(self) -> Optional[float]:
+        with self._lock:
+            return self.holds.next_expiry()
+
+    def _run(self):
+        while not self._stopped:
+            expires_at = self._next_expiry()
+            timeout = None if expires_at is None else max(expires_at - time.time(), 0)
+            self._wake.wait(timeout)
+            self._wake.clear()
+            if self._stopped:
+                return
+            expires_at = self._next_expiry()
+            if expires_at is not None and expires_at <= time.time():
+                self._expire()
+
+    def _expire(self):
+        try:
+            self.expire()
+        except Exception:
+            self.failures += 1
+            delay = min(self.retry_seconds * 2 ** (self.failures - 1), MAX_RETRY_SECONDS)
+            logger.exception("%s run failed (%d in a row); retrying in %.1fs", self._thread.name, self.failures, delay)
+            self._halt.wait(delay)
+        else:
+            self.failures = 0
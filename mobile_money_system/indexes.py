@@ -0,0 +1,290 @@
+import re
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Set, Tuple
+
+try:
+    from models import Transaction, User
+except ImportError:
+    from mobile_money_system.models import Transaction, User
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+class TransactionIndex:
+    """
+    Secondary indexes over TransactionManager.transactions.
+    The transaction list is append-only, so the index catches up from the
+    last position it has seen instead of rebuilding on every query.
+    Only immutable fields (id, phones, type, timestamp) are indexed;
+    status and flagged are checked while scanning a page.
+    """
+    def __init__(self):
+        self._source: Optional[List[Transaction]] = None
+        self._indexed = 0
+        self.by_id: Dict[str, int] = {}
+        self.by_phone: Dict[str, List[int]] = {}
+        self.by_type: Dict[str, List[int]] = {}
+        self.timestamps: List[str] = []
+        self.monotonic = True
+
+    def _reset(self, transactions: List[Transaction]):
+        self._source = transactions
+        self._indexed = 0
+        self.by_id = {}
+        self.by_phone = {}
+        self.by_type = {}
+        self.timestamps = []
+        self.monotonic = True
+
+    def _add(self, pos: int, t: Transaction):
+        self.by_id[t.id] = pos
+        self.by_phone.setdefault(t.sender_phone, []).append(pos)
+        if t.receiver_phone != t.sender_phone:
+            self.by_phone.setdefault(t.receiver_phone, []).append(pos)
+        self.by_type.setdefault(t.type, []).append(pos)
+        if self.timestamps and t.timestamp < self.timestamps[-1]:
+            self.monotonic = False
+        self.timestamps.append(t.timestamp)
+
+    def sync(self, transactions: List[Transaction]):
+        # A replaced or truncated list (e.g. tests resetting history) forces a rebuild.
+        if transactions is not self._source or len(transactions) < self._indexed:
+            self._reset(transactions)
+        for pos in range(self._indexed, len(transactions)):
+            self._add(pos, transactions[pos])
+        self._indexed = len(transactions)
+
+    def get(self, transactions: List[Transaction], t_id: str) -> Optional[Transaction]:
+        self.sync(transactions)
+        pos = self.by_id.get(t_id)
+        return transactions[pos] if pos is not None else None
+
+    def for_phone(self, transactions: List[Transaction], phone: str) -> List[Transaction]:
+        self.sync(transactions)
+        return [transactions[pos] for pos in self.by_phone.get(phone, [])]
+
+    def query(self, transactions: List[Transaction], start: Optional[str] = None, end: Optional[str] = None,
+              t_type: Optional[str] = None, status: Optional[str] = None, flagged: Optional[bool] = None,
+              phone: Optional[str] = None, offset: int = 0, limit: int = 50,
+              newest_first: bool = True) -> Tuple[List[Transaction], bool]:
+        """
+        Returns one page of matching transactions and whether more follow.
+        The narrowest index (phone or type) picks the candidates, the time range
+        is cut with bisect, and the scan stops once the page is full.
+        """
+        self.sync(transactions)
+
+        if phone is not None and t_type is not None:
+            by_phone = self.by_phone.get(phone, [])
+            by_type = self.by_type.get(t_type, [])
+            candidates = by_phone if len(by_phone) <= len(by_type) else by_type
+        elif phone is not None:
+            candidates = self.by_phone.get(phone, [])
+        elif t_type is not None:
+            candidates = self.by_type.get(t_type, [])
+        else:
+            candidates = range(len(transactions))
+
+        lo, hi = 0, len(candidates)
+        range_done = False
+        if (start or end) and self.monotonic:
+            stamp = self.timestamps.__getitem__
+            if start:
+                lo = bisect_left(candidates, start, key=stamp)
+            if end:
+                hi = bisect_left(candidates, end, lo=lo, key=stamp)
+            range_done = True
+
+        steps = range(hi - 1, lo - 1, -1) if newest_first else range(lo, hi)
+        page: List[Transaction] = []
+        skipped = 0
+        for i in steps:
+            t = transactions[candidates[i]]
+            if phone is not None and t.sender_phone != phone and t.receiver_phone != phone:
+                continue
+            if t_type is not None and t.type != t_type:
+                continue
+            if status is not None and t.status != status:
+                continue
+            if flagged is not None and t.flagged != flagged:
+                continue
+            if not range_done and ((start and t.timestamp < start) or (end and t.timestamp >= end)):
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            if len(page) == limit:
+                return page, True
+            page.append(t)
+        return page, False
+
+
+class UserSearchIndex:
+    """
+    Search index for the admin user directory: a sorted phone list for
+    prefix lookups (plus one per account status, for filtered searches), a
+    tokenized name index with a sorted token list for prefix matching, and
+    an exact id_number map.
+    """
+    def __init__(self):
+        self.phones: List[str] = []
+        self.by_status: Dict[str, List[str]] = {}
+        self.tokens: List[str] = []
+        self.by_token: Dict[str, Set[str]] = {}
+        self.by_id_number: Dict[str, Set[str]] = {}
+        self._entries: Dict[str, Tuple[Tuple[str, ...], str, str]] = {}
+
+    def rebuild(self, users: Dict[str, User]):
+        self.by_token = {}
+        self.by_id_number = {}
+        self._entries = {}
+        for user in users.values():
+            self._index_fields(user)
+        self.phones = sorted(self._entries)
+        self.by_status = {}
+        for phone in self.phones:
+            self.by_status.setdefault(self._entries[phone][2], []).append(phone)
+        self.tokens = sorted(self.by_token)
+
+    def _index_fields(self, user: User):
+        name_tokens = tuple(dict.fromkeys(tokenize(user.name)))
+        id_number = (user.id_number or "").strip().lower()
+        self._entries[user.phone] = (name_tokens, id_number, user.status)
+        for token in name_tokens:
+            self.by_token.setdefault(token, set()).add(user.phone)
+        if id_number:
+            self.by_id_number.setdefault(id_number, set()).add(user.phone)
+
+    def add(self, user: User):
+        if user.phone in self._entries:
+            self.remove(user.phone)
+        self._index_fields(user)
+        insort(self.phones, user.phone)
+        insort(self.by_status.setdefault(user.status, []), user.phone)
+        for token in self._entries[user.phone][0]:
+            if len(self.by_token[token]) == 1:
+                insort(self.tokens, token)
+
+    def remove(self, phone: str):
+        entry = self._entries.pop(phone, None)
+        if entry is None:
+            return
+        name_tokens, id_number, status = entry
+        for phones in (self.phones, self.by_status[status]):
+            pos = bisect_left(phones, phone)
+            if pos < len(phones) and phones[pos] == phone:
+                del phones[pos]
+        if not self.by_status[status]:
+            del self.by_status[status]
+        for token in name_tokens:
+            owners = self.by_token[token]
+            owners.discard(phone)
+            if not owners:
+                del self.by_token[token]
+                pos = bisect_left(self.tokens, token)
+                del self.tokens[pos]
+        if id_number:
+            owners = self.by_id_number[id_number]
+            owners.discard(phone)
+            if not owners:
+                del self.by_id_number[id_number]
+
+    def _phone_prefix(self, phones: List[str], prefix: str):
+        pos = bisect_left(phones, prefix)
+        while pos < len(phones) and phones[pos].startswith(prefix):
+            yield phones[pos]
+            pos += 1
+
+    def _token_prefix(self, prefix: str):
+        pos = bisect_left(self.tokens, prefix)
+        while pos < len(self.tokens) and self.tokens[pos].startswith(prefix):
+            yield self.tokens[pos]
+            pos += 1
+
+    def _name_match(self, phone: str, query_tokens: List[str]) -> Optional[bool]:
+        """None if the name doesn't match, True for whole-token matches, False for prefix-only."""
+        name_tokens = self._entries[phone][0]
+        exact = True
+        for q in query_tokens:
+            if q in name_tokens:
+                continue
+            if not any(token.startswith(q) for token in name_tokens):
+                return None
+            exact = False
+        return exact
+
+    def search(self, query: str, limit: int = 50, status: Optional[str] = None) -> List[str]:
+        """
+        Returns up to `limit` phones ranked by match quality: exact ID number,
+        exact phone, phone prefix, then full or prefix name matches. Every
+        lookup is bounded by `limit`, so cost does not grow with user count.
+        With `status`, phone lookups run over that status's own sorted list
+        and name lookups over the smaller of each token's owners and it.
+        """
+        query = (query or "").strip().lower()
+        results: List[str] = []
+        seen: Set[str] = set()
+        phones = self.phones if status is None else self.by_status.get(status, [])
+
+        def accept(phone: str) -> bool:
+            return status is None or self._entries[phone][2] == status
+
+        def take(candidates) -> bool:
+            for phone in candidates:
+                if phone in seen or not accept(phone):
+                    continue
+                seen.add(phone)
+                results.append(phone)
+                if len(results) >= limit:
+                    return True
+            return False
+
+        if not query:
+            take(phones)
+            return results
+
+        if take(self.by_id_number.get(query, ())):
+            return results
+        if query.isdigit():
+            if query in self._entries and take([query]):
+                return results
+            if take(self._phone_prefix(phones, query)):
+                return results
+
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return results
+
+        # Drive the scan from the longest (most selective) token and verify the
+        # rest against each candidate. Collection stops at a few pages' worth,
+        # which keeps common names like "john" from scanning every owner.
+        lead = max(query_tokens, key=len)
+        exact_hits, prefix_hits = [], []
+        budget = limit * 4
+        for token in self._token_prefix(lead):
+            owners = self.by_token[token]
+            if status is None or len(owners) <= len(phones):
+                candidates = (phone for phone in owners if accept(phone))
+            else:
+                candidates = (phone for phone in phones if phone in owners)
+            for phone in candidates:
+                if phone in seen:
+                    continue
+                seen.add(phone)
+                match = self._name_match(phone, query_tokens)
+                if match is True:
+                    exact_hits.append(phone)
+                elif match is False:
+                    prefix_hits.append(phone)
+                budget -= 1
+                if budget <= 0 or len(exact_hits) >= limit:
+                    break
+            if budget <= 0 or len(exact_hits) >= limit:
+                break
+        results.extend(sorted(exact_hits)[:limit - len(results)])
+        results.extend(sorted(prefix_hits)[:limit - len(results)])
+        return results
@@ -1,3 +1,4 @@
+import os
 import uuid
 import time
 from decimal import Decimal
@@ -6,18 +7,40 @@ from typing import List, Dict, Optional
 try:
     from models import LedgerEntry
     from storage import JsonStorage
+    import hashchain
+    import metrics
 except ImportError:
     from mobile_money_system.models import LedgerEntry
     from mobile_money_system.storage import JsonStorage
+    from mobile_money_system import hashchain
+    from mobile_money_system import metrics
+
+def currency_totals(entries: List[LedgerEntry]) -> Dict[str, Decimal]:
+    """Sum of amounts per currency (blank for entries without one)."""
+    totals: Dict[str, Decimal] = {}
+    for e in entries:
+        totals[e.currency] = totals.get(e.currency, Decimal("0.0")) + e.amount
+    return totals
+
 
 class LedgerManager:
     """
     Manages double-entry bookkeeping.
     Ensures that for every transaction, the sum of all entries is ZERO.
+
+    Every posted batch is sealed into a hash chain (see hashchain.py), and
+    every `checkpoint_every` entries the segment since the previous
+    checkpoint gets a Merkle root in the checkpoints file.
     """
-    def __init__(self, db_file: str = "ledger.json"):
+    def __init__(self, db_file: str = "ledger.json", checkpoint_every: int = 1000):
         self.storage = JsonStorage(db_file)
+        self.checkpoint_storage = JsonStorage(f"{os.path.splitext(db_file)[0]}_checkpoints.json")
+        self.checkpoint_every = checkpoint_every
         self.entries: List[LedgerEntry] = []
+        self.checkpoints: List[dict] = []
+        self.head = hashchain.GENESIS
+        self._sealed = 0
+        self._pending: List[bytes] = []
         self.load_entries()
 
     def load_entries(self):
@@ -26,30 +49,83 @@ class LedgerManager:
             self.entries = [LedgerEntry.from_dict(e) for e in data]
         else:
             self.entries = []
+        checkpoints = self.checkpoint_storage.load(default=[])
+        self.checkpoints = checkpoints if isinstance(checkpoints, list) else []
+
+        # Chain head and the leaf digests not yet under a checkpoint
+        self.head, self._sealed = hashchain.GENESIS, 0
+        for pos in range(len(self.entries) - 1, -1, -1):
+            if self.entries[pos].chain_hash:
+                self.head, self._sealed = self.entries[pos].chain_hash, pos + 1
+                break
+        covered = self.checkpoints[-1]["end"] if self.checkpoints else 0
+        self._pending = [hashchain.leaf_hash(e) for e in self.entries[covered:self._sealed]]
 
     def save_entries(self):
         data = [e.to_dict() for e in self.entries]
         self.storage.save(data)
 
+    def save_checkpoints(self):
+        self.checkpoint_storage.save(self.checkpoints)
+
+    @metrics.timed(metrics.LEDGER_POST_SECONDS)
     def post_entries(self, entries: List[LedgerEntry]) -> bool:
         """
         Validates and posts a batch of entries.
-        The sum of amounts in the batch MUST be zero.
+        The sum of amounts in the batch MUST be zero, in each currency.
         """
-        total = sum((e.amount for e in entries), Decimal("0.0"))
-        
+        totals = currency_totals(entries)
+
         # In double entry, Debits + Credits must equal 0 (if we treat Debits as negative and Credits as positive)
         # Or Debits = Credits.
         # Here we follow: + is Credit (Increase Liability/User Balance), - is Debit (Decrease Liability/User Balance).
-        if total != Decimal("0.0"):
-            print(f"Ledger Error: Unbalanced transaction. Sum: {total}")
+        unbalanced = {currency: total for currency, total in totals.items() if total != Decimal("0.0")}
+        if unbalanced:
+            print(f"Ledger Error: Unbalanced transaction. Sum: {unbalanced}")
             return False
             
         self.entries.extend(entries)
+        self.seal()
         self.save_entries()
+        if self.checkpoint_due:
+            self.checkpoint()
         return True
 
-    def create_entry(self, transaction_id: str, account_id: str, amount: Decimal, description: str = "") -> LedgerEntry:
+    def seal(self):
+        """Chains everything appended since the last seal as one batch: one hash over its leaf digests."""
+        if self._sealed == len(self.entries):
+            return
+        leaves = [hashchain.leaf_hash(e) for e in self.entries[self._sealed:]]
+        self.head = hashchain.chain_hash(self.head, leaves)
+        self.entries[-1].chain_hash = self.head
+        self._pending.extend(leaves)
+        self._sealed = len(self.entries)
+
+    @property
+    def checkpoint_due(self) -> bool:
+        return len(self._pending) >= self.checkpoint_every
+
+    def checkpoint(self, save: bool = True) -> Optional[dict]:
+        """Records a Merkle root over the sealed entries since the previous checkpoint."""
+        if not self._pending:
+            return None
+        start = self.checkpoints[-1]["end"] if self.checkpoints else 0
+        checkpoint = hashchain.make_checkpoint(start, self._sealed, self.head, self._pending,
+                                               os.environ.get(hashchain.KEY_ENV))
+        self.checkpoints.append(checkpoint)
+        if save:
+            self.save_checkpoints()
+        self._pending = []
+        return checkpoint
+
+    def verify(self, full: bool = False) -> hashchain.VerificationReport:
+        return hashchain.verify(self.entries, self.checkpoints, full, os.environ.get(hashchain.KEY_ENV))
+
+    def inclusion_proofs(self, transaction_id: str) -> List[dict]:
+        return hashchain.inclusion_proofs(self.entries, self.checkpoints, transaction_id)
+
+    def create_entry(self, transaction_id: str, account_id: str, amount: Decimal, description: str = "",
+                     currency: str = "") -> LedgerEntry:
         timestamp_part = int(time.time())
         random_part = str(uuid.uuid4())[:8].upper()
         entry_id = f"LEG-{timestamp_part}-{random_part}"
@@ -59,9 +135,13 @@ class LedgerManager:
             transaction_id=transaction_id,
             account_id=account_id,
             amount=amount,
-            description=description
+            description=description,
+            currency=currency
         )
 
+    def entries_for(self, transaction_id: str) -> List[LedgerEntry]:
+        return [e for e in self.entries if e.transaction_id == transaction_id]
+
     def get_account_balance(self, account_id: str) -> Decimal:
         """
         Calculates balance from the beginning of time.
@@ -0,0 +1,90 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Optional, Tuple
+
+try:
+    from models import User
+except ImportError:
+    from mobile_money_system.models import User
+
+# Per risk tier: single-transaction limit plus cumulative daily and monthly
+# caps on outgoing count and volume. None means uncapped.
+TIER_LIMITS: Dict[str, Dict[str, Optional[Decimal]]] = {
+    "low": {"per_transaction": Decimal("1000"), "daily_volume": Decimal("2000"), "daily_count": 20,
+            "monthly_volume": Decimal("20000"), "monthly_count": 300},
+    "standard": {"per_transaction": Decimal("5000"), "daily_volume": Decimal("15000"), "daily_count": 100,
+                 "monthly_volume": Decimal("150000"), "monthly_count": 1500},
+    "high": {"per_transaction": Decimal("50000"), "daily_volume": Decimal("500000"), "daily_count": None,
+             "monthly_volume": Decimal("5000000"), "monthly_count": None},
+}
+DEFAULT_TIER = "standard"
+
+
+def tier_limits(tier: str) -> Dict[str, Optional[Decimal]]:
+    return TIER_LIMITS.get(tier, TIER_LIMITS[DEFAULT_TIER])
+
+
+def period_keys(now: Optional[datetime] = None) -> Tuple[str, str]:
+    now = now or datetime.now()
+    day = now.strftime("%Y-%m-%d")
+    return day, day[:7]
+
+
+def current_usage(user: User, now: Optional[datetime] = None) -> Dict[str, object]:
+    """
+    The user's outgoing count and volume for today and this month. Counters
+    carry the period they belong to, so a counter from an earlier day or month
+    simply reads as zero: periods roll over without any reset sweep.
+    """
+    day, month = period_keys(now)
+    usage = user.usage
+    same_day = usage.get("day") == day
+    same_month = usage.get("month") == month
+    return {
+        "daily_count": usage.get("day_count", 0) if same_day else 0,
+        "daily_volume": Decimal(usage.get("day_volume", "0")) if same_day else Decimal("0"),
+        "monthly_count": usage.get("month_count", 0) if same_month else 0,
+        "monthly_volume": Decimal(usage.get("month_volume", "0")) if same_month else Decimal("0"),
+    }
+
+
+def check_limits(user: User, amount: Decimal, outgoing: bool = True, now: Optional[datetime] = None,
+                 pending: Tuple[int, Decimal] = (0, Decimal("0"))) -> Tuple[bool, str]:
+    """
+    `pending` is the count and volume of authorized but not yet captured
+    payments; they count against every period, since their usage is only
+    recorded when captured.
+    """
+    limits = tier_limits(user.risk_tier)
+    if amount > limits["per_transaction"]:
+        return False, f"Amount exceeds limit for {user.risk_tier} tier ({limits['per_transaction']})"
+    if not outgoing:
+        return True, ""
+
+    used = current_usage(user, now)
+    for period in ("daily", "monthly"):
+        used[f"{period}_count"] += pending[0]
+        used[f"{period}_volume"] += pending[1]
+    for period, label in (("daily", "Daily"), ("monthly", "Monthly")):
+        cap = limits[f"{period}_volume"]
+        if cap is not None and used[f"{period}_volume"] + amount > cap:
+            remaining = max(cap - used[f"{period}_volume"], Decimal("0"))
+            return False, f"{label} limit for {user.risk_tier} tier reached ({cap}). Remaining: {remaining}"
+        cap = limits[f"{period}_count"]
+        if cap is not None and used[f"{period}_count"] + 1 > cap:
+            return False, f"{label} transaction count limit for {user.risk_tier} tier reached ({cap})"
+    return True, ""
+
+
+def record_usage(user: User, amount: Decimal, now: Optional[datetime] = None):
+    """Adds a completed outgoing transaction to the user's counters. Persisted with the user record."""
+    day, month = period_keys(now)
+    usage = user.usage
+    if usage.get("day") != day:
+        usage["day"], usage["day_count"], usage["day_volume"] = day, 0, "0"
+    if usage.get("month") != month:
+        usage["month"], usage["month_count"], usage["month_volume"] = month, 0, "0"
+    usage["day_count"] += 1
+    usage["day_volume"] = str(Decimal(usage["day_volume"]) + amount)
+    usage["month_count"] += 1
+    usage["month_volume"] = str(Decimal(usage["month_volume"]) + amount)
@@ -0,0 +1,358 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import random
+import sys
+import time
+import urllib.error
+import urllib.request
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    from models import User, Transaction, LedgerEntry
+    from users import UserManager
+    from transactions import TransactionManager
+    from settlement import biller_account
+    import limits
+except ImportError:
+    from mobile_money_system.models import User, Transaction, LedgerEntry
+    from mobile_money_system.users import UserManager
+    from mobile_money_system.transactions import TransactionManager
+    from mobile_money_system.settlement import biller_account
+    from mobile_money_system import limits
+
+# Single-transaction caps per tier
+TIER_LIMITS = {tier: int(caps["per_transaction"]) for tier, caps in limits.TIER_LIMITS.items()}
+
+FIRST_NAMES = ["Amara", "Kofi", "Fatima", "Joseph", "Grace", "Moses", "Esther", "Samuel", "Aisha", "David",
+               "Mary", "Emmanuel", "Ruth", "Peter", "Faith", "John", "Naomi", "Isaac", "Hawa", "Daniel"]
+LAST_NAMES = ["Kamara", "Doe", "Mensah", "Otieno", "Kollie", "Wanjiru", "Johnson", "Toure", "Flomo", "Njoroge",
+              "Sirleaf", "Okafor", "Weah", "Mwangi", "Boakai", "Achieng", "Kpoto", "Mutua", "Cooper", "Tubman"]
+BILLERS = [("LEC Power", "Electricity"), ("Liberia Water", "Water"), ("Telecel/Lonestar", "Airtime"),
+           ("Zuku Fiber", "Internet")]
+
+DEFAULT_PIN = hashlib.sha256("1234".encode()).hexdigest()
+
+
+@dataclass
+class PopulationSpec:
+    users: int = 1000
+    currencies: Dict[str, float] = field(default_factory=lambda: {"USD": 0.7, "KES": 0.2, "EUR": 0.05, "GBP": 0.05})
+    risk_tiers: Dict[str, float] = field(default_factory=lambda: {"low": 0.3, "standard": 0.6, "high": 0.1})
+    activity_exponent: float = 1.1   # Zipf exponent: a few accounts send/receive most traffic
+    amount_alpha: float = 1.6        # Pareto shape: many small amounts, a long tail of large ones
+    min_amount: float = 5.0
+    opening_balance: float = 500.0   # Median opening deposit; scaled by tier
+    phone_prefix: str = "07"
+
+
+@dataclass
+class TrafficMix:
+    """Relative weights of operations in generated traffic."""
+    weights: Dict[str, float] = field(default_factory=lambda: {
+        "transfer": 0.55, "pay_bill": 0.15, "deposit": 0.12, "withdraw": 0.10,
+        "get_history": 0.06, "request_money": 0.02,
+    })
+
+
+def _weighted(rng: random.Random, weights: Dict[str, float]) -> str:
+    keys = list(weights)
+    return rng.choices(keys, weights=[weights[k] for k in keys])[0]
+
+
+class Population:
+    """
+    A deterministic synthetic user base. Activity follows a Zipf distribution
+    over a shuffled rank order, separately for sending and receiving, and
+    counterparties are drawn from the sender's currency so transfers are valid.
+    """
+    def __init__(self, spec: PopulationSpec, seed: int = 42):
+        self.spec = spec
+        self.rng = random.Random(seed)
+        self.users: List[User] = []
+        self.by_currency: Dict[str, List[int]] = {}
+        self._send_cum: Dict[str, List[float]] = {}
+        self._recv_cum: Dict[str, List[float]] = {}
+        self._build()
+
+    def _build(self):
+        spec, rng = self.spec, self.rng
+        width = max(8, len(str(spec.users)))
+        for i in range(spec.users):
+            tier = _weighted(rng, spec.risk_tiers)
+            currency = _weighted(rng, spec.currencies)
+            phone = f"{spec.phone_prefix}{i:0{width}d}"
+            self.users.append(User(
+                phone=phone,
+                name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                pin=DEFAULT_PIN,
+                balance=Decimal("0.0"),
+                currency=currency,
+                id_type="national_id",
+                id_number=f"LG{i:0{width}d}",
+                is_verified=True,
+                risk_tier=tier,
+            ))
+            self.by_currency.setdefault(currency, []).append(i)
+
+        for currency, members in self.by_currency.items():
+            self._send_cum[currency] = self._zipf_cum(len(members))
+            self._recv_cum[currency] = self._zipf_cum(len(members))
+        self._currency_weights = {c: len(m) for c, m in self.by_currency.items()}
+
+    def _zipf_cum(self, n: int) -> List[float]:
+        # Shuffle which member gets which rank so heavy senders and heavy receivers differ.
+        ranks = list(range(1, n + 1))
+        self.rng.shuffle(ranks)
+        s = self.spec.activity_exponent
+        return list(itertools.accumulate(1.0 / (r ** s) for r in ranks))
+
+    def sender(self) -> User:
+        currency = _weighted(self.rng, self._currency_weights)
+        members = self.by_currency[currency]
+        return self.users[members[self.rng.choices(range(len(members)), cum_weights=self._send_cum[currency])[0]]]
+
+    def receiver(self, sender: User) -> Optional[User]:
+        members = self.by_currency[sender.currency]
+        if len(members) < 2:
+            return None
+        cum = self._recv_cum[sender.currency]
+        for _ in range(8):
+            user = self.users[members[self.rng.choices(range(len(members)), cum_weights=cum)[0]]]
+            if user.phone != sender.phone:
+                return user
+        return None
+
+    def amount(self, user: User) -> Decimal:
+        value = self.spec.min_amount * self.rng.paretovariate(self.spec.amount_alpha)
+        value = min(value, TIER_LIMITS.get(user.risk_tier, 5000))
+        return Decimal(str(round(value, 2)))
+
+    def opening_balance(self, user: User) -> Decimal:
+        scale = {"low": 0.5, "standard": 1.0, "high": 10.0}.get(user.risk_tier, 1.0)
+        value = self.spec.opening_balance * scale * self.rng.lognormvariate(0, 1)
+        return Decimal(str(round(min(value, TIER_LIMITS.get(user.risk_tier, 5000)), 2)))
+
+
+def generate_history(population: Population, n_transactions: int,
+                     start: datetime = datetime(2026, 1, 1), span: timedelta = timedelta(days=90)
+                     ) -> Iterator[Tuple[Transaction, List[LedgerEntry]]]:
+    """
+    Yields (transaction, ledger entries) pairs in timestamp order, applying
+    each one to the population balances so the result reconciles: every
+    user starts with an opening deposit, and debits never overdraw.
+    """
+    rng = population.rng
+    users = population.users
+    total = len(users) + n_transactions
+    step = span / max(total, 1)
+    counter = itertools.count()
+
+    def record(sender, receiver, amount, t_type, description, currency, ledger_sides):
+        i = next(counter)
+        ts = (start + step * i).isoformat()
+        t = Transaction(id=f"GEN-{i:010d}", sender_phone=sender, receiver_phone=receiver, amount=amount,
+                        currency=currency, type=t_type, timestamp=ts, description=description)
+        entries = [LedgerEntry(id=f"GLE-{i:010d}-{k}", transaction_id=t.id, account_id=account, amount=value,
+                               timestamp=ts, description=description, currency=currency)
+                   for k, (account, value) in enumerate(ledger_sides)]
+        return t, entries
+
+    for user in users:
+        amount = population.opening_balance(user)
+        user.balance += amount
+        yield record("SYSTEM", user.phone, amount, "DEPOSIT", "Opening balance", user.currency,
+                     [("SYSTEM_CASH", -amount), (user.phone, amount)])
+
+    for _ in range(n_transactions):
+        kind = _weighted(rng, {"TRANSFER": 0.6, "BILL_PAYMENT": 0.15, "DEPOSIT": 0.15, "WITHDRAWAL": 0.10})
+        sender = population.sender()
+        amount = population.amount(sender)
+        if kind != "DEPOSIT" and sender.balance < amount:
+            kind = "DEPOSIT"
+
+        if kind == "TRANSFER":
+            receiver = population.receiver(sender)
+            if receiver is None:
+                continue
+            sender.balance -= amount
+            receiver.balance += amount
+            yield record(sender.phone, receiver.phone, amount, "TRANSFER", "Transfer", sender.currency,
+                         [(sender.phone, -amount), (receiver.phone, amount)])
+        elif kind == "BILL_PAYMENT":
+            biller, category = rng.choice(BILLERS)
+            sender.balance -= amount
+            yield record(sender.phone, "BILLER_SYSTEM", amount, "BILL_PAYMENT",
+                         f"{biller} ({rng.randint(100000, 999999)}) - {category}", sender.currency,
+                         [(sender.phone, -amount), (biller_account(biller), amount)])
+        elif kind == "WITHDRAWAL":
+            sender.balance -= amount
+            yield record(sender.phone, "SYSTEM", amount, "WITHDRAWAL", "Withdrawal", sender.currency,
+                         [(sender.phone, -amount), ("SYSTEM_CASH", amount)])
+        else:
+            sender.balance += amount
+            yield record("SYSTEM", sender.phone, amount, "DEPOSIT", "Deposit", sender.currency,
+                         [("SYSTEM_CASH", -amount), (sender.phone, amount)])
+
+
+def seed(data_dir: str, spec: PopulationSpec, n_transactions: int, seed_value: int = 42) -> Tuple[UserManager, TransactionManager, Population]:
+    """Generates a population and history and writes users, transactions and ledger files once each."""
+    os.makedirs(data_dir, exist_ok=True)
+    population = Population(spec, seed_value)
+    user_manager = UserManager(os.path.join(data_dir, "users.json"))
+    transaction_manager = TransactionManager(user_manager, os.path.join(data_dir, "transactions.json"),
+                                             os.path.join(data_dir, "ledger.json"))
+    ledger = transaction_manager.ledger
+    for t, entries in generate_history(population, n_transactions):
+        transaction_manager.transactions.append(t)
+        ledger.entries.extend(entries)
+        ledger.seal()
+        if ledger.checkpoint_due:
+            ledger.checkpoint(save=False)
+    for user in population.users:
+        user_manager.users[user.phone] = user
+    user_manager.save_users()
+    user_manager.search_index.rebuild(user_manager.users)
+    transaction_manager.save_transactions()
+    ledger.checkpoint(save=False)
+    ledger.save_entries()
+    ledger.save_checkpoints()
+    return user_manager, transaction_manager, population
+
+
+def generate_traffic(population: Population, n_ops: int, mix: Optional[TrafficMix] = None) -> Iterator[dict]:
+    """Yields operation dicts ({"op": ..., **kwargs}) drawn from the traffic mix."""
+    mix = mix or TrafficMix()
+    rng = population.rng
+    for _ in range(n_ops):
+        op = _weighted(rng, mix.weights)
+        sender = population.sender()
+        amount = float(population.amount(sender))
+        if op == "transfer":
+            receiver = population.receiver(sender)
+            if receiver is None:
+                continue
+            yield {"op": op, "sender_phone": sender.phone, "receiver_phone": receiver.phone,
+                   "amount": amount, "description": "loadgen"}
+        elif op == "request_money":
+            payer = population.receiver(sender)
+            if payer is None:
+                continue
+            yield {"op": op, "requester_phone": sender.phone, "payer_phone": payer.phone,
+                   "amount": amount, "description": "loadgen"}
+        elif op == "pay_bill":
+            biller, category = rng.choice(BILLERS)
+            yield {"op": op, "phone": sender.phone, "amount": amount, "biller_name": biller,
+                   "biller_id": str(rng.randint(100000, 999999)), "description": category}
+        elif op == "get_history":
+            yield {"op": op, "phone": sender.phone}
+        else:
+            yield {"op": op, "phone": sender.phone, "amount": amount, "description": "loadgen"}
+
+
+def replay_direct(transaction_manager: TransactionManager, ops: Iterator[dict]) -> Dict[str, dict]:
+    """Runs generated operations against a TransactionManager in-process."""
+    stats: Dict[str, dict] = {}
+    for spec in ops:
+        op = spec.pop("op")
+        start = time.perf_counter()
+        result = getattr(transaction_manager, op)(**spec)
+        elapsed = time.perf_counter() - start
+        ok = not (isinstance(result, tuple) and result[0] is False)
+        _tally(stats, op, ok, elapsed)
+    return stats
+
+
+# api.py routes for each operation; ops without a route are skipped
+HTTP_ROUTES = {
+    "deposit": ("POST", "/transactions/deposit"),
+    "withdraw": ("POST", "/transactions/withdraw"),
+    "transfer": ("POST", "/transactions/transfer"),
+    "get_history": ("GET", "/transactions/{phone}/history"),
+}
+
+
+def replay_http(base_url: str, ops: Iterator[dict], timeout: float = 10.0) -> Dict[str, dict]:
+    """Replays generated operations against a running api.py over HTTP."""
+    stats: Dict[str, dict] = {}
+    for spec in ops:
+        op = spec.pop("op")
+        route = HTTP_ROUTES.get(op)
+        if route is None:
+            stats.setdefault(op, _empty_stats())["skipped"] += 1
+            continue
+        method, path = route
+        if method == "GET":
+            req = urllib.request.Request(base_url.rstrip("/") + path.format(**spec), method="GET")
+        else:
+            req = urllib.request.Request(base_url.rstrip("/") + path, data=json.dumps(spec).encode(),
+                                         headers={"Content-Type": "application/json"}, method=method)
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as resp:
+                resp.read()
+            ok = True
+        except urllib.error.HTTPError:
+            ok = False
+        _tally(stats, op, ok, time.perf_counter() - start)
+    return stats
+
+
+def _empty_stats() -> dict:
+    return {"ok": 0, "failed": 0, "skipped": 0, "seconds": 0.0}
+
+
+def _tally(stats: Dict[str, dict], op: str, ok: bool, elapsed: float):
+    entry = stats.setdefault(op, _empty_stats())
+    entry["ok" if ok else "failed"] += 1
+    entry["seconds"] += elapsed
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Synthetic population, history and traffic generator.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_seed = sub.add_parser("seed", help="Write a synthetic population and history to a data directory")
+    p_seed.add_argument("--users", type=int, default=1000)
+    p_seed.add_argument("--transactions", type=int, default=10000)
+    p_seed.add_argument("--data-dir", required=True)
+    p_seed.add_argument("--seed", type=int, default=42)
+
+    p_replay = sub.add_parser("replay", help="Replay a traffic mix against the engine or the HTTP API")
+    p_replay.add_argument("--users", type=int, default=1000, help="Population size (must match the seeded data)")
+    p_replay.add_argument("--ops", type=int, default=1000)
+    p_replay.add_argument("--seed", type=int, default=42, help="Population seed used when seeding")
+    p_replay.add_argument("--traffic-seed", type=int, default=7)
+    p_replay.add_argument("--target", default="direct", help="'direct' or an API base URL, e.g. http://localhost:8000")
+    p_replay.add_argument("--data-dir", default=".", help="Data directory for direct replay")
+
+    args = parser.parse_args(argv)
+    spec = PopulationSpec(users=args.users)
+
+    if args.command == "seed":
+        start = time.perf_counter()
+        seed(args.data_dir, spec, args.transactions, args.seed)
+        print(f"Seeded {args.users} users and {args.transactions} transactions into {args.data_dir} "
+              f"in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+        return
+
+    population = Population(spec, args.seed)
+    population.rng.seed(args.traffic_seed)
+    ops = generate_traffic(population, args.ops)
+    if args.target == "direct":
+        user_manager = UserManager(os.path.join(args.data_dir, "users.json"))
+        transaction_manager = TransactionManager(user_manager, os.path.join(args.data_dir, "transactions.json"),
+                                                 os.path.join(args.data_dir, "ledger.json"))
+        stats = replay_direct(transaction_manager, ops)
+    else:
+        stats = replay_http(args.target, ops)
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from users import UserManager
 from transactions import TransactionManager
+from storage import StorageCorruptError
 import getpass
 import os
 
@@ -7,8 +8,12 @@ def clear_screen():
     os.system('cls' if os.name == 'nt' else 'clear')
 
 def main():
-    user_manager = UserManager()
-    transaction_manager = TransactionManager(user_manager)
+    try:
+        user_manager = UserManager()
+        transaction_manager = TransactionManager(user_manager)
+    except StorageCorruptError as e:
+        print(f"Error: {e}")
+        return
 
     while True:
         print("\n=== Mobile Money System ===")
@@ -117,13 +122,12 @@ def user_session(user, transaction_manager):
                     print("Error: Amount must be positive.")
                     continue
                 
-                fee = amount * 0.01
-                total = amount + fee
+                quote = transaction_manager.quote_fee(user.phone, "withdraw", amount)
 
                 print("\n*** VERIFY WITHDRAWAL ***")
                 print(f"Amount:   ${amount:,.2f}")
-                print(f"Fee (1%): ${fee:,.2f}")
-                print(f"Total:    ${total:,.2f}")
+                print(f"Fee ({quote.label}): ${quote.fee:,.2f}")
+                print(f"Total:    ${quote.total:,.2f}")
                 print(f"Ref:      {desc or 'Withdrawal'}")
                 confirm = input("Proceed? (y/n): ")
 
@@ -153,14 +157,13 @@ def user_session(user, transaction_manager):
                     print("Error: Receiver not found.")
                     continue
 
-                fee = amount * 0.01
-                total = amount + fee
+                quote = transaction_manager.quote_fee(user.phone, "transfer", amount)
                 
                 print("\n*** VERIFY TRANSFER ***")
                 print(f"To:       {rx_user.name} ({receiver})")
                 print(f"Amount:   ${amount:,.2f}")
-                print(f"Fee (1%): ${fee:,.2f}")
-                print(f"Total:    ${total:,.2f}")
+                print(f"Fee ({quote.label}): ${quote.fee:,.2f}")
+                print(f"Total:    ${quote.total:,.2f}")
                 print(f"Ref:      {desc}")
                 
                 confirm = input("Proceed? (y/n): ")
@@ -189,15 +192,14 @@ def user_session(user, transaction_manager):
                     b_id = input("Enter Account/Meter/Phone Number: ")
                     amount = float(input("Enter Amount: "))
                     
-                    fee = 0.50
-                    total = amount + fee
+                    quote = transaction_manager.quote_fee(user.phone, "bill_payment", amount, biller=service)
                     
                     print(f"\n*** VERIFY BILL PAYMENT ***")
                     print(f"Service:  {service}")
                     print(f"ID:       {b_id}")
                     print(f"Amount:   ${amount:,.2f}")
-                    print(f"Fee:      ${fee:,.2f}")
-                    print(f"Total:    ${total:,.2f}")
+                    print(f"Fee:      ${quote.fee:,.2f}")
+                    print(f"Total:    ${quote.total:,.2f}")
                     
                     confirm = input("Proceed? (y/n): ")
                     if confirm.lower() == 'y':
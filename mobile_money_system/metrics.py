@@ -0,0 +1,263 @@
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import tracing
+except ImportError:
+    from mobile_money_system import tracing
+
+# Latency buckets in seconds (Prometheus default ladder extended down to 50us)
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Commit sizes in bytes, 1KB .. 1GB
+BYTES_BUCKETS = tuple(1024 * 4 ** i for i in range(11))
+
+
+def _label_key(labels: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        # label key -> [per-bucket counts (+Inf last), sum, count]
+        self.series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][idx] += 1
+            series[1] += value
+            series[2] += 1
+
+    def quantile(self, q: float, **labels) -> float:
+        """Bucket-upper-bound estimate of a quantile, as Prometheus' histogram_quantile would give."""
+        series = self.series.get(_label_key(labels))
+        if not series or not series[2]:
+            return 0.0
+        target = q * series[2]
+        running = 0
+        for i, count in enumerate(series[0]):
+            running += count
+            if running >= target:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, n) in sorted(self.series.items()):
+            running = 0
+            for bound, count in zip(self.buckets, counts):
+                running += count
+                le = _format_labels(key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{le} {running}")
+            le = _format_labels(key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {n}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {n}")
+        return lines
+
+
+class Gauge:
+    """A gauge read from a callback at scrape time, so nothing runs on the hot path."""
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.callbacks: Dict[tuple, Callable[[], float]] = {}
+
+    def set_function(self, fn: Callable[[], float], **labels):
+        self.callbacks[_label_key(labels)] = fn
+
+    def values(self) -> Dict[tuple, float]:
+        return {key: fn() for key, fn in self.callbacks.items()}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for key, value in sorted(self.values().items()):
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.metrics: Dict[str, object] = {}
+
+    def _get(self, cls, name: str, help_text: str, **kwargs):
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = cls(name, help_text, **kwargs)
+        return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._get(Counter, name, help_text)
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help_text, buckets=buckets)
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self._get(Gauge, name, help_text)
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+        lines = []
+        for name in sorted(self.metrics):
+            lines.extend(self.metrics[name].render())
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        for metric in self.metrics.values():
+            if isinstance(metric, Counter):
+                metric.values.clear()
+            elif isinstance(metric, Histogram):
+                metric.series.clear()
+
+
+REGISTRY = MetricsRegistry(enabled=os.environ.get("MMS_METRICS", "0") == "1")
+
+OPERATION_SECONDS = REGISTRY.histogram("mms_operation_seconds", "Latency of public TransactionManager operations")
+OPERATIONS_TOTAL = REGISTRY.counter("mms_operations_total", "TransactionManager operations by outcome")
+CHECK_SECONDS = REGISTRY.histogram("mms_check_seconds", "Latency of limit and AML checks")
+LEDGER_POST_SECONDS = REGISTRY.histogram("mms_ledger_post_seconds", "Latency of LedgerManager.post_entries")
+STORAGE_SECONDS = REGISTRY.histogram("mms_storage_seconds", "Latency of JsonStorage load/save")
+STORAGE_BYTES = REGISTRY.histogram("mms_storage_bytes_written", "Bytes written per storage commit", BYTES_BUCKETS)
+AML_ASSESSMENTS = REGISTRY.counter("mms_aml_assessments_total", "AML assessments by result")
+AML_RULE_HITS = REGISTRY.counter("mms_aml_rule_hits_total", "AML rule firings by rule id")
+AML_EVAL_SECONDS = REGISTRY.histogram("mms_aml_eval_seconds", "Time the AML engine spent evaluating rules")
+OBJECTS = REGISTRY.gauge("mms_objects", "In-memory object counts")
+
+
+def timed(histogram: Histogram, **labels):
+    """
+    Decorator recording call latency into `histogram`, and a span when the
+    call happens inside a sampled trace. When neither is on the wrapper
+    costs two checks before calling through.
+    """
+    def decorator(fn):
+        span_name = fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if tracing.active():
+                with tracing.span(span_name):
+                    return _observe(histogram, labels, fn, args, kwargs)
+            if not REGISTRY.enabled:
+                return fn(*args, **kwargs)
+            return _observe(histogram, labels, fn, args, kwargs)
+        return wrapper
+    return decorator
+
+
+def _observe(histogram, labels, fn, args, kwargs):
+    if not REGISTRY.enabled:
+        return fn(*args, **kwargs)
+    start = time.perf_counter()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        histogram.observe(time.perf_counter() - start, **labels)
+
+
+def operation(name: str):
+    """
+    Decorator for public TransactionManager operations: records latency,
+    counts outcomes from the (success, message) tuple they return, opens an
+    "op.<name>" span in sampled traces and runs under cProfile while an
+    operation profile is being taken.
+    """
+    span_name = "op." + name
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            profiler = tracing.operation_profiler
+            if profiler is not None:
+                return profiler.run(_record_operation, name, span_name, fn, args, kwargs)
+            if not REGISTRY.enabled and not tracing.active():
+                return fn(*args, **kwargs)
+            return _record_operation(name, span_name, fn, args, kwargs)
+        return wrapper
+    return decorator
+
+
+def _record_operation(name, span_name, fn, args, kwargs):
+    with tracing.span(span_name) as sp:
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            result = fn(*args, **kwargs)
+            outcome = "failed" if isinstance(result, tuple) and result and result[0] is False else "ok"
+            return result
+        finally:
+            if REGISTRY.enabled:
+                OPERATION_SECONDS.observe(time.perf_counter() - start, op=name)
+                OPERATIONS_TOTAL.inc(op=name, outcome=outcome)
+            if sp is not None and outcome != "ok":
+                sp.attrs["outcome"] = outcome
+
+
+def register_object_counts(user_manager, transaction_manager):
+    OBJECTS.set_function(lambda: len(user_manager.users), kind="users")
+    OBJECTS.set_function(lambda: len(transaction_manager.transactions), kind="transactions")
+    OBJECTS.set_function(lambda: len(transaction_manager.ledger.entries), kind="ledger_entries")
+
+
+def operation_summary() -> List[dict]:
+    """Per-operation rows for the admin panel."""
+    rows = []
+    for key, (_, total, count) in sorted(OPERATION_SECONDS.series.items()):
+        labels = dict(key)
+        op = labels.get("op", "")
+        rows.append({
+            "operation": op,
+            "calls": count,
+            "failed": OPERATIONS_TOTAL.values.get(_label_key({"op": op, "outcome": "failed"}), 0),
+            "mean_ms": round(total / count * 1000, 3) if count else 0.0,
+            "p50_ms": round(OPERATION_SECONDS.quantile(0.5, op=op) * 1000, 3),
+            "p99_ms": round(OPERATION_SECONDS.quantile(0.99, op=op) * 1000, 3),
+        })
+    return rows
+
+
+def aml_flag_rate() -> Optional[float]:
+    flagged = AML_ASSESSMENTS.values.get(_label_key({"flagged": "true"}), 0)
+    clean = AML_ASSESSMENTS.values.get(_label_key({"flagged": "false"}), 0)
+    total = flagged + clean
+    return flagged / total if total else None
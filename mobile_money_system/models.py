@@ -23,6 +23,9 @@ class User:
     status: str = "active" # active, suspended, deleted
     risk_tier: str = "standard" # low, standard, high
 
+    # Rolling daily/monthly outgoing counters, see limits.py
+    usage: dict = field(default_factory=dict)
+
     def to_dict(self):
         return {
             "phone": self.phone,
@@ -37,7 +40,8 @@ class User:
             "id_number": self.id_number,
             "is_verified": self.is_verified,
             "status": self.status,
-            "risk_tier": self.risk_tier
+            "risk_tier": self.risk_tier,
+            "usage": self.usage
         }
 
     @staticmethod
@@ -55,7 +59,8 @@ class User:
             id_number=data.get("id_number", ""),
             is_verified=data.get("is_verified", False),
             status=data.get("status", "active"),
-            risk_tier=data.get("risk_tier", "standard")
+            risk_tier=data.get("risk_tier", "standard"),
+            usage=data.get("usage", {})
         )
 
 @dataclass
@@ -113,9 +118,11 @@ class LedgerEntry:
     amount: Decimal # Positive for Credit (Increase User Balance), Negative for Debit (Decrease User Balance)
     timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
     description: str = ""
+    chain_hash: str = ""  # Set on the last entry of each posted batch, see hashchain.py
+    currency: str = ""    # Each currency in a batch must sum to zero on its own; blank on entries from before FX
 
     def to_dict(self):
-        return {
+        data = {
             "id": self.id,
             "transaction_id": self.transaction_id,
             "account_id": self.account_id,
@@ -123,6 +130,11 @@ class LedgerEntry:
             "timestamp": self.timestamp,
             "description": self.description
         }
+        if self.currency:
+            data["currency"] = self.currency
+        if self.chain_hash:
+            data["chain_hash"] = self.chain_hash
+        return data
 
     @staticmethod
     def from_dict(data: dict) -> 'LedgerEntry':
@@ -132,5 +144,7 @@ class LedgerEntry:
             account_id=data["account_id"],
             amount=Decimal(str(data["amount"])),
             timestamp=data.get("timestamp", datetime.now().isoformat()),
-            description=data.get("description", "")
+            description=data.get("description", ""),
+            chain_hash=data.get("chain_hash", ""),
+            currency=data.get("currency", "")
         )
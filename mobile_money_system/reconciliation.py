@@ -0,0 +1,203 @@
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+try:
+    from storage import JsonStorage, StorageCorruptError
+except ImportError:
+    from mobile_money_system.storage import JsonStorage, StorageCorruptError
+
+# Balances are summed as integer micro-units: exact for amounts with up to six
+# decimal places and totals up to ~9 trillion, and int64 sums vectorize.
+SCALE = 10 ** 6
+
+
+def to_units(value) -> int:
+    return int((Decimal(str(value)) * SCALE).to_integral_value())
+
+
+def from_units(units: int) -> Decimal:
+    return (Decimal(int(units)) / SCALE).normalize() + Decimal("0.00")
+
+
+def _columns(entries: Sequence, start: int) -> Tuple[list, list, list, list]:
+    """Account ids, amounts, transaction ids and currencies of entries[start:], from LedgerEntry objects or raw dicts."""
+    tail = entries[start:]
+    if tail and isinstance(tail[0], dict):
+        return ([e["account_id"] for e in tail], [e["amount"] for e in tail], [e["transaction_id"] for e in tail],
+                [e.get("currency", "") for e in tail])
+    return ([e.account_id for e in tail], [e.amount for e in tail], [e.transaction_id for e in tail],
+            [e.currency for e in tail])
+
+
+def _entry_id(entry) -> str:
+    return entry["id"] if isinstance(entry, dict) else entry.id
+
+
+def aggregate(keys: list, amounts: list) -> Dict[str, int]:
+    """Sum of amounts (in micro-units) per key. One sort and one reduceat with numpy."""
+    if not keys:
+        return {}
+    if np is None:
+        sums: Dict[str, int] = {}
+        for key, amount in zip(keys, amounts):
+            sums[key] = sums.get(key, 0) + to_units(amount)
+        return sums
+    # float64 parsing is exact to the micro-unit below ~9e9 per entry
+    units = np.rint(np.asarray(amounts, dtype=np.float64) * SCALE).astype(np.int64)
+    unique, inverse = np.unique(np.asarray(keys), return_inverse=True)
+    order = np.argsort(inverse, kind="stable")
+    starts = np.searchsorted(inverse[order], np.arange(len(unique)))
+    totals = np.add.reduceat(units[order], starts)
+    return dict(zip(unique.tolist(), totals.tolist()))
+
+
+class ReconciliationReport:
+    def __init__(self, entries: int, new_entries: int, incremental: bool, balances: Dict[str, int],
+                 drift: List[dict], unbalanced_transactions: List[str], elapsed_ms: float,
+                 currency_totals: Optional[Dict[str, int]] = None):
+        self.entries = entries
+        self.new_entries = new_entries
+        self.incremental = incremental
+        self.balances = balances
+        self.currency_totals = currency_totals if currency_totals is not None else {"": sum(balances.values())}
+        self.drift = drift
+        self.unbalanced_transactions = unbalanced_transactions
+        self.elapsed_ms = elapsed_ms
+
+    @property
+    def ledger_total(self) -> Decimal:
+        return from_units(sum(self.balances.values()))
+
+    @property
+    def zero_sum(self) -> bool:
+        """Every currency nets to zero on its own (blank covers entries recorded without one)."""
+        return all(units == 0 for units in self.currency_totals.values())
+
+    @property
+    def ok(self) -> bool:
+        return self.zero_sum and not self.drift and not self.unbalanced_transactions
+
+    def to_dict(self) -> dict:
+        return {
+            "ok": self.ok,
+            "entries": self.entries,
+            "new_entries": self.new_entries,
+            "incremental": self.incremental,
+            "accounts": len(self.balances),
+            "ledger_total": str(self.ledger_total),
+            "zero_sum": self.zero_sum,
+            "currency_totals": {currency or "-": str(from_units(units)) for currency, units in self.currency_totals.items()},
+            "unbalanced_transactions": self.unbalanced_transactions,
+            "drift": self.drift,
+            "elapsed_ms": round(self.elapsed_ms, 3),
+        }
+
+
+class Reconciler:
+    """
+    Recomputes every account's balance (and every currency's total) from
+    the ledger and diffs it against the wallet balances. The ledger is
+    append-only, so the sums are checkpointed together with the position and
+    id of the last entry folded in; the next run only aggregates entries
+    after it. If the entry at the checkpointed position no longer matches
+    (ledger rewritten or truncated) the run falls back to a full pass.
+    """
+    def __init__(self, checkpoint_file: str = "ledger_reconciled.json"):
+        self.storage = JsonStorage(checkpoint_file)
+
+    def load_checkpoint(self, entries: Sequence) -> Optional[dict]:
+        try:
+            checkpoint = self.storage.load(default=None)
+        except StorageCorruptError:
+            return None  # Just costs a full pass
+        if not isinstance(checkpoint, dict) or "balances" not in checkpoint or "currency_totals" not in checkpoint:
+            return None
+        position = checkpoint.get("position", 0)
+        if position > len(entries):
+            return None
+        if position and _entry_id(entries[position - 1]) != checkpoint.get("last_entry_id"):
+            return None
+        return checkpoint
+
+    def save_checkpoint(self, entries: Sequence, balances: Dict[str, int], currency_totals: Dict[str, int]):
+        self.storage.save({
+            "position": len(entries),
+            "last_entry_id": _entry_id(entries[-1]) if entries else None,
+            "reconciled_at": datetime.now().isoformat(),
+            "balances": {account: str(from_units(units)) for account, units in balances.items()},
+            "currency_totals": {currency: str(from_units(units)) for currency, units in currency_totals.items()},
+        })
+
+    def run(self, entries: Sequence, wallets: Dict[str, Decimal], full: bool = False,
+            save: bool = True) -> ReconciliationReport:
+        start = time.perf_counter()
+        checkpoint = None if full else self.load_checkpoint(entries)
+        position = checkpoint["position"] if checkpoint else 0
+        balances = {account: to_units(value) for account, value in checkpoint["balances"].items()} if checkpoint else {}
+        totals = {currency: to_units(value) for currency, value in checkpoint["currency_totals"].items()} if checkpoint else {}
+
+        accounts, amounts, txn_ids, currencies = _columns(entries, position)
+        new = aggregate(accounts, amounts)
+        for account, units in new.items():
+            balances[account] = balances.get(account, 0) + units
+        new_totals = aggregate(currencies, amounts)
+        for currency, units in new_totals.items():
+            totals[currency] = totals.get(currency, 0) + units
+        unbalanced = []
+        if any(units != 0 for units in new_totals.values()):
+            # Only then is it worth a second pass to find the culprits. Batches are
+            # posted whole, so every transaction after the checkpoint is complete.
+            keys = [f"{t}\x1f{c}" for t, c in zip(txn_ids, currencies)]
+            unbalanced = sorted({k.split("\x1f")[0] for k, units in aggregate(keys, amounts).items() if units != 0})
+
+        drift = []
+        for phone, balance in wallets.items():
+            wallet = to_units(balance)
+            ledger = balances.get(phone, 0)
+            if wallet != ledger:
+                drift.append({"account": phone, "wallet": str(from_units(wallet)), "ledger": str(from_units(ledger)),
+                              "difference": str(from_units(wallet - ledger))})
+        drift.sort(key=lambda d: abs(Decimal(d["difference"])), reverse=True)
+
+        if save:
+            self.save_checkpoint(entries, balances, totals)
+        return ReconciliationReport(len(entries), len(entries) - position, checkpoint is not None, balances,
+                                    drift, unbalanced, (time.perf_counter() - start) * 1000, totals)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Reconcile wallet balances against the ledger.")
+    parser.add_argument("--ledger", default="ledger.json")
+    parser.add_argument("--users", default="users.json")
+    parser.add_argument("--checkpoint", default="ledger_reconciled.json")
+    parser.add_argument("--full", action="store_true", help="Ignore the checkpoint and re-aggregate the whole ledger")
+    parser.add_argument("--output", default="-", help="Report as JSON, '-' for stdout")
+    args = parser.parse_args(argv)
+
+    entries = JsonStorage(args.ledger).load(default=[])
+    wallets = {phone: Decimal(str(data.get("balance", "0"))) for phone, data in JsonStorage(args.users).load(default={}).items()}
+    report = Reconciler(args.checkpoint).run(entries, wallets, full=args.full)
+
+    text = json.dumps(report.to_dict(), indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(f"{report.new_entries} of {report.entries} entries aggregated in {report.elapsed_ms:.0f} ms; "
+          f"{len(report.drift)} drifting wallets; ledger total {report.ledger_total}", file=sys.stderr)
+    sys.exit(0 if report.ok else 1)
+
+
+if __name__ == "__main__":
+    main()
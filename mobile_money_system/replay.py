@@ -0,0 +1,303 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from models import User
+    from storage import JsonStorage, StorageCorruptError, iter_json_array
+    from reconciliation import to_units, from_units
+except ImportError:
+    from mobile_money_system.models import User
+    from mobile_money_system.storage import JsonStorage, StorageCorruptError, iter_json_array
+    from mobile_money_system.reconciliation import to_units, from_units
+
+# Transaction types that post to the ledger. A logged one with no postings never
+# happened as far as money is concerned (e.g. the post failed after the record
+# was written) and is rebuilt as FAILED.
+POSTING_TYPES = {"DEPOSIT", "WITHDRAWAL", "TRANSFER", "BILL_PAYMENT", "FEE", "REVERSAL", "ADMIN_CREDIT", "ADMIN_DEBIT"}
+# Types counted against the sender's daily/monthly limits, see limits.record_usage
+USAGE_TYPES = {"WITHDRAWAL", "TRANSFER", "BILL_PAYMENT"}
+REVERSAL_PREFIX = "Reversal of "
+
+
+def partition_of(key: str, partitions: int) -> int:
+    # crc32 rather than hash(): it must agree across worker processes
+    return zlib.crc32(key.encode()) % partitions
+
+
+class _Spill:
+    """Per-partition JSON-lines files the streaming pass routes records into."""
+    def __init__(self, directory: str, prefix: str, partitions: int):
+        self.paths = [os.path.join(directory, f"{prefix}-{i}.jsonl") for i in range(partitions)]
+        self.files = [open(p, "w") for p in self.paths]
+
+    def write(self, key: str, record: list):
+        self.files[partition_of(key, len(self.files))].write(json.dumps(record) + "\n")
+
+    def close(self):
+        for f in self.files:
+            f.close()
+
+
+def _records(path: str):
+    with open(path) as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def balance_partition(path: str) -> Dict[str, int]:
+    """Ledger balance (micro-units) of every account routed to this partition."""
+    balances: Dict[str, int] = {}
+    for account, amount in _records(path):
+        balances[account] = balances.get(account, 0) + to_units(amount)
+    return balances
+
+
+def status_partition(path: str, day: str, month: str) -> Tuple[Dict[str, dict], Dict[str, list], Dict[str, int]]:
+    """
+    Resolves the transactions routed to this partition against the ledger
+    postings and reversals routed with them. Returns only the transactions
+    whose rebuilt state differs from the log, each sender's usage counters
+    for `day`/`month`, and counts by rebuilt status.
+    """
+    posted, reversed_ids, logged = set(), set(), []
+    for record in _records(path):
+        kind = record[0]
+        if kind == "P":
+            posted.add(record[1])
+        elif kind == "R":
+            reversed_ids.add(record[1])
+        else:
+            logged.append(record)
+
+    changes: Dict[str, dict] = {}
+    usage: Dict[str, list] = {}
+    counts: Dict[str, int] = {}
+    for _, t_id, t_type, status, sender, amount, timestamp, flagged, flag_reason in logged:
+        new_status = status
+        if t_type in POSTING_TYPES:
+            new_status = "COMPLETED" if t_id in posted else "FAILED"
+        change = {}
+        if new_status != status:
+            change["status"] = new_status
+        if t_id in reversed_ids and "[REVERSED]" not in flag_reason:
+            change["flagged"] = True
+            change["flag_reason"] = flag_reason + " [REVERSED]"
+        if change:
+            changes[t_id] = change
+        counts[new_status] = counts.get(new_status, 0) + 1
+
+        if new_status == "COMPLETED" and t_type in USAGE_TYPES and timestamp[:7] == month:
+            # [day_count, day_volume, month_count, month_volume]
+            counters = usage.setdefault(sender, [0, 0, 0, 0])
+            units = to_units(amount)
+            counters[2] += 1
+            counters[3] += units
+            if timestamp[:10] == day:
+                counters[0] += 1
+                counters[1] += units
+    return changes, usage, counts
+
+
+def _write_json_array(path: str, items):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write("[")
+        first = True
+        for item in items:
+            f.write("\n    " if first else ",\n    ")
+            f.write(json.dumps(item))
+            first = False
+        f.write("\n]" if not first else "]")
+    os.replace(tmp, path)
+
+
+class ReplayReport:
+    def __init__(self):
+        self.ledger_entries = 0
+        self.transactions = 0
+        self.users = 0
+        self.statuses: Dict[str, int] = {}
+        self.changed_transactions = 0
+        self.balance_changes: List[dict] = []
+        self.other_accounts: Dict[str, str] = {}
+        self.profile_source = ""
+        self.elapsed_ms = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "ledger_entries": self.ledger_entries,
+            "transactions": self.transactions,
+            "users": self.users,
+            "profile_source": self.profile_source,
+            "statuses": self.statuses,
+            "changed_transactions": self.changed_transactions,
+            "balance_changes": self.balance_changes[:100],
+            "other_accounts": self.other_accounts,
+            "elapsed_ms": round(self.elapsed_ms, 3),
+        }
+
+
+def load_profiles(users_file: str, snapshot: Optional[str] = None) -> Tuple[Dict[str, dict], str]:
+    """User profiles (name, PIN, KYC...) aren't in the logs; take them from users.json, or a snapshot if that is unreadable."""
+    try:
+        data = JsonStorage(users_file).load(default={})
+        if data or snapshot is None:
+            return data, users_file
+    except StorageCorruptError:
+        if snapshot is None:
+            raise
+    return JsonStorage(snapshot).load(default={}), snapshot
+
+
+def replay(data_dir: str, output_dir: str, workers: int = 1, partitions: Optional[int] = None,
+           users_snapshot: Optional[str] = None, now: Optional[datetime] = None) -> ReplayReport:
+    """
+    Rebuilds users.json (balances and limit usage) and transactions.json
+    (statuses and reversal flags) in `output_dir` from the ledger and the
+    transaction log in `data_dir`.
+
+    One streaming pass over each log routes compact records into partition
+    files, keyed by account for balances and by transaction id for statuses.
+    Each partition is then reduced on its own, across a process pool when
+    `workers` > 1, and a final streaming pass writes the transaction log
+    with the changed records patched in. Memory is bounded by the largest
+    partition's accounts and the changed records, not by the log sizes.
+    """
+    start = time.perf_counter()
+    report = ReplayReport()
+    now = now or datetime.now()
+    day, month = now.strftime("%Y-%m-%d"), now.strftime("%Y-%m")
+    partitions = partitions or max(workers * 4, 1)
+    ledger_file = os.path.join(data_dir, "ledger.json")
+    transactions_file = os.path.join(data_dir, "transactions.json")
+    profiles, report.profile_source = load_profiles(os.path.join(data_dir, "users.json"), users_snapshot)
+
+    with tempfile.TemporaryDirectory(prefix="replay-") as tmp:
+        accounts = _Spill(tmp, "accounts", partitions)
+        txns = _Spill(tmp, "transactions", partitions)
+        try:
+            for e in iter_json_array(ledger_file):
+                accounts.write(e["account_id"], [e["account_id"], e["amount"]])
+                txns.write(e["transaction_id"], ["P", e["transaction_id"]])
+                report.ledger_entries += 1
+            for t in iter_json_array(transactions_file):
+                txns.write(t["id"], ["T", t["id"], t["type"], t.get("status", "COMPLETED"), t["sender_phone"],
+                                     t["amount"], t.get("timestamp", ""), t.get("flagged", False), t.get("flag_reason", "")])
+                if t["type"] == "REVERSAL" and t.get("description", "").startswith(REVERSAL_PREFIX):
+                    original = t["description"][len(REVERSAL_PREFIX):]
+                    txns.write(original, ["R", original])
+                report.transactions += 1
+        finally:
+            accounts.close()
+            txns.close()
+
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                balance_parts = list(pool.map(balance_partition, accounts.paths))
+                status_parts = list(pool.map(status_partition, txns.paths, [day] * partitions, [month] * partitions))
+        else:
+            balance_parts = [balance_partition(p) for p in accounts.paths]
+            status_parts = [status_partition(p, day, month) for p in txns.paths]
+
+    balances: Dict[str, int] = {}
+    for part in balance_parts:
+        balances.update(part)  # partitions are disjoint by account
+    changes: Dict[str, dict] = {}
+    usage: Dict[str, list] = {}
+    for part_changes, part_usage, counts in status_parts:
+        changes.update(part_changes)
+        for sender, counters in part_usage.items():
+            total = usage.setdefault(sender, [0, 0, 0, 0])
+            for i, value in enumerate(counters):
+                total[i] += value
+        for status, count in counts.items():
+            report.statuses[status] = report.statuses.get(status, 0) + count
+    report.changed_transactions = len(changes)
+
+    os.makedirs(output_dir, exist_ok=True)
+    users = {}
+    for phone, data in profiles.items():
+        user = User.from_dict(data)
+        rebuilt = from_units(balances.pop(phone, 0))
+        if rebuilt != user.balance:
+            report.balance_changes.append({"phone": phone, "was": str(user.balance), "rebuilt": str(rebuilt)})
+        user.balance = rebuilt
+        counters = usage.get(phone)
+        user.usage = {} if counters is None else {
+            "day": day, "day_count": counters[0], "day_volume": str(from_units(counters[1])),
+            "month": month, "month_count": counters[2], "month_volume": str(from_units(counters[3])),
+        }
+        users[phone] = user.to_dict()
+    report.users = len(users)
+    # System accounts, plus any wallet whose profile is missing from the snapshot
+    report.other_accounts = {account: str(from_units(units)) for account, units in sorted(balances.items())}
+    JsonStorage(os.path.join(output_dir, "users.json")).save(users)
+
+    def patched():
+        for t in iter_json_array(transactions_file):
+            change = changes.get(t["id"])
+            if change:
+                t.update(change)
+            yield t
+    _write_json_array(os.path.join(output_dir, "transactions.json"), patched())
+
+    if os.path.abspath(output_dir) != os.path.abspath(data_dir):
+        # The ledger is the source of truth and is carried over untouched
+        for name in ("ledger.json", "ledger_checkpoints.json"):
+            if os.path.exists(os.path.join(data_dir, name)):
+                shutil.copyfile(os.path.join(data_dir, name), os.path.join(output_dir, name))
+
+    report.elapsed_ms = (time.perf_counter() - start) * 1000
+    return report
+
+
+def warm(transaction_manager) -> float:
+    """Builds the derived in-memory indexes up front (they otherwise catch up lazily); returns seconds taken."""
+    start = time.perf_counter()
+    transaction_manager.index.sync(transaction_manager.transactions)
+    transaction_manager.graph.sync(transaction_manager.transactions)
+    transaction_manager.aml.sync(transaction_manager.transactions)
+    return time.perf_counter() - start
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Rebuild balances, transaction statuses and limit usage from the ledger and transaction log.")
+    parser.add_argument("--data-dir", default=".", help="Directory with ledger.json, transactions.json and users.json")
+    parser.add_argument("--output-dir", required=True, help="Where to write the rebuilt files (may equal --data-dir)")
+    parser.add_argument("--users-snapshot", help="Backup of users.json to take profiles from if users.json is corrupt")
+    parser.add_argument("--workers", type=int, default=1, help="Processes for the per-partition reduce")
+    parser.add_argument("--partitions", type=int, help="Number of partitions (default: 4 per worker)")
+    parser.add_argument("--warm", action="store_true", help="Load the result and build the in-memory indexes")
+    args = parser.parse_args(argv)
+
+    report = replay(args.data_dir, args.output_dir, args.workers, args.partitions, args.users_snapshot)
+    result = report.to_dict()
+    if args.warm:
+        try:
+            from users import UserManager
+            from transactions import TransactionManager
+        except ImportError:
+            from mobile_money_system.users import UserManager
+            from mobile_money_system.transactions import TransactionManager
+        start = time.perf_counter()
+        user_manager = UserManager(os.path.join(args.output_dir, "users.json"))
+        transaction_manager = TransactionManager(user_manager, os.path.join(args.output_dir, "transactions.json"),
+                                                 os.path.join(args.output_dir, "ledger.json"))
+        result["load_seconds"] = round(time.perf_counter() - start, 3)
+        result["index_seconds"] = round(warm(transaction_manager), 3)
+    print(json.dumps(result, indent=2))
+    print(f"Replayed {report.ledger_entries} ledger entries and {report.transactions} transactions "
+          f"in {report.elapsed_ms / 1000:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
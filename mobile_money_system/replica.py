@@ -0,0 +1,278 @@
+import functools
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+try:
+    from models import LedgerEntry, Transaction, User
+    from users import UserManager
+    from transactions import TransactionManager
+except ImportError:
+    from mobile_money_system.models import LedgerEntry, Transaction, User
+    from mobile_money_system.users import UserManager
+    from mobile_money_system.transactions import TransactionManager
+
+# Opt-in, like metrics: writers append a change journal (MMS_JOURNAL=1) that
+# replicas (MMS_REPLICA=1) tail instead of reloading whole files.
+JOURNAL_ENABLED = os.environ.get("MMS_JOURNAL", "0") == "1"
+REPLICA_ENABLED = os.environ.get("MMS_REPLICA", "0") == "1"
+JOURNAL_FILE = os.environ.get("MMS_JOURNAL_FILE", "changes.jsonl")
+MAX_STALENESS = float(os.environ.get("MMS_REPLICA_STALENESS", "1.0"))
+
+# Methods a replica serves; everything else on a replica manager raises ReadOnlyError
+READ_METHODS = {
+    "get_user", "search_users", "total_balance",
+    "get_transaction", "get_history", "query_transactions", "transfer_graph", "quote_fee",
+    "flagged_transactions", "revenue_transactions",
+    "available_balance", "get_holds", "get_schedules", "settlement_queue",
+}
+
+
+class ReadOnlyError(PermissionError):
+    pass
+
+
+class ChangeJournal:
+    """
+    Writer side. Hooked onto the managers' storage listeners, it appends one
+    JSON line per changed record after every save: users are diffed against
+    the last journaled version, transactions and ledger entries are
+    append-only apart from the records TransactionManager marks as updated.
+    The file is rotated past `max_bytes`; replicas notice and reload once.
+    """
+    def __init__(self, path: str = JOURNAL_FILE, max_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.user_manager: Optional[UserManager] = None
+        self.transaction_manager: Optional[TransactionManager] = None
+        self._users: Dict[str, dict] = {}
+        self._transactions = None
+        self._transactions_seen = 0
+        self._entries = None
+        self._entries_seen = 0
+
+    def attach(self, user_manager: UserManager, transaction_manager: TransactionManager):
+        self.user_manager = user_manager
+        self.transaction_manager = transaction_manager
+        user_manager.storage.listeners.append(self._users_saved)
+        transaction_manager.storage.listeners.append(self._transactions_saved)
+        transaction_manager.ledger.storage.listeners.append(self._ledger_saved)
+        self.rebaseline()
+
+    def rebaseline(self):
+        """Takes the current in-memory state as already journaled, e.g. after reloading another process's writes."""
+        self._users = {phone: user.to_dict() for phone, user in self.user_manager.users.items()}
+        self._transactions = self.transaction_manager.transactions
+        self._transactions_seen = len(self._transactions)
+        self._entries = self.transaction_manager.ledger.entries
+        self._entries_seen = len(self._entries)
+
+    def _append(self, records: List[dict]):
+        if not records:
+            return
+        now = time.time()
+        text = "".join(json.dumps(dict(r, ts=now)) + "\n" for r in records)
+        # One write on an O_APPEND descriptor, so lines from several writers don't interleave
+        with open(self.path, "a") as f:
+            f.write(text)
+        try:
+            if os.path.getsize(self.path) > self.max_bytes:
+                os.replace(self.path, self.path + ".1")
+        except OSError:
+            pass
+
+    def _users_saved(self, storage):
+        records = []
+        current = self.user_manager.users
+        for phone, user in current.items():
+            data = user.to_dict()
+            if self._users.get(phone) != data:
+                self._users[phone] = data
+                records.append({"kind": "user", "data": data})
+        for phone in [p for p in self._users if p not in current]:
+            del self._users[phone]
+            records.append({"kind": "user_removed", "phone": phone})
+        self._append(records)
+
+    def _transactions_saved(self, storage):
+        tm = self.transaction_manager
+        if tm.transactions is not self._transactions or len(tm.transactions) < self._transactions_seen:
+            # Replaced wholesale without a rebaseline: replicas must reload
+            self._transactions, self._transactions_seen = tm.transactions, len(tm.transactions)
+            self._append([{"kind": "reset"}])
+            return
+        records = [{"kind": "txn", "data": t.to_dict()} for t in tm.transactions[self._transactions_seen:]]
+        appended = {t.id for t in tm.transactions[self._transactions_seen:]}
+        for t_id in tm.updated_ids - appended:
+            t = tm.get_transaction(t_id)
+            if t is not None:
+                records.append({"kind": "txn", "data": t.to_dict()})
+        self._transactions_seen = len(tm.transactions)
+        self._append(records)
+
+    def _ledger_saved(self, storage):
+        entries = self.transaction_manager.ledger.entries
+        if entries is not self._entries or len(entries) < self._entries_seen:
+            self._entries, self._entries_seen = entries, len(entries)
+            self._append([{"kind": "reset"}])
+            return
+        # Batches are sealed before they are saved, so appended entries are final
+        records = [{"kind": "ledger", "data": e.to_dict()} for e in entries[self._entries_seen:]]
+        self._entries_seen = len(entries)
+        self._append(records)
+
+
+class ReadOnlyProxy:
+    """
+    Wraps a replica manager: read methods catch the replica up (at most every
+    `max_staleness` seconds) and run under its lock; anything else raises.
+    """
+    def __init__(self, target, replica: 'Replica'):
+        self._target = target
+        self._replica = replica
+
+    def __getattr__(self, name):
+        self._replica.catch_up()
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+        if name not in READ_METHODS:
+            @functools.wraps(attr)
+            def refused(*args, **kwargs):
+                raise ReadOnlyError(f"{name} is not available on a read replica")
+            return refused
+
+        @functools.wraps(attr)
+        def read(*args, **kwargs):
+            with self._replica.lock:
+                return attr(*args, **kwargs)
+        return read
+
+
+class Replica:
+    """
+    A read-only UserManager/TransactionManager pair kept current by tailing
+    the change journal. Reads are at most `max_staleness` seconds behind the
+    journal; `lag` is how old the last applied change was when applied.
+    Without a journal it falls back to reloading files that changed on disk.
+    Holds, settlements and standing orders aren't journaled; each poll
+    reloads those stores when their files changed (the standing orders by
+    tailing their own change log).
+    """
+    def __init__(self, users_file: str = "users.json", transactions_file: str = "transactions.json",
+                 ledger_file: str = "ledger.json", journal_file: str = JOURNAL_FILE, max_staleness: float = MAX_STALENESS):
+        self.lock = threading.RLock()
+        self.journal_file = journal_file
+        self.max_staleness = max_staleness
+        self.applied = 0
+        self.lag = 0.0
+        self._polled = 0.0
+        self._inode = None
+        self._offset = 0
+        self._ledger_tail = set()
+        self._user_manager = UserManager(users_file)
+        self._transaction_manager = TransactionManager(self._user_manager, transactions_file, ledger_file)
+        self._mark_position()
+        self._remember_ledger_tail()
+        self.user_manager = ReadOnlyProxy(self._user_manager, self)
+        self.transaction_manager = ReadOnlyProxy(self._transaction_manager, self)
+
+    def _mark_position(self):
+        try:
+            st = os.stat(self.journal_file)
+            self._inode, self._offset = st.st_ino, st.st_size
+        except OSError:
+            self._inode, self._offset = None, 0
+
+    def _remember_ledger_tail(self):
+        # Entries journaled while the files were being read may already be in them
+        self._ledger_tail = {e.id for e in self._transaction_manager.ledger.entries[-1000:]}
+
+    def _storages(self):
+        return [self._user_manager.storage, self._transaction_manager.storage, self._transaction_manager.ledger.storage]
+
+    def reload(self):
+        with self.lock:
+            # Position first: anything journaled from here on is replayed on top of the files
+            self._mark_position()
+            self._user_manager.load_users()
+            self._transaction_manager.load_transactions()
+            self._transaction_manager.ledger.load_entries()
+            self._remember_ledger_tail()
+            self._reload_unjournaled()
+
+    def _reload_unjournaled(self):
+        tm = self._transaction_manager
+        if tm.holds.storage.changed_on_disk():
+            tm.holds.load_holds()
+        if tm.settler.storage.changed_on_disk():
+            tm.settler.load()
+        if tm.schedules.storage.changed_on_disk() or tm.schedules.log.changed_on_disk():
+            tm.schedules.catch_up()
+
+    def invalidate(self):
+        """Makes the next read poll the journal, e.g. right after a write in this process."""
+        self._polled = 0.0
+
+    def catch_up(self, force: bool = False) -> int:
+        """Applies journal lines written since the last poll; returns how many."""
+        now = time.monotonic()
+        if not force and now - self._polled < self.max_staleness:
+            return 0
+        with self.lock:
+            self._polled = now
+            self._reload_unjournaled()
+            try:
+                st = os.stat(self.journal_file)
+            except OSError:
+                if any(s.changed_on_disk() for s in self._storages()):
+                    self.reload()
+                return 0
+            if st.st_ino != self._inode or st.st_size < self._offset:
+                self.reload()
+                return 0
+            if st.st_size == self._offset:
+                return 0
+            with open(self.journal_file, "rb") as f:
+                f.seek(self._offset)
+                chunk = f.read(st.st_size - self._offset)
+            complete = chunk.rfind(b"\n") + 1  # a writer may be mid-line
+            self._offset += complete
+            count = 0
+            for line in chunk[:complete].splitlines():
+                if self._apply(json.loads(line)):
+                    return count
+                count += 1
+            self.applied += count
+            return count
+
+    def _apply(self, record: dict) -> bool:
+        """Applies one journal record; True if it forced a reload (nothing after it needs applying)."""
+        kind = record["kind"]
+        self.lag = max(time.time() - record.get("ts", time.time()), 0.0)
+        um, tm = self._user_manager, self._transaction_manager
+        if kind == "user":
+            user = User.from_dict(record["data"])
+            um.users[user.phone] = user
+            um.search_index.add(user)
+        elif kind == "user_removed":
+            um.users.pop(record["phone"], None)
+            um.search_index.remove(record["phone"])
+        elif kind == "txn":
+            t = Transaction.from_dict(record["data"])
+            tm.index.sync(tm.transactions)
+            pos = tm.index.by_id.get(t.id)
+            if pos is None:
+                tm.transactions.append(t)
+            else:
+                tm.transactions[pos] = t
+        elif kind == "ledger":
+            entry = LedgerEntry.from_dict(record["data"])
+            if entry.id not in self._ledger_tail:
+                tm.ledger.entries.append(entry)
+        elif kind == "reset":
+            self.reload()
+            return True
+        return False
@@ -0,0 +1,280 @@
+import argparse
+import calendar
+import heapq
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Set
+
+try:
+    from storage import JsonStorage, JsonLinesLog
+except ImportError:
+    from mobile_money_system.storage import JsonStorage, JsonLinesLog
+
+# Set MMS_SCHEDULER=0 on every process but one when several share the data
+# files without MMS_SHARED_STORE, or each of them runs the due payments
+SCHEDULER_ENABLED = os.environ.get("MMS_SCHEDULER", "1") == "1"
+INTERVALS = ("DAILY", "WEEKLY", "MONTHLY")
+BATCH_SIZE = 500             # Payments run per wake-up; the engine lock is released between batches
+MAX_RETRIES = 4              # Retries of one occurrence on insufficient funds
+RETRY_BASE_SECONDS = 3600    # Backoff doubles per retry: 1h, 2h, 4h, 8h
+COMPACT_MIN_RECORDS = 10000  # The change log is folded into the snapshot once it outgrows both this and the store
+
+
+def next_occurrence(at: float, interval: str, day: int) -> float:
+    """The run after `at`. Monthly runs keep their anchor day, clamped to short months."""
+    current = datetime.fromtimestamp(at)
+    if interval == "DAILY":
+        return (current + timedelta(days=1)).timestamp()
+    if interval == "WEEKLY":
+        return (current + timedelta(weeks=1)).timestamp()
+    year, month = (current.year + 1, 1) if current.month == 12 else (current.year, current.month + 1)
+    return current.replace(year=year, month=month, day=min(day, calendar.monthrange(year, month)[1])).timestamp()
+
+
+@dataclass
+class Schedule:
+    """A standing order: a transfer or bill payment repeated every interval."""
+    id: str
+    phone: str
+    kind: str          # BILL_PAYMENT or TRANSFER
+    counterparty: str  # Biller name or receiver phone
+    amount: Decimal
+    interval: str      # DAILY, WEEKLY or MONTHLY
+    due_at: float      # Unix time of the current occurrence
+    next_run: float    # Unix time of the next attempt (after due_at while retrying)
+    day: int           # Anchor day of month for MONTHLY
+    reference: str = ""  # Biller account id
+    description: str = ""
+    remaining: Optional[int] = None  # Occurrences left; None runs until cancelled
+    attempts: int = 0
+    last_status: str = ""  # COMPLETED, RETRYING or FAILED
+    last_message: str = ""
+    created: str = field(default_factory=lambda: datetime.now().isoformat())
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "phone": self.phone,
+            "kind": self.kind,
+            "counterparty": self.counterparty,
+            "amount": str(self.amount),
+            "interval": self.interval,
+            "due_at": self.due_at,
+            "next_run": self.next_run,
+            "day": self.day,
+            "reference": self.reference,
+            "description": self.description,
+            "remaining": self.remaining,
+            "attempts": self.attempts,
+            "last_status": self.last_status,
+            "last_message": self.last_message,
+            "created": self.created,
+        }
+
+    @staticmethod
+    def from_dict(data: dict) -> 'Schedule':
+        return Schedule(
+            id=data["id"],
+            phone=data["phone"],
+            kind=data["kind"],
+            counterparty=data["counterparty"],
+            amount=Decimal(str(data["amount"])),
+            interval=data["interval"],
+            due_at=data["due_at"],
+            next_run=data.get("next_run", data["due_at"]),
+            day=data.get("day", datetime.fromtimestamp(data["due_at"]).day),
+            reference=data.get("reference", ""),
+            description=data.get("description", ""),
+            remaining=data.get("remaining"),
+            attempts=data.get("attempts", 0),
+            last_status=data.get("last_status", ""),
+            last_message=data.get("last_message", ""),
+            created=data.get("created", datetime.now().isoformat()),
+        )
+
+
+class ScheduleManager:
+    """
+    Active standing orders and a min-heap of (next_run, id). Finding what is
+    due pops the heap, so a tick costs O(due log n) however many schedules
+    exist. Cancelled and finished schedules are dropped; heap entries that
+    no longer match a schedule's next_run are skipped lazily.
+
+    Saves append the schedules changed since the last save to a change log
+    (`schedules.jsonl`) instead of rewriting the snapshot, so a batch costs
+    O(batch) on disk too. The log is compacted into the snapshot when it
+    grows past the store's size; records from before the snapshot's
+    generation are ignored, so a crash mid-compaction can't replay them.
+    """
+    def __init__(self, db_file: str = "schedules.json"):
+        self.storage = JsonStorage(db_file)
+        self.log = JsonLinesLog(f"{os.path.splitext(db_file)[0]}.jsonl")
+        self.on_schedule: Optional[Callable[[float], None]] = None
+        self.load_schedules()
+
+    def load_schedules(self):
+        data = self.storage.load(default={})
+        self.generation = data.get("generation", 0)
+        self.schedules: Dict[str, Schedule] = {s_id: Schedule.from_dict(s) for s_id, s in data.get("schedules", {}).items()}
+        records = self.log.load(default=[])
+        for record in records:
+            self._apply(record)
+        self._logged = len(records)
+        self._changed: Set[str] = set()
+        self._heap = [(s.next_run, s_id) for s_id, s in self.schedules.items()]
+        heapq.heapify(self._heap)
+        if self.on_schedule and self._heap:
+            self.on_schedule(self._heap[0][0])
+
+    def _apply(self, record: dict) -> Optional[Schedule]:
+        """Replays one change-log record; returns the schedule it wrote, if any."""
+        if record.get("generation", 0) < self.generation:
+            return None
+        if record.get("deleted"):
+            self.schedules.pop(record["id"], None)
+            return None
+        schedule = self.schedules[record["id"]] = Schedule.from_dict(record)
+        return schedule
+
+    def catch_up(self):
+        """
+        Picks up another process's changes: only the records it appended to
+        the change log since we last read it, or the whole store if it
+        compacted (rewrote the snapshot) in the meantime.
+        """
+        records = None if self.storage.changed_on_disk() else self.log.tail()
+        if records is None:
+            self.load_schedules()
+            return
+        for record in records:
+            before = self.schedules.get(record["id"])
+            schedule = self._apply(record)
+            # A heap entry at an unchanged next_run would make the schedule due twice
+            if schedule is not None and (before is None or before.next_run != schedule.next_run):
+                self.push(schedule)
+        self._logged += len(records)
+
+    def save_schedules(self):
+        """Logs the schedules changed since the last save (compacting when the log is due)."""
+        if not self._changed:
+            return
+        records = [dict(self.schedules[s_id].to_dict(), generation=self.generation) if s_id in self.schedules
+                   else {"id": s_id, "deleted": True, "generation": self.generation} for s_id in self._changed]
+        self._changed.clear()
+        if self._logged + len(records) > max(COMPACT_MIN_RECORDS, len(self.schedules)):
+            self.compact()
+            return
+        self.log.append(records)
+        self._logged += len(records)
+
+    def compact(self):
+        """Rewrites the snapshot from memory and empties the change log."""
+        self.generation += 1
+        self.storage.save({"generation": self.generation,
+                           "schedules": {s_id: s.to_dict() for s_id, s in self.schedules.items()}})
+        self.log.clear()
+        self._logged = 0
+        self._changed.clear()
+
+    def for_phone(self, phone: str) -> List[Schedule]:
+        return sorted((s for s in self.schedules.values() if s.phone == phone), key=lambda s: s.created)
+
+    def create(self, phone: str, kind: str, counterparty: str, amount: Decimal, interval: str,
+               start_at: Optional[float] = None, **details) -> Schedule:
+        start_at = time.time() if start_at is None else start_at
+        schedule = Schedule(id=f"SCH-{int(time.time())}-{str(uuid.uuid4())[:8].upper()}", phone=phone, kind=kind,
+                            counterparty=counterparty, amount=amount, interval=interval, due_at=start_at,
+                            next_run=start_at, day=datetime.fromtimestamp(start_at).day, **details)
+        self.schedules[schedule.id] = schedule
+        self._changed.add(schedule.id)
+        self.save_schedules()
+        self.push(schedule)
+        return schedule
+
+    def push(self, schedule: Schedule):
+        """(Re)queues a schedule at its next_run, waking the timer if it's now the earliest."""
+        earliest = self.next_run()
+        heapq.heappush(self._heap, (schedule.next_run, schedule.id))
+        if self.on_schedule and (earliest is None or schedule.next_run < earliest):
+            self.on_schedule(schedule.next_run)
+
+    def cancel(self, schedule_id: str, save: bool = True) -> Optional[Schedule]:
+        schedule = self.schedules.pop(schedule_id, None)
+        if schedule is not None:
+            self._changed.add(schedule_id)
+            if save:
+                self.save_schedules()
+        return schedule
+
+    def _stale(self, entry) -> bool:
+        schedule = self.schedules.get(entry[1])
+        return schedule is None or schedule.next_run != entry[0]
+
+    def next_run(self) -> Optional[float]:
+        while self._heap and self._stale(self._heap[0]):
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    next_expiry = next_run  # The ExpiryTimer interface
+
+    def due(self, now: Optional[float] = None, limit: int = BATCH_SIZE) -> List[Schedule]:
+        """Up to `limit` schedules whose next run has passed, popped off the heap in run order."""
+        now = time.time() if now is None else now
+        due = []
+        while self._heap and self._heap[0][0] <= now and len(due) < limit:
+            entry = heapq.heappop(self._heap)
+            if not self._stale(entry):
+                due.append(self.schedules[entry[1]])
+        return due
+
+    def record(self, schedule: Schedule, ok: bool, message: str, now: float):
+        """Moves a schedule on after an attempt: to its next occurrence, a backoff retry, or off the store."""
+        self._changed.add(schedule.id)
+        insufficient = not ok and message.startswith("Insufficient")
+        schedule.last_message = message
+        if insufficient and schedule.attempts < MAX_RETRIES:
+            schedule.attempts += 1
+            schedule.last_status = "RETRYING"
+            schedule.next_run = now + RETRY_BASE_SECONDS * 2 ** (schedule.attempts - 1)
+            following = next_occurrence(schedule.due_at, schedule.interval, schedule.day)
+            if schedule.next_run < following:
+                self.push(schedule)
+                return
+        schedule.last_status = "COMPLETED" if ok else "FAILED"
+        schedule.attempts = 0
+        if schedule.remaining is not None:
+            schedule.remaining -= 1
+            if schedule.remaining <= 0:
+                self.schedules.pop(schedule.id, None)
+                return
+        # Occurrences missed while nothing was running are skipped, not paid in a burst
+        due_at = next_occurrence(schedule.due_at, schedule.interval, schedule.day)
+        while due_at <= now:
+            due_at = next_occurrence(due_at, schedule.interval, schedule.day)
+        schedule.due_at = schedule.next_run = due_at
+        self.push(schedule)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Run due standing orders once (e.g. from cron instead of the timer thread).")
+    parser.add_argument("--data-dir", default=".")
+    args = parser.parse_args(argv)
+
+    try:
+        from engine import MoneyEngine
+    except ImportError:
+        from mobile_money_system.engine import MoneyEngine
+    engine = MoneyEngine(*(os.path.join(args.data_dir, name) for name in ("users.json", "transactions.json", "ledger.json")))
+    total = 0
+    while ran := engine.transaction_manager.run_schedules():
+        total += ran
+    print(json.dumps({"payments_attempted": total}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import sys
+import urllib.request
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+try:
+    from storage import JsonStorage
+except ImportError:
+    from mobile_money_system.storage import JsonStorage
+
+# Bill payments credit one ledger sub-account per biller; its credits since
+# the last batch are that biller's settlement queue
+BILLER_PREFIX = "BILLER_SYSTEM:"
+PAYOUT_ACCOUNT = "SYSTEM_CASH"  # Settled funds leave the float like a withdrawal
+
+
+def biller_account(biller_name: str) -> str:
+    return BILLER_PREFIX + (re.sub(r"[^A-Z0-9]+", "_", biller_name.upper()).strip("_") or "UNKNOWN")
+
+
+def file_digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class MockBiller:
+    """
+    Local stand-in for a biller's settlement endpoint. Checks that the file
+    matches the record (digest, payment count, total) and acknowledges it;
+    billers listed in `reject` refuse every settlement.
+    """
+    def __init__(self, reject: Optional[set] = None):
+        self.reject = reject or set()
+        self.received: List[dict] = []
+
+    def check(self, record: dict, lines: List[dict], digest: str) -> dict:
+        if record["biller"] in self.reject:
+            return {"status": "REJECTED", "reason": "Biller unavailable"}
+        if digest != record["digest"]:
+            return {"status": "REJECTED", "reason": "File digest mismatch"}
+        total = sum(Decimal(line["amount"]) for line in lines)
+        if len(lines) != record["payments"] or total != Decimal(record["total"]):
+            return {"status": "REJECTED", "reason": "Totals do not match the file"}
+        self.received.append(record)
+        return {"status": "ACCEPTED", "reference": f"ACK-{uuid.uuid4().hex[:10].upper()}"}
+
+    def submit(self, record: dict, path: str) -> dict:
+        with open(path, newline="") as f:
+            lines = list(csv.DictReader(f))
+        return self.check(record, lines, file_digest(path))
+
+
+class HttpBiller:
+    """Posts the record and file to a biller settlement endpoint (e.g. `settlement.py --serve-mock`)."""
+    def __init__(self, url: str, timeout: float = 30.0):
+        self.url = url
+        self.timeout = timeout
+
+    def submit(self, record: dict, path: str) -> dict:
+        with open(path, newline="") as f:  # keep the CSV's line endings, the digest covers them
+            body = json.dumps({"record": record, "file": f.read()}).encode()
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except OSError as e:
+            return {"status": "ERROR", "reason": str(e)}
+
+
+def serve_mock(port: int, biller: Optional[MockBiller] = None):
+    biller = biller or MockBiller()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            text = payload["file"]
+            lines = list(csv.DictReader(text.splitlines()))
+            ack = biller.check(payload["record"], lines, hashlib.sha256(text.encode()).hexdigest())
+            body = json.dumps(ack).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+
+class Settler:
+    """
+    Settles bill payments in batches instead of one round-trip per payment.
+    A run scans the ledger from where the last batch stopped. It groups credits
+    to biller sub-accounts by biller and currency, and writes one settlement
+    file per group. A submission the biller accepts posts one consolidated
+    entry pair (sub-account to payout). A rejected or unreachable one stays
+    PENDING for retry(). The cut position and records live in `db_file`.
+    """
+    def __init__(self, transaction_manager, db_file: str = "settlements.json", output_dir: Optional[str] = None,
+                 gateway=None):
+        self.transaction_manager = transaction_manager
+        self.storage = JsonStorage(db_file)
+        self.output_dir = output_dir or os.path.join(os.path.dirname(db_file), "settlements")
+        self.gateway = gateway or MockBiller()
+        self.load()
+
+    def load(self):
+        state = self.storage.load(default={})
+        self.position: int = state.get("position", 0)
+        self.settlements: List[dict] = state.get("settlements", [])
+
+    def save(self):
+        self.storage.save({"position": self.position, "settlements": self.settlements})
+
+    def _scan(self, start: int, period_end: Optional[str] = None):
+        """Queued payments per (sub-account, currency) from ledger position `start`; also returns where it stopped."""
+        tm = self.transaction_manager
+        entries = tm.ledger.entries
+        groups: Dict[tuple, List[dict]] = {}
+        pos = start
+        while pos < len(entries):
+            entry = entries[pos]
+            if period_end and entry.timestamp >= period_end:
+                break  # the ledger is in posting order
+            if entry.account_id.startswith(BILLER_PREFIX) and entry.amount > 0:
+                txn = tm.get_transaction(entry.transaction_id)
+                currency = entry.currency or (txn.currency if txn else "USD")
+                groups.setdefault((entry.account_id, currency), []).append({
+                    "transaction_id": entry.transaction_id,
+                    "timestamp": entry.timestamp,
+                    "payer": txn.sender_phone if txn else "",
+                    "amount": str(entry.amount),
+                    "description": txn.description if txn else entry.description,
+                })
+            pos += 1
+        return groups, pos
+
+    def queued(self) -> List[dict]:
+        """Per-biller totals waiting for the next batch."""
+        groups, _ = self._scan(self.position)
+        return [{"biller": account[len(BILLER_PREFIX):], "currency": currency, "payments": len(lines),
+                 "total": str(sum(Decimal(line["amount"]) for line in lines))}
+                for (account, currency), lines in sorted(groups.items())]
+
+    def run(self, period_end: Optional[str] = None) -> List[dict]:
+        """Cuts a batch of everything posted before `period_end` (ISO timestamp, default now) and submits it."""
+        groups, end = self._scan(self.position, period_end)
+        batch_id = f"STL-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:4].upper()}"
+        batch_dir = os.path.join(self.output_dir, batch_id)
+        records = []
+        for (account, currency), lines in sorted(groups.items()):
+            os.makedirs(batch_dir, exist_ok=True)
+            biller = account[len(BILLER_PREFIX):]
+            path = os.path.join(batch_dir, f"{biller}_{currency}.csv")
+            with open(path, "w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=list(lines[0]))
+                writer.writeheader()
+                writer.writerows(lines)
+            records.append({
+                "id": f"{batch_id}-{biller}-{currency}",
+                "batch": batch_id,
+                "biller": biller,
+                "account": account,
+                "currency": currency,
+                "payments": len(lines),
+                "total": str(sum(Decimal(line["amount"]) for line in lines)),
+                "period_start": lines[0]["timestamp"],
+                "period_end": lines[-1]["timestamp"],
+                "file": path,
+                "digest": file_digest(path),
+                "status": "PENDING",
+                "created": datetime.now().isoformat(),
+            })
+        # The cut is saved before anything is sent: a crash can't put a payment in two batches
+        self.position = end
+        self.settlements.extend(records)
+        self.save()
+        for record in records:
+            self._submit(record)
+        if records:
+            self.save()
+        return records
+
+    def retry(self) -> List[dict]:
+        """Resubmits settlements the biller hasn't accepted yet."""
+        pending = [r for r in self.settlements if r["status"] == "PENDING"]
+        for record in pending:
+            self._submit(record)
+        if pending:
+            self.save()
+        return pending
+
+    def _submit(self, record: dict):
+        ack = self.gateway.submit(record, record["file"])
+        record["attempts"] = record.get("attempts", 0) + 1
+        if ack.get("status") != "ACCEPTED":
+            record["last_error"] = ack.get("reason", ack.get("status", "No acknowledgement"))
+            return
+        tm = self.transaction_manager
+        total = Decimal(record["total"])
+        txn = tm._create_transaction_record("BILLER_SYSTEM", record["biller"], total, "SETTLEMENT",
+                                            f"Settlement {record['id']}: {record['payments']} payments",
+                                            currency=record["currency"])
+        currency = record["currency"]
+        if not tm.ledger.post_entries([tm.ledger.create_entry(txn.id, record["account"], -total, "Biller Settlement", currency),
+                                       tm.ledger.create_entry(txn.id, PAYOUT_ACCOUNT, total, "Settlement Payout", currency)]):
+            record["last_error"] = "Ledger imbalance"
+            return
+        record.update(status="SETTLED", reference=ack.get("reference", ""), transaction_id=txn.id,
+                      settled_at=datetime.now().isoformat())
+        record.pop("last_error", None)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Batch bill payments into per-biller settlements.")
+    parser.add_argument("--data-dir", default=".")
+    parser.add_argument("--period-end", help="Settle payments posted before this ISO timestamp (default: all)")
+    parser.add_argument("--retry", action="store_true", help="Only resubmit pending settlements")
+    parser.add_argument("--biller-url", help="POST settlements here instead of the in-process mock biller")
+    parser.add_argument("--serve-mock", type=int, metavar="PORT", help="Run the mock biller endpoint and exit on Ctrl-C")
+    args = parser.parse_args(argv)
+
+    if args.serve_mock:
+        print(f"Mock biller listening on http://127.0.0.1:{args.serve_mock}/", file=sys.stderr)
+        serve_mock(args.serve_mock)
+        return
+
+    try:
+        from engine import MoneyEngine
+    except ImportError:
+        from mobile_money_system.engine import MoneyEngine
+    engine = MoneyEngine(*(os.path.join(args.data_dir, name) for name in ("users.json", "transactions.json", "ledger.json")))
+    if args.biller_url:
+        engine._transaction_manager.settler.gateway = HttpBiller(args.biller_url)
+    if args.retry:
+        records = engine.transaction_manager.retry_settlements()
+    else:
+        records = engine.transaction_manager.settle_billers(args.period_end)
+    print(json.dumps(records, indent=2))
+    sys.exit(0 if all(r["status"] == "SETTLED" for r in records) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,496 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from models import Transaction, User
+    from storage import JsonStorage
+    from users import UserManager
+    from transactions import TransactionManager
+    from replay import partition_of
+    import limits
+    import loadgen
+except ImportError:
+    from mobile_money_system.models import Transaction, User
+    from mobile_money_system.storage import JsonStorage
+    from mobile_money_system.users import UserManager
+    from mobile_money_system.transactions import TransactionManager
+    from mobile_money_system.replay import partition_of
+    from mobile_money_system import limits
+    from mobile_money_system import loadgen
+
+# Clearing account for cross-shard transfers: the sender's shard credits it,
+# the receiver's shard debits it, so it nets to zero across shards
+SHARD_TRANSIT = "SHARD_TRANSIT"
+LOG_FILE = "coordinator.jsonl"
+
+
+def shard_of(phone: str, shards: int) -> int:
+    return partition_of(phone, shards)
+
+
+class CoordinatorLog:
+    """
+    The coordinator's durable record of two-phase commits. Each record is
+    fsync'ed before the step it announces is sent to any shard, so after a
+    crash every transfer without a "done" record is finished the way it was
+    decided, and one that never reached a decision is aborted.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, record: dict):
+        line = json.dumps(record) + "\n"
+        with self._lock, open(self.path, "a") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def unfinished(self) -> Dict[str, dict]:
+        """Transfers without a "done" record: the "begin" record plus the decision, if one was logged."""
+        pending: Dict[str, dict] = {}
+        if not os.path.exists(self.path):
+            return pending
+        with open(self.path) as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # torn by a crash mid-append: never acted on
+                record = json.loads(line)
+                txn_id, state = record["txn"], record["state"]
+                if state == "begin":
+                    pending[txn_id] = record
+                elif state == "done":
+                    pending.pop(txn_id, None)
+                elif txn_id in pending:
+                    pending[txn_id]["decision"] = state
+        return pending
+
+    def compact(self):
+        """Drops the log once nothing in it is unfinished."""
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+class ShardWorker:
+    """
+    One shard: a UserManager/TransactionManager pair over the shard's own
+    files, plus its side of the two-phase protocol. Prepared transfers are
+    kept in `prepared.json`; a debit prepare holds the amount and fee in
+    SHARD_TRANSIT, so commit and abort can't fail for lack of funds. Both
+    can be retried after a crash without applying anything twice.
+    """
+    def __init__(self, data_dir: str):
+        os.makedirs(data_dir, exist_ok=True)
+        self.user_manager = UserManager(os.path.join(data_dir, "users.json"))
+        self.transaction_manager = TransactionManager(self.user_manager, os.path.join(data_dir, "transactions.json"),
+                                                      os.path.join(data_dir, "ledger.json"))
+        self.storage = JsonStorage(os.path.join(data_dir, "prepared.json"))
+        self.prepared: Dict[str, dict] = self.storage.load(default={})
+
+    # Local operations, routed here by account
+    def register(self, *args) -> Tuple[bool, str]:
+        return self.user_manager.register(*args)
+
+    def submit_kyc(self, phone: str, id_type: str, id_number: str) -> Tuple[bool, str]:
+        return self.user_manager.submit_kyc(phone, id_type, id_number)
+
+    def get_user(self, phone: str) -> Optional[User]:
+        return self.user_manager.get_user(phone)
+
+    def get_history(self, phone: str) -> List[Transaction]:
+        return self.transaction_manager.get_history(phone)
+
+    def deposit(self, phone: str, amount: float, description: str = "Deposit") -> Tuple[bool, str]:
+        return self.transaction_manager.deposit(phone, amount, description)
+
+    def withdraw(self, phone: str, amount: float, description: str = "Withdrawal") -> Tuple[bool, str]:
+        return self.transaction_manager.withdraw(phone, amount, description)
+
+    def transfer(self, sender_phone: str, receiver_phone: str, amount: float, description: str = "Transfer") -> Tuple[bool, str]:
+        return self.transaction_manager.transfer(sender_phone, receiver_phone, amount, description)
+
+    def ledger_balance(self, account_id: str) -> Decimal:
+        return self.transaction_manager.ledger.get_account_balance(account_id)
+
+    def seed(self, users: List[User]) -> int:
+        """Bulk-loads users with their opening balances as ledger-backed deposits; one save per file."""
+        tm, ledger = self.transaction_manager, self.transaction_manager.ledger
+        entries = []
+        for user in users:
+            self.user_manager.users[user.phone] = user
+            if user.balance > 0:
+                t = Transaction(id=f"TXN-SEED-{user.phone}", sender_phone="SYSTEM", receiver_phone=user.phone,
+                                amount=user.balance, currency=user.currency, type="DEPOSIT", description="Opening balance")
+                tm.transactions.append(t)
+                entries += [ledger.create_entry(t.id, "SYSTEM_CASH", -user.balance, "Cash In", user.currency),
+                            ledger.create_entry(t.id, user.phone, user.balance, "Deposit", user.currency)]
+        self.user_manager.search_index.rebuild(self.user_manager.users)
+        if entries:
+            ledger.post_entries(entries)
+        tm.save_transactions()
+        self.user_manager.save_users()
+        return len(users)
+
+    # Two-phase protocol
+    def _remember(self, txn_id: str, record: dict):
+        self.prepared[txn_id] = record
+        self.storage.save(self.prepared)
+
+    def prepare_credit(self, txn_id: str, sender_phone: str, receiver_phone: str, amount: float,
+                       description: str) -> Tuple[bool, str]:
+        """Votes on receiving a transfer. On success the message is the receiver's currency."""
+        if txn_id in self.prepared:
+            return self.prepared[txn_id]["state"] == "prepared", "Already decided"
+        receiver = self.user_manager.get_user(receiver_phone)
+        if not receiver:
+            return False, "Receiver not found"
+        self._remember(txn_id, {"role": "credit", "state": "prepared", "sender": sender_phone, "phone": receiver_phone,
+                                "amount": str(amount), "currency": receiver.currency, "description": description})
+        return True, receiver.currency
+
+    def prepare_debit(self, txn_id: str, sender_phone: str, receiver_phone: str, amount: float, currency: str,
+                      description: str) -> Tuple[bool, str]:
+        """Runs the sender-side checks of a transfer and holds amount plus fee in SHARD_TRANSIT."""
+        if txn_id in self.prepared:
+            return self.prepared[txn_id]["state"] == "prepared", "Already decided"
+        tm = self.transaction_manager
+        sender = self.user_manager.get_user(sender_phone)
+        if not sender:
+            return False, "Sender not found"
+        amount_decimal = Decimal(str(amount))
+        if amount_decimal <= 0:
+            return False, "Invalid amount"
+        if sender.currency != currency:
+            return False, f"Currency mismatch. Sender: {sender.currency}, Receiver: {currency}. Conversion not yet supported."
+
+        allowed, msg = tm._check_limits(sender_phone, amount_decimal)
+        if not allowed:
+            return False, msg
+        fee = tm.fees.quote("transfer", amount_decimal, sender.currency, sender.risk_tier).fee
+        total = amount_decimal + fee
+        if tm.available_balance(sender_phone) < total:
+            return False, f"Insufficient balance. Amount: {sender.currency} {amount_decimal} + Fee: {fee:.2f}"
+        flagged, flag_reason = tm._assess_aml(sender_phone, amount_decimal, counterparty=receiver_phone)
+
+        tm.transactions.append(Transaction(id=txn_id, sender_phone=sender_phone, receiver_phone=receiver_phone,
+                                           amount=amount_decimal, currency=currency, type="TRANSFER",
+                                           description=description, status="PENDING",
+                                           flagged=flagged, flag_reason=flag_reason))
+        entries = [tm.ledger.create_entry(txn_id, sender_phone, -total, "Transfer Out (held)", currency),
+                   tm.ledger.create_entry(txn_id, SHARD_TRANSIT, total, "Cross-shard hold", currency)]
+        if not tm.ledger.post_entries(entries):
+            tm.transactions.pop()
+            return False, "Transaction failed"
+        sender.balance -= total
+        tm.save_transactions()
+        self.user_manager.save_users()
+        self._remember(txn_id, {"role": "debit", "state": "prepared", "phone": sender_phone, "receiver": receiver_phone,
+                                "amount": str(amount_decimal), "fee": str(fee), "currency": currency})
+        return True, "Prepared"
+
+    def _begin_apply(self, txn_id: str, record: dict, state: str, user: Optional[User]) -> dict:
+        """
+        Persists the decision together with the balance and usage it leaves
+        the account at, before any of it is saved. Ledger and balance live in
+        separate files, so a crash can stop anywhere in between; the retry
+        from recover() then restores those values and only posts what is
+        missing, instead of applying the transfer twice.
+        """
+        record = dict(record, state=state)
+        if user:
+            record.update(balance=str(user.balance), usage=dict(user.usage))
+        self._remember(txn_id, record)
+        return record
+
+    def _resume_apply(self, record: dict, user: Optional[User]):
+        if user and "balance" in record:
+            user.balance = Decimal(record["balance"])
+            user.usage = dict(record["usage"])
+
+    def commit(self, txn_id: str) -> Tuple[bool, str]:
+        record = self.prepared.get(txn_id)
+        if record is None:
+            return True, "Already committed"  # commits are forgotten once applied
+        if record["state"] not in ("prepared", "committing"):
+            return False, f"Transfer was {record['state']}"
+        tm = self.transaction_manager
+        user = self.user_manager.get_user(record["phone"])
+        amount = Decimal(record["amount"])
+        retry = record["state"] == "committing"
+        if retry:
+            self._resume_apply(record, user)
+        else:
+            if user and record["role"] == "debit":
+                limits.record_usage(user, amount)
+            elif user:
+                user.balance += amount
+            self._begin_apply(txn_id, record, "committing", user)
+        if record["role"] == "debit":
+            fee = Decimal(record["fee"])
+            txn = tm.get_transaction(txn_id)
+            txn.status = "COMPLETED"
+            tm.updated_ids.add(txn_id)
+            fee_id = f"{txn_id}-FEE"
+            if fee > 0 and not (retry and tm.ledger.entries_for(fee_id)):
+                if tm.get_transaction(fee_id) is None:
+                    tm.transactions.append(Transaction(id=fee_id, sender_phone=record["phone"], receiver_phone="SYSTEM_REVENUE",
+                                                       amount=fee, currency=txn.currency, type="FEE",
+                                                       description=f"Fee for Transfer to {record['receiver']}"))
+                tm.ledger.post_entries([tm.ledger.create_entry(fee_id, SHARD_TRANSIT, -fee, "Cross-shard hold", txn.currency),
+                                        tm.ledger.create_entry(fee_id, "SYSTEM_REVENUE", fee, "Fee Revenue", txn.currency)])
+        else:
+            if tm.get_transaction(txn_id) is None:
+                tm.transactions.append(Transaction(id=txn_id, sender_phone=record["sender"], receiver_phone=record["phone"],
+                                                   amount=amount, currency=record["currency"], type="TRANSFER",
+                                                   description=record["description"]))
+            if not (retry and tm.ledger.entries_for(txn_id)):
+                tm.ledger.post_entries([tm.ledger.create_entry(txn_id, SHARD_TRANSIT, -amount, "Cross-shard release", record["currency"]),
+                                        tm.ledger.create_entry(txn_id, record["phone"], amount, "Transfer In", record["currency"])])
+        tm.save_transactions()
+        self.user_manager.save_users()
+        del self.prepared[txn_id]
+        self.storage.save(self.prepared)
+        return True, "Committed"
+
+    def abort(self, txn_id: str) -> Tuple[bool, str]:
+        record = self.prepared.get(txn_id)
+        if record is not None and record["state"] == "aborted":
+            return True, "Already aborted"
+        if record is not None and record["state"] == "committing":
+            return False, "Transfer was committed"
+        if record is not None and record["role"] == "debit":
+            tm = self.transaction_manager
+            total = Decimal(record["amount"]) + Decimal(record["fee"])
+            currency = record.get("currency", "")
+            user = self.user_manager.get_user(record["phone"])
+            retry = record["state"] == "aborting"
+            if retry:
+                self._resume_apply(record, user)
+            else:
+                if user:
+                    user.balance += total
+                self._begin_apply(txn_id, record, "aborting", user)
+            # The prepare's two entries plus, once posted, the refund's
+            if not (retry and len(tm.ledger.entries_for(txn_id)) > 2):
+                tm.ledger.post_entries([tm.ledger.create_entry(txn_id, SHARD_TRANSIT, -total, "Cross-shard hold released", currency),
+                                        tm.ledger.create_entry(txn_id, record["phone"], total, "Transfer Refund", currency)])
+            txn = tm.get_transaction(txn_id)
+            if txn:
+                txn.status = "FAILED"
+                tm.updated_ids.add(txn_id)
+            tm.save_transactions()
+            self.user_manager.save_users()
+        # Kept as a tombstone: a prepare arriving late must not succeed
+        self._remember(txn_id, {"state": "aborted"})
+        return True, "Aborted"
+
+
+def _serve(data_dir: str, conn):
+    worker = ShardWorker(data_dir)
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        method, args = message
+        try:
+            conn.send((True, getattr(worker, method)(*args)))
+        except Exception as e:
+            conn.send((False, e))
+    conn.close()
+
+
+class ShardedEngine:
+    """
+    Partitions accounts across worker processes by a hash of the phone
+    number. Each shard process owns its accounts' balances, transactions
+    and ledger segment under `<data_dir>/shard-NN`. Transfers inside a shard
+    commit locally. Cross-shard transfers run two-phase commit: the receiver
+    and then the sender prepare, the decision is logged durably, then both
+    shards apply it. Calls from several threads run on different shards in
+    parallel; each shard handles one call at a time.
+    """
+    def __init__(self, data_dir: str, shards: int = 4):
+        os.makedirs(data_dir, exist_ok=True)
+        meta = JsonStorage(os.path.join(data_dir, "shards.json"))
+        existing = meta.load(default={}).get("shards")
+        if existing and existing != shards:
+            raise ValueError(f"{data_dir} holds {existing} shards; resharding is not supported")
+        meta.save({"shards": shards})
+
+        self.shards = shards
+        self._conns = []
+        self._locks = []
+        self._processes = []
+        for i in range(shards):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_serve, args=(os.path.join(data_dir, f"shard-{i:02d}"), child),
+                                              daemon=True)
+            process.start()
+            self._conns.append(parent)
+            self._locks.append(threading.Lock())
+            self._processes.append(process)
+        self.log = CoordinatorLog(os.path.join(data_dir, LOG_FILE))
+        self.recovered = self.recover()
+
+    def call(self, shard: int, method: str, *args):
+        with self._locks[shard]:
+            self._conns[shard].send((method, args))
+            ok, result = self._conns[shard].recv()
+        if not ok:
+            raise result
+        return result
+
+    def shard_for(self, phone: str) -> int:
+        return shard_of(phone, self.shards)
+
+    def register(self, phone: str, name: str, pin: str, sec_q: str, sec_a: str, currency: str = "USD") -> Tuple[bool, str]:
+        return self.call(self.shard_for(phone), "register", phone, name, pin, sec_q, sec_a, currency)
+
+    def submit_kyc(self, phone: str, id_type: str, id_number: str) -> Tuple[bool, str]:
+        return self.call(self.shard_for(phone), "submit_kyc", phone, id_type, id_number)
+
+    def get_user(self, phone: str) -> Optional[User]:
+        return self.call(self.shard_for(phone), "get_user", phone)
+
+    def get_history(self, phone: str) -> List[Transaction]:
+        return self.call(self.shard_for(phone), "get_history", phone)
+
+    def deposit(self, phone: str, amount: float, description: str = "Deposit") -> Tuple[bool, str]:
+        return self.call(self.shard_for(phone), "deposit", phone, amount, description)
+
+    def withdraw(self, phone: str, amount: float, description: str = "Withdrawal") -> Tuple[bool, str]:
+        return self.call(self.shard_for(phone), "withdraw", phone, amount, description)
+
+    def seed(self, users: List[User]) -> int:
+        by_shard: Dict[int, List[User]] = {}
+        for user in users:
+            by_shard.setdefault(self.shard_for(user.phone), []).append(user)
+        return sum(self.call(shard, "seed", members) for shard, members in by_shard.items())
+
+    def transfer(self, sender_phone: str, receiver_phone: str, amount: float, description: str = "Transfer") -> Tuple[bool, str]:
+        source, target = self.shard_for(sender_phone), self.shard_for(receiver_phone)
+        if source == target:
+            return self.call(source, "transfer", sender_phone, receiver_phone, amount, description)
+
+        txn_id = f"TXN-{int(time.time())}-{str(uuid.uuid4())[:8].upper()}"
+        self.log.append({"txn": txn_id, "state": "begin", "source": source, "target": target})
+        ok, msg = self.call(target, "prepare_credit", txn_id, sender_phone, receiver_phone, amount, description)
+        if ok:
+            ok, msg = self.call(source, "prepare_debit", txn_id, sender_phone, receiver_phone, amount, msg, description)
+        decision = "commit" if ok else "abort"
+        self.log.append({"txn": txn_id, "state": decision})
+        self._finish(txn_id, decision, source, target)
+        return (True, "Transfer successful") if ok else (False, msg)
+
+    def _finish(self, txn_id: str, decision: str, source: int, target: int):
+        for shard in (target, source):
+            self.call(shard, decision, txn_id)
+        self.log.append({"txn": txn_id, "state": "done"})
+
+    def recover(self) -> int:
+        """Finishes transfers the log shows in flight (e.g. after a crash); returns how many."""
+        unfinished = self.log.unfinished()
+        for txn_id, record in unfinished.items():
+            decision = record.get("decision", "abort")
+            if "decision" not in record:
+                self.log.append({"txn": txn_id, "state": decision})
+            self._finish(txn_id, decision, record["source"], record["target"])
+        self.log.compact()
+        return len(unfinished)
+
+    def close(self):
+        for conn, process in zip(self._conns, self._processes):
+            conn.send(None)
+            process.join()
+            conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def benchmark(shard_counts: List[int], n_users: int = 2000, transfers: int = 2000, threads_per_shard: int = 2,
+              seed_value: int = 42) -> List[dict]:
+    """Transfer throughput per shard count, over the same population and transfer sequence."""
+    spec = loadgen.PopulationSpec(users=n_users, currencies={"USD": 1.0}, risk_tiers={"high": 1.0},
+                                  opening_balance=50000)
+    results = []
+    for shards in shard_counts:
+        population = loadgen.Population(spec, seed_value)
+        pairs = []
+        for _ in range(transfers):
+            sender = population.sender()
+            pairs.append((sender.phone, population.receiver(sender).phone, population.rng.randint(1, 100)))
+        cross = sum(shard_of(s, shards) != shard_of(r, shards) for s, r, _ in pairs)
+        for user in population.users:
+            user.balance = population.opening_balance(user)
+
+        with tempfile.TemporaryDirectory(prefix="mms-shards-") as data_dir, ShardedEngine(data_dir, shards) as engine:
+            engine.seed(population.users)
+            queue = iter(pairs)
+            queue_lock = threading.Lock()
+            errors = []
+
+            def client():
+                while True:
+                    with queue_lock:
+                        item = next(queue, None)
+                    if item is None:
+                        return
+                    ok, _ = engine.transfer(*item, "bench")
+                    if not ok:
+                        errors.append(item)
+
+            threads = [threading.Thread(target=client) for _ in range(shards * threads_per_shard)]
+            start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - start
+        results.append({"shards": shards, "transfers": transfers, "cross_shard": cross, "errors": len(errors),
+                        "seconds": round(elapsed, 3), "transfers_per_sec": round(transfers / elapsed, 1)})
+    base = results[0]["transfers_per_sec"] if results else 0
+    for r in results:
+        r["speedup"] = round(r["transfers_per_sec"] / base, 2) if base else 0.0
+    return results
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark sharded transfer throughput by shard count.")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--transfers", type=int, default=2000)
+    parser.add_argument("--threads-per-shard", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="-", help="JSON results path, '-' for stdout")
+    args = parser.parse_args(argv)
+    if args.users < 2:
+        parser.error("--users must be at least 2")
+
+    results = benchmark(args.shards, args.users, args.transfers, args.threads_per_shard, args.seed)
+    text = json.dumps({"cpus": os.cpu_count(), "results": results}, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    for r in results:
+        print(f"{r['shards']:>3} shards  {r['transfers_per_sec']:>9} transfers/s  x{r['speedup']:<5} "
+              f"({r['cross_shard']} cross-shard, {r['errors']} errors)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
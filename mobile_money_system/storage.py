@@ -1,27 +1,245 @@
 import json
 import os
-from typing import Any
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not on Windows
+    fcntl = None
+
+try:
+    import metrics
+    import tracing
+except ImportError:
+    from mobile_money_system import metrics
+    from mobile_money_system import tracing
+
+class StorageCorruptError(ValueError):
+    """A data file exists but doesn't parse. Never treated as empty: saving over it would lose the data."""
+    def __init__(self, filepath: str, detail: str):
+        super().__init__(f"{filepath} is corrupt ({detail}). Restore it from a backup or rebuild it with replay.py.")
+        self.filepath = filepath
+
 
 class JsonStorage:
     def __init__(self, filepath: str):
         self.filepath = filepath
+        self.listeners: List[Callable[['JsonStorage'], None]] = []
+        self._stamp: Optional[Tuple[int, int, int]] = None
+
+    def _disk_stamp(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.filepath)
+        except OSError:
+            return None
+        # Saves replace the file, so the inode changes even when mtime and size don't
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def changed_on_disk(self) -> bool:
+        """True if another process has written the file since we last loaded or saved it."""
+        return self._disk_stamp() != self._stamp
 
     def load(self, default: Any = None) -> Any:
+        if not metrics.REGISTRY.enabled and not tracing.active():
+            return self._load(default)
+        name = os.path.basename(self.filepath)
+        with tracing.span("storage.load", file=name):
+            start = time.perf_counter()
+            try:
+                return self._load(default)
+            finally:
+                if metrics.REGISTRY.enabled:
+                    metrics.STORAGE_SECONDS.observe(time.perf_counter() - start, op="load", file=name)
+
+    def _load(self, default: Any) -> Any:
         if default is None:
             default = {}
-            
+
+        self._stamp = self._disk_stamp()
         if not os.path.exists(self.filepath):
             return default
-            
+
         try:
             with open(self.filepath, 'r') as f:
                 content = f.read()
-                if not content:
-                    return default
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
+        except IOError:
+            return default
+        if not content:
             return default
+        try:
+            return json.loads(content)
+        except json.JSONDecodeError as e:
+            raise StorageCorruptError(self.filepath, str(e)) from e
 
     def save(self, data: Any):
-        with open(self.filepath, 'w') as f:
-            json.dump(data, f, indent=4)
+        name = os.path.basename(self.filepath)
+        with tracing.span("storage.save", file=name) as sp:
+            start = time.perf_counter()
+            text = json.dumps(data, indent=4)
+            # Write-then-rename, so readers (and a crash mid-write) never see a half-written file
+            tmp = f"{self.filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, 'w') as f:
+                f.write(text)
+            os.replace(tmp, self.filepath)
+            if sp is not None:
+                sp.attrs["bytes"] = len(text)
+        if metrics.REGISTRY.enabled:
+            metrics.STORAGE_SECONDS.observe(time.perf_counter() - start, op="save", file=name)
+            metrics.STORAGE_BYTES.observe(len(text), file=name)
+        self._stamp = self._disk_stamp()
+        for listener in self.listeners:
+            listener(self)
+
+
+class JsonLinesLog(JsonStorage):
+    """
+    Append-only JSON lines next to a snapshot, for stores too big to rewrite
+    on every change. load() returns the records; a line torn by a crash
+    mid-append is dropped. `offset` is how far the file has been read, so
+    tail() returns just what other processes appended since.
+    """
+    offset = 0
+
+    def _load(self, default: Any) -> Any:
+        self._stamp = self._disk_stamp()
+        self.offset = 0
+        if not os.path.exists(self.filepath):
+            return [] if default is None else default
+        return self._read()
+
+    def _read(self) -> List[Any]:
+        records = []
+        with open(self.filepath, "rb") as f:
+            f.seek(self.offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError as e:
+                    raise StorageCorruptError(self.filepath, str(e)) from e
+                self.offset += len(line)
+        return records
+
+    def tail(self) -> Optional[List[Any]]:
+        """Records appended since the last load or tail; None if the file was truncated (load it again)."""
+        stamp = self._disk_stamp()
+        if stamp is None or stamp[2] < self.offset:
+            return None
+        self._stamp = stamp
+        return self._read()
+
+    def append(self, records: List[Any]):
+        with open(self.filepath, "ab") as f:
+            start = f.tell()
+            f.write("".join(json.dumps(r) + "\n" for r in records).encode())
+            caught_up = start == self.offset
+            if caught_up:
+                self.offset = f.tell()
+        self._saved()
+        if not caught_up:
+            # Another process appended first: leave it to tail(), which reads ours back after theirs
+            self._stamp = None
+
+    def clear(self):
+        with open(self.filepath, "w"):
+            pass
+        self.offset = 0
+        self._saved()
+
+    def _saved(self):
+        self._stamp = self._disk_stamp()
+        for listener in self.listeners:
+            listener(self)
+
+
+class StoreLock:
+    """
+    Coordinates several processes sharing one set of data files (e.g. API
+    workers). Writers hold an exclusive flock on the lock file for a whole
+    operation and then bump the version counter stored in it; readers compare
+    the counter and reload under a shared flock when it has moved.
+    flock belongs to the open file, so callers serialize their own threads.
+    """
+    WIDTH = 20
+
+    def __init__(self, path: str):
+        if fcntl is None:
+            raise RuntimeError("A shared store needs fcntl (POSIX)")
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    def version(self) -> int:
+        raw = os.pread(self._fd, self.WIDTH, 0)
+        return int(raw) if raw.strip() else 0
+
+    def bump(self) -> int:
+        """Increments the counter; call while holding exclusive()."""
+        version = self.version() + 1
+        # Fixed width, so a single write replaces the old value without truncating
+        os.pwrite(self._fd, str(version).rjust(self.WIDTH).encode(), 0)
+        return version
+
+    @contextmanager
+    def _flock(self, mode: int):
+        fcntl.flock(self._fd, mode)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def exclusive(self):
+        return self._flock(fcntl.LOCK_EX)
+
+    def shared(self):
+        return self._flock(fcntl.LOCK_SH)
+
+    def close(self):
+        os.close(self._fd)
+
+
+_SEPARATORS = re.compile(r"[\s,]*")
+
+
+def iter_json_array(filepath: str, chunk_size: int = 1 << 20) -> Iterator[Any]:
+    """
+    Yields the items of a JSON array file one at a time, reading it in
+    chunks, so memory is bounded by the chunk size rather than the file.
+    Items must be objects or arrays (as in every data file here).
+    """
+    if not os.path.exists(filepath):
+        return
+    decoder = json.JSONDecoder()
+    with open(filepath, 'r') as f:
+        buf, pos, started = "", 0, False
+        while True:
+            pos = _SEPARATORS.match(buf, pos).end()
+            if pos == len(buf):
+                more = f.read(chunk_size)
+                if not more:
+                    if started:
+                        raise StorageCorruptError(filepath, "unterminated array")
+                    return
+                buf, pos = buf[pos:] + more, 0
+                continue
+            if not started:
+                if buf[pos] != "[":
+                    raise StorageCorruptError(filepath, "not a JSON array")
+                started, pos = True, pos + 1
+                continue
+            if buf[pos] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as e:
+                more = f.read(chunk_size)
+                if not more:
+                    raise StorageCorruptError(filepath, str(e)) from e
+                buf, pos = buf[pos:] + more, 0
+                continue
+            yield item
+            pos = end
@@ -0,0 +1,288 @@
+import argparse
+import json
+import sys
+from collections import deque
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    from models import Transaction, User
+    from storage import JsonStorage
+except ImportError:
+    from mobile_money_system.models import Transaction, User
+    from mobile_money_system.storage import JsonStorage
+
+# System accounts receive from everyone; fan-in on them is meaningless.
+SYSTEM_ACCOUNTS = {"SYSTEM", "SYSTEM_REVENUE", "SYSTEM_CASH", "BILLER_SYSTEM"}
+SENDER_TYPES = {"TRANSFER", "WITHDRAWAL", "BILL_PAYMENT"}
+
+DEFAULT_CONFIG = {
+    "reporting_threshold": 10000,
+    "tier_limits": {"low": 1000, "standard": 5000, "high": 50000},
+    # An amount is "near" a threshold when it is within this fraction below it
+    "margin": 0.1,
+    # Split payments need at least this many parts, so one large payment isn't "split"
+    "min_parts": 3,
+    # Fan patterns moving less than this over the window are ignored
+    "fan_min_total": 2000,
+    # Per window: bucket size (seconds) and the counts/sums that trigger each pattern
+    "windows": [
+        {"name": "1h", "seconds": 3600, "bucket": 60, "near_count": 2, "split_sum": 10000, "fan_out": 5, "fan_in": 5},
+        {"name": "24h", "seconds": 86400, "bucket": 900, "near_count": 3, "split_sum": 10000, "fan_out": 10, "fan_in": 10},
+        {"name": "7d", "seconds": 604800, "bucket": 3600, "near_count": 5, "split_sum": 25000, "fan_out": 20, "fan_in": 20},
+    ],
+}
+
+
+class RollingWindow:
+    """
+    Sum, count, near-threshold count and distinct counterparties over a
+    sliding time window, kept in fixed-size time buckets. Adding an event and
+    reading the window are O(1) amortized; memory is bounded by the number of
+    buckets (plus one entry per distinct counterparty), not by activity.
+    """
+    __slots__ = ("seconds", "bucket", "buckets", "total", "count", "near", "distinct")
+
+    def __init__(self, seconds: int, bucket: int):
+        self.seconds = seconds
+        self.bucket = bucket
+        # [bucket_start, total, count, near, counterparties]
+        self.buckets: deque = deque()
+        self.total = Decimal("0")
+        self.count = 0
+        self.near = 0
+        self.distinct: Dict[str, int] = {}
+
+    def evict(self, now: float):
+        cutoff = now - self.seconds
+        buckets = self.buckets
+        while buckets and buckets[0][0] + self.bucket <= cutoff:
+            _, total, count, near, parties = buckets.popleft()
+            self.total -= total
+            self.count -= count
+            self.near -= near
+            for party in parties:
+                remaining = self.distinct[party] - 1
+                if remaining:
+                    self.distinct[party] = remaining
+                else:
+                    del self.distinct[party]
+
+    def add(self, ts: float, amount: Decimal, near: bool = False, counterparty: Optional[str] = None):
+        start = ts - ts % self.bucket
+        buckets = self.buckets
+        if buckets and buckets[-1][0] >= start:
+            current = buckets[-1]
+        else:
+            current = [start, Decimal("0"), 0, 0, set()]
+            buckets.append(current)
+        current[1] += amount
+        current[2] += 1
+        if near:
+            current[3] += 1
+        if counterparty is not None and counterparty not in current[4]:
+            current[4].add(counterparty)
+            self.distinct[counterparty] = self.distinct.get(counterparty, 0) + 1
+        self.total += amount
+        self.count += 1
+        if near:
+            self.near += 1
+        self.evict(ts)
+
+
+class Alert:
+    __slots__ = ("rule", "window", "reason")
+
+    def __init__(self, rule: str, window: str, reason: str):
+        self.rule = rule
+        self.window = window
+        self.reason = reason
+
+    @property
+    def id(self) -> str:
+        return f"{self.rule}_{self.window}"
+
+
+class StructuringDetector:
+    """
+    Streaming structuring/smurfing detector. Keeps per-sender and
+    per-receiver rolling windows (1h, 24h, 7d by default) and flags:
+
+    - structuring: repeated payments just under the reporting threshold or the sender's tier limit
+    - split payments: many sub-threshold payments adding up past the reporting threshold
+    - fan-out: one sender paying many distinct receivers
+    - fan-in: one receiver collecting from many distinct senders
+
+    Plugs into AMLEngine: `observe` is fed committed transactions and `check`
+    runs inline on each new one. Split and fan patterns fire on the payment
+    that crosses the trigger rather than on every payment after it, and only
+    the shortest window that trips a pattern is reported.
+    """
+    def __init__(self, config: Optional[dict] = None, user_lookup: Optional[Callable[[str], Optional[User]]] = None):
+        config = config or DEFAULT_CONFIG
+        self.user_lookup = user_lookup
+        self.threshold = Decimal(str(config.get("reporting_threshold", 10000)))
+        self.min_parts = int(config.get("min_parts", 3))
+        self.fan_min_total = Decimal(str(config.get("fan_min_total", 0)))
+        margin = Decimal(str(config.get("margin", 0.1)))
+        base = [(self.threshold * (1 - margin), self.threshold)]
+        self.bands: Dict[Optional[str], List[tuple]] = {None: base}
+        for tier, limit in config.get("tier_limits", {}).items():
+            limit = Decimal(str(limit))
+            self.bands[tier] = base + [(limit * (1 - margin), limit)]
+        self.windows = [dict(w, split_sum=Decimal(str(w["split_sum"]))) for w in config["windows"]]
+        self.senders: Dict[str, List[RollingWindow]] = {}
+        self.receivers: Dict[str, List[RollingWindow]] = {}
+
+    def _windows(self, table: Dict[str, List[RollingWindow]], phone: str) -> List[RollingWindow]:
+        windows = table.get(phone)
+        if windows is None:
+            windows = table[phone] = [RollingWindow(w["seconds"], w["bucket"]) for w in self.windows]
+        return windows
+
+    def _tier(self, phone: str) -> Optional[str]:
+        user = self.user_lookup(phone) if self.user_lookup else None
+        return user.risk_tier if user else None
+
+    def near(self, amount: Decimal, tier: Optional[str]) -> bool:
+        for low, high in self.bands.get(tier, self.bands[None]):
+            if low <= amount < high:
+                return True
+        return False
+
+    def observe(self, t: Transaction, ts: Optional[float] = None, tier: Optional[str] = None):
+        if t.type not in SENDER_TYPES or t.status != "COMPLETED":
+            return
+        ts = datetime.fromisoformat(t.timestamp).timestamp() if ts is None else ts
+        tier = self._tier(t.sender_phone) if tier is None else tier
+        receiver = t.receiver_phone if t.type == "TRANSFER" else None
+        near = self.near(t.amount, tier)
+        for window in self._windows(self.senders, t.sender_phone):
+            window.add(ts, t.amount, near, receiver)
+        if receiver is not None and receiver not in SYSTEM_ACCOUNTS:
+            for window in self._windows(self.receivers, receiver):
+                window.add(ts, t.amount, counterparty=t.sender_phone)
+
+    def check(self, sender: str, amount: Decimal, now: float, receiver: Optional[str] = None,
+              tier: Optional[str] = None) -> List[Alert]:
+        """Alerts a new outgoing payment would raise, given everything observed so far."""
+        alerts: List[Alert] = []
+        seen = set()
+        near = self.near(amount, tier if tier is not None else self._tier(sender))
+        sent = self.senders.get(sender)
+        received = self.receivers.get(receiver) if receiver and receiver not in SYSTEM_ACCOUNTS else None
+
+        for i, spec in enumerate(self.windows):
+            name = spec["name"]
+            if sent is not None:
+                window = sent[i]
+                window.evict(now)
+                count = window.count + 1
+                total = window.total + amount
+                if near and "structuring" not in seen and window.near + 1 >= spec["near_count"]:
+                    seen.add("structuring")
+                    alerts.append(Alert("structuring", name, f"Structuring: {window.near + 1} payments just under a limit within {name}"))
+                if ("split" not in seen and amount < self.threshold and count >= self.min_parts
+                        and total >= spec["split_sum"] and window.total < spec["split_sum"]):
+                    seen.add("split")
+                    alerts.append(Alert("split", name, f"Split payments: {total:,.2f} in {count} payments within {name}"))
+                if receiver is not None and "fan_out" not in seen:
+                    fan = len(window.distinct) + (receiver not in window.distinct)
+                    before = len(window.distinct) >= spec["fan_out"] and window.total >= self.fan_min_total
+                    if not before and fan >= spec["fan_out"] and total >= self.fan_min_total:
+                        seen.add("fan_out")
+                        alerts.append(Alert("fan_out", name, f"Fan-out: {fan} receivers within {name}"))
+            if received is not None and "fan_in" not in seen:
+                window = received[i]
+                window.evict(now)
+                fan = len(window.distinct) + (sender not in window.distinct)
+                before = len(window.distinct) >= spec["fan_in"] and window.total >= self.fan_min_total
+                if not before and fan >= spec["fan_in"] and window.total + amount >= self.fan_min_total:
+                    seen.add("fan_in")
+                    alerts.append(Alert("fan_in", name, f"Fan-in: receiver collecting from {fan} senders within {name}"))
+        return alerts
+
+    # AMLEngine plug-in interface
+
+    def reset(self):
+        self.senders = {}
+        self.receivers = {}
+
+    def aml_observe(self, t: Transaction, ev):
+        self.observe(t, ev.ts, ev.tier)
+
+    def aml_check(self, phone: str, ev) -> List[Tuple[str, str]]:
+        if not ev.outgoing:
+            return []
+        return [(a.id, a.reason) for a in self.check(phone, ev.amount, ev.ts, ev.counterparty, ev.tier)]
+
+
+def backfill(transactions: List[Transaction], detector: StructuringDetector) -> List[dict]:
+    """
+    Replays history in time order, checking each payment against the windows
+    as they stood just before it, exactly as the inline check would have.
+    """
+    stamped = sorted(((datetime.fromisoformat(t.timestamp).timestamp(), t) for t in transactions
+                      if t.type in SENDER_TYPES and t.status == "COMPLETED"), key=lambda pair: pair[0])
+    alerts = []
+    for ts, t in stamped:
+        tier = detector._tier(t.sender_phone)
+        receiver = t.receiver_phone if t.type == "TRANSFER" else None
+        found = detector.check(t.sender_phone, t.amount, ts, receiver, tier)
+        if found:
+            alerts.append({
+                "transaction_id": t.id,
+                "timestamp": t.timestamp,
+                "sender": t.sender_phone,
+                "receiver": t.receiver_phone,
+                "amount": str(t.amount),
+                "rules": [a.id for a in found],
+                "reasons": [a.reason for a in found],
+            })
+        detector.observe(t, ts, tier)
+    return alerts
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Backfill structuring/smurfing detection over existing transactions.")
+    parser.add_argument("--transactions", default="transactions.json")
+    parser.add_argument("--users", default="users.json", help="Used to look up risk tiers")
+    parser.add_argument("--config", help="JSON file overriding DEFAULT_CONFIG")
+    parser.add_argument("--output", default="-", help="Alerts as JSON, '-' for stdout")
+    parser.add_argument("--apply", action="store_true", help="Flag the matching transactions and save transactions.json")
+    args = parser.parse_args(argv)
+
+    config = JsonStorage(args.config).load(default=DEFAULT_CONFIG) if args.config else DEFAULT_CONFIG
+    users = {phone: User.from_dict(data) for phone, data in JsonStorage(args.users).load(default={}).items()}
+    storage = JsonStorage(args.transactions)
+    transactions = [Transaction.from_dict(t) for t in storage.load(default=[])]
+
+    alerts = backfill(transactions, StructuringDetector(config, users.get))
+
+    if args.apply:
+        by_id = {a["transaction_id"]: a for a in alerts}
+        changed = 0
+        for t in transactions:
+            alert = by_id.get(t.id)
+            if alert is None:
+                continue
+            new = [r for r in alert["reasons"] if r not in t.flag_reason]
+            if new:
+                t.flagged = True
+                t.flag_reason = "; ".join(filter(None, [t.flag_reason] + new))
+                changed += 1
+        storage.save([t.to_dict() for t in transactions])
+        print(f"Flagged {changed} transactions", file=sys.stderr)
+
+    text = json.dumps(alerts, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(f"{len(alerts)} alerts over {len(transactions)} transactions", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
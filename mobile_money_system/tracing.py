@@ -0,0 +1,268 @@
+import cProfile
+import contextvars
+import io
+import json
+import logging
+import logging.handlers
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter as TallyCounter, deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+class Span:
+    __slots__ = ("name", "attrs", "start", "end", "children")
+
+    def __init__(self, name: str, attrs: Optional[dict] = None):
+        self.name = name
+        self.attrs = attrs or {}
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.children: List['Span'] = []
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def to_dict(self, origin: Optional[float] = None) -> dict:
+        origin = self.start if origin is None else origin
+        data = {
+            "name": self.name,
+            "offset_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration_ms, 3),
+        }
+        if self.attrs:
+            data["attrs"] = self.attrs
+        if self.children:
+            data["children"] = [c.to_dict(origin) for c in self.children]
+        return data
+
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("mms_span", default=None)
+
+
+def active() -> bool:
+    return _current.get() is not None
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Opens a child of the current span. Outside a sampled request this yields
+    None and records nothing, so instrumented code can call it unconditionally.
+    """
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name, attrs)
+    parent.children.append(child)
+    token = _current.set(child)
+    try:
+        yield child
+    finally:
+        child.end = time.perf_counter()
+        _current.reset(token)
+
+
+def annotate(**attrs):
+    """Adds attributes to the current span, if any."""
+    current = _current.get()
+    if current is not None:
+        current.attrs.update(attrs)
+
+
+class Tracer:
+    """
+    Samples a fraction of requests into span trees. Traces slower than
+    `slow_ms` are appended as JSON lines to a size-rotated file; the most
+    recent sampled traces are also kept in memory for /debug/traces.
+    """
+    def __init__(self, sample_rate: float = 0.0, slow_ms: float = 250.0, trace_file: str = "traces.jsonl",
+                 max_bytes: int = 5 * 1024 * 1024, backups: int = 3, keep: int = 50):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.trace_file = trace_file
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.recent = deque(maxlen=keep)
+        self._logger: Optional[logging.Logger] = None
+        self._rng = random.Random()
+
+    def should_sample(self, force: bool = False) -> bool:
+        return force or (self.sample_rate > 0 and self._rng.random() < self.sample_rate)
+
+    @contextmanager
+    def trace(self, name: str, **attrs):
+        root = Span(name, attrs)
+        token = _current.set(root)
+        try:
+            yield root
+        finally:
+            root.end = time.perf_counter()
+            _current.reset(token)
+            self.finish(root)
+
+    def finish(self, root: Span):
+        trace_id = root.attrs.pop("trace_id", None) or uuid.uuid4().hex[:16]
+        record = root.to_dict()
+        record["trace_id"] = trace_id
+        record["ts"] = time.time()
+        self.recent.append(record)
+        if record["duration_ms"] >= self.slow_ms:
+            self._file_logger().info(json.dumps(record))
+
+    def _file_logger(self) -> logging.Logger:
+        if self._logger is None:
+            logger = logging.getLogger("mms.traces")
+            logger.propagate = False
+            logger.setLevel(logging.INFO)
+            handler = logging.handlers.RotatingFileHandler(self.trace_file, maxBytes=self.max_bytes, backupCount=self.backups)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            self._logger = logger
+        return self._logger
+
+
+PROFILING_ENABLED = os.environ.get("MMS_PROFILING", "0") == "1"
+TRACER = Tracer(
+    sample_rate=float(os.environ.get("MMS_TRACE_SAMPLE", "0.01" if PROFILING_ENABLED else "0")),
+    slow_ms=float(os.environ.get("MMS_TRACE_SLOW_MS", "250")),
+    trace_file=os.environ.get("MMS_TRACE_FILE", "traces.jsonl"),
+)
+
+
+# Leaf frames of threads parked waiting for work; dropped so samples show busy time
+IDLE_LEAVES = {"threading.py:wait", "selectors.py:select", "queue.py:get", "thread.py:_worker"}
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler: a background thread snapshots every
+    thread's stack with sys._current_frames() and tallies collapsed stacks
+    (flamegraph.pl / speedscope input). Cheap enough to run in production.
+    """
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks: TallyCounter = TallyCounter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="mms-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                parts = []
+                while frame is not None:
+                    code = frame.f_code
+                    parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                if parts and parts[0] in IDLE_LEAVES:
+                    continue
+                self.stacks[";".join(reversed(parts))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+    def top(self, limit: int = 30) -> str:
+        """Self and inclusive sample counts per function."""
+        own: TallyCounter = TallyCounter()
+        inclusive: TallyCounter = TallyCounter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for fn in set(frames):
+                inclusive[fn] += count
+        lines = [f"{self.samples} samples every {self.interval * 1000:g} ms", "", f"{'self':>8} {'total':>8}  function"]
+        for fn, count in own.most_common(limit):
+            lines.append(f"{count:>8} {inclusive[fn]:>8}  {fn}")
+        return "\n".join(lines) + "\n"
+
+
+class OperationProfiler:
+    """
+    Deterministic cProfile over TransactionManager operations. Engine
+    operations already run one at a time under the engine lock, so a single
+    Profile can be enabled around each call without threads interleaving.
+    """
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.calls = 0
+        self._depth = 0
+
+    def run(self, fn, *args, **kwargs):
+        # Operations can call other operations (e.g. process_request -> transfer);
+        # only the outermost call toggles the profiler.
+        self._depth += 1
+        if self._depth == 1:
+            self.calls += 1
+            self.profile.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                self.profile.disable()
+
+    def report(self, limit: int = 40, sort: str = "cumulative") -> str:
+        out = io.StringIO()
+        out.write(f"{self.calls} operations profiled\n")
+        if self.calls:
+            pstats.Stats(self.profile, stream=out).sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+
+# Set while a cProfile window is open; read by metrics.operation
+operation_profiler: Optional[OperationProfiler] = None
+_profile_lock = threading.Lock()
+
+
+@contextmanager
+def profiling(mode: str = "sample", interval: float = 0.005):
+    """
+    Runs one profiler for the duration of the block and yields it.
+    Only one profiling window may be open at a time (RuntimeError otherwise).
+    """
+    global operation_profiler
+    if not _profile_lock.acquire(blocking=False):
+        raise RuntimeError("A profile is already running")
+    try:
+        if mode == "cprofile":
+            operation_profiler = OperationProfiler()
+            try:
+                yield operation_profiler
+            finally:
+                operation_profiler = None
+        else:
+            sampler = SamplingProfiler(interval)
+            sampler.start()
+            try:
+                yield sampler
+            finally:
+                sampler.stop()
+    finally:
+        _profile_lock.release()
+
+
+def recent_traces(limit: int = 20) -> List[Dict]:
+    return list(TRACER.recent)[-limit:][::-1]
@@ -1,19 +1,45 @@
+import os
 import time
 import uuid
-from datetime import datetime, timedelta
-from typing import List, Tuple, Optional
+from typing import List, Set, Tuple, Optional
 from decimal import Decimal
 
 try:
-    from models import Transaction
+    from models import Transaction, User
     from storage import JsonStorage
     from users import UserManager
     from ledger import LedgerManager
+    from indexes import TransactionIndex
+    from aml import AMLEngine, load_rules
+    from structuring import StructuringDetector
+    from graph import TransferGraph
+    import limits
+    from fees import FeeEngine, FeeQuote, load_schedule
+    from reconciliation import Reconciler, ReconciliationReport
+    from holds import Hold, HoldManager
+    from settlement import Settler, biller_account
+    from scheduler import INTERVALS, Schedule, ScheduleManager
+    from fx import FxEngine, FxQuote, position_account, rate_source
+    import metrics
+    import tracing
 except ImportError:
-    from mobile_money_system.models import Transaction
+    from mobile_money_system.models import Transaction, User
     from mobile_money_system.storage import JsonStorage
     from mobile_money_system.users import UserManager
     from mobile_money_system.ledger import LedgerManager
+    from mobile_money_system.indexes import TransactionIndex
+    from mobile_money_system.aml import AMLEngine, load_rules
+    from mobile_money_system.structuring import StructuringDetector
+    from mobile_money_system.graph import TransferGraph
+    from mobile_money_system import limits
+    from mobile_money_system.fees import FeeEngine, FeeQuote, load_schedule
+    from mobile_money_system.reconciliation import Reconciler, ReconciliationReport
+    from mobile_money_system.holds import Hold, HoldManager
+    from mobile_money_system.settlement import Settler, biller_account
+    from mobile_money_system.scheduler import INTERVALS, Schedule, ScheduleManager
+    from mobile_money_system.fx import FxEngine, FxQuote, position_account, rate_source
+    from mobile_money_system import metrics
+    from mobile_money_system import tracing
 
 class TransactionManager:
     def __init__(self, user_manager: UserManager, db_file: str = "transactions.json", ledger_file: str = "ledger.json"):
@@ -21,6 +47,18 @@ class TransactionManager:
         self.storage = JsonStorage(db_file)
         self.ledger = LedgerManager(ledger_file)
         self.transactions: List[Transaction] = []
+        # Ids of saved records changed in place since the last save (for the change journal)
+        self.updated_ids: Set[str] = set()
+        self.index = TransactionIndex()
+        self.graph = TransferGraph()
+        self.fees = FeeEngine(load_schedule())
+        self.fx = FxEngine(rate_source(), quotes_file=os.path.join(os.path.dirname(db_file), "fx_quotes.json"))
+        self.reconciler = Reconciler(f"{os.path.splitext(ledger_file)[0]}_reconciled.json")
+        self.holds = HoldManager(os.path.join(os.path.dirname(db_file), "holds.json"))
+        self.settler = Settler(self, os.path.join(os.path.dirname(db_file), "settlements.json"))
+        self.schedules = ScheduleManager(os.path.join(os.path.dirname(db_file), "schedules.json"))
+        self.aml = AMLEngine(load_rules(), user_manager.get_user,
+                             plugins=[StructuringDetector(user_lookup=user_manager.get_user)])
         self.load_transactions()
         
         # Configuration Limits (None currently active)
@@ -35,7 +73,9 @@ class TransactionManager:
     def save_transactions(self):
         data = [t.to_dict() for t in self.transactions]
         self.storage.save(data)
+        self.updated_ids.clear()
         
+    @metrics.operation("admin_adjust_balance")
     def admin_adjust_balance(self, phone: str, amount: float, reason: str, is_credit: bool = True) -> Tuple[bool, str]:
         user = self.user_manager.get_user(phone)
         if not user:
@@ -46,32 +86,37 @@ class TransactionManager:
             return False, "Invalid amount"
             
         t_type = "ADMIN_CREDIT" if is_credit else "ADMIN_DEBIT"
-        
-        # Adjust Balance
-        if is_credit:
-            user.balance += amount_decimal
-        else:
-            if user.balance < amount_decimal:
-                return False, "Insufficient funds for debit"
-            user.balance -= amount_decimal
-            amount_decimal = -amount_decimal # For ledger logic if needed, but keeping absolute for amount field usually better
-            
-        self.user_manager.save_users()
-        
+        if not is_credit and user.balance < amount_decimal:
+            return False, "Insufficient funds for debit"
+
         # Log Transaction
-        self._create_transaction_record(
+        txn = self._create_transaction_record(
             sender="ADMIN", 
             receiver=phone, 
-            amount=abs(amount_decimal), 
+            amount=amount_decimal, 
             t_type=t_type, 
             description=reason,
             currency=user.currency
         )
+
+        # Adjustments are balanced against a system account so the ledger still sums to zero
+        signed = amount_decimal if is_credit else -amount_decimal
+        entries = [
+            self.ledger.create_entry(txn.id, "SYSTEM_ADJUSTMENTS", -signed, reason, user.currency),
+            self.ledger.create_entry(txn.id, phone, signed, "Admin Credit" if is_credit else "Admin Debit", user.currency)
+        ]
+        if not self.ledger.post_entries(entries):
+            return False, "Transaction failed: Ledger imbalance."
+
+        # Adjust Balance
+        user.balance += signed
+        self.user_manager.save_users()
         return True, "Balance adjusted successfully."
 
+    @metrics.operation("reverse_transaction")
     def reverse_transaction(self, transaction_id: str) -> Tuple[bool, str]:
         # Find original
-        txn = next((t for t in self.transactions if t.id == transaction_id), None)
+        txn = self.get_transaction(transaction_id)
         if not txn:
             return False, "Transaction not found"
             
@@ -81,27 +126,12 @@ class TransactionManager:
         # Reverse Logic based on types
         if txn.type in ["TRANSFER", "PAYMENT", "BILL_PAY"]:
              sender = self.user_manager.get_user(txn.sender_phone)
-             receiver = self.user_manager.get_user(txn.receiver_phone)
              
              if not sender: return False, "Sender account missing"
              # Receiver might be external (BILL_PAY), handle carefully
              
-             # Credit Sender
-             sender.balance += txn.amount
-             
-             # Debit Receiver if internal User
-             if receiver:
-                 if receiver.balance >= txn.amount:
-                     receiver.balance -= txn.amount
-                 else:
-                     # Force debit into negative? or block?
-                     # For admin force reversal, we usually allow negative or create debt.
-                     receiver.balance -= txn.amount 
-             
-             self.user_manager.save_users()
-             
              # Log Reversal
-             self._create_transaction_record(
+             reversal = self._create_transaction_record(
                  sender=txn.receiver_phone,
                  receiver=txn.sender_phone,
                  amount=txn.amount,
@@ -109,15 +139,40 @@ class TransactionManager:
                  description=f"Reversal of {txn.id}",
                  currency=txn.currency
              )
+             # Mirror every leg of the original, so a converted transfer takes back
+             # what the receiver was credited (in their currency) and unwinds the FX positions
+             original = self.ledger.entries_for(txn.id)
+             if original:
+                 entries = [self.ledger.create_entry(reversal.id, e.account_id, -e.amount,
+                                                     "Reversal Credit" if e.amount < 0 else "Reversal Debit", e.currency)
+                            for e in original]
+             else:
+                 entries = [
+                     self.ledger.create_entry(reversal.id, txn.receiver_phone, -txn.amount, "Reversal Debit", txn.currency),
+                     self.ledger.create_entry(reversal.id, txn.sender_phone, txn.amount, "Reversal Credit", txn.currency)
+                 ]
+             if not self.ledger.post_entries(entries):
+                 return False, "Transaction failed: Ledger imbalance."
+
+             # Credit Sender, debit Receiver if internal User
+             # For admin force reversal we allow the receiver to go negative (debt).
+             for entry in entries:
+                 wallet = self.user_manager.get_user(entry.account_id)
+                 if wallet:
+                     wallet.balance += entry.amount
+             
+             self.user_manager.save_users()
              
              txn.flagged = True
              txn.flag_reason += " [REVERSED]"
+             self.updated_ids.add(txn.id)
              self.save_transactions()
              return True, "Transaction reversed."
              
         return False, f"Reversal not implemented for type {txn.type}"
 
-    def _check_limits(self, phone: str, amount: Decimal) -> Tuple[bool, str]:
+    @metrics.timed(metrics.CHECK_SECONDS, check="limits")
+    def _check_limits(self, phone: str, amount: Decimal, outgoing: bool = True) -> Tuple[bool, str]:
         # 1. KYC Check
         user = self.user_manager.get_user(phone)
         if not user:
@@ -130,37 +185,23 @@ class TransactionManager:
             # Maybe allow small deposits? strict: block all.
             return False, "Transaction blocked: KYC Not Verified."
         
-        # Risk Tier Limits
-        limit = Decimal("5000")
-        if user.risk_tier == "low":
-            limit = Decimal("1000")
-        elif user.risk_tier == "high":
-            limit = Decimal("50000")
-            
-        if amount > limit:
-            return False, f"Amount exceeds limit for {user.risk_tier} tier ({limit})"
-            
-        return True, ""
-
-    def _assess_aml(self, phone: str, amount: Decimal) -> Tuple[bool, str]:
-        flagged = False
-        reason = []
-        
-        # 1. Large Transaction
-        if amount >= 10000:
-            flagged = True
-            reason.append("Large amount (>10k)")
-            
-        # 2. Velocity Check (Rapid Movement)
-        now = datetime.now()
-        time_window = now - timedelta(minutes=5)
-        recent = [t for t in self.transactions if t.sender_phone == phone and datetime.fromisoformat(t.timestamp) > time_window]
-        
-        if len(recent) >= 5:
-            flagged = True
-            reason.append("Rapid movement (Velocity)")
-            
-        return flagged, "; ".join(reason)
+        # 2. Risk tier limits: per transaction, plus daily/monthly caps on outgoing money (open holds included)
+        return limits.check_limits(user, amount, outgoing, pending=self.holds.open_usage(phone))
+
+    @metrics.timed(metrics.CHECK_SECONDS, check="aml")
+    def _assess_aml(self, phone: str, amount: Decimal, counterparty: Optional[str] = None, outgoing: bool = True) -> Tuple[bool, str]:
+        self.aml.sync(self.transactions)
+        result = self.aml.assess(phone, amount, self.user_manager.get_user(phone), counterparty, outgoing)
+
+        if metrics.REGISTRY.enabled:
+            metrics.AML_ASSESSMENTS.inc(flagged="true" if result.flagged else "false")
+            metrics.AML_EVAL_SECONDS.observe(result.elapsed_ms / 1000)
+            for rule_id in result.rules:
+                metrics.AML_RULE_HITS.inc(rule=rule_id)
+        tracing.annotate(aml_ms=round(result.elapsed_ms, 3))
+        if result.rules:
+            tracing.annotate(rules=result.rules)
+        return result.flagged, result.reason
 
     def _create_transaction_record(self, sender: str, receiver: str, amount: Decimal, t_type: str, description: str = "", currency: str = "USD", flagged: bool = False, flag_reason: str = "") -> Transaction:
         # Generate a standard reference number (e.g., TXN-12345678-ABCD)
@@ -183,6 +224,7 @@ class TransactionManager:
         self.save_transactions()
         return t
 
+    @metrics.operation("deposit")
     def deposit(self, phone: str, amount: float, description: str = "Deposit") -> Tuple[bool, str]:
         amount_decimal = Decimal(str(amount))
         user = self.user_manager.get_user(phone)
@@ -192,7 +234,7 @@ class TransactionManager:
             return False, "Invalid amount"
         
         # Check Limits & KYC
-        allowed, msg = self._check_limits(phone, amount_decimal)
+        allowed, msg = self._check_limits(phone, amount_decimal, outgoing=False)
         if not allowed:
              return False, msg
 
@@ -205,8 +247,13 @@ class TransactionManager:
              # I will REMOVE this hard limit in favor of the AML flag.
              pass
 
+        # Free by default; a configured cash-in fee comes out of the deposit
+        fee = self.fees.quote("deposit", amount_decimal, user.currency, user.risk_tier).fee
+        if fee >= amount_decimal:
+            return False, f"Deposit does not cover the fee ({fee:.2f})"
+
         # AML Check
-        flagged, flag_reason = self._assess_aml(phone, amount_decimal)
+        flagged, flag_reason = self._assess_aml(phone, amount_decimal, outgoing=False)
 
         # 1. Create Transaction ID
         txn = self._create_transaction_record(
@@ -221,17 +268,36 @@ class TransactionManager:
         )
 
         entries = [
-            self.ledger.create_entry(txn.id, "SYSTEM_CASH", -amount_decimal, "Cash In"), # Debit Cash (Asset) - Wait, if we treat + as User Balance Increase (Liability), then Asset Increase should be ... ?
-            self.ledger.create_entry(txn.id, phone, amount_decimal, "Deposit to Wallet")
+            self.ledger.create_entry(txn.id, "SYSTEM_CASH", -amount_decimal, "Cash In", user.currency), # Debit Cash (Asset) - Wait, if we treat + as User Balance Increase (Liability), then Asset Increase should be ... ?
+            self.ledger.create_entry(txn.id, phone, amount_decimal, "Deposit to Wallet", user.currency)
         ]
         
-        if self.ledger.post_entries(entries):
-            user.balance += amount_decimal
-            self.user_manager.save_users()
-            return True, f"Deposited {amount_decimal} successfully. New balance: {user.balance}"
-        else:
+        if not self.ledger.post_entries(entries):
             return False, "Transaction failed: Ledger imbalance."
+        user.balance += amount_decimal
+
+        # 2. Fee
+        if fee > 0:
+            txn_fee = self._create_transaction_record(
+                sender=phone,
+                receiver="SYSTEM_REVENUE",
+                amount=fee,
+                t_type="FEE",
+                description=f"Fee for Deposit: {description}",
+                currency=user.currency
+            )
+            entries_fee = [
+                self.ledger.create_entry(txn_fee.id, phone, -fee, "Deposit Fee", user.currency),
+                self.ledger.create_entry(txn_fee.id, "SYSTEM_REVENUE", fee, "Fee Revenue", user.currency)
+            ]
+            if self.ledger.post_entries(entries_fee):
+                user.balance -= fee
+        self.user_manager.save_users()
+        if fee > 0:
+            return True, f"Deposited {amount_decimal} - {fee:.2f} fee successfully. New balance: {user.balance}"
+        return True, f"Deposited {amount_decimal} successfully. New balance: {user.balance}"
 
+    @metrics.operation("withdraw")
     def withdraw(self, phone: str, amount: float, description: str = "Withdrawal") -> Tuple[bool, str]:
         amount_decimal = Decimal(str(amount))
         user = self.user_manager.get_user(phone)
@@ -244,10 +310,10 @@ class TransactionManager:
         if not allowed:
             return False, msg
 
-        fee = amount_decimal * Decimal("0.01")
+        fee = self.fees.quote("withdraw", amount_decimal, user.currency, user.risk_tier).fee
         total_deduction = amount_decimal + fee
 
-        if user.balance < total_deduction:
+        if self.available_balance(phone) < total_deduction:
             return False, f"Insufficient balance. Amount: ${amount_decimal} + Fee: ${fee:.2f}"
         
         # AML Check
@@ -266,32 +332,43 @@ class TransactionManager:
         )
         
         entries_wd = [
-            self.ledger.create_entry(txn_wd.id, phone, -amount_decimal, "Withdrawal from Wallet"),
-            self.ledger.create_entry(txn_wd.id, "SYSTEM_CASH", amount_decimal, "Cash Out")
+            self.ledger.create_entry(txn_wd.id, phone, -amount_decimal, "Withdrawal from Wallet", user.currency),
+            self.ledger.create_entry(txn_wd.id, "SYSTEM_CASH", amount_decimal, "Cash Out", user.currency)
         ]
 
         # 2. Fee
-        txn_fee = self._create_transaction_record(
-            sender=phone, 
-            receiver="SYSTEM_REVENUE", 
-            amount=fee, 
-            t_type="FEE", 
-            description=f"Fee for Withdrawal: {description}",
-            currency=user.currency
-        )
-        entries_fee = [
-            self.ledger.create_entry(txn_fee.id, phone, -fee, "Withdrawal Fee"),
-            self.ledger.create_entry(txn_fee.id, "SYSTEM_REVENUE", fee, "Fee Revenue")
-        ]
-        
-        if self.ledger.post_entries(entries_wd) and self.ledger.post_entries(entries_fee):
+        entries_fee = []
+        if fee > 0:
+            txn_fee = self._create_transaction_record(
+                sender=phone, 
+                receiver="SYSTEM_REVENUE", 
+                amount=fee, 
+                t_type="FEE", 
+                description=f"Fee for Withdrawal: {description}",
+                currency=user.currency
+            )
+            entries_fee = [
+                self.ledger.create_entry(txn_fee.id, phone, -fee, "Withdrawal Fee", user.currency),
+                self.ledger.create_entry(txn_fee.id, "SYSTEM_REVENUE", fee, "Fee Revenue", user.currency)
+            ]
+
+        if self.ledger.post_entries(entries_wd) and (not entries_fee or self.ledger.post_entries(entries_fee)):
             user.balance -= total_deduction
+            limits.record_usage(user, amount_decimal)
             self.user_manager.save_users()
             return True, f"Withdrawn ${amount_decimal} + ${fee:.2f} fee. New balance: {user.balance:.2f}"
         else:
             return False, "Transaction failed: Ledger Error."
 
-    def transfer(self, sender_phone: str, receiver_phone: str, amount: float, description: str = "Transfer") -> Tuple[bool, str]:
+    @metrics.operation("transfer")
+    def transfer(self, sender_phone: str, receiver_phone: str, amount: float, description: str = "Transfer",
+                 fx_quote_id: Optional[str] = None) -> Tuple[bool, str]:
+        """
+        Moves `amount` (in the sender's currency) to another wallet. Between
+        currencies the receiver is credited at the rate of `fx_quote_id` (from
+        lock_fx_quote, so the reviewed rate is the one charged) or, without
+        one, at the current rate.
+        """
         sender = self.user_manager.get_user(sender_phone)
         receiver = self.user_manager.get_user(receiver_phone)
 
@@ -305,22 +382,41 @@ class TransactionManager:
         if amount_decimal <= 0:
             return False, "Invalid amount"
         
-        # Currency check
+        # Currency conversion
+        fx = None
         if sender.currency != receiver.currency:
-            return False, f"Currency mismatch. Sender: {sender.currency}, Receiver: {receiver.currency}. Conversion not yet supported."
+            if fx_quote_id:
+                fx = self.fx.get(fx_quote_id)
+                if fx is None:
+                    return False, "FX quote expired. Review the new rate and confirm again."
+                if (fx.phone, fx.source, fx.target, fx.amount) != (sender_phone, sender.currency, receiver.currency, amount_decimal):
+                    return False, "FX quote does not match this transfer"
+            else:
+                fx = self.fx.quote(sender_phone, sender.currency, receiver.currency, amount_decimal)
+                if fx is None:
+                    return False, f"No FX rate for {sender.currency}/{receiver.currency}"
 
-        allowed, msg = self._check_limits(sender_phone, amount_decimal)
+        allowed, msg, fee = self._check_debit(sender, amount_decimal, "transfer")
         if not allowed:
             return False, msg
 
-        fee = amount_decimal * Decimal("0.01")
-        total_deduction = amount_decimal + fee
+        # AML Check
+        flagged, flag_reason = self._assess_aml(sender_phone, amount_decimal, counterparty=receiver_phone)
 
-        if sender.balance < total_deduction:
-            return False, f"Insufficient balance. Amount: {sender.currency} {amount_decimal} + Fee: {fee:.2f}"
+        if self._post_transfer(sender, receiver, amount_decimal, fee, description, flagged, flag_reason, fx):
+            if fx_quote_id:
+                self.fx.take(fx_quote_id)
+            return True, "Transfer successful"
+        else:
+            return False, "Transaction failed"
 
-        # AML Check
-        flagged, flag_reason = self._assess_aml(sender_phone, amount_decimal)
+    def _post_transfer(self, sender: User, receiver: User, amount_decimal: Decimal, fee: Decimal, description: str,
+                       flagged: bool = False, flag_reason: str = "", fx: Optional[FxQuote] = None) -> bool:
+        sender_phone, receiver_phone = sender.phone, receiver.phone
+        total_deduction = amount_decimal + fee
+        credited = fx.converted if fx else amount_decimal
+        if fx:
+            description = f"{description} ({fx.target} {credited} @ {fx.rate})"
 
         # 1. Transfer
         txn_tr = self._create_transaction_record(
@@ -334,32 +430,43 @@ class TransactionManager:
             flag_reason=flag_reason
         )
         entries_tr = [
-            self.ledger.create_entry(txn_tr.id, sender_phone, -amount_decimal, "Transfer Out"),
-            self.ledger.create_entry(txn_tr.id, receiver_phone, amount_decimal, "Transfer In")
+            self.ledger.create_entry(txn_tr.id, sender_phone, -amount_decimal, "Transfer Out", sender.currency),
+            self.ledger.create_entry(txn_tr.id, receiver_phone, credited, "Transfer In", receiver.currency)
         ]
+        if fx:
+            # Each currency balances on its own: the FX desk buys the sender's currency and sells the receiver's
+            entries_tr[1:1] = [
+                self.ledger.create_entry(txn_tr.id, position_account(fx.source), amount_decimal, f"FX Buy {fx.source}",
+                                        fx.source),
+                self.ledger.create_entry(txn_tr.id, position_account(fx.target), -credited, f"FX Sell {fx.target}",
+                                        fx.target)
+            ]
 
         # 2. Fee
-        txn_fee = self._create_transaction_record(
-            sender_phone, 
-            "SYSTEM_REVENUE", 
-            fee, 
-            "FEE", 
-            f"Fee for Transfer to {receiver.name}",
-            currency=sender.currency
-        )
-        entries_fee = [
-            self.ledger.create_entry(txn_fee.id, sender_phone, -fee, "Transfer Fee"),
-            self.ledger.create_entry(txn_fee.id, "SYSTEM_REVENUE", fee, "Fee Revenue")
-        ]
-
-        if self.ledger.post_entries(entries_tr) and self.ledger.post_entries(entries_fee):
+        entries_fee = []
+        if fee > 0:
+            txn_fee = self._create_transaction_record(
+                sender_phone, 
+                "SYSTEM_REVENUE", 
+                fee, 
+                "FEE", 
+                f"Fee for Transfer to {receiver.name}",
+                currency=sender.currency
+            )
+            entries_fee = [
+                self.ledger.create_entry(txn_fee.id, sender_phone, -fee, "Transfer Fee", sender.currency),
+                self.ledger.create_entry(txn_fee.id, "SYSTEM_REVENUE", fee, "Fee Revenue", sender.currency)
+            ]
+
+        if self.ledger.post_entries(entries_tr) and (not entries_fee or self.ledger.post_entries(entries_fee)):
             sender.balance -= total_deduction
-            receiver.balance += amount_decimal
+            receiver.balance += credited
+            limits.record_usage(sender, amount_decimal)
             self.user_manager.save_users()
-            return True, "Transfer successful"
-        else:
-            return False, "Transaction failed"
+            return True
+        return False
 
+    @metrics.operation("pay_bill")
     def pay_bill(self, phone: str, amount: float, biller_name: str, biller_id: str, description: str = "Bill Payment") -> Tuple[bool, str]:
         user = self.user_manager.get_user(phone)
         if not user:
@@ -368,19 +475,23 @@ class TransactionManager:
         if amount_decimal <= 0:
            return False, "Invalid amount"
 
-        allowed, msg = self._check_limits(phone, amount_decimal)
+        allowed, msg, fee = self._check_debit(user, amount_decimal, "bill_payment", biller_name)
         if not allowed:
             return False, msg
-
-        fee = Decimal("0.50")
-        total_deduction = amount_decimal + fee
-        
-        if user.balance < total_deduction:
-             return False, f"Insufficient balance. Amount: {user.currency} {amount_decimal} + Fee: {fee:.2f}"
              
         # AML Check
         flagged, flag_reason = self._assess_aml(phone, amount_decimal)
 
+        if self._post_bill_payment(user, amount_decimal, fee, biller_name, biller_id, description, flagged, flag_reason):
+            return True, f"Paid {biller_name} successfully."
+        else:
+            return False, "Transaction Failed"
+
+    def _post_bill_payment(self, user: User, amount_decimal: Decimal, fee: Decimal, biller_name: str, biller_id: str,
+                           description: str, flagged: bool = False, flag_reason: str = "") -> bool:
+        phone = user.phone
+        total_deduction = amount_decimal + fee
+
         # 1. Bill Payment
         full_desc = f"{biller_name} ({biller_id}) - {description}"
         txn_bill = self._create_transaction_record(
@@ -394,31 +505,227 @@ class TransactionManager:
             flag_reason=flag_reason
         )
         entries_bill = [
-            self.ledger.create_entry(txn_bill.id, phone, -amount_decimal, "Bill Payment"),
-            self.ledger.create_entry(txn_bill.id, "BILLER_SYSTEM", amount_decimal, "Bill Payment Received")
+            self.ledger.create_entry(txn_bill.id, phone, -amount_decimal, "Bill Payment", user.currency),
+            self.ledger.create_entry(txn_bill.id, biller_account(biller_name), amount_decimal, "Bill Payment Received",
+                                    user.currency)
         ]
         
         # 2. Fee
-        txn_fee = self._create_transaction_record(
-            phone, 
-            "SYSTEM_REVENUE", 
-            fee, 
-            "FEE", 
-            f"Fee for Bill Pay: {biller_name}",
-            currency=user.currency
-        )
-        entries_fee = [
-            self.ledger.create_entry(txn_fee.id, phone, -fee, "Bill Fee"),
-            self.ledger.create_entry(txn_fee.id, "SYSTEM_REVENUE", fee, "Fee Revenue")
-        ]
-        
-        if self.ledger.post_entries(entries_bill) and self.ledger.post_entries(entries_fee):
+        entries_fee = []
+        if fee > 0:
+            txn_fee = self._create_transaction_record(
+                phone, 
+                "SYSTEM_REVENUE", 
+                fee, 
+                "FEE", 
+                f"Fee for Bill Pay: {biller_name}",
+                currency=user.currency
+            )
+            entries_fee = [
+                self.ledger.create_entry(txn_fee.id, phone, -fee, "Bill Fee", user.currency),
+                self.ledger.create_entry(txn_fee.id, "SYSTEM_REVENUE", fee, "Fee Revenue", user.currency)
+            ]
+
+        if self.ledger.post_entries(entries_bill) and (not entries_fee or self.ledger.post_entries(entries_fee)):
             user.balance -= total_deduction
+            limits.record_usage(user, amount_decimal)
             self.user_manager.save_users()
-            return True, f"Paid {biller_name} successfully."
+            return True
+        return False
+
+    def _check_debit(self, user: User, amount_decimal: Decimal, operation: str,
+                     biller: Optional[str] = None) -> Tuple[bool, str, Decimal]:
+        """Limits and available-balance checks for an outgoing payment; returns (allowed, message, fee)."""
+        allowed, msg = self._check_limits(user.phone, amount_decimal)
+        if not allowed:
+            return False, msg, Decimal("0")
+        fee = self.fees.quote(operation, amount_decimal, user.currency, user.risk_tier, biller).fee
+        if self.available_balance(user.phone) < amount_decimal + fee:
+            return False, f"Insufficient balance. Amount: {user.currency} {amount_decimal} + Fee: {fee:.2f}", fee
+        return True, "", fee
+
+    def available_balance(self, phone: str) -> Decimal:
+        """Wallet balance minus funds held by open authorizations."""
+        user = self.user_manager.get_user(phone)
+        if not user:
+            return Decimal("0")
+        return user.balance - self.holds.held_for(phone)
+
+    def get_holds(self, phone: str) -> List[Hold]:
+        """Open authorizations on `phone`, oldest first."""
+        return self.holds.for_phone(phone)
+
+    @metrics.operation("authorize_bill")
+    def authorize_bill(self, phone: str, amount: float, biller_name: str, biller_id: str, description: str = "Bill Payment",
+                       ttl_seconds: Optional[float] = None) -> Tuple[bool, str]:
+        """
+        Holds amount plus fee for a bill payment without debiting the wallet;
+        capture_hold() pays the biller, void_hold() releases the funds. On
+        success the message is the hold id.
+        """
+        user = self.user_manager.get_user(phone)
+        if not user:
+            return False, "User not found"
+        amount_decimal = Decimal(str(amount))
+        if amount_decimal <= 0:
+            return False, "Invalid amount"
+        allowed, msg, fee = self._check_debit(user, amount_decimal, "bill_payment", biller_name)
+        if not allowed:
+            return False, msg
+        flagged, flag_reason = self._assess_aml(phone, amount_decimal)
+        hold = self.holds.create(phone, "BILL_PAYMENT", biller_name, amount_decimal, fee, user.currency, ttl_seconds,
+                                 reference=biller_id, description=description, flagged=flagged, flag_reason=flag_reason)
+        return True, hold.id
+
+    @metrics.operation("authorize_transfer")
+    def authorize_transfer(self, sender_phone: str, receiver_phone: str, amount: float, description: str = "Transfer",
+                           ttl_seconds: Optional[float] = None) -> Tuple[bool, str]:
+        """Like authorize_bill, for a transfer to another wallet. On success the message is the hold id."""
+        sender = self.user_manager.get_user(sender_phone)
+        receiver = self.user_manager.get_user(receiver_phone)
+        if not sender:
+            return False, "Sender not found"
+        if not receiver:
+            return False, "Receiver not found"
+        if sender_phone == receiver_phone:
+            return False, "Cannot transfer to self"
+        amount_decimal = Decimal(str(amount))
+        if amount_decimal <= 0:
+            return False, "Invalid amount"
+        if sender.currency != receiver.currency:
+            return False, f"Currency mismatch. Sender: {sender.currency}, Receiver: {receiver.currency}. Authorizations are single-currency."
+        allowed, msg, fee = self._check_debit(sender, amount_decimal, "transfer")
+        if not allowed:
+            return False, msg
+        flagged, flag_reason = self._assess_aml(sender_phone, amount_decimal, counterparty=receiver_phone)
+        hold = self.holds.create(sender_phone, "TRANSFER", receiver_phone, amount_decimal, fee, sender.currency, ttl_seconds,
+                                 description=description, flagged=flagged, flag_reason=flag_reason)
+        return True, hold.id
+
+    @metrics.operation("capture_hold")
+    def capture_hold(self, hold_id: str) -> Tuple[bool, str]:
+        """Settles an authorization: posts the payment it reserved funds for."""
+        hold = self.holds.holds.get(hold_id)
+        if hold is None:
+            return False, "Hold not found"
+        if hold.expires_at <= time.time():
+            self.expire_holds()
+            return False, "Hold expired"
+        user = self.user_manager.get_user(hold.phone)
+        if not user:
+            return False, "User not found"
+        receiver = self.user_manager.get_user(hold.counterparty) if hold.kind == "TRANSFER" else None
+        if hold.kind == "TRANSFER" and not receiver:
+            return False, "Receiver not found"
+        # The posting takes the reserved funds out of the wallet itself
+        self.holds.release(hold_id)
+        if receiver:
+            ok = self._post_transfer(user, receiver, hold.amount, hold.fee, hold.description, hold.flagged, hold.flag_reason)
         else:
+            ok = self._post_bill_payment(user, hold.amount, hold.fee, hold.counterparty, hold.reference, hold.description,
+                                         hold.flagged, hold.flag_reason)
+        if not ok:
             return False, "Transaction Failed"
+        return True, f"Captured {hold.currency} {hold.amount} to {hold.counterparty}."
+
+    @metrics.operation("void_hold")
+    def void_hold(self, hold_id: str) -> Tuple[bool, str]:
+        hold = self.holds.release(hold_id)
+        if hold is None:
+            return False, "Hold not found"
+        return True, f"Released {hold.currency} {hold.total}."
+
+    def expire_holds(self, now: Optional[float] = None) -> int:
+        """Releases holds whose expiry has passed (driven by the hold timer heap); returns how many."""
+        expired = self.holds.due(now)
+        for hold in expired:
+            self.holds.release(hold.id, save=False)
+        if expired:
+            self.holds.save_holds()
+        return len(expired)
+
+    def get_schedules(self, phone: str) -> List[Schedule]:
+        """Active standing orders of `phone`, oldest first."""
+        return self.schedules.for_phone(phone)
+
+    def schedule_bill(self, phone: str, amount: float, biller_name: str, biller_id: str, interval: str,
+                      description: str = "Bill Payment", start_at: Optional[float] = None,
+                      occurrences: Optional[int] = None) -> Tuple[bool, str]:
+        """
+        Sets up a recurring pay_bill every DAILY/WEEKLY/MONTHLY interval from
+        `start_at` (Unix time, default now), until cancelled or for
+        `occurrences` runs. On success the message is the schedule id.
+        """
+        user = self.user_manager.get_user(phone)
+        if not user:
+            return False, "User not found"
+        return self._create_schedule(phone, "BILL_PAYMENT", biller_name, amount, interval, start_at, occurrences,
+                                     reference=biller_id, description=description)
 
+    def schedule_transfer(self, sender_phone: str, receiver_phone: str, amount: float, interval: str,
+                          description: str = "Standing Order", start_at: Optional[float] = None,
+                          occurrences: Optional[int] = None) -> Tuple[bool, str]:
+        """Like schedule_bill, for a recurring transfer (rent, school fees). On success the message is the schedule id."""
+        sender = self.user_manager.get_user(sender_phone)
+        receiver = self.user_manager.get_user(receiver_phone)
+        if not sender:
+            return False, "Sender not found"
+        if not receiver:
+            return False, "Receiver not found"
+        if sender_phone == receiver_phone:
+            return False, "Cannot transfer to self"
+        if sender.currency != receiver.currency:
+            return False, f"Currency mismatch. Sender: {sender.currency}, Receiver: {receiver.currency}. Standing orders are single-currency."
+        return self._create_schedule(sender_phone, "TRANSFER", receiver_phone, amount, interval, start_at, occurrences,
+                                     description=description)
+
+    def _create_schedule(self, phone: str, kind: str, counterparty: str, amount: float, interval: str,
+                         start_at: Optional[float], occurrences: Optional[int], **details) -> Tuple[bool, str]:
+        amount_decimal = Decimal(str(amount))
+        if amount_decimal <= 0:
+            return False, "Invalid amount"
+        interval = interval.upper()
+        if interval not in INTERVALS:
+            return False, f"Invalid interval. Use one of: {', '.join(INTERVALS)}"
+        if occurrences is not None and occurrences <= 0:
+            return False, "Occurrences must be positive"
+        schedule = self.schedules.create(phone, kind, counterparty, amount_decimal, interval, start_at,
+                                         remaining=occurrences, **details)
+        return True, schedule.id
+
+    def cancel_schedule(self, schedule_id: str) -> Tuple[bool, str]:
+        schedule = self.schedules.cancel(schedule_id)
+        if schedule is None:
+            return False, "Schedule not found"
+        return True, f"Cancelled standing order to {schedule.counterparty}."
+
+    def run_schedules(self, now: Optional[float] = None) -> int:
+        """
+        Runs one batch of due standing orders through pay_bill/transfer (driven
+        by the schedule timer heap); returns how many were attempted. A payment
+        short of funds is retried with backoff before the occurrence is missed.
+        Each order is moved on and logged right after its payment is saved, so
+        a crash mid-batch can't pay the completed ones again on restart.
+        """
+        now = time.time() if now is None else now
+        due = self.schedules.due(now)
+        for i, schedule in enumerate(due):
+            try:
+                if schedule.kind == "TRANSFER":
+                    ok, msg = self.transfer(schedule.phone, schedule.counterparty, schedule.amount, schedule.description)
+                else:
+                    ok, msg = self.pay_bill(schedule.phone, schedule.amount, schedule.counterparty, schedule.reference,
+                                            schedule.description)
+            except Exception:
+                # Requeue what this batch popped but didn't get to, so the next tick still runs it
+                for pending in due[i:]:
+                    self.schedules.push(pending)
+                raise
+            self.schedules.record(schedule, ok, msg, now)
+            self.schedules.save_schedules()
+        return len(due)
+
+    @metrics.operation("request_money")
     def request_money(self, requester_phone: str, payer_phone: str, amount: float, description: str = "Money Request") -> Tuple[bool, str]:
         # Just create a record with PENDING status. No money moves yet.
         requester = self.user_manager.get_user(requester_phone)
@@ -443,13 +750,15 @@ class TransactionManager:
         )
         # Update status to PENDING
         t.status = "PENDING"
+        self.updated_ids.add(t.id)
         self.save_transactions()
         
         return True, "Request sent successfully."
 
+    @metrics.operation("process_request")
     def process_request(self, t_id: str, action: str) -> Tuple[bool, str]: # action = 'PAY' or 'DECLINE'
         # Find transaction
-        target_t = next((t for t in self.transactions if t.id == t_id), None)
+        target_t = self.get_transaction(t_id)
         if not target_t:
             return False, "Request not found"
             
@@ -458,14 +767,32 @@ class TransactionManager:
             
         if action == "DECLINE":
             target_t.status = "DECLINED"
+            self.updated_ids.add(target_t.id)
             self.save_transactions()
             return True, "Request declined."
             
         elif action == "PAY":
             # Execute Transfer Logic
-            success, msg = self.transfer(target_t.sender_phone, target_t.receiver_phone, target_t.amount, target_t.description)
+            payer = self.user_manager.get_user(target_t.sender_phone)
+            requester = self.user_manager.get_user(target_t.receiver_phone)
+            if payer and requester and payer.currency != target_t.currency:
+                # The request is in the requester's currency: debit the payer whatever converts to it
+                if requester.currency != target_t.currency:
+                    return False, f"Request is in {target_t.currency} but the requester's wallet is in {requester.currency}"
+                quote = self.fx.quote_for(payer.phone, payer.currency, target_t.currency, target_t.amount)
+                if quote is None:
+                    return False, f"No FX rate for {payer.currency}/{target_t.currency}"
+                self.fx.lock(quote)
+                success, msg = self.transfer(payer.phone, requester.phone, quote.amount, target_t.description,
+                                             fx_quote_id=quote.id)
+                if not success:
+                    self.fx.take(quote.id)
+            else:
+                success, msg = self.transfer(target_t.sender_phone, target_t.receiver_phone, target_t.amount,
+                                             target_t.description)
             if success:
                 target_t.status = "COMPLETED"
+                self.updated_ids.add(target_t.id)
                 # The transfer() call creates a NEW COMPLETED transaction record for the actual movement.
                 # So we just mark this request as completed.
                 self.save_transactions()
@@ -475,6 +802,86 @@ class TransactionManager:
         
         return False, "Invalid action"
 
+    def lock_fx_quote(self, sender_phone: str, receiver_phone: str, amount: float) -> Tuple[bool, str]:
+        """
+        Quotes a cross-currency transfer and holds the rate for the quote window,
+        so the review screen and transfer(fx_quote_id=...) agree. On success the
+        message is the quote id.
+        """
+        sender = self.user_manager.get_user(sender_phone)
+        receiver = self.user_manager.get_user(receiver_phone)
+        if not sender:
+            return False, "Sender not found"
+        if not receiver:
+            return False, "Receiver not found"
+        if sender.currency == receiver.currency:
+            return False, "No conversion needed"
+        amount_decimal = Decimal(str(amount))
+        if amount_decimal <= 0:
+            return False, "Invalid amount"
+        quote = self.fx.quote(sender_phone, sender.currency, receiver.currency, amount_decimal)
+        if quote is None:
+            return False, f"No FX rate for {sender.currency}/{receiver.currency}"
+        return True, self.fx.lock(quote).id
+
+    def get_fx_quote(self, quote_id: str) -> Optional[FxQuote]:
+        """A locked quote that hasn't expired or been used."""
+        return self.fx.get(quote_id)
+
+    def quote_fee(self, phone: str, operation: str, amount: float, biller: Optional[str] = None) -> FeeQuote:
+        """The fee `phone` would pay, from the same schedule the operation itself charges."""
+        user = self.user_manager.get_user(phone)
+        currency = user.currency if user else None
+        tier = user.risk_tier if user else None
+        return self.fees.quote(operation, Decimal(str(amount)), currency, tier, biller)
+
+    def transfer_graph(self) -> TransferGraph:
+        """The transfer graph, caught up with any transfers since the last call."""
+        self.graph.sync(self.transactions)
+        return self.graph
+
+    def settlement_queue(self) -> List[dict]:
+        """Bill payments per biller waiting for the next settlement batch."""
+        return self.settler.queued()
+
+    def settle_billers(self, period_end: Optional[str] = None) -> List[dict]:
+        """Batches bill payments posted before `period_end` into one settlement per biller (see settlement.py)."""
+        return self.settler.run(period_end)
+
+    def retry_settlements(self) -> List[dict]:
+        return self.settler.retry()
+
+    def reconcile(self, full: bool = False) -> ReconciliationReport:
+        """Diffs every wallet balance against the ledger, continuing from the last checkpoint unless `full`."""
+        wallets = {phone: user.balance for phone, user in self.user_manager.users.items()}
+        return self.reconciler.run(self.ledger.entries, wallets, full=full)
+
+    def ledger_proofs(self, transaction_id: str) -> List[dict]:
+        """Inclusion proofs for a transaction's ledger entries (see hashchain.inclusion_proofs)."""
+        return self.ledger.inclusion_proofs(transaction_id)
+
+    def get_transaction(self, t_id: str) -> Optional[Transaction]:
+        return self.index.get(self.transactions, t_id)
+
+    @metrics.operation("get_history")
     def get_history(self, phone: str) -> List[Transaction]:
-        history = [t for t in self.transactions if t.sender_phone == phone or t.receiver_phone == phone]
-        return history
+        return self.index.for_phone(self.transactions, phone)
+
+    def flagged_transactions(self) -> List[Transaction]:
+        return [t for t in self.transactions if t.flagged]
+
+    def revenue_transactions(self) -> List[Transaction]:
+        """Fees and other credits to SYSTEM_REVENUE."""
+        return [t for t in self.transactions if t.receiver_phone == "SYSTEM_REVENUE"]
+
+    @metrics.operation("query_transactions")
+    def query_transactions(self, start: str = None, end: str = None, t_type: str = None, status: str = None,
+                           flagged: bool = None, phone: str = None, offset: int = 0, limit: int = 50,
+                           newest_first: bool = True) -> Tuple[List[Transaction], bool]:
+        """
+        Paged, filtered view of all transactions for the admin feed.
+        start/end are ISO timestamps (end exclusive). Returns (page, has_more).
+        """
+        return self.index.query(self.transactions, start=start, end=end, t_type=t_type, status=status,
+                                flagged=flagged, phone=phone, offset=offset, limit=limit,
+                                newest_first=newest_first)
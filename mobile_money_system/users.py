@@ -1,20 +1,51 @@
 import hashlib
 import random
+import re
 import time
-from typing import Dict, Optional, Tuple
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
 
 try:
     from models import User
     from storage import JsonStorage
+    from indexes import UserSearchIndex
 except ImportError:
     from mobile_money_system.models import User
     from mobile_money_system.storage import JsonStorage
+    from mobile_money_system.indexes import UserSearchIndex
+
+ID_TYPES = ("passport", "national_id")
+
+
+def validate_phone(phone):
+    return re.match(r'^\d{10,15}$', phone)
+
+
+def hash_pin(pin: str) -> str:
+    return hashlib.sha256(pin.encode()).hexdigest()
+
+
+def hash_answer(answer: str) -> str:
+    return hashlib.sha256(answer.lower().strip().encode()).hexdigest()
+
+
+def check_kyc(id_type: str, id_number: str) -> Tuple[bool, bool, str]:
+    """KYC rules for an ID document: (accepted, verified, message)."""
+    if id_type not in ID_TYPES:
+        return False, False, "Invalid ID Type. Must be 'passport' or 'national_id'"
+    # specific logic: In a real app this would go to pending. 
+    # For this prototype we'll verify immediately if ID number > 5 chars.
+    if len(id_number) > 5:
+        return True, True, "KYC Verified successfully."
+    return True, False, "KYC Submitted but rejected (ID too short)."
+
 
 class UserManager:
     def __init__(self, db_file: str = "users.json"):
         self.storage = JsonStorage(db_file)
         self.users: Dict[str, User] = {}
         self.otp_storage: Dict[str, dict] = {} # {phone: {'code': '1234', 'expiry': timestamp}}
+        self.search_index = UserSearchIndex()
         self.load_users()
 
     def load_users(self):
@@ -27,7 +58,7 @@ class UserManager:
         
         # Create Default Admin if not exists
         if "0000000000" not in self.users:
-            admin_pin = hashlib.sha256("admin123".encode()).hexdigest()
+            admin_pin = hash_pin("admin123")
             self.users["0000000000"] = User(
                 phone="0000000000",
                 name="System Admin",
@@ -36,6 +67,8 @@ class UserManager:
             )
             self.save_users()
 
+        self.search_index.rebuild(self.users)
+
     def save_users(self):
         data = {phone: user.to_dict() for phone, user in self.users.items()}
         self.storage.save(data)
@@ -45,9 +78,9 @@ class UserManager:
             return False, "User already exists"
         
         # Hash the PIN before storing
-        hashed_pin = hashlib.sha256(pin.encode()).hexdigest()
+        hashed_pin = hash_pin(pin)
         # Hash the Security Answer for privacy
-        hashed_ans = hashlib.sha256(sec_a.lower().strip().encode()).hexdigest()
+        hashed_ans = hash_answer(sec_a)
         
         new_user = User(
             phone=phone,
@@ -59,28 +92,37 @@ class UserManager:
             is_verified=False # Requires KYC
         )
         self.users[phone] = new_user
+        self.search_index.add(new_user)
         self.save_users()
         return True, "User registered successfully. Please complete KYC to transact."
 
+    def import_users(self, users: List[User]) -> List[str]:
+        """Adds new users in one save (bulk onboarding); returns the phones skipped as already registered."""
+        duplicates = []
+        for user in users:
+            if user.phone in self.users:
+                duplicates.append(user.phone)
+                continue
+            self.users[user.phone] = user
+            self.search_index.add(user)
+        if len(duplicates) < len(users):
+            self.save_users()
+        return duplicates
+
     def submit_kyc(self, phone: str, id_type: str, id_number: str) -> Tuple[bool, str]:
         user = self.users.get(phone)
         if not user:
             return False, "User not found"
         
-        if id_type not in ["passport", "national_id"]:
-             return False, "Invalid ID Type. Must be 'passport' or 'national_id'"
+        accepted, verified, msg = check_kyc(id_type, id_number)
+        if not accepted:
+             return False, msg
         
         user.id_type = id_type
         user.id_number = id_number
-        # specific logic: In a real app this would go to pending. 
-        # For this prototype we'll verify immediately if ID number > 5 chars.
-        if len(id_number) > 5:
-            user.is_verified = True
-            msg = "KYC Verified successfully."
-        else:
-            user.is_verified = False
-            msg = "KYC Submitted but rejected (ID too short)."
+        user.is_verified = verified
             
+        self.search_index.add(user)
         self.save_users()
         return True, msg
 
@@ -89,7 +131,7 @@ class UserManager:
         if not user:
             return False
         
-        hashed_attempt = hashlib.sha256(answer_attempt.lower().strip().encode()).hexdigest()
+        hashed_attempt = hash_answer(answer_attempt)
         return user.sec_a == hashed_attempt
 
     def reset_pin(self, phone: str, new_pin: str) -> Tuple[bool, str]:
@@ -97,8 +139,7 @@ class UserManager:
         if not user:
             return False, "User not found"
             
-        hashed_pin = hashlib.sha256(new_pin.encode()).hexdigest()
-        user.pin = hashed_pin
+        user.pin = hash_pin(new_pin)
         self.save_users()
         return True, "PIN reset successfully"
 
@@ -106,7 +147,7 @@ class UserManager:
         user = self.users.get(phone)
         if user:
             # Check hashed pin
-            hashed_input = hashlib.sha256(pin.encode()).hexdigest()
+            hashed_input = hash_pin(pin)
             # Fallback for old plain text pins (optional, but good for dev)
             if user.pin == hashed_input or user.pin == pin:
                  return user
@@ -114,6 +155,14 @@ class UserManager:
 
     def get_user(self, phone: str) -> Optional[User]:
         return self.users.get(phone)
+
+    def total_balance(self) -> Decimal:
+        """Sum of all wallet balances (the float). A method, so shared engines run it under their lock."""
+        return sum((user.balance for user in self.users.values()), Decimal("0"))
+
+    def search_users(self, query: str, limit: int = 50, status: str = None) -> List[User]:
+        """Ranked, capped search over phone prefix, name tokens and exact ID number."""
+        return [self.users[phone] for phone in self.search_index.search(query, limit, status or None)]
     
     def generate_otp(self, phone: str) -> str:
         code = str(random.randint(100000, 999999))
@@ -151,14 +200,12 @@ class UserManager:
             user.name = name
         if pin:
              # Hash the PIN before storing
-            hashed_pin = hashlib.sha256(pin.encode()).hexdigest()
-            user.pin = hashed_pin
+            user.pin = hash_pin(pin)
         
         if sec_q and sec_a:
             user.sec_q = sec_q
             # Hash the answer
-            hashed_ans = hashlib.sha256(sec_a.lower().strip().encode()).hexdigest()
-            user.sec_a = hashed_ans
+            user.sec_a = hash_answer(sec_a)
             
         if status:
             if status not in ["active", "suspended", "deleted"]:
@@ -170,6 +217,8 @@ class UserManager:
                 return False, "Invalid risk tier"
             user.risk_tier = risk_tier
             
+        if name or status:
+            self.search_index.add(user)
         self.save_users()
         return True, "Profile updated successfully"
 
@@ -181,8 +230,7 @@ class UserManager:
         # Determine strictness of this action
         # For prototype, we generate a random 4 digit pin
         new_pin_raw = str(random.randint(1000, 9999))
-        hashed_pin = hashlib.sha256(new_pin_raw.encode()).hexdigest()
-        user.pin = hashed_pin
+        user.pin = hash_pin(new_pin_raw)
         self.save_users()
         return True, f"PIN reset to: {new_pin_raw}"
 
@@ -201,5 +249,6 @@ class UserManager:
             
         # Hard delete from dictionary
         del self.users[phone]
+        self.search_index.remove(phone)
         self.save_users()
         return True, "User permanently deleted."
@@ -0,0 +1,41 @@
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mobile_money_system.transactions import TransactionManager
+from mobile_money_system.users import UserManager
+
+class StoreTestCase(unittest.TestCase):
+    """
+    A fresh store in a temp directory with verified users, the first of them
+    funded. Subclasses override the class attributes for their own fixture
+    data and extend setUp for anything else.
+    """
+    users = (("0770000001", "USD"), ("0770000002", "USD"))
+    opening_balance = 1000
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.data = self.data_dir()
+        self.files = [os.path.join(self.data, name) for name in ("users.json", "transactions.json", "ledger.json")]
+        self.um, self.tm = self.open_store()
+        for phone, currency in self.users:
+            self.register(phone, currency)
+        if self.users and self.opening_balance:
+            self.tm.deposit(self.users[0][0], self.opening_balance)
+
+    def data_dir(self) -> str:
+        return self.tmp.name
+
+    def open_store(self):
+        um = UserManager(self.files[0])
+        return um, TransactionManager(um, *self.files[1:])
+
+    def register(self, phone: str, currency: str = "USD"):
+        """Registers `phone` (named after itself) and verifies it."""
+        self.um.register(phone, phone, "1234", "q", "a", currency)
+        self.um.submit_kyc(phone, "passport", "P1234567")
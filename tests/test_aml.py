@@ -0,0 +1,93 @@
+import unittest
+import sys
+import os
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mobile_money_system.aml import AMLEngine, DEFAULT_RULES
+from mobile_money_system.limits import TIER_LIMITS
+from mobile_money_system.models import Transaction, User
+
+class TestAMLEngine(unittest.TestCase):
+    def setUp(self):
+        self.users = {
+            "sender": User("sender", "Sender", "1234", Decimal("100000"), is_verified=True),
+        }
+        self.engine = AMLEngine(DEFAULT_RULES, self.users.get)
+        self.transactions = []
+        # Midday, so events minutes earlier always fall on the same day
+        self.now = datetime(2026, 3, 18, 12, 0)
+
+    def add(self, amount, receiver="receiver", minutes_ago=1, t_type="TRANSFER"):
+        ts = (self.now - timedelta(minutes=minutes_ago)).isoformat()
+        self.transactions.append(Transaction(id=f"T{len(self.transactions)}", sender_phone="sender", receiver_phone=receiver,
+                                             amount=Decimal(str(amount)), currency="USD", type=t_type, timestamp=ts))
+
+    def assess(self, amount, counterparty="receiver"):
+        self.engine.sync(self.transactions)
+        return self.engine.assess("sender", Decimal(str(amount)), self.users["sender"], counterparty,
+                                  now=self.now.timestamp())
+
+    def test_clean(self):
+        self.add(100, minutes_ago=60)
+        result = self.assess(100)
+        self.assertFalse(result.flagged)
+        self.assertGreaterEqual(result.elapsed_ms, 0)
+
+    def test_fees_do_not_count_towards_velocity(self):
+        for _ in range(4):
+            self.add(100)
+            self.add(1, receiver="SYSTEM_REVENUE", t_type="FEE")
+        self.assertNotIn("velocity", self.assess(100).rules)
+        self.add(100)
+        self.assertIn("velocity", self.assess(100).rules)
+
+    def test_velocity_window_expires(self):
+        for _ in range(5):
+            self.add(100, minutes_ago=10)
+        self.assertNotIn("velocity", self.assess(100).rules)
+
+    def test_structuring_below_tier_limit(self):
+        # Standard tier limit is 5000; repeated 4,800s are just under it
+        rules = [dict(r, enabled=True) if r["id"] == "structuring" else r for r in DEFAULT_RULES]
+        self.engine = AMLEngine(rules, self.users.get)
+        self.add(4800, minutes_ago=23 * 60)  # yesterday, so today's volume stays under the daily rule
+        self.add(4900, minutes_ago=60)
+        result = self.assess(4850)
+        self.assertEqual(result.rules, ["structuring"])
+        self.assertIn("structuring", result.reason)
+
+    def test_daily_volume(self):
+        for _ in range(2):
+            self.add(4000, minutes_ago=30)
+        self.assertNotIn("daily_volume", self.assess(1900).rules)
+        self.assertIn("daily_volume", self.assess(2100).rules)
+
+    def test_daily_volume_flags_below_the_daily_cap(self):
+        rule = next(r for r in DEFAULT_RULES if r["id"] == "daily_volume")
+        for tier, limits in TIER_LIMITS.items():
+            self.assertLess(Decimal(str(rule["tiers"][tier])), limits["daily_volume"], tier)
+
+    def test_new_counterparty_burst(self):
+        for i in range(4):
+            self.add(10, receiver=f"new_{i}", minutes_ago=20 - i)
+        self.assertIn("new_counterparty_burst", self.assess(10, counterparty="new_99").rules)
+        self.assertNotIn("new_counterparty_burst", self.assess(10, counterparty="new_0").rules)
+
+    def test_tier_and_currency_thresholds(self):
+        rules = [{"id": "large", "type": "amount_threshold", "default": 10000,
+                  "tiers": {"low": 500}, "tier_currency": {"standard:LRD": 1500000}}]
+        engine = AMLEngine(rules)
+        low = User("low", "Low", "1234", Decimal("0"), currency="USD", risk_tier="low")
+        lrd = User("lrd", "Lrd", "1234", Decimal("0"), currency="LRD")
+        self.assertTrue(engine.assess("low", Decimal("600"), low).flagged)
+        self.assertFalse(engine.assess("lrd", Decimal("20000"), lrd).flagged)
+
+    def test_unknown_rule_type(self):
+        with self.assertRaises(ValueError):
+            AMLEngine([{"id": "x", "type": "nope"}])
+
+if __name__ == '__main__':
+    unittest.main()
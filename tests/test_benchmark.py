@@ -0,0 +1,34 @@
+import unittest
+import sys
+import os
+import io
+import json
+import tempfile
+from contextlib import redirect_stderr
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mobile_money_system.benchmark import OPERATIONS, main
+
+class TestBenchmark(unittest.TestCase):
+    def test_smoke(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out = os.path.join(tmp, "bench.json")
+            stderr = io.StringIO()
+            with redirect_stderr(stderr):
+                main(["--users", "20", "--ops", "5", "--output", out])
+            with open(out) as f:
+                report = json.load(f)
+        self.assertEqual(report["meta"]["users"], 20)
+        self.assertEqual(report["meta"]["ops_per_operation"], 5)
+        self.assertEqual(list(report["results"]), OPERATIONS)
+        for name, stats in report["results"].items():
+            self.assertEqual(set(stats), {"count", "errors", "ops_per_sec", "mean_ms", "p50_ms", "p99_ms", "max_ms"}, name)
+            self.assertEqual(stats["count"], 5, name)
+        # Reversals and request payments run against the ids the earlier operations recorded
+        self.assertEqual(report["results"]["reverse_transaction"]["errors"], 0)
+        self.assertEqual(report["results"]["process_request"]["errors"], 0)
+        self.assertIn("reverse_transaction", stderr.getvalue())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import sys
+import os
+import io
+import csv
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mobile_money_system.bulk_import import import_users
+from mobile_money_system.users import UserManager
+from base import StoreTestCase
+
+HEADER = "phone,name,pin,sec_q,sec_a,currency,id_type,id_number\n"
+
+class TestBulkImport(StoreTestCase):
+    users = ()
+
+    def setUp(self):
+        super().setUp()
+        self.um.register("0770000001", "Existing", "1234", "q", "a")
+
+    def run_import(self, rows, **kwargs):
+        rejects = io.StringIO()
+        report = import_users(self.um, io.StringIO(HEADER + "".join(rows)), rejects, **kwargs)
+        return report, list(csv.DictReader(io.StringIO(rejects.getvalue())))
+
+    def test_valid_rows_register_like_register_and_kyc(self):
+        report, rejects = self.run_import([
+            "0770000002,Ann,4321,Pet?,Rex,kes,passport,P1234567\n",
+            "0770000003,Ben,1111,Pet?,Tom,,national_id,123\n",
+            "0770000004,Cy,2222,Pet?,Max,USD,,\n",
+        ])
+        self.assertEqual((report.imported, report.verified, report.rejected), (3, 1, 0))
+        self.assertEqual(rejects, [])
+        ann = self.um.get_user("0770000002")
+        self.assertEqual((ann.currency, ann.is_verified, ann.id_type), ("KES", True, "passport"))
+        self.assertIs(self.um.login("0770000002", "4321"), ann)
+        self.assertTrue(self.um.verify_security_answer("0770000002", " rex "))
+        self.assertFalse(self.um.get_user("0770000003").is_verified)  # ID too short, as in submit_kyc
+        self.assertEqual([u.phone for u in self.um.search_users("Cy")], ["0770000004"])
+        # Committed to disk, not just memory
+        self.assertIsNotNone(UserManager(self.um.storage.filepath).get_user("0770000004"))
+
+    def test_rejects_and_duplicates(self):
+        report, rejects = self.run_import([
+            "0770000001,Dup,1234,q,a,USD,,\n",
+            "12345,Short,1234,q,a,USD,,\n",
+            "0770000005,Eve,12ab,q,a,USD,,\n",
+            "0770000006,Fay,1234,q,a,USD,drivers_license,D1234567\n",
+            "0770000007,,1234,q,a,USD,,\n",
+            "0770000008,Gus,1234,q,a,XYZ,,\n",
+            "0770000009,Hal,1234,q,a,USD,,\n",
+            "0770000009,Hal again,1234,q,a,USD,,\n",
+        ])
+        self.assertEqual((report.rows, report.imported, report.rejected, report.duplicates), (8, 1, 7, 2))
+        self.assertEqual([(r["line"], r["reason"]) for r in rejects], [
+            ("2", "Already registered"), ("3", "Invalid phone number"), ("4", "PIN must be 4 digits"),
+            ("5", "Invalid ID Type. Must be 'passport' or 'national_id'"), ("6", "Missing name"),
+            ("7", "Unsupported currency"), ("9", "Duplicate in file"),
+        ])
+        self.assertEqual(rejects[0]["pin"], "")  # Secrets aren't copied to the reject file
+        self.assertEqual(self.um.get_user("0770000001").name, "Existing")
+
+    def test_chunked_commits_with_progress_and_pool(self):
+        rows = [f"07710000{i:02d},User {i},1234,q,a,USD,passport,P00000{i:02d}\n" for i in range(10)]
+        seen = []
+        report, _ = self.run_import(rows, chunk_rows=4, workers=2, progress=lambda r: seen.append(r.imported))
+        self.assertEqual(seen, [4, 8, 10])
+        self.assertEqual((report.imported, report.verified, report.chunks), (10, 10, 3))
+        self.assertIsNotNone(self.um.login("0771000009", "1234"))
+
+if __name__ == '__main__':
+    unittest.main()
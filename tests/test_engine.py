@@ -0,0 +1,111 @@
+import unittest
+import sys
+import os
+import tempfile
+import time
+import multiprocessing
+import threading
+from decimal import Decimal
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mobile_money_system.engine import MoneyEngine
+
+def _deposit_worker(files, lock_file, n):
+    engine = MoneyEngine(*files, lock_file=lock_file)
+    for _ in range(n):
+        engine.transaction_manager.deposit("0770000001", 1)
+
+class TestSharedEngine(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.files = [os.path.join(self.tmpdir.name, f) for f in ("users.json", "transactions.json", "ledger.json")]
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_saves_notify_subscribers(self):
+        engine = MoneyEngine(*self.files)
+        seen = []
+        unsubscribe = engine.subscribe(seen.append)
+        engine.user_manager.register("0770000001", "Alice", "1234", "q", "a")
+        self.assertEqual(seen, [engine.version])
+        unsubscribe()
+        engine.user_manager.reset_pin("0770000001", "4321")
+        self.assertEqual(len(seen), 1)
+
+    def test_refresh_picks_up_other_process_writes(self):
+        reader = MoneyEngine(*self.files)
+        self.assertFalse(reader.refresh())
+
+        time.sleep(0.01) # make sure the mtime moves
+        writer = MoneyEngine(*self.files)
+        writer.user_manager.register("0770000001", "Alice", "1234", "q", "a")
+
+        self.assertTrue(reader.refresh())
+        self.assertIsNotNone(reader.user_manager.get_user("0770000001"))
+        self.assertFalse(reader.refresh())
+
+    def test_admin_totals_run_under_the_lock(self):
+        engine = MoneyEngine(*self.files)
+        engine.user_manager.register("0770000001", "Alice", "1234", "q", "a")
+        engine.user_manager.submit_kyc("0770000001", "passport", "P1234567")
+        engine.transaction_manager.deposit("0770000001", 100)
+        engine.transaction_manager.withdraw("0770000001", 10)
+        self.assertEqual(engine.user_manager.total_balance(), engine.user_manager.get_user("0770000001").balance)
+        self.assertEqual([t.type for t in engine.transaction_manager.revenue_transactions()], ["FEE"])
+        self.assertEqual(engine.transaction_manager.flagged_transactions(), [])
+
+        # While another thread holds the engine lock (e.g. mid-register), the read waits for it
+        done = threading.Event()
+        with engine.lock:
+            reader = threading.Thread(target=lambda: (engine.user_manager.total_balance(), done.set()))
+            reader.start()
+            self.assertFalse(done.wait(0.1))
+        reader.join()
+        self.assertTrue(done.is_set())
+
+class TestSharedStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.files = [os.path.join(self.tmpdir.name, f) for f in ("users.json", "transactions.json", "ledger.json")]
+        self.lock_file = os.path.join(self.tmpdir.name, "store.lock")
+        engine = MoneyEngine(*self.files, lock_file=self.lock_file)
+        engine.user_manager.register("0770000001", "Alice", "1234", "q", "a")
+        engine.user_manager.submit_kyc("0770000001", "passport", "P1234567")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_writes_reload_stale_state_first(self):
+        a = MoneyEngine(*self.files, lock_file=self.lock_file)
+        b = MoneyEngine(*self.files, lock_file=self.lock_file)
+        a.transaction_manager.deposit("0770000001", 10)
+        # b never refreshed, but its write still starts from a's
+        b.transaction_manager.deposit("0770000001", 5)
+        self.assertTrue(a.refresh())
+        self.assertEqual(a.user_manager.get_user("0770000001").balance, Decimal("15"))
+        self.assertEqual(len(a.transaction_manager.transactions), 2)
+        self.assertFalse(a.refresh())
+
+    def test_reads_do_not_bump_the_version(self):
+        a = MoneyEngine(*self.files, lock_file=self.lock_file)
+        version = a.store.version()
+        a.transaction_manager.get_history("0770000001")
+        a.transaction_manager.deposit("0770000001", 0)  # rejected, nothing saved
+        self.assertEqual(a.store.version(), version)
+
+    def test_concurrent_processes(self):
+        ctx = multiprocessing.get_context("fork")
+        workers = [ctx.Process(target=_deposit_worker, args=(self.files, self.lock_file, 10)) for _ in range(4)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        engine = MoneyEngine(*self.files, lock_file=self.lock_file)
+        self.assertEqual(engine.user_manager.get_user("0770000001").balance, Decimal("40"))
+        self.assertEqual(len(engine.transaction_manager.transactions), 40)
+        self.assertTrue(engine.transaction_manager.ledger.verify().ok)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+import sys
+import os
+import csv
+import io
+from contextlib import redirect_stderr
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mobile_money_system import exports
+from mobile_money_system.exports import (TRANSACTION_FIELDS, USER_FIELDS, deferred_export, export, iter_csv_chunks,
+                                         main, parquet_available, write_parquet)
+from base import StoreTestCase
+
+def _rows(data: bytes):
+    return list(csv.DictReader(io.StringIO(data.decode("utf-8"))))
+
+class TestExports(StoreTestCase):
+    opening_balance = 500
+
+    def setUp(self):
+        super().setUp()
+        self.tm.transfer("0770000001", "0770000002", 100)
+        # Fixed times for the date filters: the deposit in March, everything after it in April
+        for t in self.tm.transactions:
+            t.timestamp = "2026-03-10T09:00:00" if t.type == "DEPOSIT" else "2026-04-02T15:30:00"
+        self.tm.save_transactions()
+
+    def export(self, dataset, fmt="csv", **filters):
+        out = io.BytesIO()
+        count = export(dataset, fmt, out, self.um, self.tm, **filters)
+        return count, out.getvalue()
+
+    def test_csv_chunks_share_one_header(self):
+        rows = [{"phone": str(i), "name": f"user {i}"} for i in range(5)]
+        chunks = list(iter_csv_chunks(rows, ["phone", "name"], chunk_rows=2))
+        self.assertEqual(len(chunks), 3)
+        self.assertTrue(chunks[0].startswith("phone,name"))
+        self.assertFalse(any("phone,name" in chunk for chunk in chunks[1:]))
+        self.assertEqual(_rows("".join(chunks).encode()), rows)
+
+    def test_user_export_drops_secrets(self):
+        count, data = self.export("users")
+        rows = _rows(data)
+        self.assertEqual(count, len(self.um.users))
+        self.assertEqual(list(rows[0]), USER_FIELDS)
+        self.assertLessEqual({"0770000001", "0770000002"}, {r["phone"] for r in rows})
+        self.assertEqual(self.export("users", types=["SUSPENDED"])[0], 0)
+
+    def test_type_and_date_filters(self):
+        count, data = self.export("transactions", types=["DEPOSIT"])
+        self.assertEqual(count, 1)
+        self.assertEqual([r["type"] for r in _rows(data)], ["DEPOSIT"])
+
+        # Start is inclusive, end exclusive
+        count, data = self.export("transactions", start="2026-04-02T15:30:00")
+        self.assertEqual({r["type"] for r in _rows(data)}, {"TRANSFER", "FEE"})
+        self.assertEqual(self.export("transactions", end="2026-03-10T09:00:00")[0], 0)
+        self.assertEqual(self.export("transactions", start="2026-03-01", end="2026-04-01")[0], 1)
+
+        count, data = self.export("ledger", types=["0770000002"])
+        self.assertEqual([r["amount"] for r in _rows(data)], ["100"])
+
+    def test_empty_result_still_has_header(self):
+        count, data = self.export("transactions", start="2027-01-01")
+        self.assertEqual(count, 0)
+        self.assertEqual(data.decode().strip().split(","), TRANSACTION_FIELDS)
+
+    @unittest.skipUnless(parquet_available(), "pyarrow not installed")
+    def test_parquet_row_groups_round_trip(self):
+        rows = [{"phone": str(i), "name": f"user {i}", "balance": i * 10} for i in range(5)]
+        out = io.BytesIO()
+        self.assertEqual(write_parquet(rows, ["phone", "name", "balance"], out, chunk_rows=2), 5)
+        parquet = exports.pq.ParquetFile(io.BytesIO(out.getvalue()))
+        self.assertEqual(parquet.metadata.num_row_groups, 3)
+        self.assertEqual(parquet.metadata.num_rows, 5)
+        table = parquet.read()
+        self.assertEqual(table.column("balance").to_pylist(), ["0", "10", "20", "30", "40"])
+
+        count, data = self.export("transactions", "parquet")
+        self.assertEqual(exports.pq.read_table(io.BytesIO(data)).num_rows, count)
+        count, data = self.export("transactions", "parquet", start="2027-01-01")
+        table = exports.pq.read_table(io.BytesIO(data))
+        self.assertEqual((count, table.num_rows), (0, 0))
+        self.assertEqual(table.column_names, TRANSACTION_FIELDS)
+
+    def test_deferred_export_runs_when_called(self):
+        build = deferred_export("transactions", "csv", self.um, self.tm, types=["DEPOSIT"])
+        self.tm.deposit("0770000002", 50)
+        spool = build()
+        self.assertEqual(len(_rows(spool.read())), 2)
+        spool.close()
+
+    def test_cli(self):
+        out = os.path.join(self.tmp.name, "deposits.csv")
+        stderr = io.StringIO()
+        with redirect_stderr(stderr):
+            main(["transactions", "--data-dir", self.tmp.name, "--out", out, "--type", "DEPOSIT"])
+        self.assertIn("Exported 1 transactions rows", stderr.getvalue())
+        with open(out, "rb") as f:
+            self.assertEqual([r["amount"] for r in _rows(f.read())], ["500"])
+        with redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+            main(["users", "--data-dir", self.tmp.name, "--format", "parquet"])
+
+if __name__ == '__main__':
+    unittest.main()
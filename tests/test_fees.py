@@ -0,0 +1,99 @@
+import unittest
+import sys
+import os
+import tempfile
+from decimal import Decimal
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mobile_money_system.fees import FeeEngine
+from mobile_money_system.transactions import TransactionManager
+from mobile_money_system.users import UserManager
+
+SCHEDULE = [
+    {"operation": "transfer", "max": 25,
+     "bands": [{"up_to": 10, "flat": 0}, {"up_to": 1000, "percent": 1}, {"percent": 0.5}]},
+    {"operation": "transfer", "currency": "LRD", "bands": [{"percent": 2}], "min": 5},
+    {"operation": "transfer", "tier": "high", "bands": [{"percent": 0.25}]},
+    {"operation": "bill_payment", "bands": [{"flat": 0.5}]},
+    {"operation": "bill_payment", "biller": "LEC Power", "bands": [{"percent": 1.5, "flat": 0.1}]},
+]
+
+class TestFeeEngine(unittest.TestCase):
+    def setUp(self):
+        self.fees = FeeEngine(SCHEDULE)
+
+    def fee(self, *args, **kwargs):
+        return self.fees.quote(*args, **kwargs).fee
+
+    def test_bands_are_inclusive_upper_bounds(self):
+        self.assertEqual(self.fee("transfer", Decimal("10")), Decimal("0.00"))
+        self.assertEqual(self.fee("transfer", Decimal("10.01")), Decimal("0.10"))
+        self.assertEqual(self.fee("transfer", Decimal("1000")), Decimal("10.00"))
+        self.assertEqual(self.fee("transfer", Decimal("2000")), Decimal("10.00"))
+
+    def test_caps(self):
+        quote = self.fees.quote("transfer", Decimal("9000"))
+        self.assertEqual(quote.fee, Decimal("25"))
+        self.assertIn("max", quote.label)
+        self.assertEqual(self.fee("transfer", Decimal("20"), currency="LRD"), Decimal("5"))
+
+    def test_most_specific_rule_wins(self):
+        self.assertEqual(self.fee("transfer", Decimal("400"), currency="USD", tier="high"), Decimal("1.00"))
+        self.assertEqual(self.fee("transfer", Decimal("400"), currency="LRD", tier="standard"), Decimal("8.00"))
+        self.assertEqual(self.fee("bill_payment", Decimal("100"), biller="LEC Power"), Decimal("1.60"))
+        self.assertEqual(self.fee("bill_payment", Decimal("100"), biller="Water Co"), Decimal("0.50"))
+
+    def test_default_schedule_matches_legacy_fees(self):
+        fees = FeeEngine()
+        self.assertEqual(fees.quote("transfer", Decimal("100")).fee, Decimal("1.00"))
+        self.assertEqual(fees.quote("withdraw", Decimal("250")).fee, Decimal("2.50"))
+        self.assertEqual(fees.quote("bill_payment", Decimal("40")).total, Decimal("40.50"))
+        self.assertEqual(fees.quote("deposit", Decimal("40")).fee, Decimal("0"))
+
+    def test_rejects_unordered_bands(self):
+        with self.assertRaises(ValueError):
+            FeeEngine([{"operation": "transfer", "bands": [{"up_to": 100}, {"up_to": 50}, {"percent": 1}]}])
+
+class TestDepositFee(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.um = UserManager(os.path.join(self.tmp.name, "users.json"))
+        self.tm = TransactionManager(self.um, os.path.join(self.tmp.name, "transactions.json"),
+                                     os.path.join(self.tmp.name, "ledger.json"))
+        self.um.register("0770000001", "Ann", "1234", "q", "a")
+        self.um.submit_kyc("0770000001", "passport", "P1234567")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_quoted_deposit_fee_is_charged(self):
+        self.tm.fees = FeeEngine([{"operation": "deposit", "bands": [{"flat": 0.25}]}])
+        quote = self.tm.quote_fee("0770000001", "deposit", 100)
+        self.assertTrue(self.tm.deposit("0770000001", 100)[0])
+        self.assertEqual(self.um.get_user("0770000001").balance, Decimal("100") - quote.fee)
+        self.assertEqual(self.tm.ledger.get_account_balance("SYSTEM_REVENUE"), quote.fee)
+        self.assertEqual([t.type for t in self.tm.transactions], ["DEPOSIT", "FEE"])
+        self.assertFalse(self.tm.deposit("0770000001", 0.25)[0])
+        self.assertTrue(self.tm.reconcile(full=True).ok)
+
+    def test_free_deposit_posts_no_fee(self):
+        self.assertTrue(self.tm.deposit("0770000001", 100)[0])
+        self.assertEqual([t.type for t in self.tm.transactions], ["DEPOSIT"])
+
+    def test_zero_fee_band_posts_no_fee(self):
+        self.tm.fees = FeeEngine([{"operation": op, "bands": [{"up_to": 50, "flat": 0}, {"percent": 1}]}
+                                  for op in ("withdraw", "transfer", "bill_payment")])
+        self.um.register("0770000002", "Ben", "1234", "q", "a")
+        self.um.submit_kyc("0770000002", "passport", "P7654321")
+        self.assertTrue(self.tm.deposit("0770000001", 200)[0])
+        self.assertTrue(self.tm.withdraw("0770000001", 20)[0])
+        self.assertTrue(self.tm.transfer("0770000001", "0770000002", 30)[0])
+        self.assertTrue(self.tm.pay_bill("0770000001", 40, "Water Co", "ACC1")[0])
+        self.assertEqual([t.type for t in self.tm.transactions], ["DEPOSIT", "WITHDRAWAL", "TRANSFER", "BILL_PAYMENT"])
+        self.assertFalse([e for e in self.tm.ledger.entries if e.amount == 0])
+        self.assertEqual(self.um.get_user("0770000001").balance, Decimal("110"))
+        self.assertTrue(self.tm.reconcile(full=True).ok)
+
+if __name__ == '__main__':
+    unittest.main()
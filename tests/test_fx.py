@@ -0,0 +1,130 @@
+import unittest
+import sys
+import os
+import json
+import time
+from decimal import Decimal
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mobile_money_system.engine import MoneyEngine
+from mobile_money_system.fx import FxEngine, cross_rates, file_source, position_account
+from base import StoreTestCase
+
+RATES = {"base": "USD", "margin_percent": 2, "rates": {"EUR": 0.9, "KES": {"mid": 130, "spread_percent": 4}}}
+
+class TestFx(StoreTestCase):
+    users = (("0770000001", "USD"), ("0770000002", "KES"), ("0770000003", "USD"))
+
+    def open_store(self):
+        um, tm = super().open_store()
+        tm.fx = FxEngine(lambda: RATES)
+        return um, tm
+
+    def test_cross_rates_apply_spreads(self):
+        cross = cross_rates(RATES)
+        self.assertEqual(len(cross), 6)
+        rate, mid = cross[("USD", "KES")]
+        self.assertEqual(mid, Decimal("130"))
+        self.assertEqual(rate, Decimal("127.4"))  # bid: 2% below mid
+        # A cross pays both legs' half-spreads, so a round trip loses money
+        rate, mid = cross[("EUR", "KES")]
+        self.assertLess(rate, mid)
+        self.assertLess(cross[("KES", "EUR")][0] * rate, 1)
+
+    def test_rate_table_is_cached(self):
+        calls = []
+        engine = FxEngine(lambda: calls.append(1) or RATES, ttl_seconds=60)
+        engine.quote("p", "USD", "EUR", Decimal("1"))
+        engine.quote("p", "EUR", "USD", Decimal("1"))
+        self.assertEqual(len(calls), 1)
+        engine.invalidate()
+        engine.rates()
+        self.assertEqual(len(calls), 2)
+        self.assertIsNone(engine.quote("p", "USD", "XYZ", Decimal("1")))
+
+    def test_failed_reload_keeps_last_table(self):
+        path = os.path.join(self.tmp.name, "fx_rates.json")
+        with open(path, "w") as f:
+            json.dump(RATES, f)
+        engine = FxEngine(file_source(path), ttl_seconds=0)
+        before = engine.rates()
+        with open(path, "w") as f:
+            f.write("{broken")
+        self.assertEqual(engine.rates(), before)
+        self.assertIn("unavailable", engine.error)
+
+    def test_converted_transfer_posts_balanced_positions(self):
+        ok, msg = self.tm.transfer("0770000001", "0770000002", 100)
+        self.assertTrue(ok, msg)
+        self.assertEqual(self.um.get_user("0770000002").balance, Decimal("12740.00"))
+        ledger = self.tm.ledger
+        self.assertEqual(ledger.get_account_balance(position_account("USD")), Decimal("100"))
+        self.assertEqual(ledger.get_account_balance(position_account("KES")), Decimal("-12740.00"))
+        self.assertTrue(self.tm.reconcile(full=True).ok)
+
+    def test_reversal_mirrors_converted_legs(self):
+        self.tm.transfer("0770000001", "0770000002", 100)
+        txn = self.tm.get_history("0770000002")[0]
+        ok, msg = self.tm.reverse_transaction(txn.id)
+        self.assertTrue(ok, msg)
+        self.assertEqual(self.um.get_user("0770000002").balance, Decimal("0"))
+        self.assertEqual(self.um.get_user("0770000001").balance, Decimal("1000") - self.tm.ledger.get_account_balance("SYSTEM_REVENUE"))
+        for currency in ("USD", "KES"):
+            self.assertEqual(self.tm.ledger.get_account_balance(position_account(currency)), Decimal("0"))
+        report = self.tm.reconcile(full=True)
+        self.assertTrue(report.ok, report.to_dict())
+        self.assertEqual({e.currency for e in self.tm.ledger.entries[-4:]}, {"USD", "KES"})
+
+    def test_locked_quote_is_honoured_once(self):
+        ok, quote_id = self.tm.lock_fx_quote("0770000001", "0770000002", 50)
+        self.assertTrue(ok, quote_id)
+        self.assertEqual(self.tm.lock_fx_quote("0770000001", "0770000003", 50), (False, "No conversion needed"))
+        quote = self.tm.get_fx_quote(quote_id)
+        # The table moves between the review and the confirmation; the quoted rate still applies
+        self.tm.fx.source = lambda: dict(RATES, rates={"KES": 200})
+        self.tm.fx.invalidate()
+        self.assertFalse(self.tm.transfer("0770000001", "0770000002", 60, fx_quote_id=quote_id)[0])
+        self.assertTrue(self.tm.transfer("0770000001", "0770000002", 50, fx_quote_id=quote_id)[0])
+        self.assertEqual(self.um.get_user("0770000002").balance, quote.converted)
+        self.assertIsNone(self.tm.get_fx_quote(quote_id))
+        ok, msg = self.tm.transfer("0770000001", "0770000002", 50, fx_quote_id=quote_id)
+        self.assertFalse(ok)
+        self.assertIn("expired", msg)
+
+    def test_expired_quote_is_refused(self):
+        self.tm.fx.quote_ttl_seconds = 0.01
+        _, quote_id = self.tm.lock_fx_quote("0770000001", "0770000002", 50)
+        time.sleep(0.02)
+        self.assertFalse(self.tm.transfer("0770000001", "0770000002", 50, fx_quote_id=quote_id)[0])
+        self.assertEqual(self.um.get_user("0770000002").balance, Decimal("0"))
+
+    def test_request_paid_across_currencies(self):
+        self.tm.deposit("0770000002", 2000)
+        self.tm.request_money("0770000001", "0770000002", 10)
+        request = self.tm.get_history("0770000001")[-1]
+        before = self.um.get_user("0770000001").balance
+        ok, msg = self.tm.process_request(request.id, "PAY")
+        self.assertTrue(ok, msg)
+        # The requester gets the USD they asked for; the payer is debited its KES cost plus fee
+        self.assertEqual(self.um.get_user("0770000001").balance - before, Decimal("10.00"))
+        transfer = next(t for t in reversed(self.tm.transactions) if t.type == "TRANSFER")
+        self.assertEqual(transfer.currency, "KES")
+        self.assertGreater(transfer.amount, Decimal("1300"))
+        self.assertEqual(self.tm.fx.quotes, {})
+
+    def test_quote_locked_by_another_worker(self):
+        lock_file = os.path.join(self.tmp.name, "store.lock")
+        a, b = MoneyEngine(*self.files, lock_file=lock_file), MoneyEngine(*self.files, lock_file=lock_file)
+        ok, quote_id = a.transaction_manager.lock_fx_quote("0770000001", "0770000002", 50)
+        self.assertTrue(ok, quote_id)
+        b.refresh()
+        quote = b.transaction_manager.get_fx_quote(quote_id)
+        self.assertIsNotNone(quote)
+        self.assertTrue(b.transaction_manager.transfer("0770000001", "0770000002", 50, fx_quote_id=quote_id)[0])
+        self.assertEqual(b.user_manager.get_user("0770000002").balance, quote.converted)
+        # Used once, whichever worker confirms
+        self.assertFalse(a.transaction_manager.transfer("0770000001", "0770000002", 50, fx_quote_id=quote_id)[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+import sys
+import os
+from decimal import Decimal
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mobile_money_system import graph
+from mobile_money_system.graph import TransferGraph, SparseTransferGraph
+from mobile_money_system.models import Transaction
+
+def transfer(i, sender, receiver, amount=100, flagged=False):
+    return Transaction(id=f"T{i}", sender_phone=sender, receiver_phone=receiver, amount=Decimal(str(amount)),
+                       currency="USD", type="TRANSFER", flagged=flagged)
+
+class TestTransferGraph(unittest.TestCase):
+    def setUp(self):
+        edges = [("a", "b"), ("b", "c"), ("c", "a"), ("d", "e"), ("e", "d"), ("x", "y")]
+        # m collects from 10 senders and forwards nearly all of it
+        edges += [(f"s{i}", "m") for i in range(10)] + [("m", "out")] * 9
+        self.transactions = [transfer(i, s, r, flagged=(s == "x")) for i, (s, r) in enumerate(edges)]
+        self.g = TransferGraph()
+        self.g.sync(self.transactions)
+
+    def test_incremental_sync(self):
+        self.transactions.append(transfer(99, "a", "b", 50))
+        self.g.sync(self.transactions)
+        self.assertEqual(self.g.out_edges["a"]["b"], [150.0, 2])
+        self.assertIs(self.g.in_edges["b"]["a"], self.g.out_edges["a"]["b"])
+
+    def test_cycles(self):
+        self.assertEqual(sorted(self.g.cycles()), [["a", "b", "c"], ["d", "e"]])
+        self.assertEqual(self.g.cycles_closed_by("c", "a"), [["c", "a", "b"]])
+
+    def test_mules_and_components(self):
+        self.assertEqual([m["phone"] for m in self.g.mule_candidates(min_senders=10)], ["m"])
+        rings = self.g.components_from(graph.flagged_accounts(self.transactions))
+        self.assertEqual(rings, [{"size": 2, "flagged": ["x"], "members": ["x", "y"]}])
+
+    @unittest.skipIf(graph.sparse is None, "scipy not installed")
+    def test_sparse_matches(self):
+        sg = SparseTransferGraph.from_transactions(self.transactions)
+        self.assertEqual(sg.round_trip_pairs(), [("d", "e")])
+        on_triangles = sorted(str(sg.phones[i]) for i in sg.triangle_counts().nonzero()[0])
+        self.assertEqual(on_triangles, ["a", "b", "c"])
+        self.assertEqual(sg.mule_candidates(min_senders=10), self.g.mule_candidates(min_senders=10))
+        self.assertEqual(sg.components_from(["x"]), self.g.components_from(["x"]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import sys
+import os
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mobile_money_system import hashchain
+from mobile_money_system.ledger import LedgerManager
+
+class TestLedgerHashChain(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "ledger.json")
+        self.ledger = LedgerManager(self.path, checkpoint_every=4)
+        for i in range(5):
+            self.post(f"TXN-{i}", Decimal(10 + i))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def post(self, txn_id, amount):
+        ledger = self.ledger
+        self.assertTrue(ledger.post_entries([ledger.create_entry(txn_id, "SYSTEM_CASH", -amount),
+                                             ledger.create_entry(txn_id, "alice", amount)]))
+
+    def test_batches_are_chained_and_checkpointed(self):
+        heads = [e.chain_hash for e in self.ledger.entries]
+        self.assertEqual(heads[0::2], [""] * 5)
+        self.assertEqual(len(set(heads[1::2])), 5)
+        self.assertEqual([(c["start"], c["end"]) for c in self.ledger.checkpoints], [(0, 4), (4, 8)])
+        self.assertTrue(self.ledger.verify(full=True).ok)
+
+        reloaded = LedgerManager(self.path, checkpoint_every=4)
+        self.assertEqual(reloaded.head, self.ledger.head)
+        reloaded.post_entries([reloaded.create_entry("TXN-5", "SYSTEM_CASH", Decimal("-1")),
+                               reloaded.create_entry("TXN-5", "alice", Decimal("1"))])
+        self.assertEqual(reloaded.checkpoints[-1]["end"], 12)
+        self.assertTrue(reloaded.verify(full=True).ok)
+
+    def test_edit_is_detected(self):
+        self.ledger.entries[2].amount = Decimal("-1000")
+        report = self.ledger.verify(full=True)
+        self.assertFalse(report.ok)
+        self.assertTrue(any("batch hash mismatch" in e for e in report.errors))
+        self.assertTrue(any("Merkle root mismatch" in e for e in report.errors))
+
+    def test_incremental_verify_starts_at_last_checkpoint(self):
+        report = self.ledger.verify()
+        self.assertEqual((report.start, report.end), (8, 10))
+        self.assertTrue(report.ok)
+        self.ledger.entries[9].description = "edited"
+        self.assertFalse(self.ledger.verify().ok)
+
+    def test_unsealed_entries_are_reported(self):
+        self.ledger.entries.append(self.ledger.create_entry("TXN-X", "alice", Decimal("5")))
+        self.assertIn("not sealed", self.ledger.verify().errors[0])
+
+    def test_inclusion_proof(self):
+        proofs = self.ledger.inclusion_proofs("TXN-2")
+        self.assertEqual([p["position"] for p in proofs], [4, 5])
+        for proof in proofs:
+            self.assertTrue(hashchain.verify_proof(self.ledger.entries[proof["position"]], proof))
+        self.assertFalse(hashchain.verify_proof(self.ledger.entries[6], proofs[0]))
+        with self.assertRaises(ValueError):
+            self.ledger.inclusion_proofs("TXN-4")
+        with self.assertRaises(LookupError):
+            self.ledger.inclusion_proofs("TXN-MISSING")
+
+    def test_signed_checkpoints(self):
+        with mock.patch.dict(os.environ, {hashchain.KEY_ENV: "secret"}):
+            # Unsigned checkpoints aren't trusted once a key is set
+            self.assertEqual(self.ledger.verify().start, 0)
+            self.ledger = LedgerManager(os.path.join(self.tmp.name, "signed.json"), checkpoint_every=4)
+            for i in range(5):
+                self.post(f"TXN-{i}", Decimal(10 + i))
+            self.assertEqual(self.ledger.verify().start, 8)
+            self.ledger.checkpoints[-1]["signature"] = "0" * 64
+            report = self.ledger.verify()
+            self.assertEqual(report.start, 4)
+            self.assertIn("bad signature", report.errors[0])
+
+if __name__ == '__main__':
+    unittest.main()
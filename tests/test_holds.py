@@ -0,0 +1,82 @@
+import unittest
+import sys
+import os
+import time
+from decimal import Decimal
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mobile_money_system.engine import MoneyEngine
+from mobile_money_system.holds import HoldManager
+from base import StoreTestCase
+
+class TestHolds(StoreTestCase):
+    def test_authorize_reserves_available_balance(self):
+        ok, hold_id = self.tm.authorize_bill("0770000001", 600, "LEC Power", "ACC-1")
+        self.assertTrue(ok, hold_id)
+        hold = self.tm.holds.holds[hold_id]
+        self.assertEqual(self.um.get_user("0770000001").balance, Decimal("1000"))
+        self.assertEqual(self.tm.available_balance("0770000001"), Decimal("400") - hold.fee)
+        # Other debits only see the available balance
+        ok, msg = self.tm.withdraw("0770000001", 500)
+        self.assertFalse(ok)
+        self.assertIn("Insufficient", msg)
+        self.assertFalse(self.tm.authorize_transfer("0770000001", "0770000002", 500)[0])
+
+    def test_capture_posts_the_payment(self):
+        _, hold_id = self.tm.authorize_transfer("0770000001", "0770000002", 200)
+        fee = self.tm.holds.holds[hold_id].fee
+        self.assertTrue(self.tm.capture_hold(hold_id)[0])
+        self.assertEqual(self.um.get_user("0770000001").balance, Decimal("800") - fee)
+        self.assertEqual(self.um.get_user("0770000002").balance, Decimal("200"))
+        self.assertEqual(self.tm.available_balance("0770000001"), self.um.get_user("0770000001").balance)
+        self.assertEqual(self.tm.capture_hold(hold_id), (False, "Hold not found"))
+        self.assertTrue(self.tm.reconcile(full=True).ok)
+
+    def test_void_and_expiry_release(self):
+        _, voided = self.tm.authorize_bill("0770000001", 100, "LEC Power", "ACC-1")
+        _, stale = self.tm.authorize_bill("0770000001", 100, "LEC Power", "ACC-2", ttl_seconds=60)
+        self.assertTrue(self.tm.void_hold(voided)[0])
+        self.assertEqual(self.tm.expire_holds(now=time.time() + 30), 0)
+        self.assertEqual(self.tm.expire_holds(now=time.time() + 61), 1)
+        self.assertEqual(self.tm.available_balance("0770000001"), Decimal("1000"))
+        self.assertEqual(self.tm.get_holds("0770000001"), [])
+        self.assertEqual(len(self.tm.transactions), 1)
+
+    def test_open_holds_count_against_limits(self):
+        self.tm.deposit("0770000001", 2000)
+        self.um.get_user("0770000001").risk_tier = "low"  # daily cap 2000
+        ok, first = self.tm.authorize_bill("0770000001", 900, "LEC Power", "ACC-1")
+        self.assertTrue(ok, first)
+        self.assertTrue(self.tm.authorize_bill("0770000001", 900, "LEC Power", "ACC-2")[0])
+        ok, msg = self.tm.authorize_bill("0770000001", 900, "LEC Power", "ACC-3")
+        self.assertFalse(ok)
+        self.assertIn("Daily limit", msg)
+        self.assertFalse(self.tm.withdraw("0770000001", 300)[0])
+        # Capturing moves the amount from the open holds to the recorded usage; voiding frees it
+        self.assertTrue(self.tm.capture_hold(first)[0])
+        self.assertFalse(self.tm.authorize_bill("0770000001", 900, "LEC Power", "ACC-3")[0])
+        self.tm.void_hold(self.tm.get_holds("0770000001")[0].id)
+        self.assertEqual(self.tm.holds.open_usage("0770000001"), (0, Decimal("0")))
+        self.assertTrue(self.tm.authorize_bill("0770000001", 900, "LEC Power", "ACC-3")[0])
+
+    def test_holds_survive_reload(self):
+        _, hold_id = self.tm.authorize_bill("0770000001", 100, "LEC Power", "ACC-1")
+        holds = HoldManager(self.tm.holds.storage.filepath)
+        self.assertEqual(list(holds.holds), [hold_id])
+        self.assertEqual(holds.held_for("0770000001"), self.tm.holds.held_for("0770000001"))
+        self.assertEqual(holds.open_usage("0770000001"), (1, Decimal("100")))
+        self.assertEqual(holds.next_expiry(), self.tm.holds.holds[hold_id].expires_at)
+
+    def test_engine_timer_expires_holds(self):
+        engine = MoneyEngine(*self.files)
+        ok, hold_id = engine.transaction_manager.authorize_bill("0770000001", 100, "LEC Power", "ACC-1", ttl_seconds=0.05)
+        self.assertTrue(ok)
+        deadline = time.time() + 2
+        while engine.transaction_manager.get_holds("0770000001") and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(engine.transaction_manager.get_holds("0770000001"), [])
+        engine.hold_timer.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+import sys
+import os
+from decimal import Decimal
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tempfile
+
+from mobile_money_system.transactions import TransactionManager
+from mobile_money_system.users import UserManager
+from mobile_money_system.models import Transaction
+
+class MockUserManager:
+    def __init__(self):
+        self.users = {}
+
+    def get_user(self, phone):
+        return self.users.get(phone)
+
+    def save_users(self):
+        pass
+
+def make_txn(i, sender, receiver, t_type="TRANSFER", status="COMPLETED", flagged=False):
+    return Transaction(
+        id=f"T{i}",
+        sender_phone=sender,
+        receiver_phone=receiver,
+        amount=Decimal("10.0"),
+        currency="USD",
+        type=t_type,
+        timestamp=f"2026-01-{i + 1:02d}T12:00:00",
+        status=status,
+        flagged=flagged
+    )
+
+class TestTransactionQuery(unittest.TestCase):
+    def setUp(self):
+        self.tm = TransactionManager(MockUserManager())
+        self.tm.transactions = []
+        self.tm.save_transactions = lambda: None
+        for i in range(20):
+            t_type = "DEPOSIT" if i % 2 == 0 else "TRANSFER"
+            sender = "SYSTEM" if t_type == "DEPOSIT" else "alice"
+            self.tm.transactions.append(make_txn(i, sender, "bob", t_type, flagged=(i % 5 == 0)))
+
+    def test_newest_first_paging(self):
+        page, has_more = self.tm.query_transactions(limit=5)
+        self.assertEqual([t.id for t in page], ["T19", "T18", "T17", "T16", "T15"])
+        self.assertTrue(has_more)
+
+        page, has_more = self.tm.query_transactions(offset=15, limit=5)
+        self.assertEqual([t.id for t in page], ["T4", "T3", "T2", "T1", "T0"])
+        self.assertFalse(has_more)
+
+    def test_filters_combine(self):
+        page, _ = self.tm.query_transactions(t_type="TRANSFER", phone="alice", limit=100)
+        self.assertEqual(len(page), 10)
+        self.assertTrue(all(t.type == "TRANSFER" for t in page))
+
+        page, _ = self.tm.query_transactions(flagged=True, limit=100)
+        self.assertEqual([t.id for t in page], ["T15", "T10", "T5", "T0"])
+
+    def test_time_range(self):
+        page, _ = self.tm.query_transactions(start="2026-01-03", end="2026-01-06", limit=100)
+        self.assertEqual([t.id for t in page], ["T4", "T3", "T2"])
+
+    def test_index_follows_new_and_replaced_history(self):
+        self.assertEqual(len(self.tm.get_history("alice")), 10)
+        self.tm.transactions.append(make_txn(25, "alice", "carol"))
+        self.assertEqual(len(self.tm.get_history("alice")), 11)
+        self.assertEqual(self.tm.get_transaction("T25").receiver_phone, "carol")
+
+        self.tm.transactions = []
+        self.assertEqual(self.tm.get_history("alice"), [])
+        self.assertIsNone(self.tm.get_transaction("T25"))
+
+class TestUserSearch(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.um = UserManager(os.path.join(self.tmpdir.name, "users.json"))
+        self.um.register("0770000001", "Alice Johnson", "1234", "q", "a")
+        self.um.register("0770000002", "Bob Johns", "1234", "q", "a")
+        self.um.register("0880000003", "Carol Alison", "1234", "q", "a")
+        self.um.submit_kyc("0880000003", "passport", "P1234567")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def phones(self, query, **kwargs):
+        return [u.phone for u in self.um.search_users(query, **kwargs)]
+
+    def test_phone_prefix_and_exact_id(self):
+        self.assertEqual(self.phones("07700"), ["0770000001", "0770000002"])
+        self.assertEqual(self.phones("p1234567"), ["0880000003"])
+
+    def test_name_ranking(self):
+        # Whole-token matches rank ahead of prefix matches
+        self.assertEqual(self.phones("johns"), ["0770000002", "0770000001"])
+        self.assertEqual(self.phones("ali"), ["0770000001", "0880000003"])
+        self.assertEqual(self.phones("alice jo"), ["0770000001"])
+
+    def test_index_maintained_on_changes(self):
+        self.um.update_user("0770000002", name="Robert Smith")
+        self.assertEqual(self.phones("johns"), ["0770000001"])
+        self.assertEqual(self.phones("smith"), ["0770000002"])
+
+        self.um.delete_user("0770000001")
+        self.assertEqual(self.phones("07700"), ["0770000002"])
+        self.assertEqual(self.phones("alice"), [])
+
+    def test_status_filter_and_limit(self):
+        self.um.suspend_user("0770000002")
+        self.assertEqual(self.phones("077", status="suspended"), ["0770000002"])
+        self.assertEqual(len(self.phones("", limit=2)), 2)
+
+    def test_status_lists_follow_changes(self):
+        for i in range(300):
+            self.um.register(f"0990{i:06d}", f"John Doe{i}", "1234", "q", "a")
+        self.um.suspend_user("0990000299")
+        index = self.um.search_index
+        self.assertEqual(index.by_status["suspended"], ["0990000299"])
+        # Found through the suspended list, not by scanning the 300 other Johns
+        self.assertEqual(self.phones("john", limit=5, status="suspended"), ["0990000299"])
+        self.assertEqual(self.phones("", status="suspended"), ["0990000299"])
+        self.assertEqual(self.phones("0990", limit=2, status="active"), ["0990000000", "0990000001"])
+        self.um.reactivate_user("0990000299")
+        self.assertNotIn("suspended", index.by_status)
+        self.assertEqual(self.phones("john", status="suspended"), [])
+        self.assertEqual(len(index.by_status["active"]), len(self.um.users))
+
+if __name__ == '__main__':
+    unittest.main()
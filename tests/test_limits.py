@@ -0,0 +1,70 @@
+import unittest
+import sys
+import os
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mobile_money_system import limits
+from mobile_money_system.transactions import TransactionManager
+from mobile_money_system.users import User
+
+class MockUserManager:
+    def __init__(self):
+        self.users = {
+            "low": User("low", "Low", "1234", Decimal("100000"), is_verified=True, risk_tier="low"),
+            "receiver": User("receiver", "Receiver", "1234", Decimal("0"), is_verified=True),
+        }
+
+    def get_user(self, phone):
+        return self.users.get(phone)
+
+    def save_users(self):
+        pass
+
+class TestCumulativeLimits(unittest.TestCase):
+    def setUp(self):
+        self.user = User("u", "U", "1234", Decimal("0"), risk_tier="low")
+
+    def test_daily_volume_cap(self):
+        day = datetime(2026, 3, 10, 9)
+        limits.record_usage(self.user, Decimal("1500"), day)
+        self.assertTrue(limits.check_limits(self.user, Decimal("500"), now=day)[0])
+        allowed, msg = limits.check_limits(self.user, Decimal("600"), now=day)
+        self.assertFalse(allowed)
+        self.assertIn("Daily limit", msg)
+        # Deposits only have the per-transaction limit
+        self.assertTrue(limits.check_limits(self.user, Decimal("600"), outgoing=False, now=day)[0])
+
+    def test_periods_roll_over_without_reset(self):
+        limits.record_usage(self.user, Decimal("1900"), datetime(2026, 3, 10, 23, 59))
+        next_day = datetime(2026, 3, 11, 0, 1)
+        used = limits.current_usage(self.user, next_day)
+        self.assertEqual((used["daily_count"], used["daily_volume"]), (0, Decimal("0")))
+        self.assertEqual((used["monthly_count"], used["monthly_volume"]), (1, Decimal("1900")))
+        limits.record_usage(self.user, Decimal("100"), next_day)
+        self.assertEqual(self.user.usage["day"], "2026-03-11")
+        self.assertEqual(limits.current_usage(self.user, datetime(2026, 4, 1))["monthly_count"], 0)
+
+    def test_monthly_volume_cap(self):
+        for day in range(1, 11):
+            limits.record_usage(self.user, Decimal("1950"), datetime(2026, 3, day))
+        allowed, msg = limits.check_limits(self.user, Decimal("600"), now=datetime(2026, 3, 12))
+        self.assertFalse(allowed)
+        self.assertIn("Monthly limit", msg)
+
+    def test_transfers_consume_daily_limit(self):
+        tm = TransactionManager(MockUserManager())
+        tm.transactions = []
+        tm.save_transactions = lambda: None
+        tm.ledger.post_entries = lambda *args: True
+        self.assertTrue(tm.transfer("low", "receiver", 1000)[0])
+        self.assertTrue(tm.transfer("low", "receiver", 900)[0])
+        success, msg = tm.transfer("low", "receiver", 200)
+        self.assertFalse(success)
+        self.assertIn("Daily limit", msg)
+        self.assertEqual(limits.current_usage(tm.user_manager.users["low"])["daily_count"], 2)
+
+if __name__ == '__main__':
+    unittest.main()
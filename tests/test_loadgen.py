@@ -0,0 +1,45 @@
+import unittest
+import sys
+import os
+from decimal import Decimal
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mobile_money_system.loadgen import Population, PopulationSpec, generate_history, generate_traffic
+
+class TestLoadGenerator(unittest.TestCase):
+    def test_same_seed_same_data(self):
+        runs = []
+        for _ in range(2):
+            population = Population(PopulationSpec(users=50), seed=7)
+            history = [t.to_dict() for t, _ in generate_history(population, 300)]
+            traffic = list(generate_traffic(population, 50))
+            runs.append(([u.to_dict() for u in population.users], history, traffic))
+        self.assertEqual(runs[0], runs[1])
+
+    def test_history_is_balanced_and_consistent(self):
+        population = Population(PopulationSpec(users=40), seed=3)
+        ledger_balances = {}
+        for t, entries in generate_history(population, 500):
+            self.assertEqual(sum(e.amount for e in entries), Decimal("0"))
+            if t.type == "TRANSFER":
+                self.assertNotEqual(t.sender_phone, t.receiver_phone)
+            for e in entries:
+                ledger_balances[e.account_id] = ledger_balances.get(e.account_id, Decimal("0")) + e.amount
+
+        for user in population.users:
+            self.assertGreaterEqual(user.balance, 0)
+            self.assertEqual(ledger_balances.get(user.phone, Decimal("0")), user.balance)
+
+    def test_activity_is_skewed(self):
+        population = Population(PopulationSpec(users=200, currencies={"USD": 1.0}), seed=11)
+        counts = {}
+        for _ in range(5000):
+            phone = population.sender().phone
+            counts[phone] = counts.get(phone, 0) + 1
+        top = sorted(counts.values(), reverse=True)
+        # The busiest 10% of senders account for well over 10% of traffic
+        self.assertGreater(sum(top[:20]), 5000 * 0.4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mobile_money_system import metrics
+from mobile_money_system.transactions import TransactionManager
+from mobile_money_system.users import UserManager
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.was_enabled = metrics.REGISTRY.enabled
+        metrics.REGISTRY.enabled = True
+        metrics.REGISTRY.reset()
+
+    def tearDown(self):
+        metrics.REGISTRY.reset()
+        metrics.REGISTRY.enabled = self.was_enabled
+
+    def test_operation_counts_outcomes(self):
+        @metrics.operation("demo")
+        def demo(ok):
+            return (ok, "done")
+
+        demo(True)
+        demo(False)
+        rows = metrics.operation_summary()
+        self.assertEqual(rows[0]["operation"], "demo")
+        self.assertEqual(rows[0]["calls"], 2)
+        self.assertEqual(rows[0]["failed"], 1)
+
+    def test_disabled_records_nothing(self):
+        metrics.REGISTRY.enabled = False
+
+        @metrics.timed(metrics.CHECK_SECONDS, check="demo")
+        def check():
+            return 1
+
+        self.assertEqual(check(), 1)
+        self.assertEqual(metrics.CHECK_SECONDS.series, {})
+
+    def test_render_histogram(self):
+        metrics.STORAGE_BYTES.observe(2000, file="users.json")
+        text = metrics.REGISTRY.render()
+        self.assertIn('mms_storage_bytes_written_bucket{file="users.json",le="4096"} 1', text)
+        self.assertIn('mms_storage_bytes_written_bucket{file="users.json",le="+Inf"} 1', text)
+        self.assertIn('mms_storage_bytes_written_count{file="users.json"} 1', text)
+
+    def test_aml_evaluation_time_is_recorded(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            um = UserManager(os.path.join(tmp, "users.json"))
+            tm = TransactionManager(um, os.path.join(tmp, "transactions.json"), os.path.join(tmp, "ledger.json"))
+            um.register("0770000001", "Alice", "1234", "q", "a")
+            um.submit_kyc("0770000001", "passport", "P1234567")
+            tm.deposit("0770000001", 100)
+        self.assertIn("mms_aml_eval_seconds_count 1", metrics.REGISTRY.render())
+
+if __name__ == '__main__':
+    unittest.main()
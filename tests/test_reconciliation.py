@@ -0,0 +1,107 @@
+import unittest
+import sys
+import os
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mobile_money_system import reconciliation
+from mobile_money_system.transactions import TransactionManager
+from mobile_money_system.users import User
+
+class MockUserManager:
+    def __init__(self):
+        self.users = {
+            "alice": User("alice", "Alice", "1234", Decimal("0"), is_verified=True),
+            "bob": User("bob", "Bob", "1234", Decimal("0"), is_verified=True),
+        }
+
+    def get_user(self, phone):
+        return self.users.get(phone)
+
+    def save_users(self):
+        pass
+
+class TestReconciliation(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.tm = TransactionManager(MockUserManager(), os.path.join(self.tmp.name, "transactions.json"),
+                                     os.path.join(self.tmp.name, "ledger.json"))
+        self.tm.deposit("alice", 500)
+        self.tm.transfer("alice", "bob", 120.25)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_clean_ledger_reconciles(self):
+        report = self.tm.reconcile()
+        self.assertTrue(report.ok, report.to_dict())
+        self.assertEqual(report.ledger_total, Decimal("0"))
+        self.assertEqual(report.balances["SYSTEM_REVENUE"], reconciliation.to_units("1.20"))
+
+    def test_admin_adjustments_and_reversals_are_posted(self):
+        txn = self.tm.get_history("bob")[0]
+        self.assertTrue(self.tm.admin_adjust_balance("alice", 50, "Goodwill credit")[0])
+        self.assertTrue(self.tm.admin_adjust_balance("bob", 20, "Correction", is_credit=False)[0])
+        self.assertTrue(self.tm.reverse_transaction(txn.id)[0])
+        report = self.tm.reconcile(full=True)
+        self.assertTrue(report.ok, report.to_dict())
+
+    def test_direct_balance_mutation_shows_as_drift(self):
+        self.tm.user_manager.users["bob"].balance += Decimal("10")
+        report = self.tm.reconcile()
+        self.assertFalse(report.ok)
+        self.assertEqual(report.drift, [{"account": "bob", "wallet": "130.25", "ledger": "120.25", "difference": "10.00"}])
+        self.assertTrue(report.zero_sum)
+
+    def test_incremental_runs_only_aggregate_new_entries(self):
+        first = self.tm.reconcile()
+        self.assertEqual(first.new_entries, first.entries)
+        self.assertEqual(self.tm.reconcile().new_entries, 0)
+        self.tm.withdraw("alice", 100)
+        report = self.tm.reconcile()
+        self.assertTrue(report.incremental)
+        self.assertEqual(report.new_entries, 4)
+        self.assertTrue(report.ok, report.to_dict())
+
+        # A rewritten ledger invalidates the checkpoint
+        self.tm.ledger.entries[-1].id = "LEG-REWRITTEN"
+        report = self.tm.reconcile()
+        self.assertFalse(report.incremental)
+        self.assertEqual(report.new_entries, report.entries)
+
+    def test_unbalanced_entries_break_zero_sum(self):
+        self.tm.reconcile()
+        ledger = self.tm.ledger
+        ledger.entries.append(ledger.create_entry("TXN-BAD", "SYSTEM_CASH", Decimal("-5")))
+        report = self.tm.reconcile()
+        self.assertFalse(report.zero_sum)
+        self.assertEqual(report.ledger_total, Decimal("-5"))
+        self.assertEqual(report.unbalanced_transactions, ["TXN-BAD"])
+
+    def test_each_currency_must_net_to_zero(self):
+        ledger = self.tm.ledger
+        # Sums to zero overall, but not per currency
+        mixed = [ledger.create_entry("TXN-MIX", "alice", Decimal("-5"), "", "USD"),
+                 ledger.create_entry("TXN-MIX", "bob", Decimal("5"), "", "LRD")]
+        self.assertFalse(ledger.post_entries(mixed))
+        self.tm.reconcile()
+        ledger.entries.extend(mixed)
+        report = self.tm.reconcile()
+        self.assertEqual(report.ledger_total, Decimal("0"))
+        self.assertFalse(report.zero_sum)
+        self.assertEqual(report.unbalanced_transactions, ["TXN-MIX"])
+        self.assertEqual(report.to_dict()["currency_totals"], {"USD": "-5.00", "LRD": "5.00"})
+
+    def test_python_fallback_matches_numpy(self):
+        keys = ["a", "b", "a", "c", "b"]
+        amounts = ["1.10", "-2.005", "3", "0.000001", Decimal("2.005")]
+        expected = reconciliation.aggregate(keys, amounts)
+        with mock.patch.object(reconciliation, "np", None):
+            self.assertEqual(reconciliation.aggregate(keys, amounts), expected)
+        self.assertEqual(expected, {"a": 4100000, "b": 0, "c": 1})
+
+if __name__ == '__main__':
+    unittest.main()
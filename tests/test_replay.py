@@ -0,0 +1,95 @@
+import unittest
+import sys
+import os
+import json
+import shutil
+import tempfile
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mobile_money_system import replay
+from mobile_money_system.storage import JsonStorage, StorageCorruptError, iter_json_array
+from mobile_money_system.transactions import TransactionManager
+from mobile_money_system.users import UserManager
+from base import StoreTestCase
+
+class TestReplay(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.users_file = self.files[0]
+        self.tm.transfer("0770000001", "0770000002", 250)
+        shutil.copyfile(self.users_file, os.path.join(self.tmp.name, "users_backup.json"))
+        self.tm.withdraw("0770000002", 100)
+        self.tm.admin_adjust_balance("0770000002", 40, "Goodwill")
+        self.tm.reverse_transaction(self.tm.get_history("0770000002")[-1].id)
+
+    def data_dir(self):
+        data = os.path.join(self.tmp.name, "data")
+        os.makedirs(data)
+        return data
+
+    def out(self, name=""):
+        return os.path.join(self.tmp.name, "out", name)
+
+    def test_rebuild_matches_live_state(self):
+        report = replay.replay(self.data, self.out(), now=datetime.now())
+        self.assertEqual(report.balance_changes, [])
+        self.assertEqual(report.changed_transactions, 0)
+        rebuilt = UserManager(self.out("users.json"))
+        for phone, user in self.um.users.items():
+            self.assertEqual(rebuilt.users[phone].balance, user.balance)
+        self.assertEqual(rebuilt.users["0770000001"].usage["day_count"], 1)
+        self.assertEqual(Decimal(rebuilt.users["0770000001"].usage["day_volume"]), Decimal("250"))
+        with open(self.out("transactions.json")) as f:
+            self.assertEqual(json.load(f), [t.to_dict() for t in self.tm.transactions])
+        self.assertTrue(TransactionManager(rebuilt, self.out("transactions.json"), self.out("ledger.json")).ledger.verify(full=True).ok)
+
+    def test_parallel_matches_serial(self):
+        replay.replay(self.data, self.out("serial"), now=datetime(2030, 1, 1))
+        replay.replay(self.data, self.out("parallel"), workers=2, partitions=3, now=datetime(2030, 1, 1))
+        for name in ("users.json", "transactions.json"):
+            with open(self.out(f"serial/{name}")) as a, open(self.out(f"parallel/{name}")) as b:
+                self.assertEqual(json.load(a), json.load(b))
+
+    def test_recovers_corrupt_users_from_stale_snapshot(self):
+        with open(self.users_file) as f:
+            text = f.read()
+        with open(self.users_file, "w") as f:
+            f.write(text[:len(text) // 2])
+        with self.assertRaises(StorageCorruptError):
+            UserManager(self.users_file)
+        with self.assertRaises(StorageCorruptError):
+            replay.replay(self.data, self.out())
+
+        report = replay.replay(self.data, self.out(), users_snapshot=os.path.join(self.tmp.name, "users_backup.json"))
+        self.assertTrue(report.profile_source.endswith("users_backup.json"))
+        rebuilt = UserManager(self.out("users.json"))
+        self.assertEqual(rebuilt.users["0770000002"].balance, self.um.users["0770000002"].balance)
+
+    def test_unposted_transactions_are_failed(self):
+        ghost = self.tm._create_transaction_record("0770000001", "0770000002", Decimal("5"), "TRANSFER")
+        report = replay.replay(self.data, self.out())
+        self.assertEqual(report.statuses["FAILED"], 1)
+        with open(self.out("transactions.json")) as f:
+            statuses = {t["id"]: t["status"] for t in json.load(f)}
+        self.assertEqual(statuses[ghost.id], "FAILED")
+
+class TestStorage(unittest.TestCase):
+    def test_streaming_reader_and_atomic_save(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "items.json")
+            items = [{"n": i, "text": "x" * (i % 7)} for i in range(500)]
+            JsonStorage(path).save(items)
+            self.assertEqual(os.listdir(tmp), ["items.json"])
+            self.assertEqual(list(iter_json_array(path, chunk_size=16)), items)
+            with open(path) as f:
+                text = f.read()
+            with open(path, "w") as f:
+                f.write(text[:-40])
+            with self.assertRaises(StorageCorruptError):
+                list(iter_json_array(path, chunk_size=16))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import sys
+import os
+import json
+import time
+from decimal import Decimal
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mobile_money_system.engine import MoneyEngine
+from mobile_money_system.replica import Replica, ReadOnlyError
+from base import StoreTestCase
+
+class TestReplica(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.replica = Replica(*self.files, journal_file=self.journal, max_staleness=0)
+
+    def open_store(self):
+        self.journal = os.path.join(self.tmp.name, "changes.jsonl")
+        self.engine = MoneyEngine(*self.files, journal_file=self.journal)
+        return self.engine.user_manager, self.engine.transaction_manager
+
+    def test_tails_new_writes(self):
+        self.tm.transfer("0770000001", "0770000002", 250)
+        self.um.register("0770000003", "Carol", "1234", "q", "a")
+        users, txns = self.replica.user_manager, self.replica.transaction_manager
+        self.assertEqual(users.get_user("0770000002").balance, Decimal("250"))
+        self.assertEqual([u.phone for u in users.search_users("Carol")], ["0770000003"])
+        self.assertEqual([t.type for t in txns.get_history("0770000002")], ["TRANSFER"])
+        self.assertEqual(len(txns.ledger.entries), len(self.tm.ledger.entries))
+        self.assertGreater(self.replica.applied, 0)
+
+    def test_in_place_updates_and_deletes(self):
+        self.tm.request_money("0770000002", "0770000001", 30)
+        request = self.tm.get_history("0770000002")[-1]
+        self.assertEqual(self.replica.transaction_manager.get_transaction(request.id).status, "PENDING")
+        self.tm.process_request(request.id, "DECLINE")
+        self.assertEqual(self.replica.transaction_manager.get_transaction(request.id).status, "DECLINED")
+        self.um.delete_user("0770000002")
+        self.assertIsNone(self.replica.user_manager.get_user("0770000002"))
+        self.assertEqual(len(self.replica.transaction_manager.transactions), len(self.tm.transactions))
+
+    def test_rotation_and_refresh_reload(self):
+        os.replace(self.journal, self.journal + ".1")
+        self.tm.deposit("0770000002", 75)
+        self.assertEqual(self.replica.user_manager.get_user("0770000002").balance, Decimal("75"))
+
+        # A writer that reloads another process's files doesn't journal them as its own changes
+        MoneyEngine(*self.files).transaction_manager.deposit("0770000001", 5)
+        self.assertTrue(self.engine.refresh())
+        size = os.path.getsize(self.journal)
+        self.tm.deposit("0770000002", 1)
+        with open(self.journal) as f:
+            f.seek(size)
+            records = [json.loads(line) for line in f]
+        self.assertEqual([r["data"]["phone"] for r in records if r["kind"] == "user"], ["0770000002"])
+
+    def test_unjournaled_stores_follow_the_files(self):
+        txns = self.replica.transaction_manager
+        _, hold_id = self.tm.authorize_bill("0770000001", 100, "LEC Power", "ACC-1")
+        self.tm.schedule_bill("0770000001", 10, "LEC Power", "ACC-2", "MONTHLY", start_at=time.time() + 3600)
+        self.tm.pay_bill("0770000001", 20, "LEC Power", "ACC-3")
+        self.assertEqual(txns.available_balance("0770000001"), self.tm.available_balance("0770000001"))
+        self.assertEqual([h.id for h in txns.get_holds("0770000001")], [hold_id])
+        self.assertEqual(len(txns.get_schedules("0770000001")), 1)
+        self.assertEqual(len(txns.settlement_queue()), 1)
+        self.tm.settle_billers()
+        self.assertEqual(txns.settlement_queue(), [])
+        self.assertEqual([r["status"] for r in txns.settler.settlements], ["SETTLED"])
+
+    def test_read_only(self):
+        with self.assertRaises(ReadOnlyError):
+            self.replica.transaction_manager.deposit("0770000001", 10)
+        with self.assertRaises(ReadOnlyError):
+            self.replica.user_manager.suspend_user("0770000001")
+        self.assertEqual(self.um.get_user("0770000001").balance, Decimal("1000"))
+
+    def test_staleness_bound(self):
+        self.replica.max_staleness = 60
+        self.replica.catch_up(force=True)
+        self.tm.deposit("0770000002", 10)
+        self.assertEqual(self.replica.user_manager.get_user("0770000002").balance, Decimal("0"))
+        self.replica.invalidate()
+        self.assertEqual(self.replica.user_manager.get_user("0770000002").balance, Decimal("10"))
+        self.assertLess(self.replica.lag, 5)
+
+if __name__ == '__main__':
+    unittest.main()
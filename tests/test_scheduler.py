@@ -0,0 +1,196 @@
+import unittest
+import sys
+import os
+import time
+from datetime import datetime
+from decimal import Decimal
+from unittest import mock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mobile_money_system.engine import MoneyEngine
+from mobile_money_system.holds import ExpiryTimer
+from mobile_money_system import scheduler
+from mobile_money_system.scheduler import ScheduleManager, MAX_RETRIES, next_occurrence
+from base import StoreTestCase
+
+class TestScheduler(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = time.time()
+
+    def test_monthly_runs_keep_their_day(self):
+        jan31 = datetime(2026, 1, 31, 9, 0).timestamp()
+        feb = next_occurrence(jan31, "MONTHLY", 31)
+        self.assertEqual(datetime.fromtimestamp(feb), datetime(2026, 2, 28, 9, 0))
+        self.assertEqual(datetime.fromtimestamp(next_occurrence(feb, "MONTHLY", 31)), datetime(2026, 3, 31, 9, 0))
+        self.assertEqual(datetime.fromtimestamp(next_occurrence(jan31, "WEEKLY", 31)), datetime(2026, 2, 7, 9, 0))
+
+    def test_standing_order_runs_and_reschedules(self):
+        ok, schedule_id = self.tm.schedule_transfer("0770000001", "0770000002", 100, "weekly", "Rent",
+                                                    start_at=self.now, occurrences=2)
+        self.assertTrue(ok, schedule_id)
+        self.assertEqual(self.tm.run_schedules(now=self.now - 1), 0)
+        self.assertEqual(self.tm.run_schedules(now=self.now), 1)
+        self.assertEqual(self.um.get_user("0770000002").balance, Decimal("100"))
+        schedule = self.tm.schedules.schedules[schedule_id]
+        self.assertEqual((schedule.last_status, schedule.remaining), ("COMPLETED", 1))
+        self.assertEqual(schedule.next_run, next_occurrence(self.now, "WEEKLY", schedule.day))
+        # Nothing is due until the next week; the last occurrence ends the order
+        self.assertEqual(self.tm.run_schedules(now=self.now + 86400), 0)
+        self.assertEqual(self.tm.run_schedules(now=schedule.next_run), 1)
+        self.assertEqual(self.um.get_user("0770000002").balance, Decimal("200"))
+        self.assertEqual(self.tm.get_schedules("0770000001"), [])
+
+    def test_insufficient_funds_retry_with_backoff(self):
+        _, schedule_id = self.tm.schedule_bill("0770000001", 2000, "LEC Power", "ACC-1", "MONTHLY", start_at=self.now)
+        schedule = self.tm.schedules.schedules[schedule_id]
+        runs = [self.now]
+        for _ in range(MAX_RETRIES):
+            self.tm.run_schedules(now=runs[-1])
+            self.assertEqual(schedule.last_status, "RETRYING")
+            runs.append(schedule.next_run)
+        gaps = [b - a for a, b in zip(runs, runs[1:])]
+        self.assertEqual(gaps, [gaps[0] * 2 ** i for i in range(MAX_RETRIES)])
+        # Retries exhausted: the occurrence is missed and the order moves to next month
+        self.tm.run_schedules(now=runs[-1])
+        self.assertEqual((schedule.last_status, schedule.attempts), ("FAILED", 0))
+        self.assertEqual(schedule.next_run, next_occurrence(self.now, "MONTHLY", schedule.day))
+        self.tm.deposit("0770000001", 2000)
+        self.tm.run_schedules(now=schedule.next_run)
+        self.assertEqual(schedule.last_status, "COMPLETED")
+        self.assertEqual(len(self.tm.ledger.entries), 8)
+
+    def test_validation_cancel_and_reload(self):
+        self.assertEqual(self.tm.schedule_transfer("0770000001", "0770000009", 10, "DAILY"), (False, "Receiver not found"))
+        self.assertFalse(self.tm.schedule_transfer("0770000001", "0770000002", 10, "HOURLY")[0])
+        self.assertFalse(self.tm.schedule_bill("0770000001", 0, "LEC Power", "ACC-1", "DAILY")[0])
+        _, kept = self.tm.schedule_bill("0770000001", 10, "LEC Power", "ACC-1", "DAILY", start_at=self.now + 60)
+        _, cancelled = self.tm.schedule_bill("0770000001", 10, "LEC Power", "ACC-2", "DAILY", start_at=self.now + 30)
+        self.assertTrue(self.tm.cancel_schedule(cancelled)[0])
+        self.assertEqual(self.tm.cancel_schedule(cancelled), (False, "Schedule not found"))
+        self.assertEqual(self.tm.schedules.next_run(), self.now + 60)
+        schedules = ScheduleManager(self.tm.schedules.storage.filepath)
+        self.assertEqual(list(schedules.schedules), [kept])
+        self.assertEqual(schedules.next_run(), self.now + 60)
+
+    def test_change_log_compaction(self):
+        schedules = self.tm.schedules
+        ids = [self.tm.schedule_bill("0770000001", 1, "LEC Power", f"ACC-{i}", "DAILY", start_at=self.now + i)[1]
+               for i in range(3)]
+        self.assertEqual(len(schedules.log.load()), 3)
+        self.tm.cancel_schedule(ids[0])
+        self.assertEqual(len(schedules.log.load()), 4)
+        limit, scheduler.COMPACT_MIN_RECORDS = scheduler.COMPACT_MIN_RECORDS, 4
+        try:
+            self.tm.cancel_schedule(ids[1])
+        finally:
+            scheduler.COMPACT_MIN_RECORDS = limit
+        self.assertEqual(schedules.log.load(), [])
+        # Records left behind by a crash before the log was emptied predate the snapshot
+        schedules.log.append([{"id": ids[2], "deleted": True, "generation": schedules.generation - 1}])
+        self.assertEqual(list(ScheduleManager(schedules.storage.filepath).schedules), [ids[2]])
+
+    def test_each_payment_is_logged_and_failures_requeue(self):
+        ids = [self.tm.schedule_bill("0770000001", 10, "LEC Power", f"ACC-{i}", "DAILY", start_at=self.now - 3 + i)[1]
+               for i in range(3)]
+        pay_bill, calls = self.tm.pay_bill, []
+
+        def flaky(*args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise OSError("disk full")
+            return pay_bill(*args)
+
+        self.tm.pay_bill = flaky
+        with self.assertRaises(OSError):
+            self.tm.run_schedules(now=self.now)
+        # The first order was moved on and logged before the failure; a restart won't pay it again
+        reloaded = ScheduleManager(self.tm.schedules.storage.filepath)
+        self.assertGreater(reloaded.schedules[ids[0]].next_run, self.now)
+        self.assertEqual([s.id for s in reloaded.due(self.now)], ids[1:])
+        # ...and this process still runs the rest on its next tick
+        self.tm.pay_bill = pay_bill
+        self.assertEqual(self.tm.run_schedules(now=self.now), 2)
+        self.assertEqual(self.tm.schedules.due(self.now), [])
+
+    def test_timer_survives_a_failing_run(self):
+        _, first = self.tm.schedule_bill("0770000001", 10, "LEC Power", "ACC-1", "DAILY", start_at=self.now)
+        _, second = self.tm.schedule_bill("0770000001", 10, "LEC Power", "ACC-2", "DAILY", start_at=self.now + 1)
+        pay_bill, calls = self.tm.pay_bill, []
+
+        def flaky(*args):
+            calls.append(args)
+            if len(calls) == 1:
+                raise OSError("disk full")
+            return pay_bill(*args)
+
+        self.tm.pay_bill = flaky
+        timer = ExpiryTimer(self.tm.schedules, self.tm.run_schedules, name="standing-orders", retry_seconds=0.05)
+        with self.assertLogs("mms.timers", "ERROR"):
+            timer.start()
+            deadline = time.time() + 5
+            while self.tm.schedules.schedules[second].last_status != "COMPLETED" and time.time() < deadline:
+                time.sleep(0.05)
+        self.assertTrue(timer._thread.is_alive())
+        timer.stop()
+        for schedule_id in (first, second):
+            self.assertEqual(self.tm.schedules.schedules[schedule_id].last_status, "COMPLETED")
+        self.assertEqual(timer.failures, 0)
+
+    def test_catch_up_tails_the_change_log(self):
+        other = ScheduleManager(self.tm.schedules.storage.filepath)
+        _, first = self.tm.schedule_bill("0770000001", 10, "LEC Power", "ACC-1", "DAILY", start_at=self.now)
+        _, second = self.tm.schedule_bill("0770000001", 10, "LEC Power", "ACC-2", "DAILY", start_at=self.now + 5)
+        self.tm.cancel_schedule(second)
+        with mock.patch.object(other, "load_schedules") as full_load:
+            self.assertTrue(other.log.changed_on_disk())
+            other.catch_up()
+        full_load.assert_not_called()
+        self.assertEqual(list(other.schedules), [first])
+        self.assertEqual([s.id for s in other.due(self.now)], [first])
+        # A compaction rewrites the snapshot, which needs a full load
+        self.tm.schedules.compact()
+        other.catch_up()
+        self.assertEqual(list(other.schedules), [first])
+
+    def test_engine_reloads_only_changed_stores(self):
+        engine = MoneyEngine(*self.files)
+        writer = MoneyEngine(*self.files)
+        schedules = engine._transaction_manager.schedules
+        with mock.patch.object(schedules, "load_schedules") as full_load, \
+                mock.patch.object(schedules, "catch_up", wraps=schedules.catch_up) as catch_up:
+            writer.user_manager.register("0770000003", "C", "1234", "q", "a")
+            self.assertTrue(engine.refresh())
+            catch_up.assert_not_called()
+            writer.transaction_manager.schedule_bill("0770000001", 10, "LEC Power", "ACC-1", "DAILY",
+                                                     start_at=self.now + 3600)
+            self.assertTrue(engine.refresh())
+            catch_up.assert_called_once()
+        full_load.assert_not_called()
+        self.assertIsNotNone(engine.user_manager.get_user("0770000003"))
+        self.assertEqual(len(engine.transaction_manager.get_schedules("0770000001")), 1)
+        for e in (engine, writer):
+            e.schedule_timer.stop()
+            e.hold_timer.stop()
+
+    def test_due_is_batched(self):
+        for i in range(5):
+            self.tm.schedule_bill("0770000001", 1, "LEC Power", f"ACC-{i}", "DAILY", start_at=self.now - i)
+        due = self.tm.schedules.due(self.now, limit=3)
+        self.assertEqual([s.reference for s in due], ["ACC-4", "ACC-3", "ACC-2"])
+
+    def test_engine_timer_runs_due_orders(self):
+        engine = MoneyEngine(*self.files)
+        ok, _ = engine.transaction_manager.schedule_transfer("0770000001", "0770000002", 50, "DAILY",
+                                                             start_at=time.time() + 0.05)
+        self.assertTrue(ok)
+        deadline = time.time() + 2
+        while engine.user_manager.get_user("0770000002").balance == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(engine.user_manager.get_user("0770000002").balance, Decimal("50"))
+        engine.schedule_timer.stop()
+        engine.hold_timer.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import sys
+import os
+import csv
+from decimal import Decimal
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mobile_money_system.settlement import MockBiller, Settler, biller_account
+from base import StoreTestCase
+
+class TestSettlement(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tm.deposit("0770000002", 1000)
+        self.tm.pay_bill("0770000001", 40, "LEC Power", "ACC-1")
+        self.tm.pay_bill("0770000002", 60, "LEC Power", "ACC-2")
+        self.tm.pay_bill("0770000001", 25, "Liberia Water", "W-9")
+
+    def test_payments_credit_biller_sub_accounts(self):
+        self.assertEqual(biller_account("Telecel/Lonestar"), "BILLER_SYSTEM:TELECEL_LONESTAR")
+        self.assertEqual(self.tm.ledger.get_account_balance(biller_account("LEC Power")), Decimal("100"))
+        self.assertEqual(self.tm.settlement_queue(), [
+            {"biller": "LEC_POWER", "currency": "USD", "payments": 2, "total": "100"},
+            {"biller": "LIBERIA_WATER", "currency": "USD", "payments": 1, "total": "25"},
+        ])
+
+    def test_batch_posts_one_entry_pair_per_biller(self):
+        records = self.tm.settle_billers()
+        self.assertEqual([(r["biller"], r["payments"], r["status"]) for r in records],
+                         [("LEC_POWER", 2, "SETTLED"), ("LIBERIA_WATER", 1, "SETTLED")])
+        with open(records[0]["file"], newline="") as f:
+            self.assertEqual([row["amount"] for row in csv.DictReader(f)], ["40", "60"])
+        self.assertEqual(self.tm.ledger.get_account_balance(biller_account("LEC Power")), Decimal("0"))
+        self.assertEqual(self.tm.settlement_queue(), [])
+        self.assertEqual(self.tm.settle_billers(), [])
+        # Payments after the cut go to the next batch
+        self.tm.pay_bill("0770000002", 10, "LEC Power", "ACC-2")
+        self.assertEqual([r["total"] for r in self.tm.settle_billers()], ["10"])
+        self.assertTrue(self.tm.reconcile(full=True).ok)
+
+    def test_rejected_settlement_retries(self):
+        self.tm.settler.gateway = MockBiller(reject={"LIBERIA_WATER"})
+        records = self.tm.settle_billers()
+        self.assertEqual([r["status"] for r in records], ["SETTLED", "PENDING"])
+        self.assertEqual(records[1]["last_error"], "Biller unavailable")
+        self.assertEqual(self.tm.ledger.get_account_balance(biller_account("Liberia Water")), Decimal("25"))
+
+        self.tm.settler.gateway = MockBiller()
+        self.assertEqual([r["status"] for r in self.tm.retry_settlements()], ["SETTLED"])
+        reloaded = Settler(self.tm, self.tm.settler.storage.filepath)
+        self.assertEqual([r["status"] for r in reloaded.settlements], ["SETTLED", "SETTLED"])
+        self.assertEqual(reloaded.position, len(self.tm.ledger.entries) - 4)
+
+    def test_mock_biller_checks_the_file(self):
+        records = self.tm.settle_billers()
+        tampered = dict(records[0], total="99")
+        self.assertEqual(MockBiller().submit(tampered, tampered["file"])["status"], "REJECTED")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import unittest
+import sys
+import os
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mobile_money_system.sharding import ShardedEngine, ShardWorker, SHARD_TRANSIT, shard_of
+
+SHARDS = 2
+
+def _phones():
+    # Two accounts on shard 0, two on shard 1 (the last is never registered)
+    phones = [f"07700000{i:02d}" for i in range(40)]
+    home = [p for p in phones if shard_of(p, SHARDS) == 0][:2]
+    away = [p for p in phones if shard_of(p, SHARDS) == 1][:2]
+    return home + away
+
+def _killed_on(call, real):
+    """Passes calls through to `real` until the `call`-th one, which raises as if the process was killed."""
+    calls = []
+    def stand_in(*args):
+        calls.append(args)
+        if len(calls) == call:
+            raise OSError("killed")
+        return real(*args)
+    return stand_in
+
+class TestSharding(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.a, self.b, self.c, self.missing = _phones()
+        self.engine = self.open()
+        for phone in (self.a, self.b, self.c):
+            self.engine.register(phone, phone, "1234", "q", "a")
+            self.engine.submit_kyc(phone, "passport", "P1234567")
+        self.engine.deposit(self.a, 1000)
+
+    def tearDown(self):
+        self.engine.close()
+        self.tmp.cleanup()
+
+    def open(self):
+        return ShardedEngine(self.tmp.name, SHARDS)
+
+    def balance(self, phone):
+        return self.engine.get_user(phone).balance
+
+    def transit(self):
+        return sum(self.engine.call(shard, "ledger_balance", SHARD_TRANSIT) for shard in range(SHARDS))
+
+    def test_intra_and_cross_shard_transfers(self):
+        self.assertEqual(self.engine.transfer(self.a, self.b, 100), (True, "Transfer successful"))
+        ok, msg = self.engine.transfer(self.a, self.c, 200)
+        self.assertTrue(ok, msg)
+        self.assertEqual(self.balance(self.b), Decimal("100"))
+        self.assertEqual(self.balance(self.c), Decimal("200"))
+        fees = Decimal("1000") - 300 - self.balance(self.a)
+        self.assertGreater(fees, 0)
+        self.assertEqual(self.transit(), 0)
+        sent = [t for t in self.engine.get_history(self.a) if t.receiver_phone == self.c][0]
+        received = self.engine.get_history(self.c)[0]
+        self.assertEqual((sent.id, sent.status), (received.id, "COMPLETED"))
+        self.assertEqual(self.engine.log.unfinished(), {})
+
+    def test_failed_prepare_aborts_both_sides(self):
+        ok, msg = self.engine.transfer(self.a, self.c, 5000)
+        self.assertFalse(ok)
+        self.assertIn("Insufficient", msg)
+        self.assertEqual(self.engine.transfer(self.a, self.missing, 10), (False, "Receiver not found"))
+        self.assertEqual(self.balance(self.a), Decimal("1000"))
+        self.assertEqual(self.engine.get_history(self.c), [])
+        self.assertEqual(self.transit(), 0)
+
+    def test_recovery_finishes_logged_decisions(self):
+        # Crash after both prepares and the commit decision, before any shard applied it
+        engine, source, target = self.engine, shard_of(self.a, SHARDS), shard_of(self.c, SHARDS)
+        engine.log.append({"txn": "TXN-COMMITTED", "state": "begin", "source": source, "target": target})
+        _, currency = engine.call(target, "prepare_credit", "TXN-COMMITTED", self.a, self.c, 50, "t")
+        engine.call(source, "prepare_debit", "TXN-COMMITTED", self.a, self.c, 50, currency, "t")
+        engine.log.append({"txn": "TXN-COMMITTED", "state": "commit"})
+        # ...and one crashed before a decision was logged
+        engine.log.append({"txn": "TXN-UNDECIDED", "state": "begin", "source": source, "target": target})
+        engine.call(target, "prepare_credit", "TXN-UNDECIDED", self.a, self.c, 70, "t")
+        engine.call(source, "prepare_debit", "TXN-UNDECIDED", self.a, self.c, 70, currency, "t")
+        self.assertLess(self.balance(self.a), Decimal("900"))
+        engine.close()
+
+        self.engine = self.open()
+        self.assertEqual(self.engine.recovered, 2)
+        self.assertEqual(self.balance(self.c), Decimal("50"))
+        self.assertGreater(self.balance(self.a), Decimal("940"))
+        self.assertEqual(self.transit(), 0)
+        # Re-delivered decisions are no-ops
+        self.assertTrue(self.engine.call(target, "commit", "TXN-COMMITTED")[0])
+        self.assertFalse(self.engine.call(source, "prepare_debit", "TXN-UNDECIDED", self.a, self.c, 70, currency, "t")[0])
+        self.assertEqual(self.balance(self.c), Decimal("50"))
+
+    def test_prepare_debit_respects_holds(self):
+        worker = ShardWorker(os.path.join(self.tmp.name, "worker"))
+        worker.register(self.a, self.a, "1234", "q", "a")
+        worker.submit_kyc(self.a, "passport", "P1234567")
+        worker.deposit(self.a, 1000)
+        self.assertTrue(worker.transaction_manager.authorize_bill(self.a, 900, "LEC Power", "ACC-1")[0])
+        ok, msg = worker.prepare_debit("TXN-HELD", self.a, self.c, 200, "USD", "t")
+        self.assertFalse(ok)
+        self.assertIn("Insufficient", msg)
+        self.assertEqual(worker.get_user(self.a).balance, Decimal("1000"))
+
+    def test_commit_and_abort_survive_a_crash(self):
+        path = os.path.join(self.tmp.name, "worker")
+        worker = ShardWorker(path)
+        for phone in (self.a, self.c):
+            worker.register(phone, phone, "1234", "q", "a")
+            worker.submit_kyc(phone, "passport", "P1234567")
+        worker.deposit(self.a, 1000)
+        worker.prepare_credit("TXN-IN", self.a, self.c, 50, "t")
+        worker.prepare_debit("TXN-OUT", self.a, self.c, 50, "USD", "t")
+        worker.prepare_debit("TXN-BACK", self.a, self.c, 30, "USD", "t")
+        before = worker.get_user(self.a).balance
+
+        # The process dies after the ledger post, before the balances are saved...
+        with mock.patch.object(worker.user_manager, "save_users", side_effect=OSError("killed")):
+            for txn_id, decision in (("TXN-IN", "commit"), ("TXN-BACK", "abort")):
+                with self.assertRaises(OSError):
+                    getattr(worker, decision)(txn_id)
+        # ...and after everything but forgetting the prepared record
+        with mock.patch.object(worker.storage, "save", side_effect=_killed_on(2, worker.storage.save)):
+            with self.assertRaises(OSError):
+                worker.commit("TXN-OUT")
+
+        worker = ShardWorker(path)  # restarted; recover() re-delivers the decisions
+        for txn_id, decision in (("TXN-IN", "commit"), ("TXN-OUT", "commit"), ("TXN-BACK", "abort")):
+            self.assertTrue(getattr(worker, decision)(txn_id)[0])
+        ledger = worker.transaction_manager.ledger
+        self.assertEqual(worker.get_user(self.c).balance, Decimal("50"))
+        self.assertEqual(worker.get_user(self.a).balance, before + ledger.entries_for("TXN-BACK")[-1].amount)
+        self.assertEqual(len(ledger.entries_for("TXN-IN")), 2)
+        self.assertEqual(len(ledger.entries_for("TXN-BACK")), 4)
+        self.assertEqual(len(ledger.entries_for("TXN-OUT-FEE")), 2)
+        self.assertEqual(ledger.get_account_balance(self.a), worker.get_user(self.a).balance)
+        self.assertEqual(ledger.get_account_balance(self.c), Decimal("50"))
+
+    def test_shard_count_is_fixed(self):
+        with self.assertRaises(ValueError):
+            ShardedEngine(self.tmp.name, SHARDS + 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import sys
+import os
+import json
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mobile_money_system.structuring import RollingWindow, StructuringDetector, main
+from mobile_money_system.models import Transaction
+
+class TestRollingWindow(unittest.TestCase):
+    def test_sums_and_distinct_expire(self):
+        window = RollingWindow(3600, 60)
+        window.add(0, Decimal("100"), counterparty="a")
+        window.add(1800, Decimal("50"), near=True, counterparty="b")
+        window.add(1900, Decimal("25"), counterparty="a")
+        self.assertEqual((window.total, window.count, window.near, len(window.distinct)), (Decimal("175"), 3, 1, 2))
+        window.evict(3700)
+        self.assertEqual((window.total, window.count, len(window.distinct)), (Decimal("75"), 2, 2))
+        window.evict(5600)
+        self.assertEqual((window.total, window.count, window.near, window.distinct), (Decimal("0"), 0, 0, {}))
+
+class TestStructuringDetector(unittest.TestCase):
+    def setUp(self):
+        self.detector = StructuringDetector()
+        self.now = datetime.now()
+        self.n = 0
+
+    def send(self, sender, receiver, amount, minutes_ago):
+        self.n += 1
+        t = Transaction(id=f"T{self.n}", sender_phone=sender, receiver_phone=receiver, amount=Decimal(str(amount)),
+                        currency="USD", type="TRANSFER", timestamp=(self.now - timedelta(minutes=minutes_ago)).isoformat())
+        self.detector.observe(t, tier="high")
+        return t
+
+    def rules(self, sender, receiver, amount):
+        return [a.id for a in self.detector.check(sender, Decimal(str(amount)), self.now.timestamp(), receiver, "high")]
+
+    def test_split_payments_under_reporting_threshold(self):
+        self.send("s", "r", 4000, 300)
+        self.send("s", "r", 4000, 200)
+        self.assertIn("split_24h", self.rules("s", "r", 4000))
+        self.assertNotIn("split_24h", self.rules("s", "r", 1000))
+
+    def test_near_threshold_repeats(self):
+        self.send("s", "r", 9500, 30)
+        self.assertEqual(self.rules("s", "r", 9600), ["structuring_1h"])
+
+    def test_fan_out_and_fan_in(self):
+        for i in range(4):
+            self.send("hub", f"mule{i}", 600, 10 + i)
+            self.send(f"payer{i}", "collector", 600, 10 + i)
+        self.assertIn("fan_out_1h", self.rules("hub", "mule9", 600))
+        self.assertIn("fan_in_1h", self.rules("payer9", "collector", 600))
+        self.assertEqual(self.rules("hub", "mule0", 600), [])
+
+    def test_backfill_cli(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            txns = [self.send("s", "r", 9500, m) for m in (50, 40)]
+            path = os.path.join(tmp, "transactions.json")
+            with open(path, "w") as f:
+                json.dump([t.to_dict() for t in txns], f)
+            out = os.path.join(tmp, "alerts.json")
+            main(["--transactions", path, "--users", os.path.join(tmp, "users.json"), "--output", out, "--apply"])
+            with open(out) as f:
+                alerts = json.load(f)
+            self.assertEqual([a["transaction_id"] for a in alerts], [txns[1].id])
+            with open(path) as f:
+                saved = json.load(f)
+            self.assertTrue(saved[1]["flagged"])
+            self.assertFalse(saved[0]["flagged"])
+
+if __name__ == '__main__':
+    unittest.main()
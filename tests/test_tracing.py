@@ -0,0 +1,64 @@
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mobile_money_system import tracing
+from mobile_money_system.engine import MoneyEngine
+
+def names(node):
+    return [node["name"]] + [n for child in node.get("children", []) for n in names(child)]
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        files = [os.path.join(self.tmpdir.name, f) for f in ("users.json", "transactions.json", "ledger.json")]
+        self.engine = MoneyEngine(*files)
+        um = self.engine.user_manager
+        for phone, name in (("0770000001", "Alice"), ("0770000002", "Bob")):
+            um.register(phone, name, "1234", "q", "a")
+            um.submit_kyc(phone, "passport", phone)
+        self.engine.transaction_manager.deposit("0770000001", 500)
+        self.tracer = tracing.Tracer(slow_ms=0, trace_file=os.path.join(self.tmpdir.name, "traces.jsonl"))
+
+    def tearDown(self):
+        for handler in list(self.tracer._file_logger().handlers):
+            handler.close()
+            self.tracer._file_logger().removeHandler(handler)
+        self.tracer._logger = None
+        self.tmpdir.cleanup()
+
+    def test_span_tree_covers_hot_path(self):
+        with self.tracer.trace("POST /transactions/transfer"):
+            success, _ = self.engine.transaction_manager.transfer("0770000001", "0770000002", 50)
+        self.assertTrue(success)
+        seen = names(self.tracer.recent[-1])
+        for name in ("engine.lock_wait", "op.transfer", "TransactionManager._check_limits",
+                     "TransactionManager._assess_aml", "LedgerManager.post_entries", "storage.save"):
+            self.assertIn(name, seen)
+        with open(self.tracer.trace_file) as f:
+            self.assertEqual(len(f.readlines()), 1)
+        aml = next(n for n in self.tracer.recent[-1]["children"][1]["children"] if n["name"] == "TransactionManager._assess_aml")
+        self.assertGreaterEqual(aml["attrs"]["aml_ms"], 0)
+
+    def test_no_spans_outside_trace(self):
+        with tracing.span("orphan") as sp:
+            self.assertIsNone(sp)
+        self.assertFalse(tracing.active())
+
+    def test_cprofile_window_counts_outer_operations(self):
+        tm = self.engine.transaction_manager
+        tm.request_money("0770000002", "0770000001", 10)
+        request_id = tm.transactions[-1].id
+        with tracing.profiling("cprofile") as profiler:
+            tm.process_request(request_id, "PAY")
+            with self.assertRaises(RuntimeError):
+                with tracing.profiling("sample"):
+                    pass
+        self.assertEqual(profiler.calls, 1)
+        self.assertIn("process_request", profiler.report())
+
+if __name__ == '__main__':
+    unittest.main()